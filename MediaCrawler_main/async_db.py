@@ -105,3 +105,31 @@ class AsyncMysqlDB:
             async with conn.cursor() as cur:
                 rows = await cur.execute(sql, args)
                 return rows
+
+    async def upsert_items(self, table_name: str, items: List[Dict[str, Any]], conflict_fields: List[str],
+                           insert_only_fields: List[str] = ()) -> int:
+        """
+        批量写入记录，唯一键冲突时更新已有记录（INSERT ... ON DUPLICATE KEY UPDATE），一次 executemany 完成
+        :param table_name: 表名
+        :param items: 记录列表，所有记录的字段必须一致
+        :param conflict_fields: 唯一键字段，冲突时不更新
+        :param insert_only_fields: 只在新增时写入、冲突时不更新的字段，如 add_ts
+        :return:
+        """
+        if not items:
+            return 0
+        fields = list(items[0].keys())
+        values = [[item.get(field) for field in fields] for item in items]
+        fieldstr = ','.join([f'`{field}`' for field in fields])
+        valstr = ','.join(['%s'] * len(fields))
+        skip_fields = set(conflict_fields) | set(insert_only_fields)
+        upsets = [f'`{field}`=VALUES(`{field}`)' for field in fields if field not in skip_fields]
+        if not upsets:
+            upsets = [f'`{conflict_fields[0]}`=`{conflict_fields[0]}`']
+        sql = "INSERT INTO %s (%s) VALUES(%s) ON DUPLICATE KEY UPDATE %s" % (
+            table_name, fieldstr, valstr, ','.join(upsets)
+        )
+        async with self.__pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                rows = await cur.executemany(sql, values)
+                return rows
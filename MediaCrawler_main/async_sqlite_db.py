@@ -13,14 +13,55 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/4/6 14:21
 # @Desc    : 异步SQLite的增删改查封装
-from typing import Any, Dict, List, Union
+import asyncio
+from typing import Any, Dict, List, Optional, Union
 
 import aiosqlite
 
 
 class AsyncSqliteDB:
-    def __init__(self, db_path: str) -> None:
+    """
+    持有一个常驻的 SQLite 连接，所有读写复用同一个连接，写操作串行执行
+    连接打开时开启 WAL 并设置 synchronous / cache_size，避免每条记录都重新打开文件和 fsync
+    """
+
+    def __init__(self, db_path: str, journal_mode: str = "WAL", synchronous: str = "NORMAL",
+                 cache_size: int = -64000) -> None:
+        """
+
+        Args:
+            db_path: 数据库文件路径
+            journal_mode: PRAGMA journal_mode
+            synchronous: PRAGMA synchronous
+            cache_size: PRAGMA cache_size，负数表示 KB
+        """
         self.__db_path = db_path
+        self.__journal_mode = journal_mode
+        self.__synchronous = synchronous
+        self.__cache_size = cache_size
+        self.__conn: Optional[aiosqlite.Connection] = None
+        self.__connect_lock: Optional[asyncio.Lock] = None
+        self.__write_lock: Optional[asyncio.Lock] = None
+
+    async def _get_conn(self) -> aiosqlite.Connection:
+        """
+        获取常驻连接，第一次调用时打开连接并设置 pragma
+        :return:
+        """
+        if self.__conn is not None:
+            return self.__conn
+        if self.__connect_lock is None:
+            self.__connect_lock = asyncio.Lock()
+            self.__write_lock = asyncio.Lock()
+        async with self.__connect_lock:
+            if self.__conn is None:
+                conn = await aiosqlite.connect(self.__db_path)
+                conn.row_factory = aiosqlite.Row
+                await conn.execute(f"PRAGMA journal_mode={self.__journal_mode}")
+                await conn.execute(f"PRAGMA synchronous={self.__synchronous}")
+                await conn.execute(f"PRAGMA cache_size={self.__cache_size}")
+                self.__conn = conn
+        return self.__conn
 
     async def query(self, sql: str, *args: Union[str, int]) -> List[Dict[str, Any]]:
         """
@@ -29,11 +70,10 @@ class AsyncSqliteDB:
         :param args: sql中传递动态参数列表
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-            async with conn.execute(sql, args) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows] if rows else []
+        conn = await self._get_conn()
+        async with conn.execute(sql, args) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows] if rows else []
 
     async def get_first(self, sql: str, *args: Union[str, int]) -> Union[Dict[str, Any], None]:
         """
@@ -42,11 +82,32 @@ class AsyncSqliteDB:
         :param args:sql中传递动态参数列表
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-            async with conn.execute(sql, args) as cursor:
-                row = await cursor.fetchone()
-                return dict(row) if row else None
+        conn = await self._get_conn()
+        async with conn.execute(sql, args) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
+    async def _write(self, sql: str, args: Any, many: bool = False) -> aiosqlite.Cursor:
+        """
+        在一个事务中执行写操作并提交，写操作之间串行，避免一个协程的 commit 提交另一个协程写到一半的数据
+        :param sql:
+        :param args: 参数，many 为 True 时是参数列表
+        :param many: 是否 executemany
+        :return:
+        """
+        conn = await self._get_conn()
+        async with self.__write_lock:
+            try:
+                if many:
+                    cursor = await conn.executemany(sql, args)
+                else:
+                    cursor = await conn.execute(sql, args)
+                await cursor.close()
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            return cursor
 
     async def item_to_table(self, table_name: str, item: Dict[str, Any]) -> int:
         """
@@ -60,10 +121,8 @@ class AsyncSqliteDB:
         fieldstr = ','.join(fields)
         valstr = ','.join(['?'] * len(item))
         sql = f"INSERT INTO {table_name} ({fieldstr}) VALUES({valstr})"
-        async with aiosqlite.connect(self.__db_path) as conn:
-            async with conn.execute(sql, values) as cursor:
-                await conn.commit()
-                return cursor.lastrowid
+        cursor = await self._write(sql, values)
+        return cursor.lastrowid
 
     async def update_table(self, table_name: str, updates: Dict[str, Any], field_where: str,
                            value_where: Union[str, int, float]) -> int:
@@ -83,10 +142,35 @@ class AsyncSqliteDB:
         upsets_str = ','.join(upsets)
         values.append(value_where)
         sql = f'UPDATE {table_name} SET {upsets_str} WHERE {field_where}=?'
-        async with aiosqlite.connect(self.__db_path) as conn:
-            async with conn.execute(sql, values) as cursor:
-                await conn.commit()
-                return cursor.rowcount
+        cursor = await self._write(sql, values)
+        return cursor.rowcount
+
+    async def upsert_items(self, table_name: str, items: List[Dict[str, Any]], conflict_fields: List[str],
+                           insert_only_fields: List[str] = ()) -> int:
+        """
+        批量写入记录，唯一键冲突时更新已有记录（INSERT ... ON CONFLICT DO UPDATE），一次 executemany 在同一个事务中完成
+        :param table_name: 表名
+        :param items: 记录列表，所有记录的字段必须一致
+        :param conflict_fields: 唯一键字段，表中需要有对应的 UNIQUE 索引
+        :param insert_only_fields: 只在新增时写入、冲突时不更新的字段，如 add_ts
+        :return:
+        """
+        if not items:
+            return 0
+        fields = list(items[0].keys())
+        values = [[item.get(field) for field in fields] for item in items]
+        fieldstr = ','.join(fields)
+        valstr = ','.join(['?'] * len(fields))
+        skip_fields = set(conflict_fields) | set(insert_only_fields)
+        upsets = [f'{field}=excluded.{field}' for field in fields if field not in skip_fields]
+        conflict_str = ','.join(conflict_fields)
+        if upsets:
+            on_conflict = f"ON CONFLICT({conflict_str}) DO UPDATE SET {','.join(upsets)}"
+        else:
+            on_conflict = f"ON CONFLICT({conflict_str}) DO NOTHING"
+        sql = f"INSERT INTO {table_name} ({fieldstr}) VALUES({valstr}) {on_conflict}"
+        cursor = await self._write(sql, values, many=True)
+        return cursor.rowcount
 
     async def execute(self, sql: str, *args: Union[str, int]) -> int:
         """
@@ -95,10 +179,8 @@ class AsyncSqliteDB:
         :param args:
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
-            async with conn.execute(sql, args) as cursor:
-                await conn.commit()
-                return cursor.rowcount
+        cursor = await self._write(sql, args)
+        return cursor.rowcount
 
     async def executescript(self, sql_script: str) -> None:
         """
@@ -106,6 +188,17 @@ class AsyncSqliteDB:
         :param sql_script: SQL脚本内容
         :return:
         """
-        async with aiosqlite.connect(self.__db_path) as conn:
+        conn = await self._get_conn()
+        async with self.__write_lock:
             await conn.executescript(sql_script)
-            await conn.commit()
\ No newline at end of file
+            await conn.commit()
+
+    async def close(self) -> None:
+        """
+        提交并关闭常驻连接
+        :return:
+        """
+        conn, self.__conn = self.__conn, None
+        if conn is not None:
+            await conn.commit()
+            await conn.close()
@@ -9,8 +9,9 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。  
 
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, Optional
 
 from playwright.async_api import BrowserContext, BrowserType, Playwright
 
@@ -56,6 +57,35 @@ class AbstractCrawler(ABC):
         # 默认实现：回退到标准模式
         return await self.launch_browser(playwright.chromium, playwright_proxy, user_agent, headless)
 
+    async def run_keyword_searches(self, search_keyword: Callable[..., Awaitable[None]], *args) -> None:
+        """
+        并发执行多个关键词的搜索，同时进行的关键词数量由 KEYWORD_SEARCH_CONCURRENCY 控制
+        每个关键词在独立的 task 中运行，source_keyword_var 等上下文变量只在该关键词的 task 内生效，
+        保存的数据按关键词正确归属；请求仍受平台共享的限速和并发控制约束
+        任一关键词搜索抛出异常时取消其余关键词，与串行执行时一样向上抛出
+        :param search_keyword: 单个关键词的搜索函数，第一个参数为关键词
+        :param args: 传给搜索函数的其余参数
+        :return:
+        """
+        import config
+        from var import request_keyword_var, source_keyword_var
+        semaphore = asyncio.Semaphore(max(1, config.KEYWORD_SEARCH_CONCURRENCY))
+
+        async def search_task(keyword: str):
+            async with semaphore:
+                source_keyword_var.set(keyword)
+                request_keyword_var.set(keyword)
+                await search_keyword(keyword, *args)
+
+        task_list = [asyncio.create_task(search_task(keyword), name=keyword) for keyword in config.KEYWORDS.split(",")]
+        try:
+            await asyncio.gather(*task_list)
+        except BaseException:
+            for task in task_list:
+                task.cancel()
+            await asyncio.gather(*task_list, return_exceptions=True)
+            raise
+
 
 class AbstractLogin(ABC):
     @abstractmethod
@@ -98,8 +128,26 @@ class AbstractStoreImage(ABC):
     async def store_image(self, image_content_item: Dict):
         pass
 
+    async def store_media(self, save_file_name: str, media_key: str,
+                          download: Callable[[str], Awaitable[bool]]) -> bool:
+        """
+        保存媒体文件，开启媒体去重时经过按内容寻址的媒体库，已下载过的媒体直接硬链接
+        :param save_file_name: 保存路径
+        :param media_key: 媒体标识，相同标识的媒体只下载一次
+        :param download: 下载函数，参数为保存路径，返回是否下载成功
+        :return: 是否保存成功
+        """
+        import config
+        if not config.ENABLE_MEDIA_DEDUP:
+            return await download(save_file_name)
+        from store.media_blob_store import media_blob_store
+        return await media_blob_store.fetch(media_key, save_file_name, download)
+
 
 class AbstractApiClient(ABC):
+    # 开启 IP 代理时由爬虫设置，request 方法遇到 IP 封禁时通过它更换代理
+    proxy_rotator = None
+
     @abstractmethod
     async def request(self, method, url, **kwargs):
         pass
@@ -0,0 +1,641 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 端到端爬取吞吐压测，用本地模拟平台服务器驱动各平台 Crawler.search 和 batch_get_*_comments，
+#            统计吞吐、p50/p99 延迟、峰值内存和事件循环延迟，按 MAX_CONCURRENCY_NUM 和 SAVE_DATA_OPTION 组合运行
+#            默认关闭自适应限速和自适应并发，只测爬虫本身，限速器的等待时间单独统计，不计入请求延迟
+#            运行方式: python -m benchmark.bench_crawler_throughput --platforms xhs,dy,ks,bili,wb,tieba,zhihu --concurrency 1,4
+import argparse
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from benchmark.mock_platform_server import MockServerOptions, serve
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计峰值内存
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# bilibili 从 localStorage 读取 wbi 签名的 key
+BILI_WBI_IMG_URLS = ("https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png-"
+                     "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png")
+
+# 当前 API 请求在限速器中的等待时间，用于从请求耗时中扣除
+_request_limiter_waits: ContextVar[Optional[List[float]]] = ContextVar("request_limiter_waits", default=None)
+
+
+@dataclass
+class BenchCase:
+    platform: str
+    save_data_option: str
+    max_concurrency_num: int
+    server_url: str
+    keywords: str
+    max_notes_count: int
+    max_comments_count: int
+    keep_crawl_interval: bool
+    verbose: bool
+    config_overrides: Dict = field(default_factory=dict)
+
+
+@dataclass
+class BenchStats:
+    latencies: List[float] = field(default_factory=list)  # API 请求耗时(包括重试，不包括限速器等待)
+    path_counts: Counter = field(default_factory=Counter)  # 成功的 API 请求按路径计数
+    failed_requests: int = 0  # 重试后仍失败的 API 请求
+    http_requests: int = 0  # 实际发出的 HTTP 请求(包括重试)
+    http_errors: int = 0  # 返回 5xx 的 HTTP 请求
+    notes: int = 0  # 保存的帖子数
+    comments: int = 0  # 保存的评论数
+    loop_lags: List[float] = field(default_factory=list)  # 事件循环调度延迟
+    limiter_waits: List[float] = field(default_factory=list)  # 每次 API 请求在限速器中的等待时间
+
+
+@dataclass
+class CrawlScenario:
+    search_path: str  # 搜索接口路径，用于统计翻页数
+    store_module: str  # 平台的 store 模块
+    note_store_func: str  # 保存帖子的函数
+    comments_store_func: str  # 批量保存评论的函数
+    local_storage: Dict[str, str]  # 模拟浏览器 localStorage，客户端签名时读取
+    create_crawler: Callable  # (fake_page) -> (crawler, api_client)
+    request_key: Callable = lambda url, kwargs: urlsplit(url).path  # 请求的统计 key，默认按路径统计
+
+
+class FakePage:
+    """替代 playwright Page，只实现 API 客户端签名用到的 evaluate"""
+
+    def __init__(self, local_storage: Dict[str, str]):
+        self.local_storage = local_storage
+
+    async def evaluate(self, expression: str, arg=None):
+        if "localStorage" in expression:
+            return self.local_storage
+        # xhs 的 window._webmsxyw 签名，长度与真实签名接近(sign 至少需要 57 个字符)
+        return {"X-s": "XYW_" + "0" * 120, "X-t": str(int(time.time() * 1000))}
+
+
+class NoCrawlIntervalRandom:
+    """
+    替换平台 core 模块中的 random，爬取间隔(random.random / random.uniform / random.randint)返回 0，只测爬虫本身的吞吐
+    其他函数仍使用标准库的 random
+    """
+
+    @staticmethod
+    def random() -> float:
+        return 0.0
+
+    @staticmethod
+    def uniform(a: float, b: float) -> float:
+        return 0.0
+
+    @staticmethod
+    def randint(a: int, b: int) -> int:
+        return 0
+
+    def __getattr__(self, name: str):
+        return getattr(random, name)
+
+
+class MockPlatformTransport(httpx.AsyncBaseTransport):
+    """把所有平台域名的请求转发到本地模拟服务器，保留路径和参数，并统计实际发出的 HTTP 请求"""
+
+    def __init__(self, server_url: str, stats: BenchStats, limits: httpx.Limits):
+        self._server_url = httpx.URL(server_url)
+        self._stats = stats
+        self._transport = httpx.AsyncHTTPTransport(limits=limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self._server_url.scheme, host=self._server_url.host, port=self._server_url.port
+        )
+        request.headers["Host"] = self._server_url.netloc.decode("ascii")
+        self._stats.http_requests += 1
+        response = await self._transport.handle_async_request(request)
+        if response.status_code >= 500:
+            self._stats.http_errors += 1
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_xhs_crawler(page: FakePage):
+    from media_platform.xhs.client import XiaoHongShuClient
+    from media_platform.xhs.core import XiaoHongShuCrawler
+
+    crawler = XiaoHongShuCrawler()
+    crawler.xhs_client = XiaoHongShuClient(headers={"Cookie": ""}, playwright_page=page, cookie_dict={})
+    return crawler, crawler.xhs_client
+
+
+def create_bili_crawler(page: FakePage):
+    from media_platform.bilibili.client import BilibiliClient
+    from media_platform.bilibili.core import BilibiliCrawler
+
+    crawler = BilibiliCrawler()
+    crawler.bili_client = BilibiliClient(headers={"Cookie": ""}, playwright_page=page, cookie_dict={})
+    return crawler, crawler.bili_client
+
+
+def create_dy_crawler(page: FakePage):
+    from media_platform.douyin.client import DOUYINClient
+    from media_platform.douyin.core import DouYinCrawler
+
+    crawler = DouYinCrawler()
+    crawler.dy_client = DOUYINClient(
+        headers={"User-Agent": "Mozilla/5.0", "Cookie": "", "Host": "www.douyin.com",
+                 "Origin": "https://www.douyin.com/", "Referer": "https://www.douyin.com/",
+                 "Content-Type": "application/json;charset=UTF-8"},
+        playwright_page=page,
+        cookie_dict={},
+    )
+    return crawler, crawler.dy_client
+
+
+def create_ks_crawler(page: FakePage):
+    from media_platform.kuaishou.client import KuaiShouClient
+    from media_platform.kuaishou.core import KuaishouCrawler
+
+    crawler = KuaishouCrawler()
+    crawler.ks_client = KuaiShouClient(headers={"Cookie": "", "Content-Type": "application/json;charset=UTF-8"},
+                                       playwright_page=page, cookie_dict={})
+    return crawler, crawler.ks_client
+
+
+def create_wb_crawler(page: FakePage):
+    from media_platform.weibo.client import WeiboClient
+    from media_platform.weibo.core import WeiboCrawler
+
+    crawler = WeiboCrawler()
+    crawler.wb_client = WeiboClient(headers={"Cookie": ""}, playwright_page=page, cookie_dict={})
+    return crawler, crawler.wb_client
+
+
+def create_zhihu_crawler(page: FakePage):
+    from media_platform.zhihu.client import ZhiHuClient
+    from media_platform.zhihu.core import ZhihuCrawler
+
+    crawler = ZhihuCrawler()
+    crawler.zhihu_client = ZhiHuClient(headers={"cookie": "d_c0=mock"}, playwright_page=page,
+                                       cookie_dict={"d_c0": "mock"})
+    return crawler, crawler.zhihu_client
+
+
+def create_tieba_crawler(page: FakePage):
+    from media_platform.tieba.client import BaiduTieBaClient
+    from media_platform.tieba.core import TieBaCrawler
+
+    crawler = TieBaCrawler()
+    crawler.tieba_client = BaiduTieBaClient()
+    return crawler, crawler.tieba_client
+
+
+def ks_request_key(url: str, kwargs: Dict) -> str:
+    """快手所有接口都是 POST /graphql，按 operationName 区分"""
+    operation_name = json.loads(kwargs.get("data") or "{}").get("operationName", "")
+    return f"{urlsplit(url).path}#{operation_name}"
+
+
+SCENARIOS: Dict[str, CrawlScenario] = {
+    "xhs": CrawlScenario(
+        search_path="/api/sns/web/v1/search/notes",
+        store_module="store.xhs",
+        note_store_func="update_xhs_note",
+        comments_store_func="batch_update_xhs_note_comments",
+        local_storage={"b1": "mock_b1"},
+        create_crawler=create_xhs_crawler,
+    ),
+    "bili": CrawlScenario(
+        search_path="/x/web-interface/wbi/search/type",
+        store_module="store.bilibili",
+        note_store_func="update_bilibili_video",
+        comments_store_func="batch_update_bilibili_video_comments",
+        local_storage={"wbi_img_urls": BILI_WBI_IMG_URLS},
+        create_crawler=create_bili_crawler,
+    ),
+    "dy": CrawlScenario(
+        search_path="/aweme/v1/web/general/search/single/",
+        store_module="store.douyin",
+        note_store_func="update_douyin_aweme",
+        comments_store_func="batch_update_dy_aweme_comments",
+        local_storage={"xmst": "mock_ms_token"},
+        create_crawler=create_dy_crawler,
+    ),
+    "ks": CrawlScenario(
+        search_path="/graphql#visionSearchPhoto",
+        store_module="store.kuaishou",
+        note_store_func="update_kuaishou_video",
+        comments_store_func="batch_update_ks_video_comments",
+        local_storage={},
+        create_crawler=create_ks_crawler,
+        request_key=ks_request_key,
+    ),
+    "wb": CrawlScenario(
+        search_path="/api/container/getIndex",
+        store_module="store.weibo",
+        note_store_func="update_weibo_note",
+        comments_store_func="batch_update_weibo_note_comments",
+        local_storage={},
+        create_crawler=create_wb_crawler,
+    ),
+    "zhihu": CrawlScenario(
+        search_path="/api/v4/search_v3",
+        store_module="store.zhihu",
+        note_store_func="update_zhihu_content",
+        comments_store_func="batch_update_zhihu_note_comments",
+        local_storage={},
+        create_crawler=create_zhihu_crawler,
+    ),
+    "tieba": CrawlScenario(
+        search_path="/f/search/res",
+        store_module="store.tieba",
+        note_store_func="update_tieba_note",
+        comments_store_func="batch_update_tieba_note_comments",
+        local_storage={},
+        create_crawler=create_tieba_crawler,
+    ),
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # Linux 下 ru_maxrss 的单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def preload_module(module_name: str) -> None:
+    """在解析进程中提前导入模块，模块对象不能 pickle，不返回"""
+    importlib.import_module(module_name)
+
+
+def instrument_api_client(api_client, scenario: CrawlScenario, stats: BenchStats) -> None:
+    """替换客户端实例的 request，统计每个 API 请求的耗时(包括重试和换 IP)"""
+    request = api_client.request
+
+    @functools.wraps(request)
+    async def timed_request(method, url, **kwargs):
+        limiter_waits: List[float] = []
+        token = _request_limiter_waits.set(limiter_waits)
+        start = time.perf_counter()
+        try:
+            result = await request(method, url, **kwargs)
+        except Exception:
+            stats.failed_requests += 1
+            raise
+        finally:
+            _request_limiter_waits.reset(token)
+        stats.latencies.append(time.perf_counter() - start - sum(limiter_waits))
+        stats.path_counts[scenario.request_key(url, kwargs)] += 1
+        return result
+
+    api_client.request = timed_request
+
+
+def instrument_store(scenario: CrawlScenario, stats: BenchStats) -> None:
+    """替换平台 store 模块的保存函数，统计保存的帖子数和评论数"""
+    store_module = importlib.import_module(scenario.store_module)
+    note_store_func = getattr(store_module, scenario.note_store_func)
+    comments_store_func = getattr(store_module, scenario.comments_store_func)
+
+    async def counted_note_store(*args, **kwargs):
+        stats.notes += 1
+        return await note_store_func(*args, **kwargs)
+
+    async def counted_comments_store(*args, **kwargs):
+        # 评论列表是最后一个参数，知乎的保存函数只有评论列表一个参数
+        stats.comments += len(args[-1] or [])
+        return await comments_store_func(*args, **kwargs)
+
+    setattr(store_module, scenario.note_store_func, counted_note_store)
+    setattr(store_module, scenario.comments_store_func, counted_comments_store)
+
+
+def instrument_rate_limiter(stats: BenchStats) -> None:
+    """替换限速器的 acquire，统计每次请求等待令牌的时间，与请求延迟分开报告"""
+    from tools.rate_limiter import AdaptiveRateLimiter
+
+    acquire = AdaptiveRateLimiter.acquire
+
+    @functools.wraps(acquire)
+    async def timed_acquire(self):
+        start = time.perf_counter()
+        try:
+            return await acquire(self)
+        finally:
+            wait = time.perf_counter() - start
+            stats.limiter_waits.append(wait)
+            request_limiter_waits = _request_limiter_waits.get()
+            if request_limiter_waits is not None:
+                request_limiter_waits.append(wait)
+
+    AdaptiveRateLimiter.acquire = timed_acquire
+
+
+async def monitor_loop_lag(stats: BenchStats, interval: float = 0.01) -> None:
+    """定时 sleep，实际唤醒时间比预期晚多少就是事件循环被阻塞的时间"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stats.loop_lags.append(loop.time() - start - interval)
+
+
+def apply_config(case: BenchCase, work_dir: str) -> None:
+    """在导入平台模块之前设置配置，部分模块在导入时读取配置"""
+    import config
+
+    config.PLATFORM = case.platform
+    config.KEYWORDS = case.keywords
+    config.CRAWLER_TYPE = "search"
+    config.START_PAGE = 1
+    config.BILI_SEARCH_MODE = "normal"
+    config.SAVE_DATA_OPTION = case.save_data_option
+    config.MAX_CONCURRENCY_NUM = case.max_concurrency_num
+    config.CRAWLER_MAX_NOTES_COUNT = case.max_notes_count
+    config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES = case.max_comments_count
+    config.ENABLE_GET_COMMENTS = True
+    config.ENABLE_GET_SUB_COMMENTS = False
+    config.ENABLE_GET_IMAGES = False
+    config.ENABLE_GET_WORDCLOUD = False
+    config.ENABLE_IP_PROXY = False
+    config.ENABLE_INCREMENTAL_CRAWL = False
+    # 自适应限速会把吞吐压在 RATE_LIMIT_MAX_RPS，默认关闭，只测爬虫本身，可用 --set 打开
+    config.ENABLE_ADAPTIVE_RATE_LIMIT = False
+    # 自适应并发会从 MAX_CONCURRENCY_NUM 逐步调整，不同并发数的结果会趋同，默认使用固定并发
+    config.ENABLE_ADAPTIVE_CONCURRENCY = False
+    config.HTTP_CASSETTE_MODE = ""
+    config.SQLITE_DB_PATH = os.path.join(work_dir, "sqlite_tables.db")
+    for key, value in case.config_overrides.items():
+        setattr(config, key, value)
+
+
+async def run_case(case: BenchCase, work_dir: str) -> Dict:
+    """
+    在当前进程中运行一次压测，爬取数据写入 work_dir
+    Args:
+        case: 压测参数
+        work_dir: 临时工作目录
+
+    Returns: 压测结果
+
+    """
+    apply_config(case, work_dir)
+
+    import config
+    import db
+    from store import jsonl_store
+    from tools import extraction_executor, http_pool, media_downloader, signer_pool, utils
+    from var import crawler_type_var
+
+    if not case.verbose:
+        utils.logger.setLevel(logging.WARNING)
+
+    scenario = SCENARIOS[case.platform]
+    stats = BenchStats()
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    http_pool._http_client_pool = http_pool.HttpClientPool(
+        transport=MockPlatformTransport(case.server_url, stats, limits)
+    )
+
+    if case.save_data_option == "sqlite":
+        with open(os.path.join(PROJECT_ROOT, "schema", "sqlite_tables.sql"), encoding="utf-8") as f:
+            with sqlite3.connect(config.SQLITE_DB_PATH) as conn:
+                conn.executescript(f.read())
+    if case.save_data_option in ["db", "sqlite"]:
+        await db.init_db()
+
+    crawler, api_client = scenario.create_crawler(FakePage(scenario.local_storage))
+    if not case.keep_crawl_interval:
+        core_module = __import__(type(crawler).__module__, fromlist=["random"])
+        core_module.random = NoCrawlIntervalRandom()
+    instrument_api_client(api_client, scenario, stats)
+    instrument_store(scenario, stats)
+    instrument_rate_limiter(stats)
+    crawler_type_var.set(config.CRAWLER_TYPE)
+    # 部分模块导入时按相对项目根目录的路径读取文件，导入完成后再切换到临时目录保存数据
+    # 签名脚本在第一次签名时才加载，切换目录前先转换成绝对路径
+    for pool in signer_pool.SignerPool._instances:
+        pool.js_path = os.path.abspath(pool.js_path)
+    # 解析进程池的子进程继承启动时的当前目录，子进程按需启动，切换目录前同时提交任务启动全部子进程，
+    # 并在子进程中导入平台模块，进程启动和模块导入的耗时不计入压测
+    executor = extraction_executor.get_extraction_executor()
+    if executor.max_workers > 0:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(executor._get_pool(), preload_module, type(crawler).__module__)
+            for _ in range(executor.max_workers)
+        ])
+    os.chdir(work_dir)
+
+    lag_task = asyncio.create_task(monitor_loop_lag(stats))
+    error = ""
+    start = time.perf_counter()
+    try:
+        await crawler.search()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        # 与 main.py 一致，保存数据的落盘时间也计入压测
+        await media_downloader.close()
+        await http_pool.close_all()
+        await signer_pool.close_all()
+        extraction_executor.close()
+        if case.save_data_option == "jsonl":
+            await jsonl_store.close()
+        if case.save_data_option in ["db", "sqlite"]:
+            await db.close()
+    elapsed = time.perf_counter() - start
+    lag_task.cancel()
+
+    pages = stats.path_counts[scenario.search_path]
+    return {
+        "platform": case.platform,
+        "save_data_option": case.save_data_option,
+        "max_concurrency_num": case.max_concurrency_num,
+        "elapsed_sec": round(elapsed, 3),
+        "pages": pages,
+        "notes": stats.notes,
+        "comments": stats.comments,
+        "pages_per_sec": round(pages / elapsed, 2),
+        "notes_per_sec": round(stats.notes / elapsed, 2),
+        "comments_per_sec": round(stats.comments / elapsed, 2),
+        "requests_per_sec": round(len(stats.latencies) / elapsed, 2),
+        "latency_p50_ms": round(percentile(stats.latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(percentile(stats.latencies, 99) * 1000, 2),
+        "limiter_wait_p99_ms": round(percentile(stats.limiter_waits, 99) * 1000, 2),
+        "limiter_wait_total_sec": round(sum(stats.limiter_waits, 0.0), 3),
+        "http_requests": stats.http_requests,
+        "http_errors": stats.http_errors,
+        "failed_requests": stats.failed_requests,
+        "loop_lag_p99_ms": round(percentile(stats.loop_lags, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(stats.loop_lags, default=0) * 1000, 2),
+        "peak_rss_mb": get_peak_rss_mb(),
+        "error": error,
+    }
+
+
+def run_case_in_process(case: BenchCase) -> Dict:
+    """
+    每个组合在新进程中运行，配置、模块级单例和峰值内存互不影响
+    数据写到临时目录，运行结束后删除
+    """
+    with tempfile.TemporaryDirectory(prefix="mediacrawler_bench_") as work_dir:
+        os.chdir(PROJECT_ROOT)
+        try:
+            return asyncio.run(run_case(case, work_dir))
+        finally:
+            os.chdir(PROJECT_ROOT)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"mock platform server is not ready on port {port}")
+
+
+def print_results(results: List[Dict]) -> None:
+    columns: List[Tuple[str, str]] = [
+        ("platform", "platform"), ("save", "save_data_option"), ("conc", "max_concurrency_num"),
+        ("elapsed(s)", "elapsed_sec"), ("pages/s", "pages_per_sec"), ("notes/s", "notes_per_sec"),
+        ("comments/s", "comments_per_sec"), ("req/s", "requests_per_sec"), ("p50(ms)", "latency_p50_ms"),
+        ("p99(ms)", "latency_p99_ms"), ("wait_p99(ms)", "limiter_wait_p99_ms"),
+        ("wait_total(s)", "limiter_wait_total_sec"), ("http_err", "http_errors"), ("failed", "failed_requests"),
+        ("lag_p99(ms)", "loop_lag_p99_ms"), ("lag_max(ms)", "loop_lag_max_ms"), ("rss(MB)", "peak_rss_mb"),
+    ]
+    rows = [[title for title, _ in columns]]
+    for result in results:
+        row = []
+        for _, key in columns:
+            value = result[key]
+            row.append(f"{value:.1f}" if isinstance(value, float) and key == "peak_rss_mb" else str(value))
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+    for result in results:
+        if result["error"]:
+            print(f"[{result['platform']}/{result['save_data_option']}/{result['max_concurrency_num']}] "
+                  f"crawler aborted: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="end-to-end crawler throughput benchmark")
+    parser.add_argument("--platforms", default=",".join(SCENARIOS), help=f"逗号分隔，可选 {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4", help="逗号分隔的 MAX_CONCURRENCY_NUM")
+    parser.add_argument("--save-options", default="json", help="逗号分隔的 SAVE_DATA_OPTION，db 需要可用的 MySQL")
+    parser.add_argument("--keywords", default="bench")
+    parser.add_argument("--notes", type=int, default=40, help="CRAWLER_MAX_NOTES_COUNT，每页 10 或 20 条")
+    parser.add_argument("--comments", type=int, default=20, help="每个帖子的评论数")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--keep-crawl-interval", action="store_true", help="保留爬虫的随机爬取间隔")
+    parser.add_argument("--json-output", default="", help="把结果写入 json 文件，方便对比优化前后的数据")
+    parser.add_argument("--verbose", action="store_true", help="输出爬虫的 INFO 日志")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="覆盖配置项，值按 JSON 解析，例如 --set ENABLE_ADAPTIVE_RATE_LIMIT=true")
+    args = parser.parse_args()
+
+    config_overrides = {}
+    for item in args.set:
+        key, _, value = item.partition("=")
+        try:
+            config_overrides[key] = json.loads(value)
+        except ValueError:
+            config_overrides[key] = value
+
+    platforms = [platform for platform in args.platforms.split(",") if platform]
+    for platform in platforms:
+        if platform not in SCENARIOS:
+            parser.error(f"unsupported platform: {platform}")
+
+    port = get_free_port()
+    server_options = MockServerOptions(args.latency_ms, args.jitter_ms, args.error_rate, args.comments)
+    ctx = multiprocessing.get_context("spawn")
+    server = ctx.Process(target=serve, args=(port, server_options), daemon=True)
+    server.start()
+    results = []
+    try:
+        wait_for_port(port)
+        for platform in platforms:
+            for save_data_option in args.save_options.split(","):
+                for concurrency in args.concurrency.split(","):
+                    case = BenchCase(
+                        platform=platform,
+                        save_data_option=save_data_option,
+                        max_concurrency_num=int(concurrency),
+                        server_url=f"http://127.0.0.1:{port}",
+                        keywords=args.keywords,
+                        max_notes_count=args.notes,
+                        max_comments_count=args.comments,
+                        keep_crawl_interval=args.keep_crawl_interval,
+                        verbose=args.verbose,
+                        config_overrides=config_overrides,
+                    )
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                        results.append(executor.submit(run_case_in_process, case).result())
+    finally:
+        server.terminate()
+        server.join()
+
+    print_results(results)
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
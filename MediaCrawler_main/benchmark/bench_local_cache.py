@@ -0,0 +1,73 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 本地缓存微基准，对比 ExpiringLocalCache 与 ExpiringLruCache
+#            运行方式: python -m benchmark.bench_local_cache --keys 50000
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable, Dict
+
+from cache.abs_cache import AbstractCache
+from cache.expiring_lru_cache import ExpiringLruCache
+from cache.local_cache import ExpiringLocalCache
+
+BRAND_NAMES = ["kuaidaili", "jishuhttp", "xhs_login", "dy_login"]
+
+
+def timeit(func: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run_case(cache: AbstractCache, key_count: int, query_count: int) -> Dict[str, float]:
+    keys = [f"{random.choice(BRAND_NAMES)}_{i}_{random.randint(1000, 9999)}" for i in range(key_count)]
+    expire_times = [random.randint(60, 600) for _ in range(key_count)]
+    get_keys = [random.choice(keys) for _ in range(key_count)]
+    patterns = [f"{random.choice(BRAND_NAMES)}_*" for _ in range(query_count)]
+    result = {
+        "set": timeit(lambda: [cache.set(key, key, ex) for key, ex in zip(keys, expire_times)]),
+        "get": timeit(lambda: [cache.get(key) for key in get_keys]),
+        "keys(prefix_*)": timeit(lambda: [cache.keys(pattern) for pattern in patterns]),
+    }
+    if isinstance(cache, ExpiringLocalCache):
+        result["clear"] = timeit(cache._clear)
+    else:
+        result["clear"] = timeit(lambda: cache._purge_expired(time.time()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local cache micro benchmark")
+    parser.add_argument("--keys", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    random.seed(0)
+    old_result = run_case(ExpiringLocalCache(cron_interval=3600), args.keys, args.queries)
+    random.seed(0)
+    new_result = run_case(ExpiringLruCache(), args.keys, args.queries)
+
+    print(f"keys: {args.keys}, keys() queries: {args.queries}")
+    print(f"{'operation':<16}{'ExpiringLocalCache':>20}{'ExpiringLruCache':>20}{'speedup':>10}")
+    for name in old_result:
+        speedup = old_result[name] / new_result[name] if new_result[name] else float("inf")
+        print(f"{name:<16}{old_result[name] * 1000:>18.1f}ms{new_result[name] * 1000:>18.1f}ms{speedup:>9.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
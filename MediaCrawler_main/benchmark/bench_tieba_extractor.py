@@ -0,0 +1,75 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 贴吧页面提取微基准，对比 TieBaExtractor(parsel) 与 TieBaLxmlExtractor，并校验两者输出一致
+#            运行方式: python -m benchmark.bench_tieba_extractor --rounds 20
+import argparse
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+from media_platform.tieba.help import TieBaExtractor, TieBaLxmlExtractor
+from model.m_baidu_tieba import TiebaComment
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "media_platform", "tieba", "test_data")
+
+
+def read_test_data(file_name: str) -> str:
+    with open(os.path.join(TEST_DATA_DIR, file_name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def build_cases() -> List[Tuple[str, str, tuple]]:
+    """(名称, 提取方法名, 参数)"""
+    parent_comment = TiebaComment(comment_id="1", content="", note_id="1", note_url="", tieba_id="",
+                                  tieba_name="", tieba_link="")
+    return [
+        ("search_note_list", "extract_search_note_list", (read_test_data("search_keyword_notes.html"),)),
+        ("tieba_note_list", "extract_tieba_note_list", (read_test_data("tieba_note_list.html"),)),
+        ("note_detail", "extract_note_detail", (read_test_data("note_detail.html"),)),
+        ("comment_page", "extract_tieba_note_comment_page", (read_test_data("note_comments.html"), "1")),
+        ("sub_comments", "extract_tieba_note_sub_comments", (read_test_data("note_sub_comments.html"), parent_comment)),
+    ]
+
+
+def timeit(func: Callable[[], object], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tieba extractor micro benchmark")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    old_extractor, new_extractor = TieBaExtractor(), TieBaLxmlExtractor()
+    results: Dict[str, Tuple[float, float]] = {}
+    for name, method, method_args in build_cases():
+        old_func = getattr(old_extractor, method)
+        new_func = getattr(new_extractor, method)
+        if old_func(*method_args) != new_func(*method_args):
+            raise AssertionError(f"{name}: TieBaLxmlExtractor output differs from TieBaExtractor")
+        results[name] = (timeit(lambda: old_func(*method_args), args.rounds),
+                         timeit(lambda: new_func(*method_args), args.rounds))
+
+    print(f"rounds: {args.rounds}, outputs identical")
+    print(f"{'page':<18}{'parsel':>12}{'lxml':>12}{'speedup':>10}")
+    for name, (old_time, new_time) in results.items():
+        speedup = old_time / new_time if new_time else float("inf")
+        print(f"{name:<18}{old_time * 1000:>10.2f}ms{new_time * 1000:>10.2f}ms{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
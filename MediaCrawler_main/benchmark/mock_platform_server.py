@@ -0,0 +1,454 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 压测用的本地模拟平台服务器，按各平台 API 的路径和响应格式返回假数据，可配置延迟和错误注入
+#            单独运行: python -m benchmark.mock_platform_server --port 18080 --latency-ms 50 --error-rate 0.01
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import re
+import zlib
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+
+# 每页评论数，与平台接口实际返回的数量接近
+COMMENTS_PAGE_SIZE = 10
+
+# 贴吧返回 HTML 页面，直接使用提取器单测的真实页面
+TIEBA_TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "media_platform", "tieba", "test_data")
+# 贴吧帖子详情页中的帖子ID，返回时替换成请求的帖子ID
+TIEBA_DETAIL_NOTE_ID = "9117905169"
+
+
+@dataclass
+class MockServerOptions:
+    latency_ms: float = 50  # 平均响应延迟(毫秒)
+    jitter_ms: float = 20  # 延迟的标准差(毫秒)
+    error_rate: float = 0.0  # 返回 5xx 错误的概率
+    comments_per_note: int = 20  # 每个帖子的一级评论总数
+    seed: int = 0
+
+
+def build_app(options: MockServerOptions) -> FastAPI:
+    """
+    创建模拟服务器，同一个服务器同时提供各平台的搜索、详情、评论接口，路径互不冲突
+    Args:
+        options: 延迟和错误注入配置
+
+    Returns:
+
+    """
+    app = FastAPI()
+    rand = random.Random(options.seed)
+
+    async def simulate() -> bool:
+        """模拟网络和服务端处理延迟，返回本次请求是否注入错误"""
+        delay_ms = max(0.0, rand.gauss(options.latency_ms, options.jitter_ms))
+        await asyncio.sleep(delay_ms / 1000)
+        return rand.random() < options.error_rate
+
+    def comment_page(cursor: int):
+        end = min(cursor + COMMENTS_PAGE_SIZE, options.comments_per_note)
+        return range(cursor, end), end < options.comments_per_note, end
+
+    def keyword_id_of(keyword: str) -> int:
+        return zlib.crc32(keyword.encode("utf-8")) % 10000
+
+    @functools.lru_cache(maxsize=None)
+    def read_tieba_page(file_name: str) -> str:
+        with open(os.path.join(TIEBA_TEST_DATA_DIR, file_name), "r", encoding="utf-8") as f:
+            return f.read()
+
+    # ---------------- xhs ----------------
+    def xhs_error() -> JSONResponse:
+        return JSONResponse({"success": False, "code": -1, "msg": "mock server error"}, status_code=500)
+
+    @app.post("/api/sns/web/v1/search/notes")
+    async def xhs_search_notes(request: Request):
+        if await simulate():
+            return xhs_error()
+        body = json.loads(await request.body())
+        keyword_id = keyword_id_of(body["keyword"])
+        items = [
+            {
+                "id": f"{keyword_id:04d}{body['page']:04d}{index:02d}",
+                "xsec_source": "pc_search",
+                "xsec_token": "mock_xsec_token",
+                "model_type": "note",
+                "note_card": {"interact_info": {"liked_count": "10", "comment_count": str(options.comments_per_note)}},
+            }
+            for index in range(body.get("page_size", 20))
+        ]
+        return {"success": True, "data": {"has_more": True, "items": items}}
+
+    @app.post("/api/sns/web/v1/feed")
+    async def xhs_note_detail(request: Request):
+        if await simulate():
+            return xhs_error()
+        note_id = json.loads(await request.body())["source_note_id"]
+        note_card = {
+            "note_id": note_id,
+            "type": "normal",
+            "title": f"mock note {note_id}",
+            "desc": "mock note desc " * 20,
+            "time": 1700000000000,
+            "last_update_time": 1700000000000,
+            "ip_location": "mock",
+            "user": {"user_id": f"user_{note_id}", "nickname": "mock user", "avatar": "https://mock/avatar.jpg"},
+            "interact_info": {"liked_count": "10", "collected_count": "5", "share_count": "1",
+                              "comment_count": str(options.comments_per_note)},
+            "image_list": [],
+            "tag_list": [{"name": "mock", "type": "topic"}],
+        }
+        return {"success": True, "data": {"items": [{"note_card": note_card}]}}
+
+    @app.get("/api/sns/web/v2/comment/page")
+    async def xhs_note_comments(note_id: str, cursor: str = ""):
+        if await simulate():
+            return xhs_error()
+        indexes, has_more, next_cursor = comment_page(int(cursor or 0))
+        comments = [
+            {
+                "id": f"{note_id}_{index}",
+                "note_id": note_id,
+                "content": f"mock comment {index}",
+                "create_time": 1700000000000,
+                "ip_location": "mock",
+                "like_count": "1",
+                "sub_comment_count": "0",
+                "sub_comments": [],
+                "user_info": {"user_id": f"commenter_{index}", "nickname": "mock commenter",
+                              "image": "https://mock/avatar.jpg"},
+            }
+            for index in indexes
+        ]
+        return {"success": True, "data": {"comments": comments, "has_more": has_more, "cursor": str(next_cursor)}}
+
+    @app.get("/explore/{note_id}")
+    async def xhs_note_html(note_id: str):
+        # 详情接口失败后的网页兜底，返回空状态让爬虫按失败处理
+        await simulate()
+        return HTMLResponse("<script>window.__INITIAL_STATE__={}</script>")
+
+    # ---------------- bilibili ----------------
+    def bili_error() -> JSONResponse:
+        return JSONResponse({"code": -1, "message": "mock server error"}, status_code=500)
+
+    @app.get("/x/web-interface/wbi/search/type")
+    async def bili_search(keyword: str, page: int, page_size: int = 20):
+        if await simulate():
+            return bili_error()
+        keyword_id = keyword_id_of(keyword)
+        result = [{"aid": int(f"{keyword_id}{page:04d}{index:02d}")} for index in range(page_size)]
+        return {"code": 0, "data": {"result": result}}
+
+    @app.get("/x/web-interface/view/detail")
+    async def bili_video_detail(aid: int):
+        if await simulate():
+            return bili_error()
+        view = {
+            "aid": aid,
+            "cid": aid,
+            "title": f"mock video {aid}",
+            "desc": "mock video desc " * 20,
+            "pubdate": 1700000000,
+            "pic": "https://mock/cover.jpg",
+            "owner": {"mid": aid, "name": "mock up", "face": "https://mock/face.jpg"},
+            "stat": {"like": 10, "dislike": 0, "view": 100, "favorite": 5, "share": 1, "coin": 1, "danmaku": 3,
+                     "reply": options.comments_per_note},
+        }
+        card = {
+            "card": {"mid": aid, "name": "mock up", "sex": "保密", "sign": "", "face": "https://mock/face.jpg",
+                     "fans": 100, "level_info": {"current_level": 6}, "official_verify": {"type": -1}},
+            "like_num": 1000,
+        }
+        return {"code": 0, "data": {"View": view, "Card": card}}
+
+    @app.get("/x/v2/reply/wbi/main")
+    async def bili_video_comments(oid: str, next: int = 0):
+        if await simulate():
+            return bili_error()
+        indexes, has_more, next_cursor = comment_page(next)
+        replies = [
+            {
+                "rpid": int(f"{oid}{index:04d}"),
+                "parent": 0,
+                "ctime": 1700000000,
+                "like": 1,
+                "rcount": 0,
+                "content": {"message": f"mock comment {index}"},
+                "member": {"mid": str(index), "uname": "mock commenter", "sex": "保密", "sign": "",
+                           "avatar": "https://mock/face.jpg"},
+            }
+            for index in indexes
+        ]
+        return {"code": 0, "data": {"cursor": {"is_end": not has_more, "next": next_cursor}, "replies": replies}}
+
+    # ---------------- douyin ----------------
+    def dy_user(user_id: str) -> dict:
+        return {"uid": user_id, "sec_uid": f"sec_{user_id}", "short_id": user_id, "unique_id": user_id,
+                "signature": "", "nickname": "mock user", "avatar_thumb": {"url_list": ["https://mock/avatar.jpg"]}}
+
+    @app.get("/aweme/v1/web/general/search/single/")
+    async def dy_search(keyword: str, offset: int = 0):
+        if await simulate():
+            return JSONResponse({"status_code": -1}, status_code=500)
+        keyword_id = keyword_id_of(keyword)
+        # 抖音每页约返回 10 条，与 DouYinCrawler 的 dy_limit_count 一致
+        data = [
+            {
+                "type": 1,
+                "aweme_info": {
+                    "aweme_id": f"{keyword_id:04d}{offset:05d}{index:02d}",
+                    "aweme_type": 0,
+                    "desc": "mock aweme desc " * 10,
+                    "create_time": 1700000000,
+                    "author": dy_user(f"user_{index}"),
+                    "statistics": {"digg_count": 10, "collect_count": 5, "share_count": 1,
+                                   "comment_count": options.comments_per_note},
+                    "ip_label": "mock",
+                    "video": {"cover": {"url_list": ["https://mock/cover.jpg"]}},
+                },
+            }
+            for index in range(10)
+        ]
+        return {"status_code": 0, "data": data, "has_more": 1, "extra": {"logid": "mock_logid"}}
+
+    @app.get("/aweme/v1/web/comment/list/")
+    async def dy_aweme_comments(aweme_id: str, cursor: int = 0):
+        if await simulate():
+            return JSONResponse({"status_code": -1}, status_code=500)
+        indexes, has_more, next_cursor = comment_page(cursor)
+        comments = [
+            {
+                "cid": f"{aweme_id}_{index}",
+                "aweme_id": aweme_id,
+                "text": f"mock comment {index}",
+                "create_time": 1700000000,
+                "ip_label": "mock",
+                "digg_count": 1,
+                "reply_comment_total": 0,
+                "user": dy_user(f"commenter_{index}"),
+            }
+            for index in indexes
+        ]
+        return {"status_code": 0, "comments": comments, "has_more": int(has_more), "cursor": next_cursor}
+
+    # ---------------- kuaishou ----------------
+    @app.post("/graphql")
+    async def ks_graphql(request: Request):
+        if await simulate():
+            return JSONResponse({"errors": [{"message": "mock server error"}]}, status_code=500)
+        body = json.loads(await request.body())
+        variables = body.get("variables", {})
+        if body.get("operationName") == "visionSearchPhoto":
+            keyword_id = keyword_id_of(variables["keyword"])
+            page = int(variables.get("pcursor") or 1)
+            feeds = [
+                {
+                    "type": 1,
+                    "author": {"id": f"user_{index}", "name": "mock user", "headerUrl": "https://mock/avatar.jpg"},
+                    "photo": {
+                        "id": f"{keyword_id:04d}{page:04d}{index:02d}",
+                        "caption": "mock video caption " * 10,
+                        "timestamp": 1700000000000,
+                        "realLikeCount": 10,
+                        "viewCount": 100,
+                        "coverUrl": "https://mock/cover.jpg",
+                        "photoUrl": "https://mock/video.mp4",
+                    },
+                }
+                for index in range(20)
+            ]
+            return {"data": {"visionSearchPhoto": {"result": 1, "searchSessionId": "mock_session",
+                                                   "pcursor": str(page + 1), "feeds": feeds}}}
+        if body.get("operationName") == "commentListQuery":
+            photo_id = variables["photoId"]
+            indexes, has_more, next_cursor = comment_page(int(variables.get("pcursor") or 0))
+            root_comments = [
+                {
+                    "commentId": f"{photo_id}_{index}",
+                    "authorId": f"commenter_{index}",
+                    "authorName": "mock commenter",
+                    "content": f"mock comment {index}",
+                    "headurl": "https://mock/avatar.jpg",
+                    "timestamp": 1700000000000,
+                    "subCommentCount": 0,
+                    "subCommentsPcursor": "no_more",
+                    "subComments": [],
+                }
+                for index in indexes
+            ]
+            return {"data": {"visionCommentList": {"pcursor": str(next_cursor) if has_more else "no_more",
+                                                   "rootComments": root_comments}}}
+        return {"errors": [{"message": f"unsupported operation: {body.get('operationName')}"}]}
+
+    # ---------------- weibo ----------------
+    def wb_user(user_id: str) -> dict:
+        return {"id": user_id, "screen_name": "mock user", "gender": "f", "profile_url": "https://mock/profile",
+                "profile_image_url": "https://mock/avatar.jpg"}
+
+    def wb_error() -> JSONResponse:
+        return JSONResponse({"ok": 0, "msg": "mock server error"}, status_code=500)
+
+    @app.get("/api/container/getIndex")
+    async def wb_search(containerid: str, page: int = 1):
+        if await simulate():
+            return wb_error()
+        keyword = parse_qs(containerid).get("q", [""])[0]
+        keyword_id = keyword_id_of(keyword)
+        cards = [
+            {
+                "card_type": 9,
+                "mblog": {
+                    "id": f"{keyword_id:04d}{page:04d}{index:02d}",
+                    "text": "<span>mock weibo text</span> " * 10,
+                    "created_at": "Tue Nov 14 22:13:20 +0800 2023",
+                    "attitudes_count": 10,
+                    "comments_count": options.comments_per_note,
+                    "reposts_count": 1,
+                    "region_name": "发布于 mock",
+                    "user": wb_user(f"user_{index}"),
+                },
+            }
+            for index in range(10)
+        ]
+        return {"ok": 1, "data": {"cards": cards}}
+
+    @app.get("/comments/hotflow")
+    async def wb_note_comments(id: str, max_id: int = 0):
+        if await simulate():
+            return wb_error()
+        indexes, has_more, next_cursor = comment_page(max_id)
+        comments = [
+            {
+                "id": f"{id}_{index}",
+                "rootid": f"{id}_{index}",
+                "text": f"mock comment {index}",
+                "created_at": "Tue Nov 14 22:13:20 +0800 2023",
+                "total_number": 0,
+                "like_count": 1,
+                "source": "来自mock",
+                "user": wb_user(f"commenter_{index}"),
+            }
+            for index in indexes
+        ]
+        # max_id 为 0 表示没有下一页
+        return {"ok": 1, "data": {"data": comments, "max_id": next_cursor if has_more else 0, "max_id_type": 0}}
+
+    # ---------------- zhihu ----------------
+    def zhihu_author(user_id: str) -> dict:
+        return {"id": user_id, "url_token": user_id, "name": "mock user", "avatar_url": "https://mock/avatar.jpg"}
+
+    def zhihu_error() -> JSONResponse:
+        return JSONResponse({"error": {"message": "mock server error"}}, status_code=500)
+
+    @app.get("/api/v4/search_v3")
+    async def zhihu_search(q: str, offset: int = 0, limit: int = 20):
+        if await simulate():
+            return zhihu_error()
+        keyword_id = keyword_id_of(q)
+        data = [
+            {
+                "type": "search_result",
+                "object": {
+                    "type": "answer",
+                    "id": f"{keyword_id:04d}{offset:05d}{index:02d}",
+                    "content": "<p>mock answer content</p>" * 20,
+                    "question": {"id": f"question_{index}"},
+                    "title": "mock question title",
+                    "excerpt": "mock answer excerpt",
+                    "created_time": 1700000000,
+                    "updated_time": 1700000000,
+                    "voteup_count": 10,
+                    "comment_count": options.comments_per_note,
+                    "author": zhihu_author(f"user_{index}"),
+                },
+            }
+            for index in range(limit)
+        ]
+        return {"paging": {"is_end": False}, "data": data}
+
+    @app.get("/api/v4/comment_v5/{content_type}/{content_id}/root_comment")
+    async def zhihu_root_comments(content_type: str, content_id: str, offset: str = ""):
+        if await simulate():
+            return zhihu_error()
+        indexes, has_more, next_cursor = comment_page(int(offset or 0))
+        data = [
+            {
+                "type": "comment",
+                "id": f"{content_id}{index:04d}",
+                "reply_comment_id": "0",
+                "content": f"<p>mock comment {index}</p>",
+                "created_time": 1700000000,
+                "child_comment_count": 0,
+                "like_count": 1,
+                "comment_tag": [{"type": "ip_info", "text": "IP 属地mock"}],
+                "author": zhihu_author(f"commenter_{index}"),
+            }
+            for index in indexes
+        ]
+        next_url = (f"https://www.zhihu.com/api/v4/comment_v5/{content_type}/{content_id}/root_comment"
+                    f"?limit={COMMENTS_PAGE_SIZE}&offset={next_cursor}")
+        return {"paging": {"is_end": not has_more, "next": next_url}, "data": data}
+
+    # ---------------- tieba ----------------
+    @app.get("/f/search/res")
+    async def tieba_search(qw: str, pn: int = 1):
+        if await simulate():
+            return HTMLResponse("", status_code=500)
+        page_content = read_tieba_page("search_keyword_notes.html")
+        keyword_id = keyword_id_of(qw)
+        # 每页的帖子ID换成按关键词和页码生成的ID，不同页的帖子不重复
+        note_ids = list(dict.fromkeys(re.findall(r'data-tid="(\d+)"', page_content)))
+        for index, note_id in enumerate(note_ids):
+            page_content = page_content.replace(note_id, f"{keyword_id:04d}{pn:04d}{index:02d}")
+        return HTMLResponse(page_content)
+
+    @app.get("/p/{note_id}")
+    async def tieba_note(note_id: str, pn: int = 0):
+        if await simulate():
+            return HTMLResponse("", status_code=500)
+        if pn:
+            # 评论页面中没有帖子ID，提取时使用请求的帖子ID
+            return HTMLResponse(read_tieba_page("note_comments.html"))
+        return HTMLResponse(read_tieba_page("note_detail.html").replace(TIEBA_DETAIL_NOTE_ID, note_id))
+
+    return app
+
+
+def serve(port: int, options: MockServerOptions) -> None:
+    """在当前进程中启动模拟服务器，压测时在单独的进程中运行，避免和爬虫争抢同一个事件循环"""
+    uvicorn.run(build_app(options), host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mock platform server for crawler benchmark")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--comments-per-note", type=int, default=20)
+    args = parser.parse_args()
+    serve(args.port, MockServerOptions(args.latency_ms, args.jitter_ms, args.error_rate, args.comments_per_note))
+
+
+if __name__ == "__main__":
+    main()
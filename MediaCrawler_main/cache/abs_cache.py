@@ -16,7 +16,7 @@
 # @Desc    : 抽象类
 
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 
 
 class AbstractCache(ABC):
@@ -51,3 +51,63 @@ class AbstractCache(ABC):
         :return:
         """
         raise NotImplementedError
+
+
+class AbstractAsyncCache(ABC):
+    """
+    异步缓存接口，网络缓存(redis)不阻塞事件循环，并提供批量读写减少网络往返
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值
+        :param key: 键
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中
+        :param key: 键
+        :param value: 值
+        :param expire_time: 过期时间
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的key
+        :param pattern: 匹配模式
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取键的值，顺序与 keys 一致，不存在的键返回 None
+        :param keys: 键列表
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_many(self, items: List[Tuple[str, Any, int]]) -> None:
+        """
+        批量设置键的值
+        :param items: (键, 值, 过期时间) 列表
+        :return:
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """
+        释放连接等资源
+        :return:
+        """
+        pass
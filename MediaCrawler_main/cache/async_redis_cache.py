@@ -0,0 +1,114 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 异步 RedisCache 实现，连接池 + SCAN 遍历 + MGET/pipeline 批量读写
+import json
+from typing import Any, List, Optional, Tuple
+
+from redis.asyncio import ConnectionPool, Redis
+
+from cache.abs_cache import AbstractAsyncCache
+from config import db_config
+
+
+def dumps(value: Any) -> bytes:
+    """缓存的值都是字符串、数字、列表、字典，用紧凑的 JSON 代替 pickle，跨语言可读且不会反序列化出任意对象"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(value: Optional[bytes]) -> Any:
+    if value is None:
+        return None
+    return json.loads(value)
+
+
+class AsyncRedisCache(AbstractAsyncCache):
+
+    def __init__(self, redis_client: Optional[Redis] = None, scan_count: int = 500) -> None:
+        """
+        初始化异步 redis 缓存
+        :param redis_client: redis 客户端，为空时按配置创建连接池，测试时可传入 fake 客户端
+        :param scan_count: SCAN 每次遍历的 key 数量
+        """
+        self._redis_client = redis_client
+        self._scan_count = scan_count
+
+    def _get_client(self) -> Redis:
+        """
+        首次使用时在事件循环中创建连接池
+        :return:
+        """
+        if self._redis_client is None:
+            pool = ConnectionPool(
+                host=db_config.REDIS_DB_HOST,
+                port=db_config.REDIS_DB_PORT,
+                db=db_config.REDIS_DB_NUM,
+                password=db_config.REDIS_DB_PWD,
+                max_connections=db_config.REDIS_MAX_CONNECTIONS,
+            )
+            self._redis_client = Redis(connection_pool=pool)
+        return self._redis_client
+
+    async def get(self, key: str) -> Any:
+        """
+        从缓存中获取键的值, 并且反序列化
+        :param key:
+        :return:
+        """
+        return loads(await self._get_client().get(key))
+
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中, 并且序列化
+        :param key:
+        :param value:
+        :param expire_time:
+        :return:
+        """
+        await self._get_client().set(key, dumps(value), ex=expire_time)
+
+    async def keys(self, pattern: str) -> List[str]:
+        """
+        用 SCAN 分批遍历符合 pattern 的 key，不会像 KEYS 一样阻塞 redis
+        """
+        keys = set()
+        async for key in self._get_client().scan_iter(match=pattern, count=self._scan_count):
+            keys.add(key.decode() if isinstance(key, bytes) else key)
+        return list(keys)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        一次 MGET 获取多个键的值
+        :param keys:
+        :return:
+        """
+        if not keys:
+            return []
+        return [loads(value) for value in await self._get_client().mget(keys)]
+
+    async def set_many(self, items: List[Tuple[str, Any, int]]) -> None:
+        """
+        用 pipeline 一次往返写入多个带过期时间的键
+        :param items: (键, 值, 过期时间) 列表
+        :return:
+        """
+        if not items:
+            return
+        async with self._get_client().pipeline(transaction=False) as pipe:
+            for key, value, expire_time in items:
+                pipe.set(key, dumps(value), ex=expire_time)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        if self._redis_client is not None:
+            await self._redis_client.close()
+            self._redis_client = None
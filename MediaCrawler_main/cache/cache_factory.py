@@ -31,10 +31,30 @@ class CacheFactory:
         :return:
         """
         if cache_type == 'memory':
-            from .local_cache import ExpiringLocalCache
-            return ExpiringLocalCache(*args, **kwargs)
+            import config
+            from .expiring_lru_cache import ExpiringLruCache
+            kwargs.setdefault("max_entries", config.LOCAL_CACHE_MAX_ENTRIES)
+            return ExpiringLruCache(*args, **kwargs)
         elif cache_type == 'redis':
             from .redis_cache import RedisCache
             return RedisCache()
         else:
             raise ValueError(f'Unknown cache type: {cache_type}')
+
+    @staticmethod
+    def create_async_cache(cache_type: str, *args, **kwargs):
+        """
+        创建异步缓存对象
+        :param cache_type: 缓存类型
+        :param args: 参数
+        :param kwargs: 关键字参数
+        :return:
+        """
+        if cache_type == 'memory':
+            from .expiring_lru_cache import AsyncLocalCache
+            return AsyncLocalCache(CacheFactory.create_cache(cache_type, *args, **kwargs))
+        elif cache_type == 'redis':
+            from .async_redis_cache import AsyncRedisCache
+            return AsyncRedisCache(*args, **kwargs)
+        else:
+            raise ValueError(f'Unknown cache type: {cache_type}')
@@ -0,0 +1,189 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 本地缓存，最小堆管理过期时间，可选 LRU 容量上限，有序 key 索引支持通配符前缀查询
+import bisect
+import fnmatch
+import heapq
+import re
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from cache.abs_cache import AbstractAsyncCache, AbstractCache
+
+GLOB_SPECIAL_CHARS = "*?["
+
+
+class ExpiringLruCache(AbstractCache):
+    """
+    不依赖定时任务清理，每次读写时从过期堆顶弹出已过期的 key，单次操作 O(log n)
+    1. 过期时间: 最小堆 (过期时间, key)，key 被覆盖或删除后堆中的旧记录惰性跳过
+    2. 容量上限: OrderedDict 按访问顺序排列，超过 max_entries 时淘汰最久未访问的 key
+    3. 通配符查询: 有序 key 列表，按 pattern 中通配符之前的前缀二分查找候选 key，再做 glob 匹配
+       新增和删除的 key 先记下，查询时才合并进有序列表，key 没有变化时查询只需二分 + 切片
+    """
+
+    def __init__(self, max_entries: int = 0):
+        """
+        初始化本地缓存
+        :param max_entries: 最多缓存的 key 数量，0 表示不限制
+        """
+        self._max_entries = max_entries
+        self._cache_container: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._expire_heap: List[Tuple[float, str]] = []
+        self._sorted_keys: List[str] = []
+        self._pending_keys: List[str] = []
+        self._stale_key_count = 0
+
+    def __len__(self) -> int:
+        return len(self._cache_container)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        从缓存中获取键的值
+        :param key:
+        :return:
+        """
+        item = self._cache_container.get(key)
+        if item is None:
+            return None
+        value, expire_at = item
+        if expire_at <= time.time():
+            self._delete(key)
+            return None
+        self._cache_container.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expire_time: int) -> None:
+        """
+        将键的值设置到缓存中
+        :param key:
+        :param value:
+        :param expire_time: 过期时间(秒)
+        :return:
+        """
+        now = time.time()
+        self._purge_expired(now)
+        expire_at = now + expire_time
+        if key in self._cache_container:
+            self._cache_container.move_to_end(key)
+        else:
+            self._pending_keys.append(key)
+        self._cache_container[key] = (value, expire_at)
+        heapq.heappush(self._expire_heap, (expire_at, key))
+
+        if self._max_entries and len(self._cache_container) > self._max_entries:
+            lru_key = next(iter(self._cache_container))
+            self._delete(lru_key)
+        # 同一个 key 反复写入时堆中的旧记录会累积，超过有效 key 数的两倍时重建
+        if len(self._expire_heap) > 2 * len(self._cache_container) + 64:
+            self._rebuild_heap()
+
+    def delete(self, key: str) -> None:
+        """
+        删除缓存中的键
+        :param key:
+        :return:
+        """
+        if key in self._cache_container:
+            self._delete(key)
+
+    def _refresh_key_index(self) -> None:
+        """
+        把上次查询之后新增、删除的 key 合并进有序列表
+        :return:
+        """
+        if self._stale_key_count:
+            # 删除过的 key 可能又被写入，直接按现有 key 重建，避免重复
+            self._sorted_keys = sorted(self._cache_container)
+            self._pending_keys = []
+            self._stale_key_count = 0
+        elif self._pending_keys:
+            # 有序列表后追加新 key，timsort 识别出两段有序序列后归并
+            self._pending_keys.sort()
+            self._sorted_keys.extend(self._pending_keys)
+            self._sorted_keys.sort()
+            self._pending_keys = []
+
+    def keys(self, pattern: str) -> List[str]:
+        """
+        获取所有符合pattern的key，支持 * ? [] 通配符
+        :param pattern: 匹配模式
+        :return:
+        """
+        self._purge_expired(time.time())
+        wildcard_indexes = [pattern.find(c) for c in GLOB_SPECIAL_CHARS if c in pattern]
+        if not wildcard_indexes:
+            return [pattern] if pattern in self._cache_container else []
+
+        self._refresh_key_index()
+        prefix = pattern[:min(wildcard_indexes)]
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        if prefix:
+            end = bisect.bisect_left(self._sorted_keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo=start)
+        else:
+            end = len(self._sorted_keys)
+        candidates = self._sorted_keys[start:end]
+        if pattern == prefix + "*":
+            # 最常见的 "前缀*" 不需要再做 glob 匹配
+            return candidates
+        match = re.compile(fnmatch.translate(pattern)).match
+        return [key for key in candidates if match(key)]
+
+    def _delete(self, key: str) -> None:
+        # 有序 key 列表在下次查询时再删除
+        del self._cache_container[key]
+        self._stale_key_count += 1
+
+    def _purge_expired(self, now: float) -> None:
+        """
+        从堆顶弹出所有已过期的记录并删除对应的 key
+        :param now: 当前时间
+        :return:
+        """
+        heap = self._expire_heap
+        while heap and heap[0][0] <= now:
+            expire_at, key = heapq.heappop(heap)
+            item = self._cache_container.get(key)
+            # key 已被删除或被覆盖成新的过期时间时，这是一条旧记录
+            if item is not None and item[1] == expire_at:
+                self._delete(key)
+
+    def _rebuild_heap(self) -> None:
+        self._expire_heap = [(expire_at, key) for key, (_, expire_at) in self._cache_container.items()]
+        heapq.heapify(self._expire_heap)
+
+
+class AsyncLocalCache(AbstractAsyncCache):
+    """
+    本地缓存的异步接口包装，本地缓存的读写都是内存操作，直接调用不会阻塞事件循环
+    """
+
+    def __init__(self, local_cache: AbstractCache):
+        self._local_cache = local_cache
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._local_cache.get(key)
+
+    async def set(self, key: str, value: Any, expire_time: int) -> None:
+        self._local_cache.set(key, value, expire_time)
+
+    async def keys(self, pattern: str) -> List[str]:
+        return self._local_cache.keys(pattern)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        return [self._local_cache.get(key) for key in keys]
+
+    async def set_many(self, items: List[Tuple[str, Any, int]]) -> None:
+        for key, value, expire_time in items:
+            self._local_cache.set(key, value, expire_time)
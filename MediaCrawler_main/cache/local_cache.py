@@ -105,7 +105,7 @@ class ExpiringLocalCache(AbstractCache):
         根据过期时间清理缓存
         :return:
         """
-        for key, (value, expire_time) in self._cache_container.items():
+        for key, (value, expire_time) in list(self._cache_container.items()):
             if expire_time < time.time():
                 del self._cache_container[key]
 
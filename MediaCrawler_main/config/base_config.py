@@ -12,6 +12,8 @@
 # 基础配置
 PLATFORM = "xhs"  # 平台，xhs | dy | ks | bili | wb | tieba | zhihu
 KEYWORDS = "编程副业,编程兼职"  # 关键词搜索配置，以英文逗号分隔
+# 同时搜索的关键词数量，各关键词共享平台的限速和并发控制，设置为 1 时逐个关键词搜索(默认)
+KEYWORD_SEARCH_CONCURRENCY = 1
 LOGIN_TYPE = "qrcode"  # qrcode or phone or cookie
 COOKIES = ""
 CRAWLER_TYPE = (
@@ -26,6 +28,67 @@ IP_PROXY_POOL_COUNT = 2
 # 代理IP提供商名称
 IP_PROXY_PROVIDER_NAME = "kuaidaili"
 
+# 代理池中可用IP数低于该值时，在后台从代理商补充，不阻塞爬虫取IP
+IP_PROXY_POOL_MIN_COUNT = 1
+
+# 距离过期时间不足该秒数的IP提前移出代理池
+IP_PROXY_EXPIRE_AHEAD_SEC = 30
+
+# IP连续请求失败达到该次数时移出代理池
+IP_PROXY_MAX_CONTINUOUS_FAILS = 3
+
+# 单次请求遇到IP被封禁(如小红书 461/471、B站 -412)或代理不可用时，最多更换代理IP重试的次数
+IP_PROXY_MAX_ROTATIONS = 3
+
+# ==================== HTTP 连接池配置 ====================
+# 所有平台的 API 客户端按代理共享长连接池，避免每次请求都重新建立 TCP/TLS 连接
+# 连接池最大连接数
+HTTP_MAX_CONNECTIONS = 100
+
+# 连接池最大保持的空闲长连接数
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# 空闲长连接的保持时间（秒）
+HTTP_KEEPALIVE_EXPIRY = 30
+
+# 是否开启 HTTP/2，需要额外安装 h2 依赖：pip install httpx[http2]
+ENABLE_HTTP2 = False
+
+# API 请求录制/回放模式，用于离线测试和性能分析：
+# "" 正常请求；"record" 录制所有 API 请求和响应；"replay" 从录制文件返回响应，不访问网络
+# 匹配录制记录时忽略请求头和签名、时间戳等易变参数，图片/视频不录制
+HTTP_CASSETTE_MODE = ""
+
+# 录制文件目录，文件名为 <平台>_<爬取类型>.jsonl.gz
+HTTP_CASSETTE_DIR = "data/cassettes"
+
+# ==================== 自适应限速配置 ====================
+# 是否开启自适应限速，开启后按 (平台, 接口, 代理IP) 的令牌桶控制请求速率，替代翻页之间固定的随机 sleep
+# 请求成功时逐步提速，遇到限流(429、验证码、IP封禁)时速率减半，延迟明显升高时停止提速
+# 默认关闭，翻页之间按原有的爬取间隔 sleep
+ENABLE_ADAPTIVE_RATE_LIMIT = False
+
+# 每个令牌桶的初始速率（请求/秒）
+RATE_LIMIT_INITIAL_RPS = 2.0
+
+# 速率下限（请求/秒）
+RATE_LIMIT_MIN_RPS = 0.2
+
+# 速率上限（请求/秒），请勿设置过高，避免给平台带来不必要的负担
+RATE_LIMIT_MAX_RPS = 5.0
+
+# 令牌桶容量，允许的突发请求数
+RATE_LIMIT_BURST = 2
+
+# 请求成功时每秒增加的速率（请求/秒）
+RATE_LIMIT_INCREASE_STEP = 0.5
+
+# 遇到限流时速率的乘性减小系数
+RATE_LIMIT_DECREASE_FACTOR = 0.5
+
+# 近期延迟超过长期平均延迟的倍数时停止提速
+RATE_LIMIT_LATENCY_FACTOR = 2.0
+
 # 设置为True不会打开浏览器（无头浏览器）
 # 设置False会打开一个浏览器
 # 小红书如果一直扫码登录不通过，打开浏览器手动过一下滑动验证码
@@ -62,8 +125,15 @@ BROWSER_LAUNCH_TIMEOUT = 30
 # 设置为False可以保持浏览器运行，便于调试
 AUTO_CLOSE_BROWSER = True
 
-# 数据保存类型选项配置,支持四种类型：csv、db、json、sqlite, 最好保存到DB，有排重的功能。
-SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite
+# 数据保存类型选项配置,支持五种类型：csv、db、json、jsonl、sqlite, 最好保存到DB，有排重的功能。
+# jsonl 每条数据追加一行，不会随数据量增大而变慢，数据量大时推荐使用 jsonl 代替 json
+SAVE_DATA_OPTION = "json"  # csv or db or json or jsonl or sqlite
+
+# jsonl 存储定期 flush + fsync 的间隔（秒）
+JSONL_FLUSH_INTERVAL_SEC = 5
+
+# jsonl 存储在程序结束时是否额外生成一份 JSON 数组格式的文件（与 json 存储的格式一致）
+JSONL_COMPACT_TO_JSON = False
 
 # 用户浏览器缓存的浏览器文件配置
 USER_DATA_DIR = "%s_user_data_dir"  # %s will be replaced by platform name
@@ -77,9 +147,69 @@ CRAWLER_MAX_NOTES_COUNT = 200
 # 并发爬虫数量控制
 MAX_CONCURRENCY_NUM = 1
 
+# 是否开启自适应并发，同一平台的详情、评论等并发任务共享一个并发控制器，以 MAX_CONCURRENCY_NUM 为初始并发数，
+# 请求延迟稳定时逐步提高并发，延迟明显升高或遇到限流、超时时降低并发；关闭时共享固定的 MAX_CONCURRENCY_NUM 并发
+# 默认关闭，提高并发会增加对目标平台的请求压力，请确认符合平台的使用条款后再开启
+ENABLE_ADAPTIVE_CONCURRENCY = False
+
+# 自适应并发的上限，小于 MAX_CONCURRENCY_NUM 时以 MAX_CONCURRENCY_NUM 为上限(即不会超过配置的并发数)，开启自适应并发时按需调大
+ADAPTIVE_CONCURRENCY_MAX_NUM = 1
+
+# 搜索按流水线执行(搜索翻页 -> 帖子详情 -> 保存 -> 评论)，该值为各阶段之间的队列长度，即最多预取的搜索页数
+SEARCH_PIPELINE_QUEUE_SIZE = 1
+
+# 常驻 JS 签名进程数量(抖音 a_bogus、知乎 x-zse-96)，签名脚本只加载一次，进程在请求间复用
+SIGN_WORKER_NUM = 1
+
+# HTML 解析进程数量，贴吧/知乎页面和小红书详情页 HTML 等大页面在子进程中解析，避免阻塞事件循环，设置为 0 时在主线程解析
+EXTRACTION_PROCESS_NUM = 2
+
+# 小于该长度(字符数)的页面直接在主线程解析，跨进程传输的开销比解析本身还大
+EXTRACTION_INLINE_MAX_SIZE = 64 * 1024
+
 # 是否开启爬图片模式, 默认不开启爬图片
 ENABLE_GET_IMAGES = False
 
+# ==================== 媒体下载配置 ====================
+# 图片/视频按块流式写入磁盘，内存占用约为 并发数 * 块大小，与文件大小无关
+# 同时进行的媒体下载流数量(所有平台共享)
+MEDIA_DOWNLOAD_CONCURRENCY = 4
+
+# 媒体下载总带宽上限(字节/秒)，0 表示不限速
+MEDIA_DOWNLOAD_MAX_BYTES_PER_SEC = 0
+
+# 流式下载每次读取写入的块大小(字节)
+MEDIA_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 首次下载时响应的 Content-Length 超过该值(字节)且服务端支持 Range 时改为分段并行下载，小文件只发一次请求
+MEDIA_DOWNLOAD_SEGMENT_THRESHOLD = 32 * 1024 * 1024
+
+# 大文件分段并行下载的段数，设置为 1 关闭分段下载
+MEDIA_DOWNLOAD_SEGMENT_NUM = 4
+
+# 媒体下载 worker 数量，爬虫把下载任务放入队列后继续爬取，由 worker 在后台下载
+MEDIA_DOWNLOAD_WORKER_NUM = 4
+
+# 媒体下载队列长度上限，队列满时爬虫等待下载消化
+MEDIA_DOWNLOAD_QUEUE_SIZE = 1000
+
+# 媒体下载失败后的重试次数
+MEDIA_DOWNLOAD_MAX_RETRIES = 3
+
+# 是否开启媒体文件去重，开启后图片/视频按内容保存在 MEDIA_BLOB_STORE_PATH 中，
+# 已下载过的 url(小红书图片按 trace id)不再重复下载，帖子目录下的文件为硬链接，默认不开启
+ENABLE_MEDIA_DEDUP = False
+
+# 按内容寻址的媒体库路径
+MEDIA_BLOB_STORE_PATH = "data/blobs"
+
+# 是否开启增量爬取，开启后已爬取过且互动数(点赞/评论数等)没有变化的帖子不再爬取详情和评论，
+# 创作者主页翻页遇到已爬取过的帖子时停止翻页，适合定时重复运行的监控任务
+ENABLE_INCREMENTAL_CRAWL = False
+
+# 增量爬取索引文件路径，记录已爬取的帖子及其互动数，所有平台和数据保存方式共用
+CRAWL_INDEX_PATH = "data/crawl_index.db"
+
 # 是否开启爬评论模式, 默认开启爬评论
 ENABLE_GET_COMMENTS = True
 
@@ -90,6 +220,9 @@ CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES = 10
 # 老版本项目使用了 db, 则需参考 schema/tables.sql line 287 增加表字段
 ENABLE_GET_SUB_COMMENTS = False
 
+# 爬取二级评论的数量控制(单视频/帖子)
+CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES = 200
+
 # 词云相关
 # 是否开启生成评论词云图
 ENABLE_GET_WORDCLOUD = False
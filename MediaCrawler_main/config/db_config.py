@@ -24,10 +24,30 @@ REDIS_DB_HOST = "127.0.0.1"  # your redis host
 REDIS_DB_PWD = os.getenv("REDIS_DB_PWD", "123456")  # your redis password
 REDIS_DB_PORT = os.getenv("REDIS_DB_PORT", 6379)  # your redis port
 REDIS_DB_NUM = os.getenv("REDIS_DB_NUM", 0)  # your redis db num
+REDIS_MAX_CONNECTIONS = 20  # 异步 redis 连接池的最大连接数
 
 # cache type
 CACHE_TYPE_REDIS = "redis"
 CACHE_TYPE_MEMORY = "memory"
 
+# 本地缓存最多保存的 key 数量，超过时淘汰最久未访问的 key，0 表示不限制
+LOCAL_CACHE_MAX_ENTRIES = 10000
+
+# 代理IP缓存类型，多进程/多机部署时设置为 redis，所有爬虫进程共享已提取的代理IP
+IP_CACHE_TYPE = CACHE_TYPE_MEMORY
+
 # sqlite config
-SQLITE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "schema", "sqlite_tables.db")
\ No newline at end of file
+SQLITE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "schema", "sqlite_tables.db")
+
+# sqlite 常驻连接的 pragma 配置
+# WAL 模式下读写互不阻塞，synchronous=NORMAL 时事务提交不再每次 fsync，cache_size 为负数时单位是 KB
+SQLITE_JOURNAL_MODE = "WAL"
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_CACHE_SIZE = -64000
+
+# db / sqlite 批量写入配置，同一个表攒够 DB_BATCH_SIZE 条或每隔 DB_BATCH_FLUSH_INTERVAL_SEC 秒批量 upsert 一次
+DB_BATCH_SIZE = 100
+DB_BATCH_FLUSH_INTERVAL_SEC = 1
+# 同一批记录连续落库失败超过该次数(例如旧表缺少唯一索引)后不再重试，写入 DB_BATCH_DEAD_LETTER_DIR 下的 <表名>.jsonl
+DB_BATCH_MAX_RETRIES = 3
+DB_BATCH_DEAD_LETTER_DIR = "data/db_dead_letter"
@@ -23,3 +23,9 @@ TIEBA_CREATOR_URL_LIST = [
     "https://tieba.baidu.com/home/main/?id=tb.1.7f139e2e.6CyEwxu3VJruH_-QqpCi6g&fr=frs",
     # ........................
 ]
+
+# 帖子评论分页并发拉取的窗口大小(页数)，帖子总页数已知时按窗口并发拉取后按楼层顺序保存
+TIEBA_COMMENT_PAGE_CONCURRENCY = 4
+
+# 贴吧页面提取器：lxml 预编译 XPath、每个页面只解析一次；parsel 为原实现，两者输出一致
+TIEBA_PAGE_EXTRACTOR = "lxml"
@@ -23,6 +23,7 @@ import aiomysql
 import config
 from async_db import AsyncMysqlDB
 from async_sqlite_db import AsyncSqliteDB
+from store.db_batch_writer import db_batch_writer
 from tools import utils
 from var import db_conn_pool_var, media_crawler_db_var
 
@@ -54,7 +55,12 @@ async def init_sqlite_db():
     Returns:
 
     """
-    async_db_obj = AsyncSqliteDB(config.SQLITE_DB_PATH)
+    async_db_obj = AsyncSqliteDB(
+        config.SQLITE_DB_PATH,
+        journal_mode=config.SQLITE_JOURNAL_MODE,
+        synchronous=config.SQLITE_SYNCHRONOUS,
+        cache_size=config.SQLITE_CACHE_SIZE,
+    )
     
     # 将SQLite数据库对象放到上下文变量中
     media_crawler_db_var.set(async_db_obj)
@@ -82,14 +88,22 @@ async def close():
 
     """
     utils.logger.info("[close] close mediacrawler db connection")
+    # 先把批量写入队列中剩余的记录落库
+    if media_crawler_db_var.get(None) is not None:
+        await db_batch_writer.close()
     if config.SAVE_DATA_OPTION == "sqlite":
-        # SQLite数据库连接会在AsyncSqliteDB对象销毁时自动关闭
-        utils.logger.info("[close] sqlite db connection will be closed automatically")
+        # 关闭SQLite常驻连接
+        async_db_obj: AsyncSqliteDB = media_crawler_db_var.get(None)
+        if async_db_obj is not None:
+            await async_db_obj.close()
+            utils.logger.info("[close] sqlite db connection closed")
     else:
         # MySQL连接池关闭
-        db_pool: aiomysql.Pool = db_conn_pool_var.get()
+        db_pool: aiomysql.Pool = db_conn_pool_var.get(None)
         if db_pool is not None:
             db_pool.close()
+            await db_pool.wait_closed()
+            db_conn_pool_var.set(None)
             utils.logger.info("[close] mysql db pool closed")
 
 
@@ -125,6 +139,10 @@ async def init_table_schema(db_type: str = None):
                 except Exception as rename_e:
                     utils.logger.error(f"[init_table_schema] failed to rename existing sqlite db file: {rename_e}")
                     raise rename_e
+        # WAL 模式遗留的日志文件属于旧库，需要一并删除
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(config.SQLITE_DB_PATH + suffix):
+                os.remove(config.SQLITE_DB_PATH + suffix)
         
         await init_sqlite_db()
         async_db_obj: AsyncSqliteDB = media_crawler_db_var.get()
@@ -132,6 +150,7 @@ async def init_table_schema(db_type: str = None):
             schema_sql = await f.read()
             await async_db_obj.executescript(schema_sql)
             utils.logger.info("[init_table_schema] sqlite table schema init successful")
+            await async_db_obj.close()
     elif db_type == "mysql":
         utils.logger.info("[init_table_schema] begin init mysql table schema ...")
         await init_mediacrawler_db()
@@ -0,0 +1,52 @@
+// 常驻的 JS 签名进程，由 tools/signer_pool.py 启动并通过 stdin/stdout 管道复用
+// 用法: node sign_worker.js <签名js文件路径>
+// 协议: 每行一个 JSON 请求 {"id": 1, "fn": "get_sign", "args": [...]}
+//       每行一个 JSON 响应 {"id": 1, "result": ...} 或 {"id": 1, "error": "..."}
+//       进程加载完签名脚本后先输出一行 {"ready": true} 或 {"ready": false, "error": "..."}
+
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const Module = require('module');
+
+function write(obj) {
+    process.stdout.write(JSON.stringify(obj) + "\n");
+}
+
+function loadSignScript(file) {
+    const filename = path.resolve(file);
+    const source = fs.readFileSync(filename, 'utf8').replace(/^\uFEFF/, '');
+    const m = new Module(filename, module);
+    m.filename = filename;
+    m.paths = Module._nodeModulePaths(path.dirname(filename));
+    // 在签名脚本的作用域内按函数名查找，兼容只声明了顶层函数、没有导出的脚本
+    m._compile(source + "\n;module.exports.__sign_lookup__ = function (name) { return eval(name); };", filename);
+    return m.exports.__sign_lookup__;
+}
+
+let lookup = null;
+try {
+    lookup = loadSignScript(process.argv[2]);
+    write({ready: true});
+} catch (e) {
+    write({ready: false, error: String(e && e.stack || e)});
+    process.exit(1);
+}
+
+const rl = readline.createInterface({input: process.stdin, terminal: false});
+rl.on('line', function (line) {
+    if (!line) {
+        return;
+    }
+    let req = null;
+    try {
+        req = JSON.parse(line);
+        const fn = lookup(req.fn);
+        write({id: req.id, result: fn.apply(null, req.args || [])});
+    } catch (e) {
+        write({id: req ? req.id : null, error: String(e && e.stack || e)});
+    }
+});
+rl.on('close', function () {
+    process.exit(0);
+});
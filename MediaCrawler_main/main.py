@@ -24,6 +24,10 @@ from media_platform.tieba import TieBaCrawler
 from media_platform.weibo import WeiboCrawler
 from media_platform.xhs import XiaoHongShuCrawler
 from media_platform.zhihu import ZhihuCrawler
+from store import jsonl_store
+from store.crawl_index import crawl_index
+from store.media_blob_store import media_blob_store
+from tools import extraction_executor, http_pool, media_downloader, signer_pool
 
 
 class CrawlerFactory:
@@ -61,16 +65,32 @@ async def main():
     if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
         await db.init_db()
 
+    crawl_index.enable = config.ENABLE_INCREMENTAL_CRAWL
+    await crawl_index.load()
+
     crawler = CrawlerFactory.create_crawler(platform=config.PLATFORM)
-    await crawler.start()
+    try:
+        await crawler.start()
+    finally:
+        # 等待后台媒体下载完成，再释放共享的 HTTP 长连接、常驻签名进程和解析进程，落盘 jsonl 缓冲区
+        await media_downloader.close()
+        media_blob_store.close()
+        await crawl_index.flush()
+        crawl_index.close()
+        await http_pool.close_all()
+        await signer_pool.close_all()
+        extraction_executor.close()
+        if config.SAVE_DATA_OPTION == "jsonl":
+            await jsonl_store.close()
+        # 在同一个事件循环内把批量写入队列落库并关闭数据库连接
+        if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+            await db.close()
 
 
 def cleanup():
     if crawler:
         # asyncio.run(crawler.close())
         pass
-    if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
-        asyncio.run(db.close())
 
 
 if __name__ == "__main__":
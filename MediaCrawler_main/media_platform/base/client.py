@@ -78,11 +78,12 @@ class AbstractApiClient(ABC):
         pass
 
     @abstractmethod
-    async def get_note_media(self, media_url: str) -> bytes:
+    async def download_note_media(self, media_url: str, save_file_name: str) -> bool:
         """
-        下载媒体文件
+        流式下载媒体文件到本地
         :param media_url: 媒体URL
-        :return: 媒体内容
+        :param save_file_name: 保存路径
+        :return: 是否下载成功
         """
         pass
 
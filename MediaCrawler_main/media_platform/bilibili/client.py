@@ -16,17 +16,20 @@
 import asyncio
 import json
 import random
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from proxy.proxy_rotator import rotate_proxy_on_block
+from tools import http_pool, media_downloader, utils
+from tools.concurrency_limiter import get_concurrency_limiter
+from tools.crawl_pipeline import merge_page_iterators
+from tools.rate_limiter import rate_limited, wait_crawl_interval
 
-from .exception import DataFetchError
+from .exception import DataFetchError, IPBlockError
 from .field import CommentOrderType, SearchOrderType
 from .help import BilibiliSign
 
@@ -48,17 +51,24 @@ class BilibiliClient(AbstractApiClient):
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
 
+    @rotate_proxy_on_block(IPBlockError)
+    @rate_limited("bili", IPBlockError)
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request(
-                method, url, timeout=self.timeout,
-                **kwargs
-            )
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(
+            method, url, timeout=self.timeout,
+            **kwargs
+        )
+        if response.status_code == 412:
+            raise IPBlockError(f"request blocked, status_code: {response.status_code}")
         try:
             data: Dict = response.json()
         except json.JSONDecodeError:
             utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
             raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
+        if data.get("code") == -412:
+            # 请求被风控拦截
+            raise IPBlockError(data.get("message", "request blocked"))
         if data.get("code") != 0:
             raise DataFetchError(data.get("message", "unkonw error"))
         else:
@@ -201,14 +211,18 @@ class BilibiliClient(AbstractApiClient):
 
         return await self.get(uri, params, enable_params_sign=True)
 
-    async def get_video_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
-            if not response.reason_phrase == "OK":
-                utils.logger.error(f"[BilibiliClient.get_video_media] request {url} err, res:{response.text}")
-                return None
-            else:
-                return response.content
+    async def download_video_media(self, url: str, save_file_name: str) -> bool:
+        """
+        流式下载视频到本地，大文件分段并行下载，中断后可以断点续传
+        Args:
+            url: 视频地址
+            save_file_name: 保存路径
+
+        Returns: 是否下载成功
+
+        """
+        return await media_downloader.download(url, save_file_name, headers=self.headers, proxies=self.proxies,
+                                               timeout=self.timeout)
 
     async def get_video_comments(self,
                                  video_id: str,
@@ -231,24 +245,23 @@ class BilibiliClient(AbstractApiClient):
         }
         return await self.get(uri, post_data)
 
-    async def get_video_all_comments(self, video_id: str, crawl_interval: float = 1.0, is_fetch_sub_comments=False,
-                                     callback: Optional[Callable] = None,
-                                     max_count: int = 10,):
+    async def iter_video_comments(self, video_id: str, crawl_interval: float = 1.0, is_fetch_sub_comments=False,
+                                  max_count: int = 10, ) -> AsyncIterator[List[Dict]]:
         """
-        get video all comments include sub comments
+        get video comments include sub comments page by page, yield each page as soon as it arrives
         :param video_id:
         :param crawl_interval:
         :param is_fetch_sub_comments:
-        :param callback:
-        max_count: 一次笔记爬取的最大评论数量
+        max_count: 一次笔记爬取的最大一级评论数量
 
         :return:
         """
-        result = []
+        comments_count = 0
+        sub_comments_count = 0
         is_end = False
         next_page = 0
         max_retries = 3
-        while not is_end and len(result) < max_count:
+        while not is_end and comments_count < max_count:
             comments_res = None
             for attempt in range(max_retries):
                 try:
@@ -258,12 +271,12 @@ class BilibiliClient(AbstractApiClient):
                     if attempt < max_retries - 1:
                         delay = 5 * (2 ** attempt) + random.uniform(0, 1)
                         utils.logger.warning(
-                            f"[BilibiliClient.get_video_all_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})"
+                            f"[BilibiliClient.iter_video_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})"
                         )
                         await asyncio.sleep(delay)
                     else:
                         utils.logger.error(
-                            f"[BilibiliClient.get_video_all_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}"
+                            f"[BilibiliClient.iter_video_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}"
                         )
                         is_end = True
                         break
@@ -272,56 +285,54 @@ class BilibiliClient(AbstractApiClient):
 
             cursor_info: Dict = comments_res.get("cursor")
             if not cursor_info:
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Could not find 'cursor' in response for video_id: {video_id}. Skipping.")
+                utils.logger.warning(f"[BilibiliClient.iter_video_comments] Could not find 'cursor' in response for video_id: {video_id}. Skipping.")
                 break
 
             comment_list: List[Dict] = comments_res.get("replies", [])
             
             # 检查 is_end 和 next 是否存在
             if "is_end" not in cursor_info or "next" not in cursor_info:
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' or 'next' not in cursor for video_id: {video_id}. Assuming end of comments.")
+                utils.logger.warning(f"[BilibiliClient.iter_video_comments] 'is_end' or 'next' not in cursor for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
             else:
                 is_end = cursor_info.get("is_end")
                 next_page = cursor_info.get("next")
 
             if not isinstance(is_end, bool):
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
+                utils.logger.warning(f"[BilibiliClient.iter_video_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
+            if comments_count + len(comment_list) > max_count:
+                comment_list = comment_list[:max_count - comments_count]
+            comments_count += len(comment_list)
+            yield comment_list
+            await wait_crawl_interval(crawl_interval)
             if is_fetch_sub_comments:
-                for comment in comment_list:
-                    comment_id = comment['rpid']
-                    if (comment.get("rcount", 0) > 0):
-                        {
-                            await self.get_video_all_level_two_comments(
-                                video_id, comment_id, CommentOrderType.DEFAULT, 10, crawl_interval,  callback)
-                        }
-            if len(result) + len(comment_list) > max_count:
-                comment_list = comment_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
-            if not is_fetch_sub_comments:
-                result.extend(comment_list)
-                continue
-        return result
-
-    async def get_video_all_level_two_comments(self,
-                                               video_id: str,
-                                               level_one_comment_id: int,
-                                               order_mode: CommentOrderType,
-                                               ps: int = 10,
-                                               crawl_interval: float = 1.0,
-                                               callback: Optional[Callable] = None,
-                                               ) -> Dict:
+                # 各条一级评论的二级评论并发翻页，单个视频的二级评论总数受 CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES 限制
+                threads = [
+                    self.iter_video_level_two_comments(video_id, comment["rpid"], CommentOrderType.DEFAULT, 10, crawl_interval)
+                    for comment in comment_list
+                    if comment.get("rcount", 0) > 0
+                ]
+                async for sub_comment_list in merge_page_iterators(
+                        threads, max_count=config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count,
+                        limiter=get_concurrency_limiter("bili")):
+                    sub_comments_count += len(sub_comment_list)
+                    yield sub_comment_list
+
+    async def iter_video_level_two_comments(self,
+                                            video_id: str,
+                                            level_one_comment_id: int,
+                                            order_mode: CommentOrderType,
+                                            ps: int = 10,
+                                            crawl_interval: float = 1.0,
+                                            ) -> AsyncIterator[List[Dict]]:
         """
-        get video all level two comments for a level one comment
+        get video level two comments for a level one comment page by page
         :param video_id: 视频 ID
         :param level_one_comment_id: 一级评论 ID
         :param order_mode:
         :param ps: 一页评论数
         :param crawl_interval:
-        :param callback:
         :return:
         """
 
@@ -330,9 +341,8 @@ class BilibiliClient(AbstractApiClient):
             result = await self.get_video_level_two_comments(
                 video_id, level_one_comment_id, pn, ps, order_mode)
             comment_list: List[Dict] = result.get("replies", [])
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
+            yield comment_list
+            await wait_crawl_interval(crawl_interval)
             if (int(result["page"]["count"]) <= pn * ps):
                 break
 
@@ -452,91 +462,79 @@ class BilibiliClient(AbstractApiClient):
 
         return await self.get(uri, post_data)
 
-    async def get_creator_all_fans(self, creator_info: Dict, crawl_interval: float = 1.0,
-                                   callback: Optional[Callable] = None,
-                                   max_count: int = 100) -> List:
+    async def iter_creator_fans(self, creator_info: Dict, crawl_interval: float = 1.0,
+                                max_count: int = 100) -> AsyncIterator[List[Dict]]:
         """
-        get creator all fans
+        get creator fans page by page
         :param creator_info:
         :param crawl_interval:
-        :param callback:
         :param max_count: 一个up主爬取的最大粉丝数量
 
-        :return: up主粉丝数列表
+        :return: up主粉丝分页
         """
         creator_id = creator_info["id"]
-        result = []
+        fans_count = 0
         pn = config.START_CONTACTS_PAGE
-        while len(result) < max_count:
+        while fans_count < max_count:
             fans_res: Dict = await self.get_creator_fans(creator_id, pn=pn)
             fans_list: List[Dict] = fans_res.get("list", [])
 
             pn += 1
-            if len(result) + len(fans_list) > max_count:
-                fans_list = fans_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(creator_info, fans_list)
-            await asyncio.sleep(crawl_interval)
             if not fans_list:
                 break
-            result.extend(fans_list)
-        return result
-
-    async def get_creator_all_followings(self, creator_info: Dict, crawl_interval: float = 1.0,
-                                         callback: Optional[Callable] = None,
-                                         max_count: int = 100) -> List:
+            if fans_count + len(fans_list) > max_count:
+                fans_list = fans_list[:max_count - fans_count]
+            fans_count += len(fans_list)
+            yield fans_list
+            await wait_crawl_interval(crawl_interval)
+
+    async def iter_creator_followings(self, creator_info: Dict, crawl_interval: float = 1.0,
+                                      max_count: int = 100) -> AsyncIterator[List[Dict]]:
         """
-        get creator all followings
+        get creator followings page by page
         :param creator_info:
         :param crawl_interval:
-        :param callback:
         :param max_count: 一个up主爬取的最大关注者数量
 
-        :return: up主关注者列表
+        :return: up主关注者分页
         """
         creator_id = creator_info["id"]
-        result = []
+        followings_count = 0
         pn = config.START_CONTACTS_PAGE
-        while len(result) < max_count:
+        while followings_count < max_count:
             followings_res: Dict = await self.get_creator_followings(creator_id, pn=pn)
             followings_list: List[Dict] = followings_res.get("list", [])
 
             pn += 1
-            if len(result) + len(followings_list) > max_count:
-                followings_list = followings_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(creator_info, followings_list)
-            await asyncio.sleep(crawl_interval)
             if not followings_list:
                 break
-            result.extend(followings_list)
-        return result
-
-    async def get_creator_all_dynamics(self, creator_info: Dict, crawl_interval: float = 1.0,
-                                       callback: Optional[Callable] = None,
-                                       max_count: int = 20) -> List:
+            if followings_count + len(followings_list) > max_count:
+                followings_list = followings_list[:max_count - followings_count]
+            followings_count += len(followings_list)
+            yield followings_list
+            await wait_crawl_interval(crawl_interval)
+
+    async def iter_creator_dynamics(self, creator_info: Dict, crawl_interval: float = 1.0,
+                                    max_count: int = 20) -> AsyncIterator[List[Dict]]:
         """
-        get creator all followings
+        get creator dynamics page by page
         :param creator_info:
         :param crawl_interval:
-        :param callback:
         :param max_count: 一个up主爬取的最大动态数量
 
-        :return: up主关注者列表
+        :return: up主动态分页
         """
         creator_id = creator_info["id"]
-        result = []
+        dynamics_count = 0
         offset = ""
         has_more = True
-        while has_more and len(result) < max_count:
+        while has_more and dynamics_count < max_count:
             dynamics_res = await self.get_creator_dynamics(creator_id, offset)
             dynamics_list: List[Dict] = dynamics_res["items"]
             has_more = dynamics_res["has_more"]
             offset = dynamics_res["offset"]
-            if len(result) + len(dynamics_list) > max_count:
-                dynamics_list = dynamics_list[:max_count - len(result)]
-            if callback:
-                await callback(creator_info, dynamics_list)
-            await asyncio.sleep(crawl_interval)
-            result.extend(dynamics_list)
-        return result
+            if dynamics_count + len(dynamics_list) > max_count:
+                dynamics_list = dynamics_list[:max_count - dynamics_count]
+            dynamics_count += len(dynamics_list)
+            yield dynamics_list
+            await wait_crawl_interval(crawl_interval)
@@ -15,10 +15,11 @@
 # @Desc    : B站爬虫
 
 import asyncio
+import functools
 import os
 import random
 from asyncio import Task
-from typing import Dict, List, Optional, Tuple, Union
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import pandas as pd
 
@@ -34,10 +35,16 @@ from playwright._impl._errors import TargetClosedError
 import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator
 from store import bilibili as bilibili_store
-from tools import utils
+from store.crawl_index import crawl_index
+from store.media_blob_store import make_media_key
+from tools import http_pool, media_downloader, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from tools.crawl_pipeline import run_pipeline
+from tools.rate_limiter import wait_crawl_interval
 from tools.cdp_browser import CDPBrowserManager
-from var import crawler_type_var, source_keyword_var
+from var import crawler_type_var
 
 from .client import BilibiliClient
 from .exception import DataFetchError
@@ -57,12 +64,14 @@ class BilibiliCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self):
-        playwright_proxy_format, httpx_proxy_format = None, None
+        playwright_proxy_format, httpx_proxy_format, proxy_rotator = None, None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            # IP 被封禁时由 proxy_rotator 为 API 客户端自动更换代理
+            proxy_rotator = ProxyRotator(ip_proxy_pool, max_rotations=config.IP_PROXY_MAX_ROTATIONS)
+            ip_proxy_info: IpInfoModel = await proxy_rotator.lease()
             playwright_proxy_format, httpx_proxy_format = self.format_proxy_info(
                 ip_proxy_info
             )
@@ -91,6 +100,7 @@ class BilibiliCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.bili_client = await self.create_bilibili_client(httpx_proxy_format)
+            self.bili_client.proxy_rotator = proxy_rotator
             if not await self.bili_client.pong():
                 login_obj = BilibiliLogin(
                     login_type=config.LOGIN_TYPE,
@@ -184,64 +194,114 @@ class BilibiliCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < bili_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = bili_limit_count
         start_page = config.START_PAGE  # start page number
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
+        await self.run_keyword_searches(self.search_by_keyword, bili_limit_count, start_page)
+
+    async def search_by_keyword(self, keyword: str, bili_limit_count: int, start_page: int) -> None:
+        """
+        search bilibili video of one keyword in normal mode
+        搜索翻页 -> 视频详情 -> 保存 -> 评论 按流水线执行，第 N 页获取评论时第 N+1 页已在获取详情
+        :param keyword: search keyword
+        :param bili_limit_count: page size
+        :param start_page: start page number
+        :return:
+        """
+        utils.logger.info(
+            f"[BilibiliCrawler.search_by_keyword] Current search keyword: {keyword}"
+        )
+        await run_pipeline(
+            self.iter_search_pages(keyword, bili_limit_count, start_page),
+            [self.fetch_search_video_details, self.store_search_videos, self.fetch_search_videos_comments],
+            queue_size=config.SEARCH_PIPELINE_QUEUE_SIZE,
+        )
+
+    async def iter_search_pages(self, keyword: str, bili_limit_count: int, start_page: int) -> AsyncIterator[List[Dict]]:
+        """
+        搜索流水线的第一阶段：逐页搜索，产出每页的视频列表
+        :param keyword: search keyword
+        :param bili_limit_count: page size
+        :param start_page: start page number
+        :return:
+        """
+        page = 1
+        while (
+            page - start_page + 1
+        ) * bili_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(
+                    f"[BilibiliCrawler.iter_search_pages] Skip page: {page}"
+                )
+                page += 1
+                continue
+
             utils.logger.info(
-                f"[BilibiliCrawler.search_by_keywords] Current search keyword: {keyword}"
+                f"[BilibiliCrawler.iter_search_pages] search bilibili keyword: {keyword}, page: {page}"
             )
-            page = 1
-            while (
-                page - start_page + 1
-            ) * bili_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(
-                        f"[BilibiliCrawler.search_by_keywords] Skip page: {page}"
-                    )
-                    page += 1
-                    continue
+            videos_res = await self.bili_client.search_video_by_keyword(
+                keyword=keyword,
+                page=page,
+                page_size=bili_limit_count,
+                order=SearchOrderType.DEFAULT,
+                pubtime_begin_s=0,  # 作品发布日期起始时间戳
+                pubtime_end_s=0,  # 作品发布日期结束日期时间戳
+            )
+            video_list: List[Dict] = videos_res.get("result")
 
+            if not video_list:
                 utils.logger.info(
-                    f"[BilibiliCrawler.search_by_keywords] search bilibili keyword: {keyword}, page: {page}"
+                    f"[BilibiliCrawler.iter_search_pages] No more videos for '{keyword}', moving to next keyword."
+                )
+                break
+            page += 1
+            yield video_list
+
+    async def fetch_search_video_details(self, video_list: List[Dict]) -> List[Optional[Dict]]:
+        """
+        搜索流水线的详情阶段：并发获取一页搜索结果中视频的详情
+        :param video_list: 搜索结果中的视频列表
+        :return:
+        """
+        semaphore = get_concurrency_limiter("bili")
+        task_list = []
+        try:
+            task_list = [
+                self.get_video_info_task(
+                    aid=video_item.get("aid"), bvid="", semaphore=semaphore
                 )
-                video_id_list: List[str] = []
-                videos_res = await self.bili_client.search_video_by_keyword(
-                    keyword=keyword,
-                    page=page,
-                    page_size=bili_limit_count,
-                    order=SearchOrderType.DEFAULT,
-                    pubtime_begin_s=0,  # 作品发布日期起始时间戳
-                    pubtime_end_s=0,  # 作品发布日期结束日期时间戳
+                for video_item in video_list
+                if not crawl_index.is_unchanged(
+                    "bili", str(video_item.get("aid")), self.get_search_interact_counts(video_item)
                 )
-                video_list: List[Dict] = videos_res.get("result")
+            ]
+        except Exception as e:
+            utils.logger.warning(
+                f"[BilibiliCrawler.fetch_search_video_details] error in the task list. The video for this page will not be included. {e}"
+            )
+        return await asyncio.gather(*task_list)
 
-                if not video_list:
-                    utils.logger.info(
-                        f"[BilibiliCrawler.search_by_keywords] No more videos for '{keyword}', moving to next keyword."
-                    )
-                    break
+    async def store_search_videos(self, video_items: List[Optional[Dict]]) -> List[Optional[Dict]]:
+        """
+        搜索流水线的保存阶段：保存视频详情、UP 主信息并提交视频下载
+        :param video_items: 视频详情列表
+        :return: 视频详情列表
+        """
+        semaphore = get_concurrency_limiter("bili")
+        for video_item in video_items:
+            if video_item:
+                await bilibili_store.update_bilibili_video(video_item)
+                await bilibili_store.update_up_info(video_item)
+                await self.get_bilibili_video(video_item, semaphore)
+        return video_items
 
-                semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
-                task_list = []
-                try:
-                    task_list = [
-                        self.get_video_info_task(
-                            aid=video_item.get("aid"), bvid="", semaphore=semaphore
-                        )
-                        for video_item in video_list
-                    ]
-                except Exception as e:
-                    utils.logger.warning(
-                        f"[BilibiliCrawler.search_by_keywords] error in the task list. The video for this page will not be included. {e}"
-                    )
-                video_items = await asyncio.gather(*task_list)
-                for video_item in video_items:
-                    if video_item:
-                        video_id_list.append(video_item.get("View").get("aid"))
-                        await bilibili_store.update_bilibili_video(video_item)
-                        await bilibili_store.update_up_info(video_item)
-                        await self.get_bilibili_video(video_item, semaphore)
-                page += 1
-                await self.batch_get_video_comments(video_id_list)
+    async def fetch_search_videos_comments(self, video_items: List[Optional[Dict]]) -> None:
+        """
+        搜索流水线的评论阶段：获取一页视频的评论，完成后记入增量爬取索引
+        :param video_items: 视频详情列表
+        :return:
+        """
+        await self.batch_get_video_comments(
+            [video_item.get("View").get("aid") for video_item in video_items if video_item]
+        )
+        await self.mark_videos_seen(video_items)
 
     async def search_by_keywords_in_time_range(self, daily_limit: bool):
         """
@@ -254,125 +314,139 @@ class BilibiliCrawler(AbstractCrawler):
         bili_limit_count = 20
         start_page = config.START_PAGE
 
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
-            utils.logger.info(
-                f"[BilibiliCrawler.search_by_keywords_in_time_range] Current search keyword: {keyword}"
-            )
-            total_notes_crawled_for_keyword = 0
+        await self.run_keyword_searches(self.search_by_keyword_in_time_range, daily_limit, bili_limit_count, start_page)
+
+    async def search_by_keyword_in_time_range(self, keyword: str, daily_limit: bool, bili_limit_count: int, start_page: int) -> None:
+        """
+        Search bilibili video of one keyword in a given time range.
+        :param keyword: search keyword
+        :param daily_limit: if True, strictly limit the number of notes per day and total.
+        :param bili_limit_count: page size
+        :param start_page: start page number
+        """
+        utils.logger.info(
+            f"[BilibiliCrawler.search_by_keyword_in_time_range] Current search keyword: {keyword}"
+        )
+        total_notes_crawled_for_keyword = 0
+
+        for day in pd.date_range(
+            start=config.START_DAY, end=config.END_DAY, freq="D"
+        ):
+            if (
+                daily_limit
+                and total_notes_crawled_for_keyword
+                >= config.CRAWLER_MAX_NOTES_COUNT
+            ):
+                utils.logger.info(
+                    f"[BilibiliCrawler.search_by_keyword_in_time_range] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}', skipping remaining days."
+                )
+                break
 
-            for day in pd.date_range(
-                start=config.START_DAY, end=config.END_DAY, freq="D"
+            if (
+                not daily_limit
+                and total_notes_crawled_for_keyword
+                >= config.CRAWLER_MAX_NOTES_COUNT
             ):
+                utils.logger.info(
+                    f"[BilibiliCrawler.search_by_keyword_in_time_range] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}', skipping remaining days."
+                )
+                break
+
+            pubtime_begin_s, pubtime_end_s = await self.get_pubtime_datetime(
+                start=day.strftime("%Y-%m-%d"), end=day.strftime("%Y-%m-%d")
+            )
+            page = 1
+            notes_count_this_day = 0
+
+            while True:
+                if notes_count_this_day >= config.MAX_NOTES_PER_DAY:
+                    utils.logger.info(
+                        f"[BilibiliCrawler.search_by_keyword_in_time_range] Reached MAX_NOTES_PER_DAY limit for {day.ctime()}."
+                    )
+                    break
                 if (
                     daily_limit
                     and total_notes_crawled_for_keyword
                     >= config.CRAWLER_MAX_NOTES_COUNT
                 ):
                     utils.logger.info(
-                        f"[BilibiliCrawler.search] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}', skipping remaining days."
+                        f"[BilibiliCrawler.search_by_keyword_in_time_range] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}'."
                     )
                     break
-
                 if (
                     not daily_limit
                     and total_notes_crawled_for_keyword
                     >= config.CRAWLER_MAX_NOTES_COUNT
                 ):
-                    utils.logger.info(
-                        f"[BilibiliCrawler.search] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}', skipping remaining days."
-                    )
                     break
 
-                pubtime_begin_s, pubtime_end_s = await self.get_pubtime_datetime(
-                    start=day.strftime("%Y-%m-%d"), end=day.strftime("%Y-%m-%d")
-                )
-                page = 1
-                notes_count_this_day = 0
+                try:
+                    utils.logger.info(
+                        f"[BilibiliCrawler.search_by_keyword_in_time_range] search bilibili keyword: {keyword}, date: {day.ctime()}, page: {page}"
+                    )
+                    video_id_list: List[str] = []
+                    videos_res = await self.bili_client.search_video_by_keyword(
+                        keyword=keyword,
+                        page=page,
+                        page_size=bili_limit_count,
+                        order=SearchOrderType.DEFAULT,
+                        pubtime_begin_s=pubtime_begin_s,
+                        pubtime_end_s=pubtime_end_s,
+                    )
+                    video_list: List[Dict] = videos_res.get("result")
 
-                while True:
-                    if notes_count_this_day >= config.MAX_NOTES_PER_DAY:
-                        utils.logger.info(
-                            f"[BilibiliCrawler.search] Reached MAX_NOTES_PER_DAY limit for {day.ctime()}."
-                        )
-                        break
-                    if (
-                        daily_limit
-                        and total_notes_crawled_for_keyword
-                        >= config.CRAWLER_MAX_NOTES_COUNT
-                    ):
+                    if not video_list:
                         utils.logger.info(
-                            f"[BilibiliCrawler.search] Reached CRAWLER_MAX_NOTES_COUNT limit for keyword '{keyword}'."
+                            f"[BilibiliCrawler.search_by_keyword_in_time_range] No more videos for '{keyword}' on {day.ctime()}, moving to next day."
                         )
                         break
-                    if (
-                        not daily_limit
-                        and total_notes_crawled_for_keyword
-                        >= config.CRAWLER_MAX_NOTES_COUNT
-                    ):
-                        break
 
-                    try:
-                        utils.logger.info(
-                            f"[BilibiliCrawler.search] search bilibili keyword: {keyword}, date: {day.ctime()}, page: {page}"
-                        )
-                        video_id_list: List[str] = []
-                        videos_res = await self.bili_client.search_video_by_keyword(
-                            keyword=keyword,
-                            page=page,
-                            page_size=bili_limit_count,
-                            order=SearchOrderType.DEFAULT,
-                            pubtime_begin_s=pubtime_begin_s,
-                            pubtime_end_s=pubtime_end_s,
+                    semaphore = get_concurrency_limiter("bili")
+                    task_list = [
+                        self.get_video_info_task(
+                            aid=video_item.get("aid"), bvid="", semaphore=semaphore
                         )
-                        video_list: List[Dict] = videos_res.get("result")
-
-                        if not video_list:
-                            utils.logger.info(
-                                f"[BilibiliCrawler.search] No more videos for '{keyword}' on {day.ctime()}, moving to next day."
-                            )
-                            break
-
-                        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
-                        task_list = [
-                            self.get_video_info_task(
-                                aid=video_item.get("aid"), bvid="", semaphore=semaphore
-                            )
-                            for video_item in video_list
-                        ]
-                        video_items = await asyncio.gather(*task_list)
-
-                        for video_item in video_items:
-                            if video_item:
-                                if (
-                                    daily_limit
-                                    and total_notes_crawled_for_keyword
-                                    >= config.CRAWLER_MAX_NOTES_COUNT
-                                ):
-                                    break
-                                if (
-                                    not daily_limit
-                                    and total_notes_crawled_for_keyword
-                                    >= config.CRAWLER_MAX_NOTES_COUNT
-                                ):
-                                    break
-                                if notes_count_this_day >= config.MAX_NOTES_PER_DAY:
-                                    break
-                                notes_count_this_day += 1
-                                total_notes_crawled_for_keyword += 1
-                                video_id_list.append(video_item.get("View").get("aid"))
-                                await bilibili_store.update_bilibili_video(video_item)
-                                await bilibili_store.update_up_info(video_item)
-                                await self.get_bilibili_video(video_item, semaphore)
-
-                        page += 1
-                        await self.batch_get_video_comments(video_id_list)
-
-                    except Exception as e:
-                        utils.logger.error(
-                            f"[BilibiliCrawler.search] Error searching on {day.ctime()}: {e}"
+                        for video_item in video_list
+                        if not crawl_index.is_unchanged(
+                            "bili", str(video_item.get("aid")), self.get_search_interact_counts(video_item)
                         )
-                        break
+                    ]
+                    video_items = await asyncio.gather(*task_list)
+                    seen_video_items: List[Dict] = []
+
+                    for video_item in video_items:
+                        if video_item:
+                            if (
+                                daily_limit
+                                and total_notes_crawled_for_keyword
+                                >= config.CRAWLER_MAX_NOTES_COUNT
+                            ):
+                                break
+                            if (
+                                not daily_limit
+                                and total_notes_crawled_for_keyword
+                                >= config.CRAWLER_MAX_NOTES_COUNT
+                            ):
+                                break
+                            if notes_count_this_day >= config.MAX_NOTES_PER_DAY:
+                                break
+                            notes_count_this_day += 1
+                            total_notes_crawled_for_keyword += 1
+                            video_id_list.append(video_item.get("View").get("aid"))
+                            seen_video_items.append(video_item)
+                            await bilibili_store.update_bilibili_video(video_item)
+                            await bilibili_store.update_up_info(video_item)
+                            await self.get_bilibili_video(video_item, semaphore)
+
+                    page += 1
+                    await self.batch_get_video_comments(video_id_list)
+                    await self.mark_videos_seen(seen_video_items)
+
+                except Exception as e:
+                    utils.logger.error(
+                        f"[BilibiliCrawler.search_by_keyword_in_time_range] Error searching on {day.ctime()}: {e}"
+                    )
+                    break
 
     async def batch_get_video_comments(self, video_id_list: List[str]):
         """
@@ -389,7 +463,7 @@ class BilibiliCrawler(AbstractCrawler):
         utils.logger.info(
             f"[BilibiliCrawler.batch_get_video_comments] video ids:{video_id_list}"
         )
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("bili")
         task_list: List[Task] = []
         for video_id in video_id_list:
             task = asyncio.create_task(
@@ -398,7 +472,7 @@ class BilibiliCrawler(AbstractCrawler):
             task_list.append(task)
         await asyncio.gather(*task_list)
 
-    async def get_comments(self, video_id: str, semaphore: asyncio.Semaphore):
+    async def get_comments(self, video_id: str, semaphore: AdaptiveConcurrencyLimiter):
         """
         get comment for video id
         :param video_id:
@@ -410,14 +484,14 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[BilibiliCrawler.get_comments] begin get video_id: {video_id} comments ..."
                 )
-                await asyncio.sleep(random.uniform(0.5, 1.5))
-                await self.bili_client.get_video_all_comments(
+                await wait_crawl_interval(random.uniform(0.5, 1.5))
+                async for comments in self.bili_client.iter_video_comments(
                     video_id=video_id,
                     crawl_interval=random.random(),
                     is_fetch_sub_comments=config.ENABLE_GET_SUB_COMMENTS,
-                    callback=bilibili_store.batch_update_bilibili_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await bilibili_store.batch_update_bilibili_video_comments(video_id, comments)
 
             except DataFetchError as ex:
                 utils.logger.error(
@@ -439,11 +513,18 @@ class BilibiliCrawler(AbstractCrawler):
         pn = 1
         while True:
             result = await self.bili_client.get_creator_videos(creator_id, pn, ps)
-            video_bvids_list = [video["bvid"] for video in result["list"]["vlist"]]
-            await self.get_specified_videos(video_bvids_list)
-            if int(result["page"]["count"]) <= pn * ps:
+            # 投稿列表按发布时间倒序，增量模式下遇到已爬取过的视频时停止翻页
+            video_list, has_more = utils.drop_seen_items(
+                result["list"]["vlist"],
+                lambda video: crawl_index.is_seen("bili", str(video.get("aid"))),
+                int(result["page"]["count"]) > pn * ps,
+            )
+            video_bvids_list = [video["bvid"] for video in video_list]
+            if video_bvids_list:
+                await self.get_specified_videos(video_bvids_list)
+            if not has_more:
                 break
-            await asyncio.sleep(random.random())
+            await wait_crawl_interval(random.random())
             pn += 1
 
     async def get_specified_videos(self, bvids_list: List[str]):
@@ -451,7 +532,7 @@ class BilibiliCrawler(AbstractCrawler):
         get specified videos info
         :return:
         """
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("bili")
         task_list = [
             self.get_video_info_task(aid=0, bvid=video_id, semaphore=semaphore)
             for video_id in bvids_list
@@ -462,15 +543,61 @@ class BilibiliCrawler(AbstractCrawler):
             if video_detail is not None:
                 video_item_view: Dict = video_detail.get("View")
                 video_aid: str = video_item_view.get("aid")
-                if video_aid:
+                # 互动数没有变化时跳过评论
+                if video_aid and not crawl_index.is_unchanged(
+                    "bili", str(video_aid), self.get_interact_counts(video_detail)
+                ):
                     video_aids_list.append(video_aid)
                 await bilibili_store.update_bilibili_video(video_detail)
                 await bilibili_store.update_up_info(video_detail)
                 await self.get_bilibili_video(video_detail, semaphore)
         await self.batch_get_video_comments(video_aids_list)
+        await self.mark_videos_seen(video_details)
+
+    @staticmethod
+    def get_search_interact_counts(video_item: Dict) -> Dict:
+        """
+        搜索结果中视频的互动数，字段与 get_interact_counts 对齐，用于增量爬取判断视频是否有变化
+        播放数、弹幕数几乎每次都会变化，不参与比较
+        :param video_item: 搜索结果中的视频
+        :return:
+        """
+        return {
+            "liked_count": video_item.get("like"),
+            "collected_count": video_item.get("favorites"),
+            "comment_count": video_item.get("review"),
+        }
+
+    @staticmethod
+    def get_interact_counts(video_detail: Dict) -> Dict:
+        """
+        视频详情中的互动数，用于增量爬取判断视频是否有变化
+        :param video_detail: 视频详情
+        :return:
+        """
+        video_stat: Dict = video_detail.get("View", {}).get("stat", {})
+        return {
+            "liked_count": video_stat.get("like"),
+            "collected_count": video_stat.get("favorite"),
+            "comment_count": video_stat.get("reply"),
+            "share_count": video_stat.get("share"),
+        }
+
+    async def mark_videos_seen(self, video_details: List[Optional[Dict]]) -> None:
+        """
+        详情和评论都已保存后，把视频及其互动数记入增量爬取索引
+        :param video_details: 视频详情列表
+        :return:
+        """
+        for video_detail in video_details:
+            if video_detail:
+                crawl_index.mark_seen(
+                    "bili", str(video_detail.get("View", {}).get("aid")), self.get_interact_counts(video_detail)
+                )
+        await crawl_index.flush()
 
     async def get_video_info_task(
-        self, aid: int, bvid: str, semaphore: asyncio.Semaphore
+        self, aid: int, bvid: str, semaphore: AdaptiveConcurrencyLimiter
     ) -> Optional[Dict]:
         """
         Get video detail task
@@ -495,7 +622,7 @@ class BilibiliCrawler(AbstractCrawler):
                 return None
 
     async def get_video_play_url_task(
-        self, aid: int, cid: int, semaphore: asyncio.Semaphore
+        self, aid: int, cid: int, semaphore: AdaptiveConcurrencyLimiter
     ) -> Union[Dict, None]:
         """
         Get video play url
@@ -645,6 +772,9 @@ class BilibiliCrawler(AbstractCrawler):
     async def close(self):
         """Close browser context"""
         try:
+            # 关闭共享的 HTTP 连接池
+            await media_downloader.close()
+            await http_pool.close_all()
             # 如果使用CDP模式，需要特殊处理
             if self.cdp_manager:
                 await self.cdp_manager.cleanup()
@@ -661,7 +791,7 @@ class BilibiliCrawler(AbstractCrawler):
                 f"[BilibiliCrawler.close] An error occurred during close: {e}"
             )
 
-    async def get_bilibili_video(self, video_item: Dict, semaphore: asyncio.Semaphore):
+    async def get_bilibili_video(self, video_item: Dict, semaphore: AdaptiveConcurrencyLimiter):
         """
         download bilibili video
         :param video_item:
@@ -696,11 +826,13 @@ class BilibiliCrawler(AbstractCrawler):
             )
             return
 
-        content = await self.bili_client.get_video_media(video_url)
-        if content is None:
-            return
         extension_file_name = f"video.mp4"
-        await bilibili_store.store_video(aid, content, extension_file_name)
+        # 放入下载队列后台下载，不阻塞视频和评论的爬取
+        await media_downloader.enqueue(
+            functools.partial(bilibili_store.download_video, aid, extension_file_name, make_media_key(video_url),
+                              functools.partial(self.bili_client.download_video_media, video_url)),
+            f"{aid}/{extension_file_name}"
+        )
 
     async def get_all_creator_details(self, creator_id_list: List[int]):
         """
@@ -713,7 +845,7 @@ class BilibiliCrawler(AbstractCrawler):
             f"[BilibiliCrawler.get_creator_details] creator ids:{creator_id_list}"
         )
 
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("bili")
         task_list: List[Task] = []
         try:
             for creator_id in creator_id_list:
@@ -728,7 +860,7 @@ class BilibiliCrawler(AbstractCrawler):
 
         await asyncio.gather(*task_list)
 
-    async def get_creator_details(self, creator_id: int, semaphore: asyncio.Semaphore):
+    async def get_creator_details(self, creator_id: int, semaphore: AdaptiveConcurrencyLimiter):
         """
         get details for creator id
         :param creator_id:
@@ -749,7 +881,7 @@ class BilibiliCrawler(AbstractCrawler):
         await self.get_followings(creator_info, semaphore)
         await self.get_dynamics(creator_info, semaphore)
 
-    async def get_fans(self, creator_info: Dict, semaphore: asyncio.Semaphore):
+    async def get_fans(self, creator_info: Dict, semaphore: AdaptiveConcurrencyLimiter):
         """
         get fans for creator id
         :param creator_info:
@@ -762,12 +894,12 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[BilibiliCrawler.get_fans] begin get creator_id: {creator_id} fans ..."
                 )
-                await self.bili_client.get_creator_all_fans(
+                async for fans_list in self.bili_client.iter_creator_fans(
                     creator_info=creator_info,
                     crawl_interval=random.random(),
-                    callback=bilibili_store.batch_update_bilibili_creator_fans,
                     max_count=config.CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await bilibili_store.batch_update_bilibili_creator_fans(creator_info, fans_list)
 
             except DataFetchError as ex:
                 utils.logger.error(
@@ -778,7 +910,7 @@ class BilibiliCrawler(AbstractCrawler):
                     f"[BilibiliCrawler.get_fans] may be been blocked, err:{e}"
                 )
 
-    async def get_followings(self, creator_info: Dict, semaphore: asyncio.Semaphore):
+    async def get_followings(self, creator_info: Dict, semaphore: AdaptiveConcurrencyLimiter):
         """
         get followings for creator id
         :param creator_info:
@@ -791,12 +923,12 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[BilibiliCrawler.get_followings] begin get creator_id: {creator_id} followings ..."
                 )
-                await self.bili_client.get_creator_all_followings(
+                async for followings_list in self.bili_client.iter_creator_followings(
                     creator_info=creator_info,
                     crawl_interval=random.random(),
-                    callback=bilibili_store.batch_update_bilibili_creator_followings,
                     max_count=config.CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await bilibili_store.batch_update_bilibili_creator_followings(creator_info, followings_list)
 
             except DataFetchError as ex:
                 utils.logger.error(
@@ -807,7 +939,7 @@ class BilibiliCrawler(AbstractCrawler):
                     f"[BilibiliCrawler.get_followings] may be been blocked, err:{e}"
                 )
 
-    async def get_dynamics(self, creator_info: Dict, semaphore: asyncio.Semaphore):
+    async def get_dynamics(self, creator_info: Dict, semaphore: AdaptiveConcurrencyLimiter):
         """
         get dynamics for creator id
         :param creator_info:
@@ -820,12 +952,12 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[BilibiliCrawler.get_dynamics] begin get creator_id: {creator_id} dynamics ..."
                 )
-                await self.bili_client.get_creator_all_dynamics(
+                async for dynamics_list in self.bili_client.iter_creator_dynamics(
                     creator_info=creator_info,
                     crawl_interval=random.random(),
-                    callback=bilibili_store.batch_update_bilibili_creator_dynamics,
                     max_count=config.CRAWLER_MAX_DYNAMICS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await bilibili_store.batch_update_bilibili_creator_dynamics(creator_info, dynamics_list)
 
             except DataFetchError as ex:
                 utils.logger.error(
@@ -9,17 +9,22 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。  
 
 
-import asyncio
 import copy
 import json
 import urllib.parse
-from typing import Any, Callable, Dict, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
-import requests
+import httpx
 from playwright.async_api import BrowserContext
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
+import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from proxy.proxy_rotator import rotate_proxy_on_block
+from tools import http_pool, utils
+from tools.concurrency_limiter import get_concurrency_limiter
+from tools.crawl_pipeline import merge_page_iterators
+from tools.rate_limiter import rate_limited, wait_crawl_interval
 from var import request_keyword_var
 
 from .exception import *
@@ -91,14 +96,32 @@ class DOUYINClient(AbstractApiClient):
         a_bogus = await get_a_bogus(uri, query_string, post_data, headers["User-Agent"], self.playwright_page)
         params["a_bogus"] = a_bogus
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_fixed(1),
+        retry=retry_if_exception_type(httpx.TransportError),
+        reraise=True,
+    )
+    @rotate_proxy_on_block(IPBlockError)
+    @rate_limited("dy", IPBlockError)
     async def request(self, method, url, **kwargs):
-        response = None
-        if method == "GET":
-            response = requests.request(method, url, **kwargs)
-        elif method == "POST":
-            response = requests.request(method, url, **kwargs)
+        """
+        封装httpx的公共请求方法，连接超时、断开等网络错误会重试，业务错误直接抛出
+        Args:
+            method: 请求方法
+            url: 请求的URL
+            **kwargs: 其他请求参数，例如请求头、请求体等
+
+        Returns:
+
+        """
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        if response.text == "blocked":
+            utils.logger.error(f"[DOUYINClient.request] ip blocked, response.text: {response.text}")
+            raise IPBlockError(response.text)
         try:
-            if response.text == "" or response.text == "blocked":
+            if response.text == "":
                 utils.logger.error(f"request params incrr, response.text: {response.text}")
                 raise Exception("account blocked")
             return response.json()
@@ -225,64 +248,97 @@ class DOUYINClient(AbstractApiClient):
         headers["Referer"] = urllib.parse.quote(referer_url, safe=':/')
         return await self.get(uri, params)
 
-    async def get_aweme_all_comments(
+    async def iter_aweme_comments(
             self,
             aweme_id: str,
             crawl_interval: float = 1.0,
             is_fetch_sub_comments=False,
-            callback: Optional[Callable] = None,
             max_count: int = 10,
-    ):
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取帖子的所有评论，包括子评论
+        逐页获取帖子的评论，包括子评论，每取到一页产出一页，调用方边取边保存
         :param aweme_id: 帖子ID
         :param crawl_interval: 抓取间隔
         :param is_fetch_sub_comments: 是否抓取子评论
-        :param callback: 回调函数，用于处理抓取到的评论
-        :param max_count: 一次帖子爬取的最大评论数量
-        :return: 评论列表
+        :param max_count: 一次帖子爬取的最大一级评论数量
+        :return: 评论分页
         """
-        result = []
+        comments_count = 0
+        sub_comments_count = 0
         comments_has_more = 1
         comments_cursor = 0
-        while comments_has_more and len(result) < max_count:
+        while comments_has_more and comments_count < max_count:
             comments_res = await self.get_aweme_comments(aweme_id, comments_cursor)
             comments_has_more = comments_res.get("has_more", 0)
             comments_cursor = comments_res.get("cursor", 0)
             comments = comments_res.get("comments", [])
             if not comments:
                 continue
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            result.extend(comments)
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(aweme_id, comments)
+            if comments_count + len(comments) > max_count:
+                comments = comments[:max_count - comments_count]
+            comments_count += len(comments)
+            yield comments
 
-            await asyncio.sleep(crawl_interval)
+            await wait_crawl_interval(crawl_interval)
             if not is_fetch_sub_comments:
                 continue
             # 获取二级评论
-            for comment in comments:
-                reply_comment_total = comment.get("reply_comment_total")
+            async for sub_comments in self.iter_comments_sub_comments(
+                    aweme_id, comments, crawl_interval,
+                    max_count=config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count,
+            ):
+                sub_comments_count += len(sub_comments)
+                yield sub_comments
 
-                if reply_comment_total > 0:
-                    comment_id = comment.get("cid")
-                    sub_comments_has_more = 1
-                    sub_comments_cursor = 0
+    async def iter_comments_sub_comments(
+            self,
+            aweme_id: str,
+            comments: List[Dict],
+            crawl_interval: float = 1.0,
+            max_count: int = 100,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        并发获取多条一级评论下的子评论，每条一级评论独立翻页，每取到一页产出一页
+        :param aweme_id: 帖子ID
+        :param comments: 一级评论列表
+        :param crawl_interval: 抓取间隔
+        :param max_count: 本批一级评论下最多获取的子评论数量
+        :return: 子评论分页
+        """
+        threads = [
+            self.iter_sub_comment_thread(aweme_id, comment.get("cid"), crawl_interval)
+            for comment in comments
+            if comment.get("reply_comment_total", 0) > 0
+        ]
+        async for sub_comments in merge_page_iterators(threads, max_count=max_count,
+                                                      limiter=get_concurrency_limiter("dy")):
+            yield sub_comments
 
-                    while sub_comments_has_more:
-                        sub_comments_res = await self.get_sub_comments(aweme_id, comment_id, sub_comments_cursor)
-                        sub_comments_has_more = sub_comments_res.get("has_more", 0)
-                        sub_comments_cursor = sub_comments_res.get("cursor", 0)
-                        sub_comments = sub_comments_res.get("comments", [])
+    async def iter_sub_comment_thread(
+            self,
+            aweme_id: str,
+            comment_id: str,
+            crawl_interval: float = 1.0,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        按一条一级评论自己的游标逐页获取其子评论
+        :param aweme_id: 帖子ID
+        :param comment_id: 一级评论ID
+        :param crawl_interval: 抓取间隔
+        :return: 子评论分页
+        """
+        sub_comments_has_more = 1
+        sub_comments_cursor = 0
+        while sub_comments_has_more:
+            sub_comments_res = await self.get_sub_comments(aweme_id, comment_id, sub_comments_cursor)
+            sub_comments_has_more = sub_comments_res.get("has_more", 0)
+            sub_comments_cursor = sub_comments_res.get("cursor", 0)
+            sub_comments = sub_comments_res.get("comments", [])
 
-                        if not sub_comments:
-                            continue
-                        result.extend(sub_comments)
-                        if callback:  # 如果有回调函数，就执行回调函数
-                            await callback(aweme_id, sub_comments)
-                        await asyncio.sleep(crawl_interval)
-        return result
+            if not sub_comments:
+                continue
+            yield sub_comments
+            await wait_crawl_interval(crawl_interval)
 
     async def get_user_info(self, sec_user_id: str):
         uri = "/aweme/v1/web/user/profile/other/"
@@ -306,18 +362,30 @@ class DOUYINClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_all_user_aweme_posts(self, sec_user_id: str, callback: Optional[Callable] = None):
+    async def iter_user_aweme_posts(
+        self,
+        sec_user_id: str,
+        is_seen: Optional[Callable[[Dict], bool]] = None,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取用户发布的作品，每取到一页产出一页
+        :param sec_user_id: 用户ID
+        :param is_seen: 判断作品是否已经爬取过，遇到已爬取过的作品(置顶作品除外)时停止翻页，用于增量爬取
+        :return: 作品分页
+        """
         posts_has_more = 1
         max_cursor = ""
-        result = []
         while posts_has_more == 1:
             aweme_post_res = await self.get_user_aweme_posts(sec_user_id, max_cursor)
             posts_has_more = aweme_post_res.get("has_more", 0)
             max_cursor = aweme_post_res.get("max_cursor")
             aweme_list = aweme_post_res.get("aweme_list") if aweme_post_res.get("aweme_list") else []
             utils.logger.info(
-                f"[DOUYINClient.get_all_user_aweme_posts] got sec_user_id:{sec_user_id} video len : {len(aweme_list)}")
-            if callback:
-                await callback(aweme_list)
-            result.extend(aweme_list)
-        return result
+                f"[DOUYINClient.iter_user_aweme_posts] got sec_user_id:{sec_user_id} video len : {len(aweme_list)}")
+            if is_seen:
+                aweme_list, has_more = utils.drop_seen_items(
+                    aweme_list, is_seen, posts_has_more == 1, is_pinned=lambda aweme: aweme.get("is_top") == 1
+                )
+                posts_has_more = 1 if has_more else 0
+            if aweme_list:
+                yield aweme_list
@@ -26,10 +26,13 @@ from playwright.async_api import (
 import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator
 from store import douyin as douyin_store
-from tools import utils
+from store.crawl_index import crawl_index
+from tools import http_pool, signer_pool, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
 from tools.cdp_browser import CDPBrowserManager
-from var import crawler_type_var, source_keyword_var
+from var import crawler_type_var
 
 from .client import DOUYINClient
 from .exception import DataFetchError
@@ -48,12 +51,14 @@ class DouYinCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self) -> None:
-        playwright_proxy_format, httpx_proxy_format = None, None
+        playwright_proxy_format, httpx_proxy_format, proxy_rotator = None, None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            # IP 被封禁时由 proxy_rotator 为 API 客户端自动更换代理
+            proxy_rotator = ProxyRotator(ip_proxy_pool, max_rotations=config.IP_PROXY_MAX_ROTATIONS)
+            ip_proxy_info: IpInfoModel = await proxy_rotator.lease()
             playwright_proxy_format, httpx_proxy_format = self.format_proxy_info(
                 ip_proxy_info
             )
@@ -84,6 +89,7 @@ class DouYinCrawler(AbstractCrawler):
             await self.context_page.goto(self.index_url)
 
             self.dy_client = await self.create_douyin_client(httpx_proxy_format)
+            self.dy_client.proxy_rotator = proxy_rotator
             if not await self.dy_client.pong(browser_context=self.browser_context):
                 login_obj = DouYinLogin(
                     login_type=config.LOGIN_TYPE,
@@ -115,77 +121,90 @@ class DouYinCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < dy_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = dy_limit_count
         start_page = config.START_PAGE  # start page number
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
-            utils.logger.info(f"[DouYinCrawler.search] Current keyword: {keyword}")
-            aweme_list: List[str] = []
-            page = 0
-            dy_search_id = ""
-            while (
-                page - start_page + 1
-            ) * dy_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[DouYinCrawler.search] Skip {page}")
-                    page += 1
-                    continue
-                try:
+        await self.run_keyword_searches(self.search_by_keyword, dy_limit_count, start_page)
+
+    async def search_by_keyword(self, keyword: str, dy_limit_count: int, start_page: int) -> None:
+        """Search awemes of one keyword and retrieve their comment information."""
+        utils.logger.info(f"[DouYinCrawler.search_by_keyword] Current keyword: {keyword}")
+        aweme_list: List[str] = []
+        seen_awemes: List[Dict] = []
+        page = 0
+        dy_search_id = ""
+        while (
+            page - start_page + 1
+        ) * dy_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[DouYinCrawler.search_by_keyword] Skip {page}")
+                page += 1
+                continue
+            try:
+                utils.logger.info(
+                    f"[DouYinCrawler.search_by_keyword] search douyin keyword: {keyword}, page: {page}"
+                )
+                posts_res = await self.dy_client.search_info_by_keyword(
+                    keyword=keyword,
+                    offset=page * dy_limit_count - dy_limit_count,
+                    publish_time=PublishTimeType(config.PUBLISH_TIME_TYPE),
+                    search_id=dy_search_id,
+                )
+                if posts_res.get("data") is None or posts_res.get("data") == []:
                     utils.logger.info(
-                        f"[DouYinCrawler.search] search douyin keyword: {keyword}, page: {page}"
-                    )
-                    posts_res = await self.dy_client.search_info_by_keyword(
-                        keyword=keyword,
-                        offset=page * dy_limit_count - dy_limit_count,
-                        publish_time=PublishTimeType(config.PUBLISH_TIME_TYPE),
-                        search_id=dy_search_id,
-                    )
-                    if posts_res.get("data") is None or posts_res.get("data") == []:
-                        utils.logger.info(
-                            f"[DouYinCrawler.search] search douyin keyword: {keyword}, page: {page} is empty,{posts_res.get('data')}`"
-                        )
-                        break
-                except DataFetchError:
-                    utils.logger.error(
-                        f"[DouYinCrawler.search] search douyin keyword: {keyword} failed"
+                        f"[DouYinCrawler.search_by_keyword] search douyin keyword: {keyword}, page: {page} is empty,{posts_res.get('data')}`"
                     )
                     break
+            except DataFetchError:
+                utils.logger.error(
+                    f"[DouYinCrawler.search_by_keyword] search douyin keyword: {keyword} failed"
+                )
+                break
 
-                page += 1
-                if "data" not in posts_res:
-                    utils.logger.error(
-                        f"[DouYinCrawler.search] search douyin keyword: {keyword} failed，账号也许被风控了。"
+            page += 1
+            if "data" not in posts_res:
+                utils.logger.error(
+                    f"[DouYinCrawler.search_by_keyword] search douyin keyword: {keyword} failed，账号也许被风控了。"
+                )
+                break
+            dy_search_id = posts_res.get("extra", {}).get("logid", "")
+            for post_item in posts_res.get("data"):
+                try:
+                    aweme_info: Dict = (
+                        post_item.get("aweme_info")
+                        or post_item.get("aweme_mix_info", {}).get("mix_items")[0]
                     )
-                    break
-                dy_search_id = posts_res.get("extra", {}).get("logid", "")
-                for post_item in posts_res.get("data"):
-                    try:
-                        aweme_info: Dict = (
-                            post_item.get("aweme_info")
-                            or post_item.get("aweme_mix_info", {}).get("mix_items")[0]
-                        )
-                    except TypeError:
-                        continue
-                    aweme_list.append(aweme_info.get("aweme_id", ""))
-                    await douyin_store.update_douyin_aweme(aweme_item=aweme_info)
-            utils.logger.info(
-                f"[DouYinCrawler.search] keyword:{keyword}, aweme_list:{aweme_list}"
-            )
-            await self.batch_get_note_comments(aweme_list)
+                except TypeError:
+                    continue
+                await douyin_store.update_douyin_aweme(aweme_item=aweme_info)
+                # 搜索结果自带互动数，互动数没有变化时跳过评论
+                if crawl_index.is_unchanged("dy", aweme_info.get("aweme_id"), self.get_interact_counts(aweme_info)):
+                    continue
+                aweme_list.append(aweme_info.get("aweme_id", ""))
+                seen_awemes.append(aweme_info)
+        utils.logger.info(
+            f"[DouYinCrawler.search_by_keyword] keyword:{keyword}, aweme_list:{aweme_list}"
+        )
+        await self.batch_get_note_comments(aweme_list)
+        await self.mark_awemes_seen(seen_awemes)
 
     async def get_specified_awemes(self):
         """Get the information and comments of the specified post"""
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("dy")
         task_list = [
             self.get_aweme_detail(aweme_id=aweme_id, semaphore=semaphore)
             for aweme_id in config.DY_SPECIFIED_ID_LIST
         ]
         aweme_details = await asyncio.gather(*task_list)
-        for aweme_detail in aweme_details:
+        need_get_comment_aweme_ids = []
+        for aweme_id, aweme_detail in zip(config.DY_SPECIFIED_ID_LIST, aweme_details):
             if aweme_detail is not None:
                 await douyin_store.update_douyin_aweme(aweme_detail)
-        await self.batch_get_note_comments(config.DY_SPECIFIED_ID_LIST)
+                if crawl_index.is_unchanged("dy", aweme_id, self.get_interact_counts(aweme_detail)):
+                    continue
+            need_get_comment_aweme_ids.append(aweme_id)
+        await self.batch_get_note_comments(need_get_comment_aweme_ids)
+        await self.mark_awemes_seen(aweme_details)
 
     async def get_aweme_detail(
-        self, aweme_id: str, semaphore: asyncio.Semaphore
+        self, aweme_id: str, semaphore: AdaptiveConcurrencyLimiter
     ) -> Any:
         """Get note detail"""
         async with semaphore:
@@ -213,7 +232,7 @@ class DouYinCrawler(AbstractCrawler):
             return
 
         task_list: List[Task] = []
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("dy")
         for aweme_id in aweme_list:
             task = asyncio.create_task(
                 self.get_comments(aweme_id, semaphore), name=aweme_id
@@ -222,17 +241,16 @@ class DouYinCrawler(AbstractCrawler):
         if len(task_list) > 0:
             await asyncio.wait(task_list)
 
-    async def get_comments(self, aweme_id: str, semaphore: asyncio.Semaphore) -> None:
+    async def get_comments(self, aweme_id: str, semaphore: AdaptiveConcurrencyLimiter) -> None:
         async with semaphore:
             try:
-                # 将关键词列表传递给 get_aweme_all_comments 方法
-                await self.dy_client.get_aweme_all_comments(
+                async for comments in self.dy_client.iter_aweme_comments(
                     aweme_id=aweme_id,
                     crawl_interval=random.random(),
                     is_fetch_sub_comments=config.ENABLE_GET_SUB_COMMENTS,
-                    callback=douyin_store.batch_update_dy_aweme_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await douyin_store.batch_update_dy_aweme_comments(aweme_id, comments)
                 utils.logger.info(
                     f"[DouYinCrawler.get_comments] aweme_id: {aweme_id} comments have all been obtained and filtered ..."
                 )
@@ -253,19 +271,24 @@ class DouYinCrawler(AbstractCrawler):
             if creator_info:
                 await douyin_store.save_creator(user_id, creator=creator_info)
 
-            # Get all video information of the creator
-            all_video_list = await self.dy_client.get_all_user_aweme_posts(
-                sec_user_id=user_id, callback=self.fetch_creator_video_detail
-            )
-
-            video_ids = [video_item.get("aweme_id") for video_item in all_video_list]
+            # Get all video information of the creator, page by page
+            video_ids = []
+            seen_videos = []
+            async for video_list in self.dy_client.iter_user_aweme_posts(
+                sec_user_id=user_id,
+                is_seen=lambda video_item: crawl_index.is_seen("dy", video_item.get("aweme_id")),
+            ):
+                await self.fetch_creator_video_detail(video_list)
+                video_ids.extend(video_item.get("aweme_id") for video_item in video_list)
+                seen_videos.extend(video_list)
             await self.batch_get_note_comments(video_ids)
+            await self.mark_awemes_seen(seen_videos)
 
     async def fetch_creator_video_detail(self, video_list: List[Dict]):
         """
         Concurrently obtain the specified post list and save the data
         """
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("dy")
         task_list = [
             self.get_aweme_detail(post_item.get("aweme_id"), semaphore)
             for post_item in video_list
@@ -276,6 +299,24 @@ class DouYinCrawler(AbstractCrawler):
             if aweme_item is not None:
                 await douyin_store.update_douyin_aweme(aweme_item)
 
+    @staticmethod
+    def get_interact_counts(aweme_item: Dict) -> Dict:
+        """作品的互动数，用于增量爬取判断作品是否有变化"""
+        statistics = aweme_item.get("statistics", {})
+        return {
+            "liked_count": statistics.get("digg_count"),
+            "collected_count": statistics.get("collect_count"),
+            "comment_count": statistics.get("comment_count"),
+            "share_count": statistics.get("share_count"),
+        }
+
+    async def mark_awemes_seen(self, aweme_list: List[Optional[Dict]]) -> None:
+        """详情和评论都已保存后，把作品及其互动数记入增量爬取索引"""
+        for aweme_item in aweme_list:
+            if aweme_item:
+                crawl_index.mark_seen("dy", aweme_item.get("aweme_id"), self.get_interact_counts(aweme_item))
+        await crawl_index.flush()
+
     @staticmethod
     def format_proxy_info(
         ip_proxy_info: IpInfoModel,
@@ -377,6 +418,10 @@ class DouYinCrawler(AbstractCrawler):
 
     async def close(self) -> None:
         """Close browser context"""
+        # 关闭共享的 HTTP 连接池
+        await http_pool.close_all()
+        # 关闭常驻的签名进程
+        await signer_pool.close_all()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
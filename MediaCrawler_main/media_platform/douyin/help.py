@@ -17,10 +17,12 @@
 
 import random
 
-import execjs
 from playwright.async_api import Page
 
-douyin_sign_obj = execjs.compile(open('libs/douyin.js', encoding='utf-8-sig').read())
+import config
+from tools.signer_pool import SignerPool
+
+douyin_signer = SignerPool("libs/douyin.js", pool_size=config.SIGN_WORKER_NUM)
 
 def get_web_id():
     """
@@ -48,9 +50,9 @@ async def get_a_bogus(url: str, params: str, post_data: dict, user_agent: str, p
     """
     获取 a_bogus 参数, 目前不支持post请求类型的签名
     """
-    return get_a_bogus_from_js(url, params, user_agent)
+    return await get_a_bogus_from_js(url, params, user_agent)
 
-def get_a_bogus_from_js(url: str, params: str, user_agent: str):
+async def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     """
     通过js获取 a_bogus 参数
     Args:
@@ -64,7 +66,7 @@ def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     sign_js_name = "sign_datail"
     if "/reply" in url:
         sign_js_name = "sign_reply"
-    return douyin_sign_obj.call(sign_js_name, params, user_agent)
+    return await douyin_signer.call(sign_js_name, params, user_agent)
 
 
 
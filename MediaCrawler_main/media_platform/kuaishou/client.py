@@ -10,19 +10,21 @@
 
 
 # -*- coding: utf-8 -*-
-import asyncio
 import json
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from proxy.proxy_rotator import rotate_proxy_on_block
+from tools import http_pool, utils
+from tools.concurrency_limiter import get_concurrency_limiter
+from tools.crawl_pipeline import merge_page_iterators
+from tools.rate_limiter import rate_limited, wait_crawl_interval
 
-from .exception import DataFetchError
+from .exception import DataFetchError, IPBlockError
 from .graphql import KuaiShouGraphQL
 
 
@@ -44,9 +46,13 @@ class KuaiShouClient(AbstractApiClient):
         self.cookie_dict = cookie_dict
         self.graphql = KuaiShouGraphQL()
 
+    @rotate_proxy_on_block(IPBlockError)
+    @rate_limited("ks", IPBlockError)
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        if response.status_code == 429:
+            raise IPBlockError(f"too many requests, response.text: {response.text}")
         data: Dict = response.json()
         if data.get("errors"):
             raise DataFetchError(data.get("errors", "unkonw error"))
@@ -177,91 +183,103 @@ class KuaiShouClient(AbstractApiClient):
         }
         return await self.post("", post_data)
 
-    async def get_video_all_comments(
+    async def iter_video_comments(
         self,
         photo_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ):
+    ) -> AsyncIterator[List[Dict]]:
         """
-        get video all comments include sub comments
+        get video comments include sub comments page by page, yield each page as soon as it arrives
         :param photo_id:
         :param crawl_interval:
-        :param callback:
-        :param max_count:
+        :param max_count: 一次视频爬取的最大一级评论数量
         :return:
         """
 
-        result = []
+        comments_count = 0
+        sub_comments_count = 0
         pcursor = ""
 
-        while pcursor != "no_more" and len(result) < max_count:
+        while pcursor != "no_more" and comments_count < max_count:
             comments_res = await self.get_video_comments(photo_id, pcursor)
             vision_commen_list = comments_res.get("visionCommentList", {})
             pcursor = vision_commen_list.get("pcursor", "")
             comments = vision_commen_list.get("rootComments", [])
-            if len(result) + len(comments) > max_count:
-                comments = comments[: max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(photo_id, comments)
-            result.extend(comments)
-            await asyncio.sleep(crawl_interval)
-            sub_comments = await self.get_comments_all_sub_comments(
-                comments, photo_id, crawl_interval, callback
-            )
-            result.extend(sub_comments)
-        return result
-
-    async def get_comments_all_sub_comments(
+            if comments_count + len(comments) > max_count:
+                comments = comments[: max_count - comments_count]
+            comments_count += len(comments)
+            yield comments
+            await wait_crawl_interval(crawl_interval)
+            async for sub_comments in self.iter_comments_sub_comments(
+                comments, photo_id, crawl_interval,
+                max_count=config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count,
+            ):
+                sub_comments_count += len(sub_comments)
+                yield sub_comments
+
+    async def iter_comments_sub_comments(
         self,
         comments: List[Dict],
         photo_id,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+        max_count: int = 100,
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
+        并发获取多条一级评论下的二级评论，每条一级评论独立翻页，每取到一页产出一页
         Args:
             comments: 评论列表
             photo_id: 视频id
             crawl_interval: 爬取一次评论的延迟单位（秒）
-            callback: 一次评论爬取结束后
+            max_count: 本批一级评论下最多获取的二级评论数量
         Returns:
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
             utils.logger.info(
-                f"[KuaiShouClient.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled"
+                f"[KuaiShouClient.iter_comments_sub_comments] Crawling sub_comment mode is not enabled"
             )
-            return []
-
-        result = []
-        for comment in comments:
-            sub_comments = comment.get("subComments")
-            if sub_comments and callback:
-                await callback(photo_id, sub_comments)
-
-            sub_comment_pcursor = comment.get("subCommentsPcursor")
-            if sub_comment_pcursor == "no_more":
-                continue
-
-            root_comment_id = comment.get("commentId")
-            sub_comment_pcursor = ""
+            return
+
+        threads = [
+            self.iter_sub_comment_thread(comment, photo_id, crawl_interval)
+            for comment in comments
+            if comment.get("subComments") or comment.get("subCommentsPcursor") != "no_more"
+        ]
+        async for sub_comments in merge_page_iterators(threads, max_count=max_count,
+                                                      limiter=get_concurrency_limiter("ks")):
+            yield sub_comments
+
+    async def iter_sub_comment_thread(
+        self,
+        comment: Dict,
+        photo_id,
+        crawl_interval: float = 1.0,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取一条一级评论下的二级评论，先产出评论自带的二级评论，再从该评论的游标继续翻页
+        Args:
+            comment: 一级评论
+            photo_id: 视频id
+            crawl_interval: 爬取一次评论的延迟单位（秒）
+        Returns:
 
-            while sub_comment_pcursor != "no_more":
-                comments_res = await self.get_video_sub_comments(
-                    photo_id, root_comment_id, sub_comment_pcursor
-                )
-                vision_sub_comment_list = comments_res.get("visionSubCommentList", {})
-                sub_comment_pcursor = vision_sub_comment_list.get("pcursor", "no_more")
+        """
+        sub_comments = comment.get("subComments")
+        if sub_comments:
+            yield sub_comments
+
+        root_comment_id = comment.get("commentId")
+        sub_comment_pcursor = comment.get("subCommentsPcursor") or ""
+        while sub_comment_pcursor != "no_more":
+            comments_res = await self.get_video_sub_comments(
+                photo_id, root_comment_id, sub_comment_pcursor
+            )
+            vision_sub_comment_list = comments_res.get("visionSubCommentList", {})
+            sub_comment_pcursor = vision_sub_comment_list.get("pcursor", "no_more")
 
-                comments = vision_sub_comment_list.get("subComments", {})
-                if callback:
-                    await callback(photo_id, comments)
-                await asyncio.sleep(crawl_interval)
-                result.extend(comments)
-        return result
+            yield vision_sub_comment_list.get("subComments", [])
+            await wait_crawl_interval(crawl_interval)
 
     async def get_creator_info(self, user_id: str) -> Dict:
         """
@@ -272,29 +290,28 @@ class KuaiShouClient(AbstractApiClient):
         visionProfile = await self.get_creator_profile(user_id)
         return visionProfile.get("userProfile")
 
-    async def get_all_videos_by_creator(
+    async def iter_videos_by_creator(
         self,
         user_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+        is_seen: Optional[Callable[[Dict], bool]] = None,
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        逐页获取指定用户下发过的帖子，每取到一页产出一页
         Args:
             user_id: 用户ID
             crawl_interval: 爬取一次的延迟单位（秒）
-            callback: 一次分页爬取结束后的更新回调函数
+            is_seen: 判断视频是否已经爬取过，遇到已爬取过的视频时停止翻页，用于增量爬取
         Returns:
 
         """
-        result = []
         pcursor = ""
 
         while pcursor != "no_more":
             videos_res = await self.get_video_by_creater(user_id, pcursor)
             if not videos_res:
                 utils.logger.error(
-                    f"[KuaiShouClient.get_all_videos_by_creator] The current creator may have been banned by ks, so they cannot access the data."
+                    f"[KuaiShouClient.iter_videos_by_creator] The current creator may have been banned by ks, so they cannot access the data."
                 )
                 break
 
@@ -303,11 +320,13 @@ class KuaiShouClient(AbstractApiClient):
 
             videos = vision_profile_photo_list.get("feeds", [])
             utils.logger.info(
-                f"[KuaiShouClient.get_all_videos_by_creator] got user_id:{user_id} videos len : {len(videos)}"
+                f"[KuaiShouClient.iter_videos_by_creator] got user_id:{user_id} videos len : {len(videos)}"
             )
 
-            if callback:
-                await callback(videos)
-            await asyncio.sleep(crawl_interval)
-            result.extend(videos)
-        return result
+            if is_seen:
+                videos, has_more = utils.drop_seen_items(videos, is_seen, pcursor != "no_more")
+                if not has_more:
+                    pcursor = "no_more"
+            if videos:
+                yield videos
+            await wait_crawl_interval(crawl_interval)
@@ -14,7 +14,7 @@ import os
 import random
 import time
 from asyncio import Task
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from playwright.async_api import (
     BrowserContext,
@@ -27,10 +27,14 @@ from playwright.async_api import (
 import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator
 from store import kuaishou as kuaishou_store
-from tools import utils
+from store.crawl_index import crawl_index
+from tools import http_pool, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from tools.crawl_pipeline import run_pipeline
 from tools.cdp_browser import CDPBrowserManager
-from var import comment_tasks_var, crawler_type_var, source_keyword_var
+from var import comment_tasks_var, crawler_type_var
 
 from .client import KuaiShouClient
 from .exception import DataFetchError
@@ -49,12 +53,14 @@ class KuaishouCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self):
-        playwright_proxy_format, httpx_proxy_format = None, None
+        playwright_proxy_format, httpx_proxy_format, proxy_rotator = None, None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            # IP 被封禁时由 proxy_rotator 为 API 客户端自动更换代理
+            proxy_rotator = ProxyRotator(ip_proxy_pool, max_rotations=config.IP_PROXY_MAX_ROTATIONS)
+            ip_proxy_info: IpInfoModel = await proxy_rotator.lease()
             playwright_proxy_format, httpx_proxy_format = self.format_proxy_info(
                 ip_proxy_info
             )
@@ -83,6 +89,7 @@ class KuaishouCrawler(AbstractCrawler):
 
             # Create a client to interact with the kuaishou website.
             self.ks_client = await self.create_ks_client(httpx_proxy_format)
+            self.ks_client.proxy_rotator = proxy_rotator
             if not await self.ks_client.pong():
                 login_obj = KuaishouLogin(
                     login_type=config.LOGIN_TYPE,
@@ -117,65 +124,93 @@ class KuaishouCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < ks_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = ks_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
-            search_session_id = ""
-            source_keyword_var.set(keyword)
+        await self.run_keyword_searches(self.search_by_keyword, ks_limit_count, start_page)
+
+    async def search_by_keyword(self, keyword: str, ks_limit_count: int, start_page: int) -> None:
+        """
+        Search videos of one keyword and retrieve their comment information.
+        搜索翻页 -> 保存 -> 评论 按流水线执行，第 N 页获取评论时已在请求第 N+1 页
+        """
+        utils.logger.info(
+            f"[KuaishouCrawler.search_by_keyword] Current search keyword: {keyword}"
+        )
+        await run_pipeline(
+            self.iter_search_pages(keyword, ks_limit_count, start_page),
+            [self.store_search_videos, self.fetch_search_videos_comments],
+            queue_size=config.SEARCH_PIPELINE_QUEUE_SIZE,
+        )
+
+    async def iter_search_pages(self, keyword: str, ks_limit_count: int, start_page: int) -> AsyncIterator[List[Dict]]:
+        """搜索流水线的第一阶段：逐页搜索，产出每页的视频列表"""
+        search_session_id = ""
+        page = 1
+        while (
+            page - start_page + 1
+        ) * ks_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[KuaishouCrawler.iter_search_pages] Skip page: {page}")
+                page += 1
+                continue
             utils.logger.info(
-                f"[KuaishouCrawler.search] Current search keyword: {keyword}"
+                f"[KuaishouCrawler.iter_search_pages] search kuaishou keyword: {keyword}, page: {page}"
             )
-            page = 1
-            while (
-                page - start_page + 1
-            ) * ks_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[KuaishouCrawler.search] Skip page: {page}")
-                    page += 1
-                    continue
-                utils.logger.info(
-                    f"[KuaishouCrawler.search] search kuaishou keyword: {keyword}, page: {page}"
-                )
-                video_id_list: List[str] = []
-                videos_res = await self.ks_client.search_info_by_keyword(
-                    keyword=keyword,
-                    pcursor=str(page),
-                    search_session_id=search_session_id,
+            videos_res = await self.ks_client.search_info_by_keyword(
+                keyword=keyword,
+                pcursor=str(page),
+                search_session_id=search_session_id,
+            )
+            if not videos_res:
+                utils.logger.error(
+                    f"[KuaishouCrawler.iter_search_pages] search info by keyword:{keyword} not found data"
                 )
-                if not videos_res:
-                    utils.logger.error(
-                        f"[KuaishouCrawler.search] search info by keyword:{keyword} not found data"
-                    )
-                    continue
+                continue
 
-                vision_search_photo: Dict = videos_res.get("visionSearchPhoto")
-                if vision_search_photo.get("result") != 1:
-                    utils.logger.error(
-                        f"[KuaishouCrawler.search] search info by keyword:{keyword} not found data "
-                    )
-                    continue
-                search_session_id = vision_search_photo.get("searchSessionId", "")
-                for video_detail in vision_search_photo.get("feeds"):
-                    video_id_list.append(video_detail.get("photo", {}).get("id"))
-                    await kuaishou_store.update_kuaishou_video(video_item=video_detail)
-
-                # batch fetch video comments
-                page += 1
-                await self.batch_get_video_comments(video_id_list)
+            vision_search_photo: Dict = videos_res.get("visionSearchPhoto")
+            if vision_search_photo.get("result") != 1:
+                utils.logger.error(
+                    f"[KuaishouCrawler.iter_search_pages] search info by keyword:{keyword} not found data "
+                )
+                continue
+            search_session_id = vision_search_photo.get("searchSessionId", "")
+            page += 1
+            yield vision_search_photo.get("feeds")
+
+    async def store_search_videos(self, video_list: List[Dict]) -> List[Dict]:
+        """搜索流水线的保存阶段：保存一页视频，返回互动数有变化、需要获取评论的视频"""
+        changed_videos: List[Dict] = []
+        for video_detail in video_list:
+            await kuaishou_store.update_kuaishou_video(video_item=video_detail)
+            if not crawl_index.is_unchanged(
+                "ks", video_detail.get("photo", {}).get("id"), self.get_interact_counts(video_detail)
+            ):
+                changed_videos.append(video_detail)
+        return changed_videos
+
+    async def fetch_search_videos_comments(self, video_list: List[Dict]) -> None:
+        """搜索流水线的评论阶段：获取一页视频的评论，完成后记入增量爬取索引"""
+        await self.batch_get_video_comments([video_item.get("photo", {}).get("id") for video_item in video_list])
+        await self.mark_videos_seen(video_list)
 
     async def get_specified_videos(self):
         """Get the information and comments of the specified post"""
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("ks")
         task_list = [
             self.get_video_info_task(video_id=video_id, semaphore=semaphore)
             for video_id in config.KS_SPECIFIED_ID_LIST
         ]
         video_details = await asyncio.gather(*task_list)
-        for video_detail in video_details:
+        need_get_comment_video_ids = []
+        for video_id, video_detail in zip(config.KS_SPECIFIED_ID_LIST, video_details):
             if video_detail is not None:
                 await kuaishou_store.update_kuaishou_video(video_detail)
-        await self.batch_get_video_comments(config.KS_SPECIFIED_ID_LIST)
+                if crawl_index.is_unchanged("ks", video_id, self.get_interact_counts(video_detail)):
+                    continue
+            need_get_comment_video_ids.append(video_id)
+        await self.batch_get_video_comments(need_get_comment_video_ids)
+        await self.mark_videos_seen(video_details)
 
     async def get_video_info_task(
-        self, video_id: str, semaphore: asyncio.Semaphore
+        self, video_id: str, semaphore: AdaptiveConcurrencyLimiter
     ) -> Optional[Dict]:
         """Get video detail task"""
         async with semaphore:
@@ -211,7 +246,7 @@ class KuaishouCrawler(AbstractCrawler):
         utils.logger.info(
             f"[KuaishouCrawler.batch_get_video_comments] video ids:{video_id_list}"
         )
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("ks")
         task_list: List[Task] = []
         for video_id in video_id_list:
             task = asyncio.create_task(
@@ -222,7 +257,7 @@ class KuaishouCrawler(AbstractCrawler):
         comment_tasks_var.set(task_list)
         await asyncio.gather(*task_list)
 
-    async def get_comments(self, video_id: str, semaphore: asyncio.Semaphore):
+    async def get_comments(self, video_id: str, semaphore: AdaptiveConcurrencyLimiter):
         """
         get comment for video id
         :param video_id:
@@ -234,12 +269,12 @@ class KuaishouCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[KuaishouCrawler.get_comments] begin get video_id: {video_id} comments ..."
                 )
-                await self.ks_client.get_video_all_comments(
+                async for comments in self.ks_client.iter_video_comments(
                     photo_id=video_id,
                     crawl_interval=random.random(),
-                    callback=kuaishou_store.batch_update_ks_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await kuaishou_store.batch_update_ks_video_comments(video_id, comments)
             except DataFetchError as ex:
                 utils.logger.error(
                     f"[KuaishouCrawler.get_comments] get video_id: {video_id} comment error: {ex}"
@@ -259,6 +294,21 @@ class KuaishouCrawler(AbstractCrawler):
                     browser_context=self.browser_context
                 )
 
+    @staticmethod
+    def get_interact_counts(video_item: Dict) -> Dict:
+        """
+        视频的互动数，用于增量爬取判断视频是否有变化
+        播放数几乎每次都会变化，不参与比较
+        """
+        return {"liked_count": video_item.get("photo", {}).get("realLikeCount")}
+
+    async def mark_videos_seen(self, video_list: List[Optional[Dict]]) -> None:
+        """详情和评论都已保存后，把视频及其互动数记入增量爬取索引"""
+        for video_item in video_list:
+            if video_item:
+                crawl_index.mark_seen("ks", video_item.get("photo", {}).get("id"), self.get_interact_counts(video_item))
+        await crawl_index.flush()
+
     @staticmethod
     def format_proxy_info(
         ip_proxy_info: IpInfoModel,
@@ -373,23 +423,25 @@ class KuaishouCrawler(AbstractCrawler):
             if createor_info:
                 await kuaishou_store.save_creator(user_id, creator=createor_info)
 
-            # Get all video information of the creator
-            all_video_list = await self.ks_client.get_all_videos_by_creator(
+            # Get all video information of the creator, page by page
+            video_ids = []
+            seen_videos = []
+            async for video_list in self.ks_client.iter_videos_by_creator(
                 user_id=user_id,
                 crawl_interval=random.random(),
-                callback=self.fetch_creator_video_detail,
-            )
-
-            video_ids = [
-                video_item.get("photo", {}).get("id") for video_item in all_video_list
-            ]
+                is_seen=lambda video_item: crawl_index.is_seen("ks", video_item.get("photo", {}).get("id")),
+            ):
+                await self.fetch_creator_video_detail(video_list)
+                video_ids.extend(video_item.get("photo", {}).get("id") for video_item in video_list)
+                seen_videos.extend(video_list)
             await self.batch_get_video_comments(video_ids)
+            await self.mark_videos_seen(seen_videos)
 
     async def fetch_creator_video_detail(self, video_list: List[Dict]):
         """
         Concurrently obtain the specified post list and save the data
         """
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("ks")
         task_list = [
             self.get_video_info_task(post_item.get("photo", {}).get("id"), semaphore)
             for post_item in video_list
@@ -402,6 +454,8 @@ class KuaishouCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭共享的 HTTP 连接池
+        await http_pool.close_all()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
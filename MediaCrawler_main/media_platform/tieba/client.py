@@ -11,21 +11,27 @@
 
 import asyncio
 import json
-from typing import Any, Callable, Dict, List, Optional, Union
+import math
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext
 from tenacity import RetryError, retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
-from proxy.proxy_ip_pool import ProxyIpPool
-from tools import utils
-
+from proxy.proxy_ip_pool import IpInfoModel, ProxyIpPool
+from tools import http_pool, utils
+from tools.concurrency_limiter import get_concurrency_limiter
+from tools.crawl_pipeline import merge_page_iterators
+from tools.extraction_executor import run_extraction
+from tools.rate_limiter import rate_limited, wait_crawl_interval
+
+from .exception import IPBlockError
 from .field import SearchNoteType, SearchSortType
-from .help import TieBaExtractor
+from .help import TieBaExtractor, create_tieba_extractor
 
 
 class BaiduTieBaClient(AbstractApiClient):
@@ -34,18 +40,25 @@ class BaiduTieBaClient(AbstractApiClient):
             timeout=10,
             ip_pool=None,
             default_ip_proxy=None,
+            default_ip_proxy_info=None,
     ):
         self.ip_pool: Optional[ProxyIpPool] = ip_pool
+        self.ip_proxy_info: Optional[IpInfoModel] = default_ip_proxy_info
         self.timeout = timeout
         self.headers = {
             "User-Agent": utils.get_user_agent(),
             "Cookies": "",
         }
         self._host = "https://tieba.baidu.com"
-        self._page_extractor = TieBaExtractor()
+        self._page_extractor: TieBaExtractor = create_tieba_extractor()
         self.default_ip_proxy = default_ip_proxy
 
+    @property
+    def proxies(self):
+        return self.default_ip_proxy
+
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    @rate_limited("tieba", IPBlockError)
     async def request(self, method, url, return_ori_content=False, proxies=None, **kwargs) -> Union[str, Any]:
         """
         封装httpx的公共请求方法，对请求响应做一些处理
@@ -60,11 +73,14 @@ class BaiduTieBaClient(AbstractApiClient):
 
         """
         actual_proxies = proxies if proxies else self.default_ip_proxy
-        async with httpx.AsyncClient(proxies=actual_proxies) as client:
-            response = await client.request(
-                method, url, timeout=self.timeout,
-                headers=self.headers, **kwargs
-            )
+        client = http_pool.get_client(actual_proxies)
+        response = await client.request(
+            method, url, timeout=self.timeout,
+            headers=self.headers, **kwargs
+        )
+
+        if response.status_code in (403, 429):
+            raise IPBlockError(f"request blocked, status_code: {response.status_code}")
 
         if response.status_code != 200:
             utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
@@ -73,7 +89,7 @@ class BaiduTieBaClient(AbstractApiClient):
 
         if response.text == "" or response.text == "blocked":
             utils.logger.error(f"request params incrr, response.text: {response.text}")
-            raise Exception("account blocked")
+            raise IPBlockError("account blocked")
 
         if return_ori_content:
             return response.text
@@ -102,13 +118,23 @@ class BaiduTieBaClient(AbstractApiClient):
             return res
         except RetryError as e:
             if self.ip_pool:
-                proxie_model = await self.ip_pool.get_proxy()
+                # 当前 IP 计入失败，按健康分数换一个 IP
+                if self.ip_proxy_info:
+                    self.ip_pool.mark_failed(self.ip_proxy_info)
+                proxie_model = await self.ip_pool.get_proxy(exclude=self.ip_proxy_info)
                 _, proxies = utils.format_proxy_info(proxie_model)
-                res = await self.request(method="GET", url=f"{self._host}{final_uri}",
-                                         return_ori_content=return_ori_content,
-                                         proxies=proxies,
-                                         **kwargs)
+                start = time.monotonic()
+                try:
+                    res = await self.request(method="GET", url=f"{self._host}{final_uri}",
+                                             return_ori_content=return_ori_content,
+                                             proxies=proxies,
+                                             **kwargs)
+                except RetryError:
+                    self.ip_pool.mark_failed(proxie_model)
+                    raise
+                self.ip_pool.mark_success(proxie_model, time.monotonic() - start)
                 self.default_ip_proxy = proxies
+                self.ip_proxy_info = proxie_model
                 return res
 
             utils.logger.error(f"[BaiduTieBaClient.get] 达到了最大重试次数，IP已经被Block，请尝试更换新的IP代理: {e}")
@@ -188,7 +214,7 @@ class BaiduTieBaClient(AbstractApiClient):
             "only_thread": note_type.value
         }
         page_content = await self.get(uri, params=params, return_ori_content=True)
-        return self._page_extractor.extract_search_note_list(page_content)
+        return await run_extraction(self._page_extractor.extract_search_note_list, page_content)
 
     async def get_note_by_id(self, note_id: str) -> TiebaNote:
         """
@@ -201,91 +227,151 @@ class BaiduTieBaClient(AbstractApiClient):
         """
         uri = f"/p/{note_id}"
         page_content = await self.get(uri, return_ori_content=True)
-        return self._page_extractor.extract_note_detail(page_content)
+        return await run_extraction(self._page_extractor.extract_note_detail, page_content)
+
+    async def get_note_comment_page(self, note_id: str, page: int) -> Tuple[List[TiebaComment], int]:
+        """
+        获取帖子某一页的一级评论
+        Args:
+            note_id: 帖子ID
+            page: 页码
+
+        Returns:
+            该页的一级评论，以及该页上显示的帖子回复总页数(页面中没有时为 0)
 
-    async def get_note_all_comments(self, note_detail: TiebaNote, crawl_interval: float = 1.0,
-                                    callback: Optional[Callable] = None,
-                                    max_count: int = 10,
-                                    ) -> List[TiebaComment]:
         """
-        获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        page_content = await self.get(f"/p/{note_id}", params={"pn": page}, return_ori_content=True)
+        return await run_extraction(self._page_extractor.extract_tieba_note_comment_page, page_content,
+                                    note_id=note_id)
+
+    async def iter_note_comments(self, note_detail: TiebaNote, crawl_interval: float = 1.0,
+                                 max_count: int = 10,
+                                 ) -> AsyncIterator[List[TiebaComment]]:
+        """
+        逐页获取指定帖子下的一级评论(开启二级评论时紧跟其后的是二级评论)，每取到一页产出一页
+        帖子总页数已知时按 TIEBA_COMMENT_PAGE_CONCURRENCY 的窗口并发拉取，再按页码(楼层)顺序产出；
+        爬取过程中总页数变化时以最新页面上的页数为准，拉取到空页或超过总页数时结束；页数未知时逐页拉取直到没有新的评论
         Args:
             note_detail: 帖子详情对象
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
-            max_count: 一次帖子爬取的最大评论数量
+            max_count: 一次帖子爬取的最大一级评论数量
         Returns:
 
         """
-        uri = f"/p/{note_detail.note_id}"
-        result: List[TiebaComment] = []
+        comments_count = 0
+        sub_comments_count = 0
+        total_page = note_detail.total_replay_page
+        # 每页的楼层数，用于估算达到 max_count 还需要多少页，避免多拉取用不上的页
+        page_size = 0
+        # 爬取过程中有新回复或删帖时楼层会在页之间移动，按评论ID去重
+        seen_comment_ids = set()
         current_page = 1
-        while note_detail.total_replay_page >= current_page and len(result) < max_count:
-            params = {
-                "pn": current_page
-            }
-            page_content = await self.get(uri, params=params, return_ori_content=True)
-            comments = self._page_extractor.extract_tieba_note_parment_comments(page_content,
-                                                                                note_id=note_detail.note_id)
-            if not comments:
+        while comments_count < max_count and not (total_page and current_page > total_page):
+            window = 1
+            if total_page and page_size:
+                window = min(config.TIEBA_COMMENT_PAGE_CONCURRENCY,
+                             total_page - current_page + 1,
+                             math.ceil((max_count - comments_count) / page_size))
+            page_list = list(range(current_page, current_page + max(1, window)))
+            page_results = await asyncio.gather(
+                *[self.get_note_comment_page(note_detail.note_id, page) for page in page_list])
+            current_page = page_list[-1] + 1
+
+            is_end = False
+            for page, (comments, page_total) in zip(page_list, page_results):
+                if page_total and page_total != total_page:
+                    utils.logger.info(
+                        f"[BaiduTieBaClient.iter_note_comments] note {note_detail.note_id} total page changed "
+                        f"from {total_page} to {page_total} at page {page}")
+                    total_page = page_total
+                if not comments:
+                    is_end = True
+                    break
+                comments = [comment for comment in comments if comment.comment_id not in seen_comment_ids]
+                if not comments:
+                    # 有新回复时前一页的楼层会挤到这一页，整页都已产出过时继续下一页；
+                    # 页数未知时贴吧对超出范围的页码返回最后一页，整页重复说明已经到底
+                    if not total_page:
+                        is_end = True
+                        break
+                    continue
+                page_size = max(page_size, len(comments))
+                seen_comment_ids.update(comment.comment_id for comment in comments)
+                if comments_count + len(comments) > max_count:
+                    comments = comments[:max_count - comments_count]
+                comments_count += len(comments)
+                yield comments
+                # 获取所有子评论
+                async for sub_comments in self.iter_comments_sub_comments(
+                        comments, crawl_interval=crawl_interval,
+                        max_count=config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count):
+                    sub_comments_count += len(sub_comments)
+                    yield sub_comments
+                if comments_count >= max_count:
+                    break
+            if is_end:
                 break
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            if callback:
-                await callback(note_detail.note_id, comments)
-            result.extend(comments)
-            # 获取所有子评论
-            await self.get_comments_all_sub_comments(comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
-            current_page += 1
-        return result
+            await wait_crawl_interval(crawl_interval)
 
-    async def get_comments_all_sub_comments(self, comments: List[TiebaComment], crawl_interval: float = 1.0,
-                                            callback: Optional[Callable] = None) -> List[TiebaComment]:
+    async def iter_comments_sub_comments(self, comments: List[TiebaComment],
+                                         crawl_interval: float = 1.0,
+                                         max_count: int = 100) -> AsyncIterator[List[TiebaComment]]:
         """
-        获取指定评论下的所有子评论
+        并发获取多条评论下的子评论，每条评论独立翻页，每取到一页产出一页
         Args:
             comments: 评论列表
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
+            max_count: 本批评论下最多获取的子评论数量
 
         Returns:
 
         """
-        uri = "/p/comment"
         if not config.ENABLE_GET_SUB_COMMENTS:
-            return []
+            return
 
         # # 贴吧获取所有子评论需要登录态
         # if self.headers.get("Cookies") == "" or not self.pong():
         #     raise Exception(f"[BaiduTieBaClient.pong] Cookies is empty, please login first...")
 
-        all_sub_comments: List[TiebaComment] = []
-        for parment_comment in comments:
-            if parment_comment.sub_comment_count == 0:
-                continue
-
-            current_page = 1
-            max_sub_page_num = parment_comment.sub_comment_count // 10 + 1
-            while max_sub_page_num >= current_page:
-                params = {
-                    "tid": parment_comment.note_id,  # 帖子ID
-                    "pid": parment_comment.comment_id,  # 父级评论ID
-                    "fid": parment_comment.tieba_id,  # 贴吧ID
-                    "pn": current_page  # 页码
-                }
-                page_content = await self.get(uri, params=params, return_ori_content=True)
-                sub_comments = self._page_extractor.extract_tieba_note_sub_comments(page_content,
-                                                                                    parent_comment=parment_comment)
-
-                if not sub_comments:
-                    break
-                if callback:
-                    await callback(parment_comment.note_id, sub_comments)
-                all_sub_comments.extend(sub_comments)
-                await asyncio.sleep(crawl_interval)
-                current_page += 1
-        return all_sub_comments
+        threads = [
+            self.iter_sub_comment_thread(parment_comment, crawl_interval)
+            for parment_comment in comments
+            if parment_comment.sub_comment_count > 0
+        ]
+        async for sub_comments in merge_page_iterators(threads, max_count=max_count,
+                                                      limiter=get_concurrency_limiter("tieba")):
+            yield sub_comments
+
+    async def iter_sub_comment_thread(self, parment_comment: TiebaComment,
+                                      crawl_interval: float = 1.0) -> AsyncIterator[List[TiebaComment]]:
+        """
+        逐页获取一条评论下的子评论
+        Args:
+            parment_comment: 父级评论
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+
+        Returns:
+
+        """
+        uri = "/p/comment"
+        current_page = 1
+        max_sub_page_num = parment_comment.sub_comment_count // 10 + 1
+        while max_sub_page_num >= current_page:
+            params = {
+                "tid": parment_comment.note_id,  # 帖子ID
+                "pid": parment_comment.comment_id,  # 父级评论ID
+                "fid": parment_comment.tieba_id,  # 贴吧ID
+                "pn": current_page  # 页码
+            }
+            page_content = await self.get(uri, params=params, return_ori_content=True)
+            sub_comments = await run_extraction(self._page_extractor.extract_tieba_note_sub_comments, page_content,
+                                                parent_comment=parment_comment)
+
+            if not sub_comments:
+                break
+            yield sub_comments
+            await wait_crawl_interval(crawl_interval)
+            current_page += 1
 
     async def get_notes_by_tieba_name(self, tieba_name: str, page_num: int) -> List[TiebaNote]:
         """
@@ -299,7 +385,7 @@ class BaiduTieBaClient(AbstractApiClient):
         """
         uri = f"/f?kw={tieba_name}&pn={page_num}"
         page_content = await self.get(uri, return_ori_content=True)
-        return self._page_extractor.extract_tieba_note_list(page_content)
+        return await run_extraction(self._page_extractor.extract_tieba_note_list, page_content)
 
     async def get_creator_info_by_url(self, creator_url: str) -> str:
         """
@@ -332,45 +418,46 @@ class BaiduTieBaClient(AbstractApiClient):
         }
         return await self.get(uri, params=params)
 
-    async def get_all_notes_by_creator_user_name(self,
-                                                 user_name: str, crawl_interval: float = 1.0,
-                                                 callback: Optional[Callable] = None,
-                                                 max_note_count: int = 0,
-                                                 creator_page_html_content: str = None,
-                                                 ) -> List[TiebaNote]:
+    async def iter_notes_by_creator_user_name(self,
+                                              user_name: str, crawl_interval: float = 1.0,
+                                              max_note_count: int = 0,
+                                              creator_page_html_content: str = None,
+                                              is_seen: Optional[Callable[[str], bool]] = None,
+                                              ) -> AsyncIterator[List[TiebaNote]]:
 
         """
-        根据创作者用户名获取创作者所有帖子
+        根据创作者用户名逐页获取创作者的帖子详情，每取到一页产出一页
         Args:
             user_name: 创作者用户名
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后的回调函数，是一个awaitable类型的函数
             max_note_count: 帖子最大获取数量，如果为0则获取所有
             creator_page_html_content: 创作者主页HTML内容
+            is_seen: 根据帖子ID判断帖子是否已经爬取过，遇到已爬取过的帖子时停止翻页，不再请求之后的帖子详情，用于增量爬取
 
         Returns:
 
         """
+        notes_has_more = 1
         # 百度贴吧比较特殊一些，前10个帖子是直接展示在主页上的，要单独处理，通过API获取不到
-        result: List[TiebaNote] = []
         if creator_page_html_content:
             thread_id_list = (
-                self._page_extractor.extract_tieba_thread_id_list_from_creator_page(
-                    creator_page_html_content
+                await run_extraction(
+                    self._page_extractor.extract_tieba_thread_id_list_from_creator_page,
+                    creator_page_html_content,
                 )
             )
             utils.logger.info(
-                f"[BaiduTieBaClient.get_all_notes_by_creator] got user_name:{user_name} thread_id_list len : {len(thread_id_list)}"
+                f"[BaiduTieBaClient.iter_notes_by_creator_user_name] got user_name:{user_name} thread_id_list len : {len(thread_id_list)}"
             )
-            note_detail_task = [
-                self.get_note_by_id(thread_id) for thread_id in thread_id_list
-            ]
-            notes = await asyncio.gather(*note_detail_task)
-            if callback:
-                await callback(notes)
-            result.extend(notes)
+            if is_seen:
+                thread_id_list, has_more = utils.drop_seen_items(thread_id_list, is_seen, True)
+                notes_has_more = 1 if has_more else 0
+            if thread_id_list:
+                note_detail_task = [
+                    self.get_note_by_id(thread_id) for thread_id in thread_id_list
+                ]
+                yield await asyncio.gather(*note_detail_task)
 
-        notes_has_more = 1
         page_number = 1
         page_per_count = 20
         total_get_count = 0
@@ -384,14 +471,15 @@ class BaiduTieBaClient(AbstractApiClient):
             notes_has_more = notes_data.get("has_more")
             notes = notes_data["thread_list"]
             utils.logger.info(
-                f"[WeiboClient.get_all_notes_by_creator] got user_name:{user_name} notes len : {len(notes)}")
-
-            note_detail_task = [self.get_note_by_id(note['thread_id']) for note in notes]
-            notes = await asyncio.gather(*note_detail_task)
-            if callback:
-                await callback(notes)
-            await asyncio.sleep(crawl_interval)
-            result.extend(notes)
+                f"[BaiduTieBaClient.iter_notes_by_creator_user_name] got user_name:{user_name} notes len : {len(notes)}")
+
+            thread_id_list = [str(note['thread_id']) for note in notes]
+            if is_seen:
+                thread_id_list, has_more = utils.drop_seen_items(thread_id_list, is_seen, notes_has_more == 1)
+                notes_has_more = 1 if has_more else 0
+            if thread_id_list:
+                note_detail_task = [self.get_note_by_id(thread_id) for thread_id in thread_id_list]
+                yield await asyncio.gather(*note_detail_task)
+            await wait_crawl_interval(crawl_interval)
             page_number += 1
             total_get_count += page_per_count
-        return result
@@ -28,14 +28,17 @@ from base.base_crawler import AbstractCrawler
 from model.m_baidu_tieba import TiebaCreator, TiebaNote
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import tieba as tieba_store
-from tools import utils
+from store.crawl_index import crawl_index
+from tools import http_pool, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
 from tools.cdp_browser import CDPBrowserManager
 from tools.crawler_util import format_proxy_info
-from var import crawler_type_var, source_keyword_var
+from tools.extraction_executor import run_extraction
+from var import crawler_type_var
 
 from .client import BaiduTieBaClient
 from .field import SearchNoteType, SearchSortType
-from .help import TieBaExtractor
+from .help import TieBaExtractor, create_tieba_extractor
 from .login import BaiduTieBaLogin
 
 
@@ -48,7 +51,7 @@ class TieBaCrawler(AbstractCrawler):
     def __init__(self) -> None:
         self.index_url = "https://tieba.baidu.com"
         self.user_agent = utils.get_user_agent()
-        self._page_extractor = TieBaExtractor()
+        self._page_extractor: TieBaExtractor = create_tieba_extractor()
         self.cdp_manager = None
 
     async def start(self) -> None:
@@ -57,7 +60,7 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
-        ip_proxy_pool, httpx_proxy_format = None, None
+        ip_proxy_pool, httpx_proxy_format, ip_proxy_info = None, None, None
         if config.ENABLE_IP_PROXY:
             utils.logger.info(
                 "[BaiduTieBaCrawler.start] Begin create ip proxy pool ..."
@@ -75,6 +78,7 @@ class TieBaCrawler(AbstractCrawler):
         self.tieba_client = BaiduTieBaClient(
             ip_pool=ip_proxy_pool,
             default_ip_proxy=httpx_proxy_format,
+            default_ip_proxy_info=ip_proxy_info,
         )
         crawler_type_var.set(config.CRAWLER_TYPE)
         if config.CRAWLER_TYPE == "search":
@@ -105,49 +109,60 @@ class TieBaCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < tieba_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = tieba_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
-            utils.logger.info(
-                f"[BaiduTieBaCrawler.search] Current search keyword: {keyword}"
-            )
-            page = 1
-            while (
-                page - start_page + 1
-            ) * tieba_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[BaiduTieBaCrawler.search] Skip page {page}")
-                    page += 1
-                    continue
-                try:
-                    utils.logger.info(
-                        f"[BaiduTieBaCrawler.search] search tieba keyword: {keyword}, page: {page}"
-                    )
-                    notes_list: List[TiebaNote] = (
-                        await self.tieba_client.get_notes_by_keyword(
-                            keyword=keyword,
-                            page=page,
-                            page_size=tieba_limit_count,
-                            sort=SearchSortType.TIME_DESC,
-                            note_type=SearchNoteType.FIXED_THREAD,
-                        )
+        await self.run_keyword_searches(self.search_by_keyword, tieba_limit_count, start_page)
+
+    async def search_by_keyword(self, keyword: str, tieba_limit_count: int, start_page: int) -> None:
+        """
+        Search notes of one keyword and retrieve their comment information.
+        Args:
+            keyword: search keyword
+            tieba_limit_count: page size
+            start_page: start page number
+
+        Returns:
+
+        """
+        utils.logger.info(
+            f"[BaiduTieBaCrawler.search_by_keyword] Current search keyword: {keyword}"
+        )
+        page = 1
+        while (
+            page - start_page + 1
+        ) * tieba_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[BaiduTieBaCrawler.search_by_keyword] Skip page {page}")
+                page += 1
+                continue
+            try:
+                utils.logger.info(
+                    f"[BaiduTieBaCrawler.search_by_keyword] search tieba keyword: {keyword}, page: {page}"
+                )
+                notes_list: List[TiebaNote] = (
+                    await self.tieba_client.get_notes_by_keyword(
+                        keyword=keyword,
+                        page=page,
+                        page_size=tieba_limit_count,
+                        sort=SearchSortType.TIME_DESC,
+                        note_type=SearchNoteType.FIXED_THREAD,
                     )
-                    if not notes_list:
-                        utils.logger.info(
-                            f"[BaiduTieBaCrawler.search] Search note list is empty"
-                        )
-                        break
+                )
+                if not notes_list:
                     utils.logger.info(
-                        f"[BaiduTieBaCrawler.search] Note list len: {len(notes_list)}"
-                    )
-                    await self.get_specified_notes(
-                        note_id_list=[note_detail.note_id for note_detail in notes_list]
-                    )
-                    page += 1
-                except Exception as ex:
-                    utils.logger.error(
-                        f"[BaiduTieBaCrawler.search] Search keywords error, current page: {page}, current keyword: {keyword}, err: {ex}"
+                        f"[BaiduTieBaCrawler.search_by_keyword] Search note list is empty"
                     )
                     break
+                utils.logger.info(
+                    f"[BaiduTieBaCrawler.search_by_keyword] Note list len: {len(notes_list)}"
+                )
+                await self.get_specified_notes(
+                    note_id_list=[note_detail.note_id for note_detail in notes_list]
+                )
+                page += 1
+            except Exception as ex:
+                utils.logger.error(
+                    f"[BaiduTieBaCrawler.search_by_keyword] Search keywords error, current page: {page}, current keyword: {keyword}, err: {ex}"
+                )
+                break
 
     async def get_specified_tieba_notes(self):
         """
@@ -178,7 +193,11 @@ class TieBaCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[BaiduTieBaCrawler.get_specified_tieba_notes] tieba name: {tieba_name} note list len: {len(note_list)}"
                 )
-                await self.get_specified_notes([note.note_id for note in note_list])
+                # 贴吧帖子列表自带回复数，回复数没有变化的帖子跳过详情和评论
+                await self.get_specified_notes([
+                    note.note_id for note in note_list
+                    if not crawl_index.is_unchanged("tieba", note.note_id, self.get_interact_counts(note))
+                ])
                 page_number += tieba_limit_count
 
     async def get_specified_notes(
@@ -192,7 +211,7 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("tieba")
         task_list = [
             self.get_note_detail_async_task(note_id=note_id, semaphore=semaphore)
             for note_id in note_id_list
@@ -201,12 +220,36 @@ class TieBaCrawler(AbstractCrawler):
         note_details_model: List[TiebaNote] = []
         for note_detail in note_details:
             if note_detail is not None:
-                note_details_model.append(note_detail)
                 await tieba_store.update_tieba_note(note_detail)
+                # 回复数没有变化时跳过评论
+                if crawl_index.is_unchanged("tieba", note_detail.note_id, self.get_interact_counts(note_detail)):
+                    continue
+                note_details_model.append(note_detail)
         await self.batch_get_note_comments(note_details_model)
+        await self.mark_notes_seen(note_details_model)
+
+    @staticmethod
+    def get_interact_counts(note_detail: TiebaNote) -> Dict:
+        """
+        帖子的互动数，用于增量爬取判断帖子是否有变化
+        搜索结果中没有回复数，只有贴吧帖子列表和帖子详情中有
+        Args:
+            note_detail: 帖子
+
+        Returns:
+
+        """
+        return {"comment_count": note_detail.total_replay_num}
+
+    async def mark_notes_seen(self, note_list: List[TiebaNote]) -> None:
+        """详情和评论都已保存后，把帖子及其回复数记入增量爬取索引"""
+        for note_detail in note_list:
+            if note_detail:
+                crawl_index.mark_seen("tieba", note_detail.note_id, self.get_interact_counts(note_detail))
+        await crawl_index.flush()
 
     async def get_note_detail_async_task(
-        self, note_id: str, semaphore: asyncio.Semaphore
+        self, note_id: str, semaphore: AdaptiveConcurrencyLimiter
     ) -> Optional[TiebaNote]:
         """
         Get note detail
@@ -252,7 +295,7 @@ class TieBaCrawler(AbstractCrawler):
         if not config.ENABLE_GET_COMMENTS:
             return
 
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("tieba")
         task_list: List[Task] = []
         for note_detail in note_detail_list:
             task = asyncio.create_task(
@@ -263,7 +306,7 @@ class TieBaCrawler(AbstractCrawler):
         await asyncio.gather(*task_list)
 
     async def get_comments_async_task(
-        self, note_detail: TiebaNote, semaphore: asyncio.Semaphore
+        self, note_detail: TiebaNote, semaphore: AdaptiveConcurrencyLimiter
     ):
         """
         Get comments async task
@@ -278,12 +321,12 @@ class TieBaCrawler(AbstractCrawler):
             utils.logger.info(
                 f"[BaiduTieBaCrawler.get_comments] Begin get note id comments {note_detail.note_id}"
             )
-            await self.tieba_client.get_note_all_comments(
+            async for comments in self.tieba_client.iter_note_comments(
                 note_detail=note_detail,
                 crawl_interval=random.random(),
-                callback=tieba_store.batch_update_tieba_note_comments,
                 max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-            )
+            ):
+                await tieba_store.batch_update_tieba_note_comments(note_detail.note_id, comments)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -298,8 +341,8 @@ class TieBaCrawler(AbstractCrawler):
             creator_page_html_content = await self.tieba_client.get_creator_info_by_url(
                 creator_url=creator_url
             )
-            creator_info: TiebaCreator = self._page_extractor.extract_creator_info(
-                creator_page_html_content
+            creator_info: TiebaCreator = await run_extraction(
+                self._page_extractor.extract_creator_info, creator_page_html_content
             )
             if creator_info:
                 utils.logger.info(
@@ -310,18 +353,17 @@ class TieBaCrawler(AbstractCrawler):
 
                 await tieba_store.save_creator(user_info=creator_info)
 
-                # Get all note information of the creator
-                all_notes_list = (
-                    await self.tieba_client.get_all_notes_by_creator_user_name(
-                        user_name=creator_info.user_name,
-                        crawl_interval=0,
-                        callback=tieba_store.batch_update_tieba_notes,
-                        max_note_count=config.CRAWLER_MAX_NOTES_COUNT,
-                        creator_page_html_content=creator_page_html_content,
-                    )
-                )
-
-                await self.batch_get_note_comments(all_notes_list)
+                # Get all note information of the creator, and the comments of each page
+                async for notes in self.tieba_client.iter_notes_by_creator_user_name(
+                    user_name=creator_info.user_name,
+                    crawl_interval=0,
+                    max_note_count=config.CRAWLER_MAX_NOTES_COUNT,
+                    creator_page_html_content=creator_page_html_content,
+                    is_seen=lambda note_id: crawl_index.is_seen("tieba", note_id),
+                ):
+                    await tieba_store.batch_update_tieba_notes(notes)
+                    await self.batch_get_note_comments(notes)
+                    await self.mark_notes_seen(notes)
 
             else:
                 utils.logger.error(
@@ -410,6 +452,8 @@ class TieBaCrawler(AbstractCrawler):
         Returns:
 
         """
+        # 关闭共享的 HTTP 连接池
+        await http_pool.close_all()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -16,8 +16,10 @@ import re
 from typing import Dict, List, Tuple
 from urllib.parse import parse_qs, unquote
 
+from lxml import etree
 from parsel import Selector
 
+import config
 from constant import baidu_tieba as const
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
 from tools import utils
@@ -132,6 +134,32 @@ class TieBaExtractor:
         note.title = note.title.replace(f"【{note.tieba_name}】_百度贴吧", "")
         return note
 
+    @staticmethod
+    def extract_total_replay_page(page_content: str) -> int:
+        """
+        提取帖子回复总页数，帖子详情页和评论分页都带有该信息，页面中没有时返回 0
+        Args:
+            page_content:
+
+        Returns:
+
+        """
+        match = re.search(r'共<span class="red">(\d+)</span>页', page_content)
+        return int(match.group(1)) if match else 0
+
+    def extract_tieba_note_comment_page(self, page_content: str, note_id: str) -> Tuple[List[TiebaComment], int]:
+        """
+        提取帖子某一页的一级评论和帖子回复总页数
+        Args:
+            page_content:
+            note_id:
+
+        Returns:
+
+        """
+        return (self.extract_tieba_note_parment_comments(page_content, note_id=note_id),
+                self.extract_total_replay_page(page_content))
+
     def extract_tieba_note_parment_comments(self, page_content: str, note_id: str) -> List[TiebaComment]:
         """
         提取贴吧帖子一级评论
@@ -343,7 +371,20 @@ class TieBaExtractor:
         Returns:
 
         """
-        data_field_value = selector.xpath("./@data-field").get(default='').strip()
+        data_field_value = selector.xpath("./@data-field").get(default='')
+        return TieBaExtractor.parse_data_field_value(data_field_value)
+
+    @staticmethod
+    def parse_data_field_value(data_field_value: str) -> Dict:
+        """
+        解析 data-field 属性的字符串值
+        Args:
+            data_field_value:
+
+        Returns:
+
+        """
+        data_field_value = data_field_value.strip()
         if not data_field_value or data_field_value == "{}":
             return {}
         try:
@@ -356,6 +397,356 @@ class TieBaExtractor:
         return data_field_dict_value
 
 
+def _first(xpath: etree.XPath, node: etree._Element, default: str = "") -> str:
+    """取 XPath 结果的第一个字符串值(文本或属性)，与 parsel 的 .get(default) 一致"""
+    result = xpath(node)
+    return str(result[0]) if result else default
+
+
+def _first_html(xpath: etree.XPath, node: etree._Element, default: str = "") -> str:
+    """取 XPath 结果的第一个元素序列化后的 HTML，与 parsel 对元素调用 .get(default) 一致"""
+    result = xpath(node)
+    return _to_html(result[0]) if result else default
+
+
+def _to_html(node: etree._Element) -> str:
+    return etree.tostring(node, method="html", encoding="unicode", with_tail=False)
+
+
+class TieBaLxmlExtractor(TieBaExtractor):
+    """
+    基于 lxml 的贴吧页面提取器，输出与 TieBaExtractor(parsel) 一致：
+    1. 每个页面只解析一次，XPath 预编译后相对各节点求值
+    2. 贴吧名称、总页数等整页只有一份的字段只查询一次，不再每个帖子/楼层重复做全文档查询
+    3. 帖子列表在 Bigpipe 的 <code class="pagelet_html"><!--...--></code> 注释中，
+       只解析含有帖子列表/吧名片的注释，不再对整页做 replace('<!--', "") 拷贝后重新解析
+    """
+
+    # 解析器可以复用，每个进程(解析进程池中的子进程)各自持有一份
+    _PARSER = etree.HTMLParser(recover=True, encoding="utf-8")
+
+    # 页面通用
+    _TIEBA_NAME = etree.XPath("//a[@class='card_title_fname']/text()")
+    _TIEBA_LINK = etree.XPath("//a[@class='card_title_fname']/@href")
+    _DATA_FIELD = etree.XPath("./@data-field")
+    _TOTAL_REPLAY_INFO = etree.XPath(
+        "//div[@id='thread_theme_5']//li[@class='l_reply_num']//span[@class='red']")
+    _TEXT = etree.XPath("./text()")
+    _POST_TAIL_WRAP = etree.XPath(".//div[@class='post-tail-wrap']")
+    _AUTHOR_FACE_HREF = etree.XPath(".//a[@class='p_author_face ']/@href")
+    _AUTHOR_FACE_IMG = etree.XPath(".//a[@class='p_author_face ']/img/@src")
+    _AUTHOR_NAME = etree.XPath(".//a[@class='p_author_name j_user_card']/text()")
+    _PAGELET_COMMENT = etree.XPath("//code[@class='pagelet_html']/comment()")
+
+    # 搜索结果
+    _SEARCH_POST = etree.XPath("//div[@class='s_post']")
+    _SEARCH_TITLE_TID = etree.XPath(".//span[@class='p_title']/a/@data-tid")
+    _SEARCH_TITLE = etree.XPath(".//span[@class='p_title']/a/text()")
+    _SEARCH_TITLE_HREF = etree.XPath(".//span[@class='p_title']/a/@href")
+    _SEARCH_DESC = etree.XPath(".//div[@class='p_content']/text()")
+    _SEARCH_USER_NAME = etree.XPath(".//a[starts-with(@href, '/home/main')]/font/text()")
+    _SEARCH_USER_HREF = etree.XPath(".//a[starts-with(@href, '/home/main')]/@href")
+    _SEARCH_FORUM_NAME = etree.XPath(".//a[@class='p_forum']/font/text()")
+    _SEARCH_FORUM_HREF = etree.XPath(".//a[@class='p_forum']/@href")
+    _SEARCH_DATE = etree.XPath(".//font[@class='p_green p_date']/text()")
+
+    # 贴吧帖子列表
+    _THREAD_LIST_ITEM = etree.XPath("//ul[@id='thread_list']/li")
+    _THREAD_TITLE = etree.XPath(".//a[@class='j_th_tit ']/text()")
+    _THREAD_DESC = etree.XPath(".//div[@class='threadlist_abs threadlist_abs_onlyline ']/text()")
+    _THREAD_AUTHOR_HREF = etree.XPath(".//a[@class='frs-author-name j_user_card ']/@href")
+
+    # 帖子详情和一级评论
+    _FIRST_FLOOR = etree.XPath("//div[@class='p_postlist'][1]")
+    _ONLY_VIEW_AUTHOR_LINK = etree.XPath("//*[@id='lzonly_cntn']/@href")
+    _TITLE = etree.XPath("//title/text()")
+    _DESCRIPTION = etree.XPath("//meta[@name='description']/@content")
+    _FIRST_POST_TAIL_WRAP = etree.XPath("//div[@class='post-tail-wrap']")
+    _POST = etree.XPath("//div[@class='l_post l_post_bright j_l_post clearfix  ']")
+
+    # 二级评论
+    _SUB_POST_FIRST = etree.XPath("//li[@class='lzl_single_post j_lzl_s_p first_no_border']")
+    _SUB_POST = etree.XPath("//li[@class='lzl_single_post j_lzl_s_p ']")
+    _SUB_USER_CARD = etree.XPath("./a[@class='j_user_card lzl_p_p']")
+    _HREF = etree.XPath("./@href")
+    _IMG_SRC = etree.XPath("./img/@src")
+    _SUB_CONTENT = etree.XPath(".//span[@class='lzl_content_main']")
+    _SUB_TIME = etree.XPath(".//span[@class='lzl_time']/text()")
+
+    # 创作者主页
+    _CREATOR_LINK = etree.XPath("//p[@class='space']/a/@href")
+    _CREATOR_USERDATA = etree.XPath("//div[@class='userinfo_userdata']")
+    _CREATOR_CONCERN_NUM = etree.XPath("//span[@class='concern_num']")
+    _CREATOR_NICKNAME = etree.XPath(".//span[@class='userinfo_username ']/text()")
+    _CREATOR_AVATAR = etree.XPath(".//div[@class='userinfo_left_head']//img/@src")
+    _CREATOR_THREAD_HREF = etree.XPath("//ul[@class='new_list clearfix']//div[@class='thread_name']/a[1]/@href")
+
+    @staticmethod
+    def parse_html(page_content: str) -> etree._Element:
+        """
+        解析页面，与 parsel 的 Selector(text=...) 使用相同的解析参数
+        Args:
+            page_content:
+
+        Returns:
+
+        """
+        body = page_content.strip().replace("\x00", "").encode("utf-8") or b"<html/>"
+        return etree.fromstring(body, parser=TieBaLxmlExtractor._PARSER)
+
+    def _extract_data_field_value(self, node: etree._Element) -> Dict:
+        return self.parse_data_field_value(_first(self._DATA_FIELD, node))
+
+    def extract_search_note_list(self, page_content: str) -> List[TiebaNote]:
+        """
+        提取贴吧帖子列表，这里提取的关键词搜索结果页的数据，还缺少帖子的回复数和回复页等数据
+        Args:
+            page_content: 页面内容的HTML字符串
+
+        Returns:
+
+        """
+        result: List[TiebaNote] = []
+        for post in self._SEARCH_POST(self.parse_html(page_content)):
+            result.append(TiebaNote(
+                note_id=_first(self._SEARCH_TITLE_TID, post).strip(),
+                title=_first(self._SEARCH_TITLE, post).strip(),
+                desc=_first(self._SEARCH_DESC, post).strip(),
+                note_url=const.TIEBA_URL + _first(self._SEARCH_TITLE_HREF, post),
+                user_nickname=_first(self._SEARCH_USER_NAME, post).strip(),
+                user_link=const.TIEBA_URL + _first(self._SEARCH_USER_HREF, post),
+                tieba_name=_first(self._SEARCH_FORUM_NAME, post).strip(),
+                tieba_link=const.TIEBA_URL + _first(self._SEARCH_FORUM_HREF, post),
+                publish_time=_first(self._SEARCH_DATE, post).strip(),
+            ))
+        return result
+
+    def _iter_pagelet_roots(self, root: etree._Element, *markers: str) -> List[etree._Element]:
+        """
+        解析含有指定标记的 Bigpipe 注释，返回页面本身和这些注释解析后的根节点，按文档顺序排列
+        Args:
+            root: 页面根节点
+            *markers: 注释内容中需要包含的任一标记
+
+        Returns:
+
+        """
+        roots = [root]
+        for comment in self._PAGELET_COMMENT(root):
+            text = comment.text or ""
+            if any(marker in text for marker in markers):
+                roots.append(self.parse_html(text.replace("<!--", "")))
+        return roots
+
+    def extract_tieba_note_list(self, page_content: str) -> List[TiebaNote]:
+        """
+        提取贴吧帖子列表
+        Args:
+            page_content:
+
+        Returns:
+
+        """
+        roots = self._iter_pagelet_roots(self.parse_html(page_content), "thread_list", "card_title_fname")
+        tieba_name, tieba_link = "", ""
+        for root in roots:
+            if self._TIEBA_NAME(root) or self._TIEBA_LINK(root):
+                tieba_name = _first(self._TIEBA_NAME, root).strip()
+                tieba_link = _first(self._TIEBA_LINK, root)
+                break
+        result: List[TiebaNote] = []
+        for root in roots:
+            for post in self._THREAD_LIST_ITEM(root):
+                post_field_value: Dict = self._extract_data_field_value(post)
+                if not post_field_value:
+                    continue
+                note_id = str(post_field_value.get("id"))
+                result.append(TiebaNote(
+                    note_id=note_id,
+                    title=_first(self._THREAD_TITLE, post).strip(),
+                    desc=_first(self._THREAD_DESC, post).strip(),
+                    note_url=const.TIEBA_URL + f"/p/{note_id}",
+                    user_link=const.TIEBA_URL + _first(self._THREAD_AUTHOR_HREF, post).strip(),
+                    user_nickname=post_field_value.get("authoer_nickname") or post_field_value.get("author_name"),
+                    tieba_name=tieba_name,
+                    tieba_link=const.TIEBA_URL + tieba_link,
+                    total_replay_num=post_field_value.get("reply_num", 0),
+                ))
+        return result
+
+    def extract_note_detail(self, page_content: str) -> TiebaNote:
+        """
+        提取贴吧帖子详情
+        Args:
+            page_content:
+
+        Returns:
+
+        """
+        root = self.parse_html(page_content)
+        first_floor_list = self._FIRST_FLOOR(root)
+
+        def first_floor_value(xpath: etree.XPath) -> str:
+            for first_floor in first_floor_list:
+                result = xpath(first_floor)
+                if result:
+                    return str(result[0])
+            return ""
+
+        note_id = _first(self._ONLY_VIEW_AUTHOR_LINK, root).strip().split("?")[0].split("/")[-1]
+        # 帖子回复数、回复页数
+        thread_num_infos = self._TOTAL_REPLAY_INFO(root)
+        # IP地理位置、发表时间
+        ip_location, publish_time = self.extract_ip_and_pub_time(
+            _first_html(self._FIRST_POST_TAIL_WRAP, root).strip())
+        note = TiebaNote(note_id=note_id,
+                         title=_first(self._TITLE, root).strip(),
+                         desc=_first(self._DESCRIPTION, root).strip(),
+                         note_url=const.TIEBA_URL + f"/p/{note_id}",
+                         user_link=const.TIEBA_URL + first_floor_value(self._AUTHOR_FACE_HREF).strip(),
+                         user_nickname=first_floor_value(self._AUTHOR_NAME).strip(),
+                         user_avatar=first_floor_value(self._AUTHOR_FACE_IMG).strip(),
+                         tieba_name=_first(self._TIEBA_NAME, root).strip(),
+                         tieba_link=const.TIEBA_URL + _first(self._TIEBA_LINK, root),
+                         ip_location=ip_location,
+                         publish_time=publish_time,
+                         total_replay_num=_first(self._TEXT, thread_num_infos[0]).strip(),
+                         total_replay_page=_first(self._TEXT, thread_num_infos[1]).strip())
+        note.title = note.title.replace(f"【{note.tieba_name}】_百度贴吧", "")
+        return note
+
+    def _extract_parment_comments(self, root: etree._Element, note_id: str) -> List[TiebaComment]:
+        tieba_name = _first(self._TIEBA_NAME, root).strip()
+        result: List[TiebaComment] = []
+        for comment_node in self._POST(root):
+            comment_field_value: Dict = self._extract_data_field_value(comment_node)
+            if not comment_field_value:
+                continue
+            ip_location, publish_time = self.extract_ip_and_pub_time(
+                _first_html(self._POST_TAIL_WRAP, comment_node).strip())
+            content_field: Dict = comment_field_value.get("content")
+            result.append(TiebaComment(
+                comment_id=str(content_field.get("post_id")),
+                sub_comment_count=content_field.get("comment_num"),
+                content=utils.extract_text_from_html(content_field.get("content")),
+                note_url=const.TIEBA_URL + f"/p/{note_id}",
+                user_link=const.TIEBA_URL + _first(self._AUTHOR_FACE_HREF, comment_node).strip(),
+                user_nickname=_first(self._AUTHOR_NAME, comment_node).strip(),
+                user_avatar=_first(self._AUTHOR_FACE_IMG, comment_node).strip(),
+                tieba_id=str(content_field.get("forum_id", "")),
+                tieba_name=tieba_name, tieba_link=f"https://tieba.baidu.com/f?kw={tieba_name}",
+                ip_location=ip_location, publish_time=publish_time, note_id=note_id,
+            ))
+        return result
+
+    def extract_tieba_note_parment_comments(self, page_content: str, note_id: str) -> List[TiebaComment]:
+        """
+        提取贴吧帖子一级评论
+        Args:
+            page_content:
+            note_id:
+
+        Returns:
+
+        """
+        return self._extract_parment_comments(self.parse_html(page_content), note_id)
+
+    def extract_tieba_note_comment_page(self, page_content: str, note_id: str) -> Tuple[List[TiebaComment], int]:
+        """
+        提取帖子某一页的一级评论和帖子回复总页数，只解析一次页面
+        Args:
+            page_content:
+            note_id:
+
+        Returns:
+
+        """
+        root = self.parse_html(page_content)
+        thread_num_infos = self._TOTAL_REPLAY_INFO(root)
+        total_page = _first(self._TEXT, thread_num_infos[1]).strip() if len(thread_num_infos) > 1 else ""
+        return self._extract_parment_comments(root, note_id), int(total_page) if total_page.isdigit() else 0
+
+    def extract_tieba_note_sub_comments(self, page_content: str, parent_comment: TiebaComment) -> List[TiebaComment]:
+        """
+        提取贴吧帖子二级评论
+        Args:
+            page_content:
+            parent_comment:
+
+        Returns:
+
+        """
+        root = self.parse_html(page_content)
+        comments = []
+        for comment_node in self._SUB_POST_FIRST(root) + self._SUB_POST(root):
+            comment_value = self._extract_data_field_value(comment_node)
+            if not comment_value:
+                continue
+            comment_user_a = self._SUB_USER_CARD(comment_node)[0]
+            comments.append(TiebaComment(
+                comment_id=str(comment_value.get("spid")),
+                content=utils.extract_text_from_html(_first_html(self._SUB_CONTENT, comment_node)),
+                user_link=_first(self._HREF, comment_user_a),
+                user_nickname=comment_value.get("showname"),
+                user_avatar=_first(self._IMG_SRC, comment_user_a),
+                publish_time=_first(self._SUB_TIME, comment_node).strip(),
+                parent_comment_id=parent_comment.comment_id,
+                note_id=parent_comment.note_id, note_url=parent_comment.note_url,
+                tieba_id=parent_comment.tieba_id, tieba_name=parent_comment.tieba_name,
+                tieba_link=parent_comment.tieba_link))
+        return comments
+
+    def extract_creator_info(self, html_content: str) -> TiebaCreator:
+        """
+        提取贴吧创作者信息
+        Args:
+            html_content:
+
+        Returns:
+
+        """
+        root = self.parse_html(html_content)
+        user_link_params: Dict = parse_qs(unquote(_first(self._CREATOR_LINK, root).split("?")[-1]))
+        user_name = user_link_params.get("un")[0] if user_link_params.get("un") else ""
+        user_id = user_link_params.get("id")[0] if user_link_params.get("id") else ""
+        follows, fans = 0, 0
+        concern_num_list = self._CREATOR_CONCERN_NUM(root)
+        if len(concern_num_list) == 2:
+            pattern = re.compile(r'<span class="concern_num">\(<a[^>]*>(\d+)</a>\)</span>')
+            follow_match = pattern.findall(_to_html(concern_num_list[0]))
+            fans_match = pattern.findall(_to_html(concern_num_list[1]))
+            follows = follow_match[0] if follow_match else 0
+            fans = fans_match[0] if fans_match else 0
+        user_content = _first_html(self._CREATOR_USERDATA, root)
+        return TiebaCreator(user_id=user_id, user_name=user_name,
+                            nickname=_first(self._CREATOR_NICKNAME, root).strip(),
+                            avatar=_first(self._CREATOR_AVATAR, root).strip(),
+                            gender=self.extract_gender(user_content),
+                            ip_location=self.extract_ip(user_content),
+                            follows=follows,
+                            fans=fans,
+                            registration_duration=self.extract_registration_duration(user_content))
+
+    def extract_tieba_thread_id_list_from_creator_page(self, html_content: str) -> List[str]:
+        """
+        提取贴吧创作者主页的帖子列表
+        Args:
+            html_content:
+
+        Returns:
+
+        """
+        return [thread_url.split("?")[0].split("/")[-1]
+                for thread_url in self._CREATOR_THREAD_HREF(self.parse_html(html_content))]
+
+
+def create_tieba_extractor() -> TieBaExtractor:
+    """按配置创建贴吧页面提取器"""
+    if config.TIEBA_PAGE_EXTRACTOR == "parsel":
+        return TieBaExtractor()
+    return TieBaLxmlExtractor()
+
+
 def test_extract_search_note_list():
     with open("test_data/search_keyword_notes.html", "r", encoding="utf-8") as f:
         content = f.read()
@@ -10,7 +10,7 @@ import json
 from typing import Any, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-from tools import utils
+from tools import http_pool, media_downloader, utils
 from media_platform.base.client import AbstractApiClient
 
 
@@ -54,7 +54,8 @@ class TouTiaoClient(AbstractApiClient):
         """
         try:
             headers = headers or self.headers
-            response = await utils.async_request(
+            client = http_pool.get_client(self.proxies)
+            response = await client.request(
                 method,
                 url,
                 params=params,
@@ -62,7 +63,6 @@ class TouTiaoClient(AbstractApiClient):
                 json=json_data,
                 headers=headers,
                 timeout=self.timeout,
-                proxies=self.proxies,
             )
 
             if return_response:
@@ -115,31 +115,12 @@ class TouTiaoClient(AbstractApiClient):
             utils.logger.error(f"获取视频详情失败: {e}")
             return {}
 
-    async def get_note_media(self, media_url: str) -> bytes:
+    async def download_note_media(self, media_url: str, save_file_name: str) -> bool:
         """
-        下载视频媒体文件
+        流式下载视频媒体文件到本地
         :param media_url: 视频URL
-        :return: 视频内容
+        :param save_file_name: 保存路径
+        :return: 是否下载成功
         """
-        try:
-            response = await utils.async_request(
-                "GET",
-                media_url,
-                headers=self.headers,
-                timeout=self.timeout,
-                proxies=self.proxies,
-                stream=True,
-            )
-
-            if response.status_code != 200:
-                utils.logger.error(f"下载视频失败: {response.status_code}")
-                return b""
-
-            content = b""
-            async for chunk in response.aiter_content(chunk_size=1024):
-                if chunk:
-                    content += chunk
-            return content
-        except Exception as e:
-            utils.logger.error(f"下载视频异常: {e}")
-            return b""
\ No newline at end of file
+        return await media_downloader.download(media_url, save_file_name, headers=self.headers,
+                                               proxies=self.proxies, timeout=self.timeout)
\ No newline at end of file
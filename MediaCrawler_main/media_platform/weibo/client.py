@@ -14,25 +14,28 @@
 # @Time    : 2023/12/23 15:40
 # @Desc    : 微博爬虫 API 请求 client
 
-import asyncio
 import copy
 import json
 import re
-from typing import Callable, Dict, List, Optional, Union
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
 from urllib.parse import parse_qs, unquote, urlencode
 
-import httpx
 from httpx import Response
 from playwright.async_api import BrowserContext, Page
 
 import config
-from tools import utils
+from proxy.proxy_rotator import rotate_proxy_on_block
+from tools import http_pool, media_downloader, utils
+from tools.rate_limiter import rate_limited, wait_crawl_interval
 
-from .exception import DataFetchError
+from .exception import DataFetchError, IPBlockError
 from .field import SearchType
 
 
 class WeiboClient:
+    # 开启 IP 代理时由爬虫设置，request 方法遇到 IP 封禁时通过它更换代理
+    proxy_rotator = None
+
     def __init__(
             self,
             timeout=10,
@@ -50,13 +53,18 @@ class WeiboClient:
         self.cookie_dict = cookie_dict
         self._image_agent_host = "https://i1.wp.com/"
 
+    @rotate_proxy_on_block(IPBlockError)
+    @rate_limited("wb", IPBlockError)
     async def request(self, method, url, **kwargs) -> Union[Response, Dict]:
         enable_return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request(
-                method, url, timeout=self.timeout,
-                **kwargs
-            )
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(
+            method, url, timeout=self.timeout,
+            **kwargs
+        )
+        if response.status_code in (418, 432):
+            # 微博反爬返回 418/432
+            raise IPBlockError(f"request blocked, status_code: {response.status_code}")
 
         if enable_return_response:
             return response
@@ -151,52 +159,52 @@ class WeiboClient:
 
         return await self.get(uri, params, headers=headers)
 
-    async def get_note_all_comments(
+    async def iter_note_comments(
         self,
         note_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ):
+    ) -> AsyncIterator[List[Dict]]:
         """
-        get note all comments include sub comments
+        get note comments include sub comments page by page, yield each page as soon as it arrives
         :param note_id:
         :param crawl_interval:
-        :param callback:
-        :param max_count:
+        :param max_count: 一次帖子爬取的最大一级评论数量
         :return:
         """
-        result = []
+        comments_count = 0
+        sub_comments_count = 0
         is_end = False
         max_id = -1
         max_id_type = 0
-        while not is_end and len(result) < max_count:
+        while not is_end and comments_count < max_count:
             comments_res = await self.get_note_comments(note_id, max_id, max_id_type)
             max_id: int = comments_res.get("max_id")
             max_id_type: int = comments_res.get("max_id_type")
             comment_list: List[Dict] = comments_res.get("data", [])
             is_end = max_id == 0
-            if len(result) + len(comment_list) > max_count:
-                comment_list = comment_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(note_id, comment_list)
-            await asyncio.sleep(crawl_interval)
-            result.extend(comment_list)
-            sub_comment_result = await self.get_comments_all_sub_comments(note_id, comment_list, callback)
-            result.extend(sub_comment_result)
-        return result
+            if comments_count + len(comment_list) > max_count:
+                comment_list = comment_list[:max_count - comments_count]
+            comments_count += len(comment_list)
+            yield comment_list
+            await wait_crawl_interval(crawl_interval)
+            # 子评论随一级评论一起返回，无需额外请求，只需限制单个帖子的子评论总数
+            for sub_comments in self.get_comments_all_sub_comments(comment_list):
+                sub_comments = sub_comments[:config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count]
+                if not sub_comments:
+                    break
+                sub_comments_count += len(sub_comments)
+                yield sub_comments
 
     @staticmethod
-    async def get_comments_all_sub_comments(note_id: str, comment_list: List[Dict],
-                                            callback: Optional[Callable] = None) -> List[Dict]:
+    def get_comments_all_sub_comments(comment_list: List[Dict]) -> List[List[Dict]]:
         """
-        获取评论的所有子评论
+        获取评论的所有子评论，微博的子评论随一级评论一起返回，不需要额外请求
         Args:
-            note_id:
             comment_list:
-            callback:
 
         Returns:
+            每条一级评论的子评论列表
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
@@ -204,13 +212,10 @@ class WeiboClient:
                 f"[WeiboClient.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled")
             return []
 
-        res_sub_comments = []
-        for comment in comment_list:
-            sub_comments = comment.get("comments")
-            if sub_comments and isinstance(sub_comments, list):
-                await callback(note_id, sub_comments)
-                res_sub_comments.extend(sub_comments)
-        return res_sub_comments
+        return [
+            comment.get("comments") for comment in comment_list
+            if comment.get("comments") and isinstance(comment.get("comments"), list)
+        ]
 
     async def get_note_info_by_id(self, note_id: str) -> Dict:
         """
@@ -219,26 +224,35 @@ class WeiboClient:
         :return:
         """
         url = f"{self._host}/detail/{note_id}"
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request(
-                "GET", url, timeout=self.timeout, headers=self.headers
-            )
-            if response.status_code != 200:
-                raise DataFetchError(f"get weibo detail err: {response.text}")
-            match = re.search(r'var \$render_data = (\[.*?\])\[0\]', response.text, re.DOTALL)
-            if match:
-                render_data_json = match.group(1)
-                render_data_dict = json.loads(render_data_json)
-                note_detail = render_data_dict[0].get("status")
-                note_item = {
-                    "mblog": note_detail
-                }
-                return note_item
-            else:
-                utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
-                return dict()
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(
+            "GET", url, timeout=self.timeout, headers=self.headers
+        )
+        if response.status_code != 200:
+            raise DataFetchError(f"get weibo detail err: {response.text}")
+        match = re.search(r'var \$render_data = (\[.*?\])\[0\]', response.text, re.DOTALL)
+        if match:
+            render_data_json = match.group(1)
+            render_data_dict = json.loads(render_data_json)
+            note_detail = render_data_dict[0].get("status")
+            note_item = {
+                "mblog": note_detail
+            }
+            return note_item
+        else:
+            utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
+            return dict()
+
+    async def download_note_image(self, image_url: str, save_file_name: str) -> bool:
+        """
+        流式下载微博图片到本地
+        Args:
+            image_url: 图片地址
+            save_file_name: 保存路径
+
+        Returns: 是否下载成功
 
-    async def get_note_image(self, image_url: str) -> bytes:
+        """
         image_url = image_url[8:]  # 去掉 https://
         sub_url = image_url.split("/")
         image_url = ""
@@ -252,13 +266,7 @@ class WeiboClient:
         # 微博图床对外存在防盗链，所以需要代理访问
         # 由于微博图片是通过 i1.wp.com 来访问的，所以需要拼接一下
         final_uri = (f"{self._image_agent_host}" f"{image_url}")
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request("GET", final_uri, timeout=self.timeout)
-            if not response.reason_phrase == "OK":
-                utils.logger.error(f"[WeiboClient.get_note_image] request {final_uri} err, res:{response.text}")
-                return None
-            else:
-                return response.content
+        return await media_downloader.download(final_uri, save_file_name, proxies=self.proxies, timeout=self.timeout)
 
 
 
@@ -337,20 +345,20 @@ class WeiboClient:
         }
         return await self.get(uri, params)
 
-    async def get_all_notes_by_creator_id(self, creator_id: str, container_id: str, crawl_interval: float = 1.0,
-                                          callback: Optional[Callable] = None) -> List[Dict]:
+    async def iter_notes_by_creator_id(self, creator_id: str, container_id: str,
+                                       crawl_interval: float = 1.0,
+                                       is_seen: Optional[Callable[[Dict], bool]] = None) -> AsyncIterator[List[Dict]]:
         """
-        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        逐页获取指定用户下发过的帖子，每取到一页产出一页
         Args:
             creator_id:
             container_id:
             crawl_interval:
-            callback:
+            is_seen: 判断帖子是否已经爬取过，遇到已爬取过的帖子(置顶帖除外)时停止翻页，用于增量爬取
 
         Returns:
 
         """
-        result = []
         notes_has_more = True
         since_id = ""
         crawler_total_count = 0
@@ -363,18 +371,21 @@ class WeiboClient:
             since_id = notes_res.get("cardlistInfo", {}).get("since_id", "0")
             if "cards" not in notes_res:
                 utils.logger.info(
-                    f"[WeiboClient.get_all_notes_by_creator] No 'notes' key found in response: {notes_res}")
+                    f"[WeiboClient.iter_notes_by_creator_id] No 'notes' key found in response: {notes_res}")
                 break
 
             notes = notes_res["cards"]
             utils.logger.info(
-                f"[WeiboClient.get_all_notes_by_creator] got user_id:{creator_id} notes len : {len(notes)}")
+                f"[WeiboClient.iter_notes_by_creator_id] got user_id:{creator_id} notes len : {len(notes)}")
             notes = [note for note  in notes if note.get("card_type") == 9]
-            if callback:
-                await callback(notes)
-            await asyncio.sleep(crawl_interval)
-            result.extend(notes)
             crawler_total_count += 10
             notes_has_more = notes_res.get("cardlistInfo", {}).get("total", 0) > crawler_total_count
-        return result
+            if is_seen:
+                notes, notes_has_more = utils.drop_seen_items(
+                    notes, is_seen, notes_has_more, is_pinned=lambda note: note.get("mblog", {}).get("isTop")
+                )
+            if notes:
+                yield notes
+            if notes_has_more:
+                await wait_crawl_interval(crawl_interval)
 
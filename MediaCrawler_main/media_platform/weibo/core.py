@@ -16,6 +16,7 @@
 
 
 import asyncio
+import functools
 import os
 import random
 from asyncio import Task
@@ -32,10 +33,14 @@ from playwright.async_api import (
 import config
 from base.base_crawler import AbstractCrawler
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator
 from store import weibo as weibo_store
-from tools import utils
+from store.crawl_index import crawl_index
+from store.media_blob_store import make_media_key
+from tools import http_pool, media_downloader, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
 from tools.cdp_browser import CDPBrowserManager
-from var import crawler_type_var, source_keyword_var
+from var import crawler_type_var
 
 from .client import WeiboClient
 from .exception import DataFetchError
@@ -58,12 +63,14 @@ class WeiboCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self):
-        playwright_proxy_format, httpx_proxy_format = None, None
+        playwright_proxy_format, httpx_proxy_format, proxy_rotator = None, None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            # IP 被封禁时由 proxy_rotator 为 API 客户端自动更换代理
+            proxy_rotator = ProxyRotator(ip_proxy_pool, max_rotations=config.IP_PROXY_MAX_ROTATIONS)
+            ip_proxy_info: IpInfoModel = await proxy_rotator.lease()
             playwright_proxy_format, httpx_proxy_format = self.format_proxy_info(
                 ip_proxy_info
             )
@@ -92,6 +99,7 @@ class WeiboCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.wb_client = await self.create_weibo_client(httpx_proxy_format)
+            self.wb_client.proxy_rotator = proxy_rotator
             if not await self.wb_client.pong():
                 login_obj = WeiboLogin(
                     login_type=config.LOGIN_TYPE,
@@ -152,56 +160,76 @@ class WeiboCrawler(AbstractCrawler):
             )
             return
 
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
-            utils.logger.info(
-                f"[WeiboCrawler.search] Current search keyword: {keyword}"
-            )
-            page = 1
-            while (
-                page - start_page + 1
-            ) * weibo_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[WeiboCrawler.search] Skip page: {page}")
-                    page += 1
-                    continue
-                utils.logger.info(
-                    f"[WeiboCrawler.search] search weibo keyword: {keyword}, page: {page}"
-                )
-                search_res = await self.wb_client.get_note_by_keyword(
-                    keyword=keyword, page=page, search_type=search_type
-                )
-                note_id_list: List[str] = []
-                note_list = filter_search_result_card(search_res.get("cards"))
-                for note_item in note_list:
-                    if note_item:
-                        mblog: Dict = note_item.get("mblog")
-                        if mblog:
-                            note_id_list.append(mblog.get("id"))
-                            await weibo_store.update_weibo_note(note_item)
-                            await self.get_note_images(mblog)
+        await self.run_keyword_searches(self.search_by_keyword, search_type, weibo_limit_count, start_page)
 
+    async def search_by_keyword(self, keyword: str, search_type: SearchType, weibo_limit_count: int, start_page: int) -> None:
+        """
+        search weibo note of one keyword
+        :param keyword: search keyword
+        :param search_type: weibo search type
+        :param weibo_limit_count: page size
+        :param start_page: start page number
+        :return:
+        """
+        utils.logger.info(
+            f"[WeiboCrawler.search_by_keyword] Current search keyword: {keyword}"
+        )
+        page = 1
+        while (
+            page - start_page + 1
+        ) * weibo_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[WeiboCrawler.search_by_keyword] Skip page: {page}")
                 page += 1
-                await self.batch_get_notes_comments(note_id_list)
+                continue
+            utils.logger.info(
+                f"[WeiboCrawler.search_by_keyword] search weibo keyword: {keyword}, page: {page}"
+            )
+            search_res = await self.wb_client.get_note_by_keyword(
+                keyword=keyword, page=page, search_type=search_type
+            )
+            note_id_list: List[str] = []
+            seen_notes: List[Dict] = []
+            note_list = filter_search_result_card(search_res.get("cards"))
+            for note_item in note_list:
+                if note_item:
+                    mblog: Dict = note_item.get("mblog")
+                    if mblog:
+                        await weibo_store.update_weibo_note(note_item)
+                        # 搜索结果自带互动数，互动数没有变化时跳过图片和评论
+                        if crawl_index.is_unchanged("wb", mblog.get("id"), self.get_interact_counts(note_item)):
+                            continue
+                        note_id_list.append(mblog.get("id"))
+                        seen_notes.append(note_item)
+                        await self.get_note_images(mblog)
+
+            page += 1
+            await self.batch_get_notes_comments(note_id_list)
+            await self.mark_notes_seen(seen_notes)
 
     async def get_specified_notes(self):
         """
         get specified notes info
         :return:
         """
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("wb")
         task_list = [
             self.get_note_info_task(note_id=note_id, semaphore=semaphore)
             for note_id in config.WEIBO_SPECIFIED_ID_LIST
         ]
         video_details = await asyncio.gather(*task_list)
-        for note_item in video_details:
+        need_get_comment_note_ids = []
+        for note_id, note_item in zip(config.WEIBO_SPECIFIED_ID_LIST, video_details):
             if note_item:
                 await weibo_store.update_weibo_note(note_item)
-        await self.batch_get_notes_comments(config.WEIBO_SPECIFIED_ID_LIST)
+                if crawl_index.is_unchanged("wb", note_id, self.get_interact_counts(note_item)):
+                    continue
+            need_get_comment_note_ids.append(note_id)
+        await self.batch_get_notes_comments(need_get_comment_note_ids)
+        await self.mark_notes_seen(video_details)
 
     async def get_note_info_task(
-        self, note_id: str, semaphore: asyncio.Semaphore
+        self, note_id: str, semaphore: AdaptiveConcurrencyLimiter
     ) -> Optional[Dict]:
         """
         Get note detail task
@@ -239,7 +267,7 @@ class WeiboCrawler(AbstractCrawler):
         utils.logger.info(
             f"[WeiboCrawler.batch_get_notes_comments] note ids:{note_id_list}"
         )
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("wb")
         task_list: List[Task] = []
         for note_id in note_id_list:
             task = asyncio.create_task(
@@ -248,7 +276,7 @@ class WeiboCrawler(AbstractCrawler):
             task_list.append(task)
         await asyncio.gather(*task_list)
 
-    async def get_note_comments(self, note_id: str, semaphore: asyncio.Semaphore):
+    async def get_note_comments(self, note_id: str, semaphore: AdaptiveConcurrencyLimiter):
         """
         get comment for note id
         :param note_id:
@@ -260,14 +288,14 @@ class WeiboCrawler(AbstractCrawler):
                 utils.logger.info(
                     f"[WeiboCrawler.get_note_comments] begin get note_id: {note_id} comments ..."
                 )
-                await self.wb_client.get_note_all_comments(
+                async for comments in self.wb_client.iter_note_comments(
                     note_id=note_id,
                     crawl_interval=random.randint(
                         1, 3
                     ),  # 微博对API的限流比较严重，所以延时提高一些
-                    callback=weibo_store.batch_update_weibo_note_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await weibo_store.batch_update_weibo_note_comments(note_id, comments)
             except DataFetchError as ex:
                 utils.logger.error(
                     f"[WeiboCrawler.get_note_comments] get note_id: {note_id} comment error: {ex}"
@@ -296,12 +324,13 @@ class WeiboCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.wb_client.get_note_image(url)
-            if content != None:
-                extension_file_name = url.split(".")[-1]
-                await weibo_store.update_weibo_note_image(
-                    pic["pid"], content, extension_file_name
-                )
+            extension_file_name = url.split(".")[-1]
+            # 放入下载队列后台下载，不阻塞微博和评论的爬取；转发的相同图片只下载一次
+            await media_downloader.enqueue(
+                functools.partial(weibo_store.download_weibo_note_image, pic["pid"], extension_file_name,
+                                  make_media_key(url), functools.partial(self.wb_client.download_note_image, url)),
+                f"{pic['pid']}.{extension_file_name}"
+            )
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -325,26 +354,54 @@ class WeiboCrawler(AbstractCrawler):
                     raise DataFetchError("Get creator info error")
                 await weibo_store.save_creator(user_id, user_info=createor_info)
 
-                # Get all note information of the creator
-                all_notes_list = await self.wb_client.get_all_notes_by_creator_id(
+                # Get all note information of the creator, page by page
+                note_ids = []
+                seen_notes = []
+                async for notes in self.wb_client.iter_notes_by_creator_id(
                     creator_id=user_id,
                     container_id=createor_info_res.get("lfid_container_id"),
                     crawl_interval=0,
-                    callback=weibo_store.batch_update_weibo_notes,
-                )
-
-                note_ids = [
-                    note_item.get("mblog", {}).get("id")
-                    for note_item in all_notes_list
-                    if note_item.get("mblog", {}).get("id")
-                ]
+                    is_seen=lambda note_item: crawl_index.is_seen("wb", note_item.get("mblog", {}).get("id")),
+                ):
+                    await weibo_store.batch_update_weibo_notes(notes)
+                    note_ids.extend(
+                        note_item.get("mblog", {}).get("id")
+                        for note_item in notes
+                        if note_item.get("mblog", {}).get("id")
+                    )
+                    seen_notes.extend(notes)
                 await self.batch_get_notes_comments(note_ids)
+                await self.mark_notes_seen(seen_notes)
 
             else:
                 utils.logger.error(
                     f"[WeiboCrawler.get_creators_and_notes] get creator info error, creator_id:{user_id}"
                 )
 
+    @staticmethod
+    def get_interact_counts(note_item: Dict) -> Dict:
+        """
+        微博的互动数，用于增量爬取判断微博是否有变化
+        Args:
+            note_item: 搜索结果、主页或详情中的微博，包含 mblog
+
+        Returns:
+
+        """
+        mblog: Dict = note_item.get("mblog", {})
+        return {
+            "liked_count": mblog.get("attitudes_count"),
+            "comment_count": mblog.get("comments_count"),
+            "share_count": mblog.get("reposts_count"),
+        }
+
+    async def mark_notes_seen(self, note_list: List[Optional[Dict]]) -> None:
+        """详情和评论都已保存后，把微博及其互动数记入增量爬取索引"""
+        for note_item in note_list:
+            if note_item and note_item.get("mblog"):
+                crawl_index.mark_seen("wb", note_item["mblog"].get("id"), self.get_interact_counts(note_item))
+        await crawl_index.flush()
+
     async def create_weibo_client(self, httpx_proxy: Optional[str]) -> WeiboClient:
         """Create xhs client"""
         utils.logger.info(
@@ -448,6 +505,9 @@ class WeiboCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭共享的 HTTP 连接池
+        await media_downloader.close()
+        await http_pool.close_all()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -9,24 +9,27 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 
-import asyncio
 import json
 import re
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_result
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from proxy.proxy_rotator import rotate_proxy_on_block
+from tools import http_pool, media_downloader, utils
+from tools.concurrency_limiter import get_concurrency_limiter
+from tools.crawl_pipeline import merge_page_iterators
+from tools.extraction_executor import run_extraction
+from tools.rate_limiter import rate_limited, wait_crawl_interval
 from html import unescape
 
 from .exception import DataFetchError, IPBlockError
 from .field import SearchNoteType, SearchSortType
-from .help import get_search_id, sign
+from .help import get_search_id, parse_note_detail_from_html, sign
 
 
 class XiaoHongShuClient(AbstractApiClient):
@@ -78,10 +81,12 @@ class XiaoHongShuClient(AbstractApiClient):
             "x-S-Common": signs["x-s-common"],
             "X-B3-Traceid": signs["x-b3-traceid"],
         }
-        self.headers.update(headers)
-        return self.headers
+        # 返回每个请求独立的请求头，签名和发送之间还要等待限速，写入共享的 self.headers 会被并发请求的签名覆盖
+        return {**self.headers, **headers}
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    @rotate_proxy_on_block(IPBlockError)
+    @rate_limited("xhs", IPBlockError)
     async def request(self, method, url, **kwargs) -> Union[str, Any]:
         """
         封装httpx的公共请求方法，对请求响应做一些处理
@@ -95,8 +100,8 @@ class XiaoHongShuClient(AbstractApiClient):
         """
         # return response.text
         return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(method, url, timeout=self.timeout, **kwargs)
 
         if response.status_code == 471 or response.status_code == 461:
             # someday someone maybe will bypass captcha
@@ -104,7 +109,7 @@ class XiaoHongShuClient(AbstractApiClient):
             verify_uuid = response.headers["Verifyuuid"]
             msg = f"出现验证码，请求失败，Verifytype: {verify_type}，Verifyuuid: {verify_uuid}, Response: {response}"
             utils.logger.error(msg)
-            raise Exception(msg)
+            raise IPBlockError(msg)
 
         if return_response:
             return response.text
@@ -154,16 +159,17 @@ class XiaoHongShuClient(AbstractApiClient):
             **kwargs,
         )
 
-    async def get_note_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxies=self.proxies) as client:
-            response = await client.request("GET", url, timeout=self.timeout)
-            if not response.reason_phrase == "OK":
-                utils.logger.error(
-                    f"[XiaoHongShuClient.get_note_media] request {url} err, res:{response.text}"
-                )
-                return None
-            else:
-                return response.content
+    async def download_note_media(self, url: str, save_file_name: str) -> bool:
+        """
+        流式下载笔记图片/视频到本地，不在内存中缓存整个文件
+        Args:
+            url: 媒体地址
+            save_file_name: 保存路径
+
+        Returns: 是否下载成功
+
+        """
+        return await media_downloader.download(url, save_file_name, proxies=self.proxies, timeout=self.timeout)
 
     async def pong(self) -> bool:
         """
@@ -319,29 +325,30 @@ class XiaoHongShuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_note_all_comments(
+    async def iter_note_comments(
         self,
         note_id: str,
         xsec_token: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ) -> List[Dict]:
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定笔记下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        逐页获取指定笔记下的一级评论(开启二级评论时紧跟其后的是二级评论)，每取到一页产出一页，
+        调用方边取边保存，内存占用与评论总数无关
         Args:
             note_id: 笔记ID
             xsec_token: 验证token
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
-            max_count: 一次笔记爬取的最大评论数量
+            max_count: 一次笔记爬取的最大一级评论数量
+
         Returns:
 
         """
-        result = []
+        comments_count = 0
+        sub_comments_count = 0
         comments_has_more = True
         comments_cursor = ""
-        while comments_has_more and len(result) < max_count:
+        while comments_has_more and comments_count < max_count:
             comments_res = await self.get_note_comments(
                 note_id=note_id, xsec_token=xsec_token, cursor=comments_cursor
             )
@@ -349,90 +356,103 @@ class XiaoHongShuClient(AbstractApiClient):
             comments_cursor = comments_res.get("cursor", "")
             if "comments" not in comments_res:
                 utils.logger.info(
-                    f"[XiaoHongShuClient.get_note_all_comments] No 'comments' key found in response: {comments_res}"
+                    f"[XiaoHongShuClient.iter_note_comments] No 'comments' key found in response: {comments_res}"
                 )
                 break
             comments = comments_res["comments"]
-            if len(result) + len(comments) > max_count:
-                comments = comments[: max_count - len(result)]
-            if callback:
-                await callback(note_id, comments)
-            await asyncio.sleep(crawl_interval)
-            result.extend(comments)
-            sub_comments = await self.get_comments_all_sub_comments(
+            if comments_count + len(comments) > max_count:
+                comments = comments[: max_count - comments_count]
+            comments_count += len(comments)
+            yield comments
+            await wait_crawl_interval(crawl_interval)
+            async for sub_comments in self.iter_comments_sub_comments(
                 comments=comments,
                 xsec_token=xsec_token,
                 crawl_interval=crawl_interval,
-                callback=callback,
-            )
-            result.extend(sub_comments)
-        return result
+                max_count=config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count,
+            ):
+                sub_comments_count += len(sub_comments)
+                yield sub_comments
 
-    async def get_comments_all_sub_comments(
+    async def iter_comments_sub_comments(
         self,
         comments: List[Dict],
         xsec_token: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+        max_count: int = 100,
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
+        并发获取多条一级评论下的二级评论，每条一级评论独立翻页，每取到一页产出一页
         Args:
             comments: 评论列表
             xsec_token: 验证token
             crawl_interval: 爬取一次评论的延迟单位（秒）
-            callback: 一次评论爬取结束后
+            max_count: 本批一级评论下最多获取的二级评论数量
 
         Returns:
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
             utils.logger.info(
-                f"[XiaoHongShuCrawler.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled"
+                f"[XiaoHongShuCrawler.iter_comments_sub_comments] Crawling sub_comment mode is not enabled"
             )
-            return []
-
-        result = []
-        for comment in comments:
-            note_id = comment.get("note_id")
-            sub_comments = comment.get("sub_comments")
-            if sub_comments and callback:
-                await callback(note_id, sub_comments)
-
-            sub_comment_has_more = comment.get("sub_comment_has_more")
-            if not sub_comment_has_more:
-                continue
-
-            root_comment_id = comment.get("id")
-            sub_comment_cursor = comment.get("sub_comment_cursor")
-
-            while sub_comment_has_more:
-                comments_res = await self.get_note_sub_comments(
-                    note_id=note_id,
-                    root_comment_id=root_comment_id,
-                    xsec_token=xsec_token,
-                    num=10,
-                    cursor=sub_comment_cursor,
+            return
+
+        threads = [
+            self.iter_sub_comment_thread(comment, xsec_token, crawl_interval)
+            for comment in comments
+            if comment.get("sub_comments") or comment.get("sub_comment_has_more")
+        ]
+        async for sub_comments in merge_page_iterators(threads, max_count=max_count,
+                                                      limiter=get_concurrency_limiter("xhs")):
+            yield sub_comments
+
+    async def iter_sub_comment_thread(
+        self,
+        comment: Dict,
+        xsec_token: str,
+        crawl_interval: float = 1.0,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取一条一级评论下的二级评论，先产出评论自带的二级评论，再按该评论的游标翻页
+        Args:
+            comment: 一级评论
+            xsec_token: 验证token
+            crawl_interval: 爬取一次评论的延迟单位（秒）
+
+        Returns:
+
+        """
+        note_id = comment.get("note_id")
+        sub_comments = comment.get("sub_comments")
+        if sub_comments:
+            yield sub_comments
+
+        sub_comment_has_more = comment.get("sub_comment_has_more")
+        root_comment_id = comment.get("id")
+        sub_comment_cursor = comment.get("sub_comment_cursor")
+        while sub_comment_has_more:
+            comments_res = await self.get_note_sub_comments(
+                note_id=note_id,
+                root_comment_id=root_comment_id,
+                xsec_token=xsec_token,
+                num=10,
+                cursor=sub_comment_cursor,
+            )
+            if comments_res is None:
+                utils.logger.info(
+                    f"[XiaoHongShuClient.iter_sub_comment_thread] No response found for note_id: {note_id}"
+                )
+                break
+            sub_comment_has_more = comments_res.get("has_more", False)
+            sub_comment_cursor = comments_res.get("cursor", "")
+            if "comments" not in comments_res:
+                utils.logger.info(
+                    f"[XiaoHongShuClient.iter_sub_comment_thread] No 'comments' key found in response: {comments_res}"
                 )
-                
-                if comments_res is None:
-                    utils.logger.info(
-                        f"[XiaoHongShuClient.get_comments_all_sub_comments] No response found for note_id: {note_id}"
-                    )
-                    continue
-                sub_comment_has_more = comments_res.get("has_more", False)
-                sub_comment_cursor = comments_res.get("cursor", "")
-                if "comments" not in comments_res:
-                    utils.logger.info(
-                        f"[XiaoHongShuClient.get_comments_all_sub_comments] No 'comments' key found in response: {comments_res}"
-                    )
-                    break
-                comments = comments_res["comments"]
-                if callback:
-                    await callback(note_id, comments)
-                await asyncio.sleep(crawl_interval)
-                result.extend(comments)
-        return result
+                break
+            yield comments_res["comments"]
+            await wait_crawl_interval(crawl_interval)
 
     async def get_creator_info(self, user_id: str) -> Dict:
         """
@@ -478,26 +498,26 @@ class XiaoHongShuClient(AbstractApiClient):
         }
         return await self.get(uri, data)
 
-    async def get_all_notes_by_creator(
+    async def iter_notes_by_creator(
         self,
         user_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+        is_seen: Optional[Callable[[Dict], bool]] = None,
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        逐页获取指定用户下发过的帖子，每取到一页产出一页，最多 CRAWLER_MAX_NOTES_COUNT 条
         Args:
             user_id: 用户ID
             crawl_interval: 爬取一次的延迟单位（秒）
-            callback: 一次分页爬取结束后的更新回调函数
+            is_seen: 判断帖子是否已经爬取过，遇到已爬取过的帖子(置顶帖除外)时停止翻页，用于增量爬取
 
         Returns:
 
         """
-        result = []
+        notes_count = 0
         notes_has_more = True
         notes_cursor = ""
-        while notes_has_more and len(result) < config.CRAWLER_MAX_NOTES_COUNT:
+        while notes_has_more and notes_count < config.CRAWLER_MAX_NOTES_COUNT:
             notes_res = await self.get_notes_by_creator(user_id, notes_cursor)
             if not notes_res:
                 utils.logger.error(
@@ -509,30 +529,41 @@ class XiaoHongShuClient(AbstractApiClient):
             notes_cursor = notes_res.get("cursor", "")
             if "notes" not in notes_res:
                 utils.logger.info(
-                    f"[XiaoHongShuClient.get_all_notes_by_creator] No 'notes' key found in response: {notes_res}"
+                    f"[XiaoHongShuClient.iter_notes_by_creator] No 'notes' key found in response: {notes_res}"
                 )
                 break
 
             notes = notes_res["notes"]
             utils.logger.info(
-                f"[XiaoHongShuClient.get_all_notes_by_creator] got user_id:{user_id} notes len : {len(notes)}"
+                f"[XiaoHongShuClient.iter_notes_by_creator] got user_id:{user_id} notes len : {len(notes)}"
             )
 
-            remaining = config.CRAWLER_MAX_NOTES_COUNT - len(result)
-            if remaining <= 0:
-                break
-
-            notes_to_add = notes[:remaining]
-            if callback:
-                await callback(notes_to_add)
-
-            result.extend(notes_to_add)
-            await asyncio.sleep(crawl_interval)
+            notes_to_add = notes[:config.CRAWLER_MAX_NOTES_COUNT - notes_count]
+            if is_seen:
+                notes_to_add, notes_has_more = self._drop_seen_notes(notes_to_add, is_seen, notes_has_more)
+            if notes_to_add:
+                notes_count += len(notes_to_add)
+                yield notes_to_add
+            await wait_crawl_interval(crawl_interval)
 
         utils.logger.info(
-            f"[XiaoHongShuClient.get_all_notes_by_creator] Finished getting notes for user {user_id}, total: {len(result)}"
+            f"[XiaoHongShuClient.iter_notes_by_creator] Finished getting notes for user {user_id}, total: {notes_count}"
         )
-        return result
+
+    @staticmethod
+    def _drop_seen_notes(notes: List[Dict], is_seen: Callable[[Dict], bool], has_more: bool) -> (List[Dict], bool):
+        """
+        去掉已爬取过的帖子，主页按发布时间倒序，遇到已爬取过的非置顶帖说明之后的帖子都已爬取过
+        Args:
+            notes: 一页帖子
+            is_seen: 判断帖子是否已经爬取过
+            has_more: 是否还有下一页
+
+        Returns: 未爬取过的帖子, 是否继续翻页
+
+        """
+        return utils.drop_seen_items(notes, is_seen, has_more,
+                                     is_pinned=lambda note: note.get("interact_info", {}).get("sticky"))
 
     async def get_note_short_url(self, note_id: str) -> Dict:
         """
@@ -568,32 +599,6 @@ class XiaoHongShuClient(AbstractApiClient):
         Returns:
 
         """
-
-        def camel_to_underscore(key):
-            return re.sub(r"(?<!^)(?=[A-Z])", "_", key).lower()
-
-        def transform_json_keys(json_data):
-            data_dict = json.loads(json_data)
-            dict_new = {}
-            for key, value in data_dict.items():
-                new_key = camel_to_underscore(key)
-                if not value:
-                    dict_new[new_key] = value
-                elif isinstance(value, dict):
-                    dict_new[new_key] = transform_json_keys(json.dumps(value))
-                elif isinstance(value, list):
-                    dict_new[new_key] = [
-                        (
-                            transform_json_keys(json.dumps(item))
-                            if (item and isinstance(item, dict))
-                            else item
-                        )
-                        for item in value
-                    ]
-                else:
-                    dict_new[new_key] = value
-            return dict_new
-
         url = (
             "https://www.xiaohongshu.com/explore/"
             + note_id
@@ -607,17 +612,7 @@ class XiaoHongShuClient(AbstractApiClient):
             method="GET", url=url, return_response=True, headers=copy_headers
         )
 
-        def get_note_dict(html):
-            state = re.findall(r"window.__INITIAL_STATE__=({.*})</script>", html)[
-                0
-            ].replace("undefined", '""')
-
-            if state != "{}":
-                note_dict = transform_json_keys(state)
-                return note_dict["note"]["note_detail_map"][note_id]["note"]
-            return {}
-
         try:
-            return get_note_dict(html)
-        except:
+            return await run_extraction(parse_note_detail_from_html, html, note_id)
+        except Exception:
             return None
@@ -10,11 +10,12 @@
 
 
 import asyncio
+import functools
 import os
 import random
 import time
 from asyncio import Task
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from playwright.async_api import (
     BrowserContext,
@@ -30,15 +31,20 @@ from base.base_crawler import AbstractCrawler
 from config import CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES
 from model.m_xiaohongshu import NoteUrlInfo
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator
 from store import xhs as xhs_store
-from tools import utils
+from store.crawl_index import crawl_index
+from store.media_blob_store import make_media_key
+from tools import http_pool, media_downloader, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from tools.crawl_pipeline import run_pipeline
 from tools.cdp_browser import CDPBrowserManager
-from var import crawler_type_var, source_keyword_var
+from var import crawler_type_var
 
 from .client import XiaoHongShuClient
 from .exception import DataFetchError
 from .field import SearchSortType
-from .help import parse_note_info_from_note_url, get_search_id
+from .help import parse_note_info_from_note_url, get_search_id, get_trace_id
 from .login import XiaoHongShuLogin
 
 
@@ -55,12 +61,14 @@ class XiaoHongShuCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self) -> None:
-        playwright_proxy_format, httpx_proxy_format = None, None
+        playwright_proxy_format, httpx_proxy_format, proxy_rotator = None, None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            # IP 被封禁时由 proxy_rotator 为 API 客户端自动更换代理
+            proxy_rotator = ProxyRotator(ip_proxy_pool, max_rotations=config.IP_PROXY_MAX_ROTATIONS)
+            ip_proxy_info: IpInfoModel = await proxy_rotator.lease()
             playwright_proxy_format, httpx_proxy_format = self.format_proxy_info(
                 ip_proxy_info
             )
@@ -92,6 +100,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
             # Create a client to interact with the xiaohongshu website.
             self.xhs_client = await self.create_xhs_client(httpx_proxy_format)
+            self.xhs_client.proxy_rotator = proxy_rotator
             if not await self.xhs_client.pong():
                 login_obj = XiaoHongShuLogin(
                     login_type=config.LOGIN_TYPE,
@@ -129,71 +138,108 @@ class XiaoHongShuCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < xhs_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = xhs_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
+        await self.run_keyword_searches(self.search_by_keyword, xhs_limit_count, start_page)
+
+    async def search_by_keyword(self, keyword: str, xhs_limit_count: int, start_page: int) -> None:
+        """
+        Search notes of one keyword and retrieve their comment information.
+        搜索翻页 -> 帖子详情 -> 保存 -> 评论 按流水线执行，第 N 页获取评论时第 N+1 页已在获取详情
+        """
+        utils.logger.info(
+            f"[XiaoHongShuCrawler.search_by_keyword] Current search keyword: {keyword}"
+        )
+        try:
+            await run_pipeline(
+                self.iter_search_pages(keyword, xhs_limit_count, start_page),
+                [self.fetch_search_note_details, self.store_search_notes, self.fetch_search_notes_comments],
+                queue_size=config.SEARCH_PIPELINE_QUEUE_SIZE,
+            )
+        except DataFetchError:
+            utils.logger.error(
+                "[XiaoHongShuCrawler.search_by_keyword] Get note detail error"
+            )
+
+    async def iter_search_pages(self, keyword: str, xhs_limit_count: int, start_page: int) -> AsyncIterator[Dict]:
+        """搜索流水线的第一阶段：逐页搜索，产出每页的搜索结果"""
+        page = 1
+        search_id = get_search_id()
+        while (
+                page - start_page + 1
+        ) * xhs_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[XiaoHongShuCrawler.iter_search_pages] Skip page {page}")
+                page += 1
+                continue
+
             utils.logger.info(
-                f"[XiaoHongShuCrawler.search] Current search keyword: {keyword}"
+                f"[XiaoHongShuCrawler.iter_search_pages] search xhs keyword: {keyword}, page: {page}"
             )
-            page = 1
-            search_id = get_search_id()
-            while (
-                    page - start_page + 1
-            ) * xhs_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[XiaoHongShuCrawler.search] Skip page {page}")
-                    page += 1
-                    continue
+            try:
+                notes_res = await self.xhs_client.get_note_by_keyword(
+                    keyword=keyword,
+                    search_id=search_id,
+                    page=page,
+                    sort=(
+                        SearchSortType(config.SORT_TYPE)
+                        if config.SORT_TYPE != ""
+                        else SearchSortType.GENERAL
+                    ),
+                )
+            except DataFetchError:
+                # 搜索出错时停止翻页，已取到的页在后续阶段继续处理完
+                utils.logger.error(
+                    f"[XiaoHongShuCrawler.iter_search_pages] Search notes error, keyword: {keyword}, page: {page}"
+                )
+                break
+            utils.logger.info(
+                f"[XiaoHongShuCrawler.iter_search_pages] Search notes res:{notes_res}"
+            )
+            if not notes_res or not notes_res.get("has_more", False):
+                utils.logger.info("No more content!")
+                break
+            page += 1
+            yield notes_res
+
+    async def fetch_search_note_details(self, notes_res: Dict) -> List[Optional[Dict]]:
+        """搜索流水线的详情阶段：并发获取一页搜索结果中帖子的详情"""
+        semaphore = get_concurrency_limiter("xhs")
+        task_list = [
+            self.get_note_detail_async_task(
+                note_id=post_item.get("id"),
+                xsec_source=post_item.get("xsec_source"),
+                xsec_token=post_item.get("xsec_token"),
+                semaphore=semaphore,
+            )
+            for post_item in notes_res.get("items", {})
+            if post_item.get("model_type") not in ("rec_query", "hot_query")
+            and not crawl_index.is_unchanged(
+                "xhs", post_item.get("id"),
+                self.get_interact_counts(post_item.get("note_card", {}).get("interact_info", {}))
+            )
+        ]
+        return await asyncio.gather(*task_list)
 
-                try:
-                    utils.logger.info(
-                        f"[XiaoHongShuCrawler.search] search xhs keyword: {keyword}, page: {page}"
-                    )
-                    note_ids: List[str] = []
-                    xsec_tokens: List[str] = []
-                    notes_res = await self.xhs_client.get_note_by_keyword(
-                        keyword=keyword,
-                        search_id=search_id,
-                        page=page,
-                        sort=(
-                            SearchSortType(config.SORT_TYPE)
-                            if config.SORT_TYPE != ""
-                            else SearchSortType.GENERAL
-                        ),
-                    )
-                    utils.logger.info(
-                        f"[XiaoHongShuCrawler.search] Search notes res:{notes_res}"
-                    )
-                    if not notes_res or not notes_res.get("has_more", False):
-                        utils.logger.info("No more content!")
-                        break
-                    semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
-                    task_list = [
-                        self.get_note_detail_async_task(
-                            note_id=post_item.get("id"),
-                            xsec_source=post_item.get("xsec_source"),
-                            xsec_token=post_item.get("xsec_token"),
-                            semaphore=semaphore,
-                        )
-                        for post_item in notes_res.get("items", {})
-                        if post_item.get("model_type") not in ("rec_query", "hot_query")
-                    ]
-                    note_details = await asyncio.gather(*task_list)
-                    for note_detail in note_details:
-                        if note_detail:
-                            await xhs_store.update_xhs_note(note_detail)
-                            await self.get_notice_media(note_detail)
-                            note_ids.append(note_detail.get("note_id"))
-                            xsec_tokens.append(note_detail.get("xsec_token"))
-                    page += 1
-                    utils.logger.info(
-                        f"[XiaoHongShuCrawler.search] Note details: {note_details}"
-                    )
-                    await self.batch_get_note_comments(note_ids, xsec_tokens)
-                except DataFetchError:
-                    utils.logger.error(
-                        "[XiaoHongShuCrawler.search] Get note detail error"
-                    )
-                    break
+    async def store_search_notes(self, note_details: List[Optional[Dict]]) -> List[Optional[Dict]]:
+        """搜索流水线的保存阶段：保存帖子详情并提交媒体下载"""
+        for note_detail in note_details:
+            if note_detail:
+                await xhs_store.update_xhs_note(note_detail)
+                await self.get_notice_media(note_detail)
+        utils.logger.info(
+            f"[XiaoHongShuCrawler.store_search_notes] Note details: {note_details}"
+        )
+        return note_details
+
+    async def fetch_search_notes_comments(self, note_details: List[Optional[Dict]]) -> None:
+        """搜索流水线的评论阶段：获取一页帖子的评论，完成后记入增量爬取索引"""
+        note_ids: List[str] = []
+        xsec_tokens: List[str] = []
+        for note_detail in note_details:
+            if note_detail:
+                note_ids.append(note_detail.get("note_id"))
+                xsec_tokens.append(note_detail.get("xsec_token"))
+        await self.batch_get_note_comments(note_ids, xsec_tokens)
+        await self.mark_notes_seen(note_details)
 
     async def get_creators_and_notes(self) -> None:
         """Get creator's notes and retrieve their comment information."""
@@ -213,25 +259,28 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 crawl_interval = random.random()
             else:
                 crawl_interval = random.uniform(1, config.CRAWLER_MAX_SLEEP_SEC)
-            # Get all note information of the creator
-            all_notes_list = await self.xhs_client.get_all_notes_by_creator(
-                user_id=user_id,
-                crawl_interval=crawl_interval,
-                callback=self.fetch_creator_notes_detail,
-            )
-
+            # Get all note information of the creator, page by page
             note_ids = []
             xsec_tokens = []
-            for note_item in all_notes_list:
-                note_ids.append(note_item.get("note_id"))
-                xsec_tokens.append(note_item.get("xsec_token"))
+            seen_notes = []
+            async for note_list in self.xhs_client.iter_notes_by_creator(
+                user_id=user_id,
+                crawl_interval=crawl_interval,
+                is_seen=lambda note_item: crawl_index.is_seen("xhs", note_item.get("note_id")),
+            ):
+                await self.fetch_creator_notes_detail(note_list)
+                for note_item in note_list:
+                    note_ids.append(note_item.get("note_id"))
+                    xsec_tokens.append(note_item.get("xsec_token"))
+                    seen_notes.append({"note_id": note_item.get("note_id"), "interact_info": note_item.get("interact_info", {})})
             await self.batch_get_note_comments(note_ids, xsec_tokens)
+            await self.mark_notes_seen(seen_notes)
 
     async def fetch_creator_notes_detail(self, note_list: List[Dict]):
         """
         Concurrently obtain the specified post list and save the data
         """
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("xhs")
         task_list = [
             self.get_note_detail_async_task(
                 note_id=post_item.get("note_id"),
@@ -264,7 +313,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 note_id=note_url_info.note_id,
                 xsec_source=note_url_info.xsec_source,
                 xsec_token=note_url_info.xsec_token,
-                semaphore=asyncio.Semaphore(config.MAX_CONCURRENCY_NUM),
+                semaphore=get_concurrency_limiter("xhs"),
             )
             get_note_detail_task_list.append(crawler_task)
 
@@ -273,17 +322,47 @@ class XiaoHongShuCrawler(AbstractCrawler):
         note_details = await asyncio.gather(*get_note_detail_task_list)
         for note_detail in note_details:
             if note_detail:
+                await xhs_store.update_xhs_note(note_detail)
+                # 详情必须请求才能拿到互动数，互动数没有变化时跳过评论
+                if crawl_index.is_unchanged("xhs", note_detail.get("note_id"),
+                                            self.get_interact_counts(note_detail.get("interact_info", {}))):
+                    continue
                 need_get_comment_note_ids.append(note_detail.get("note_id", ""))
                 xsec_tokens.append(note_detail.get("xsec_token", ""))
-                await xhs_store.update_xhs_note(note_detail)
         await self.batch_get_note_comments(need_get_comment_note_ids, xsec_tokens)
+        await self.mark_notes_seen(note_details)
+
+    @staticmethod
+    def get_interact_counts(interact_info: Dict) -> Dict:
+        """
+        统一搜索结果、主页帖子列表、帖子详情中的互动数字段，用于增量爬取判断帖子是否有变化
+        Args:
+            interact_info: 接口返回的 interact_info
+
+        Returns:
+
+        """
+        return {
+            "liked_count": interact_info.get("liked_count"),
+            "collected_count": interact_info.get("collected_count"),
+            "comment_count": interact_info.get("comment_count"),
+            "share_count": interact_info.get("share_count", interact_info.get("shared_count")),
+        }
+
+    async def mark_notes_seen(self, note_list: List[Optional[Dict]]) -> None:
+        """详情和评论都已保存后，把帖子及其互动数记入增量爬取索引"""
+        for note_item in note_list:
+            if note_item:
+                crawl_index.mark_seen("xhs", note_item.get("note_id"),
+                                      self.get_interact_counts(note_item.get("interact_info", {})))
+        await crawl_index.flush()
 
     async def get_note_detail_async_task(
             self,
             note_id: str,
             xsec_source: str,
             xsec_token: str,
-            semaphore: asyncio.Semaphore,
+            semaphore: AdaptiveConcurrencyLimiter,
     ) -> Optional[Dict]:
         """Get note detail
 
@@ -345,7 +424,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
         utils.logger.info(
             f"[XiaoHongShuCrawler.batch_get_note_comments] Begin batch get note comments, note list: {note_list}"
         )
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("xhs")
         task_list: List[Task] = []
         for index, note_id in enumerate(note_list):
             task = asyncio.create_task(
@@ -358,7 +437,7 @@ class XiaoHongShuCrawler(AbstractCrawler):
         await asyncio.gather(*task_list)
 
     async def get_comments(
-            self, note_id: str, xsec_token: str, semaphore: asyncio.Semaphore
+            self, note_id: str, xsec_token: str, semaphore: AdaptiveConcurrencyLimiter
     ):
         """Get note comments with keyword filtering and quantity limitation"""
         async with semaphore:
@@ -370,13 +449,13 @@ class XiaoHongShuCrawler(AbstractCrawler):
                 crawl_interval = random.random()
             else:
                 crawl_interval = random.uniform(1, config.CRAWLER_MAX_SLEEP_SEC)
-            await self.xhs_client.get_note_all_comments(
+            async for comments in self.xhs_client.iter_note_comments(
                 note_id=note_id,
                 xsec_token=xsec_token,
                 crawl_interval=crawl_interval,
-                callback=xhs_store.batch_update_xhs_note_comments,
                 max_count=CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-            )
+            ):
+                await xhs_store.batch_update_xhs_note_comments(note_id, comments)
 
     @staticmethod
     def format_proxy_info(
@@ -496,6 +575,9 @@ class XiaoHongShuCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭共享的 HTTP 连接池
+        await media_downloader.close()
+        await http_pool.close_all()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -535,12 +617,14 @@ class XiaoHongShuCrawler(AbstractCrawler):
             url = pic.get("url")
             if not url:
                 continue
-            content = await self.xhs_client.get_note_media(url)
-            if content is None:
-                continue
             extension_file_name = f"{picNum}.jpg"
             picNum += 1
-            await xhs_store.update_xhs_note_image(note_id, content, extension_file_name)
+            # 放入下载队列后台下载，不阻塞笔记和评论的爬取；同一张图片(trace id 相同)只下载一次
+            await media_downloader.enqueue(
+                functools.partial(xhs_store.download_xhs_note_media, note_id, extension_file_name,
+                                  get_trace_id(url), functools.partial(self.xhs_client.download_note_media, url)),
+                f"{note_id}/{extension_file_name}"
+            )
 
     async def get_notice_video(self, note_item: Dict):
         """
@@ -558,9 +642,10 @@ class XiaoHongShuCrawler(AbstractCrawler):
             return
         videoNum = 0
         for url in videos:
-            content = await self.xhs_client.get_note_media(url)
-            if content is None:
-                continue
             extension_file_name = f"{videoNum}.mp4"
             videoNum += 1
-            await xhs_store.update_xhs_note_image(note_id, content, extension_file_name)
+            await media_downloader.enqueue(
+                functools.partial(xhs_store.download_xhs_note_media, note_id, extension_file_name,
+                                  make_media_key(url), functools.partial(self.xhs_client.download_note_media, url)),
+                f"{note_id}/{extension_file_name}"
+            )
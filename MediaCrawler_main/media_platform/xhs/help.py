@@ -12,8 +12,10 @@
 import ctypes
 import json
 import random
+import re
 import time
 import urllib.parse
+from typing import Dict
 
 from model.m_xiaohongshu import NoteUrlInfo
 from tools.crawler_util import extract_url_params_to_dict
@@ -306,6 +308,55 @@ def parse_note_info_from_note_url(url: str) -> NoteUrlInfo:
     return NoteUrlInfo(note_id=note_id, xsec_token=xsec_token, xsec_source=xsec_source)
 
 
+def camel_to_underscore(key: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", key).lower()
+
+
+def transform_json_keys(data_dict: Dict) -> Dict:
+    """
+    把字典(包括嵌套的字典、列表中的字典)的 key 从驼峰转换为下划线，直接遍历已解析的对象，
+    不再对每一层子对象重复 json.dumps/json.loads
+    Args:
+        data_dict:
+
+    Returns:
+
+    """
+    dict_new = {}
+    for key, value in data_dict.items():
+        new_key = camel_to_underscore(key)
+        if not value:
+            dict_new[new_key] = value
+        elif isinstance(value, dict):
+            dict_new[new_key] = transform_json_keys(value)
+        elif isinstance(value, list):
+            dict_new[new_key] = [
+                transform_json_keys(item) if (item and isinstance(item, dict)) else item
+                for item in value
+            ]
+        else:
+            dict_new[new_key] = value
+    return dict_new
+
+
+def parse_note_detail_from_html(html: str, note_id: str) -> Dict:
+    """
+    从笔记详情页 HTML 的 window.__INITIAL_STATE__ 中解析笔记详情，页面较大，由解析进程池执行
+    Args:
+        html: 笔记详情页 HTML
+        note_id: 笔记ID
+
+    Returns:
+        笔记详情，页面中没有数据时返回空字典
+
+    """
+    state = re.findall(r"window.__INITIAL_STATE__=({.*})</script>", html)[0].replace("undefined", '""')
+    if state != "{}":
+        note_dict = transform_json_keys(json.loads(state))
+        return note_dict["note"]["note_detail_map"][note_id]["note"]
+    return {}
+
+
 if __name__ == '__main__':
     _img_url = "https://sns-img-bd.xhscdn.com/7a3abfaf-90c1-a828-5de7-022c80b92aa3"
     # 获取一个图片地址在多个cdn下的url地址
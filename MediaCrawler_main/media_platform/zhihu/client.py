@@ -10,23 +10,26 @@
 
 
 # -*- coding: utf-8 -*-
-import asyncio
 import json
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
 from httpx import Response
 from playwright.async_api import BrowserContext, Page
 from tenacity import retry, stop_after_attempt, wait_fixed
 
 import config
 from base.base_crawler import AbstractApiClient
+from proxy.proxy_rotator import rotate_proxy_on_block
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
-from tools import utils
+from tools import http_pool, utils
+from tools.concurrency_limiter import get_concurrency_limiter
+from tools.crawl_pipeline import merge_page_iterators
+from tools.extraction_executor import run_extraction
+from tools.rate_limiter import rate_limited, wait_crawl_interval
 
-from .exception import DataFetchError, ForbiddenError
+from .exception import DataFetchError, ForbiddenError, IPBlockError
 from .field import SearchSort, SearchTime, SearchType
 from .help import ZhihuExtractor, sign
 
@@ -58,13 +61,15 @@ class ZhiHuClient(AbstractApiClient):
         d_c0 = self.cookie_dict.get("d_c0")
         if not d_c0:
             raise Exception("d_c0 not found in cookies")
-        sign_res = sign(url, self.default_headers["cookie"])
+        sign_res = await sign(url, self.default_headers["cookie"])
         headers = self.default_headers.copy()
         headers['x-zst-81'] = sign_res["x-zst-81"]
         headers['x-zse-96'] = sign_res["x-zse-96"]
         return headers
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    @rotate_proxy_on_block(IPBlockError)
+    @rate_limited("zhihu", IPBlockError)
     async def request(self, method, url, **kwargs) -> Union[str, Any]:
         """
         封装httpx的公共请求方法，对请求响应做一些处理
@@ -79,16 +84,18 @@ class ZhiHuClient(AbstractApiClient):
         # return response.text
         return_response = kwargs.pop('return_response', False)
 
-        async with httpx.AsyncClient(proxies=self.proxies, ) as client:
-            response = await client.request(
-                method, url, timeout=self.timeout,
-                **kwargs
-            )
+        client = http_pool.get_client(self.proxies)
+        response = await client.request(
+            method, url, timeout=self.timeout,
+            **kwargs
+        )
 
         if response.status_code != 200:
             utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
             if response.status_code == 403:
                 raise ForbiddenError(response.text)
+            elif response.status_code == 429:
+                raise IPBlockError(response.text)
             elif response.status_code == 404: # 如果一个content没有评论也是404
                 return {}
 
@@ -259,19 +266,17 @@ class ZhiHuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_note_all_comments(self, content: ZhihuContent, crawl_interval: float = 1.0,
-                                    callback: Optional[Callable] = None) -> List[ZhihuComment]:
+    async def iter_note_comments(self, content: ZhihuContent, crawl_interval: float = 1.0) -> AsyncIterator[List[ZhihuComment]]:
         """
-        获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        逐页获取指定帖子下的一级评论(开启二级评论时紧跟其后的是二级评论)，每取到一页产出一页
         Args:
             content: 内容详情对象(问题｜文章｜视频)
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
 
         Returns:
 
         """
-        result: List[ZhihuComment] = []
+        sub_comments_count = 0
         is_end: bool = False
         offset: str = ""
         limit: int = 10
@@ -287,56 +292,69 @@ class ZhiHuClient(AbstractApiClient):
             if not comments:
                 break
 
-            if callback:
-                await callback(comments)
-
-            result.extend(comments)
-            await self.get_comments_all_sub_comments(content, comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
-        return result
+            yield comments
+            async for sub_comments in self.iter_comments_sub_comments(
+                    content, comments, crawl_interval=crawl_interval,
+                    max_count=config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES - sub_comments_count):
+                sub_comments_count += len(sub_comments)
+                yield sub_comments
+            await wait_crawl_interval(crawl_interval)
 
-    async def get_comments_all_sub_comments(self, content: ZhihuContent, comments: List[ZhihuComment], crawl_interval: float = 1.0,
-                                            callback: Optional[Callable] = None) -> List[ZhihuComment]:
+    async def iter_comments_sub_comments(self, content: ZhihuContent, comments: List[ZhihuComment],
+                                         crawl_interval: float = 1.0,
+                                         max_count: int = 100) -> AsyncIterator[List[ZhihuComment]]:
         """
-        获取指定评论下的所有子评论
+        并发获取多条评论下的子评论，每条评论独立翻页，每取到一页产出一页
         Args:
             content: 内容详情对象(问题｜文章｜视频)
             comments: 评论列表
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
+            max_count: 本批评论下最多获取的子评论数量
 
         Returns:
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
-            return []
-
-        all_sub_comments: List[ZhihuComment] = []
-        for parment_comment in comments:
-            if parment_comment.sub_comment_count == 0:
-                continue
-
-            is_end: bool = False
-            offset: str = ""
-            limit: int = 10
-            while not is_end:
-                child_comment_res = await self.get_child_comments(parment_comment.comment_id, offset, limit)
-                if not child_comment_res:
-                    break
-                paging_info = child_comment_res.get("paging", {})
-                is_end = paging_info.get("is_end")
-                offset = self._extractor.extract_offset(paging_info)
-                sub_comments = self._extractor.extract_comments(content, child_comment_res.get("data"))
-
-                if not sub_comments:
-                    break
-
-                if callback:
-                    await callback(sub_comments)
-
-                all_sub_comments.extend(sub_comments)
-                await asyncio.sleep(crawl_interval)
-        return all_sub_comments
+            return
+
+        threads = [
+            self.iter_sub_comment_thread(content, parment_comment, crawl_interval)
+            for parment_comment in comments
+            if parment_comment.sub_comment_count > 0
+        ]
+        async for sub_comments in merge_page_iterators(threads, max_count=max_count,
+                                                      limiter=get_concurrency_limiter("zhihu")):
+            yield sub_comments
+
+    async def iter_sub_comment_thread(self, content: ZhihuContent, parment_comment: ZhihuComment,
+                                      crawl_interval: float = 1.0) -> AsyncIterator[List[ZhihuComment]]:
+        """
+        逐页获取一条评论下的子评论
+        Args:
+            content: 内容详情对象(问题｜文章｜视频)
+            parment_comment: 父级评论
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+
+        Returns:
+
+        """
+        is_end: bool = False
+        offset: str = ""
+        limit: int = 10
+        while not is_end:
+            child_comment_res = await self.get_child_comments(parment_comment.comment_id, offset, limit)
+            if not child_comment_res:
+                break
+            paging_info = child_comment_res.get("paging", {})
+            is_end = paging_info.get("is_end")
+            offset = self._extractor.extract_offset(paging_info)
+            sub_comments = self._extractor.extract_comments(content, child_comment_res.get("data"))
+
+            if not sub_comments:
+                break
+
+            yield sub_comments
+            await wait_crawl_interval(crawl_interval)
 
     async def get_creator_info(self, url_token: str) -> Optional[ZhihuCreator]:
         """
@@ -349,7 +367,7 @@ class ZhiHuClient(AbstractApiClient):
         """
         uri = f"/people/{url_token}"
         html_content: str = await self.get(uri, return_response=True)
-        return self._extractor.extract_creator(url_token, html_content)
+        return await run_extraction(self._extractor.extract_creator, url_token, html_content)
 
     async def get_creator_answers(self, url_token: str, offset: int = 0, limit: int = 20) -> Dict:
         """
@@ -412,19 +430,18 @@ class ZhiHuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_all_anwser_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0,
-                                        callback: Optional[Callable] = None) -> List[ZhihuContent]:
+    async def iter_answers_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0,
+                                      is_seen: Optional[Callable[[ZhihuContent], bool]] = None) -> AsyncIterator[List[ZhihuContent]]:
         """
-        获取创作者的所有回答
+        逐页获取创作者的所有回答，每取到一页产出一页
         Args:
             creator: 创作者信息
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
+            is_seen: 判断内容是否已经爬取过，遇到已爬取过的内容时停止翻页，用于增量爬取
 
         Returns:
 
         """
-        all_contents: List[ZhihuContent] = []
         is_end: bool = False
         offset: int = 0
         limit: int = 20
@@ -432,31 +449,31 @@ class ZhiHuClient(AbstractApiClient):
             res = await self.get_creator_answers(creator.url_token, offset, limit)
             if not res:
                 break
-            utils.logger.info(f"[ZhiHuClient.get_all_anwser_by_creator] Get creator {creator.url_token} answers: {res}")
+            utils.logger.info(f"[ZhiHuClient.iter_answers_by_creator] Get creator {creator.url_token} answers: {res}")
             paging_info = res.get("paging", {})
             is_end = paging_info.get("is_end")
-            contents = self._extractor.extract_content_list_from_creator(res.get("data"))
-            if callback:
-                await callback(contents)
-            all_contents.extend(contents)
+            content_list = self._extractor.extract_content_list_from_creator(res.get("data"))
+            if is_seen:
+                content_list, has_more = utils.drop_seen_items(content_list, is_seen, not is_end)
+                is_end = not has_more
+            if content_list:
+                yield content_list
             offset += limit
-            await asyncio.sleep(crawl_interval)
-        return all_contents
+            await wait_crawl_interval(crawl_interval)
 
 
-    async def get_all_articles_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0,
-                                          callback: Optional[Callable] = None) -> List[ZhihuContent]:
+    async def iter_articles_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0,
+                                       is_seen: Optional[Callable[[ZhihuContent], bool]] = None) -> AsyncIterator[List[ZhihuContent]]:
         """
-        获取创作者的所有文章
+        逐页获取创作者的所有文章，每取到一页产出一页
         Args:
-            creator:
-            crawl_interval:
-            callback:
+            creator: 创作者信息
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            is_seen: 判断内容是否已经爬取过，遇到已爬取过的内容时停止翻页，用于增量爬取
 
         Returns:
 
         """
-        all_contents: List[ZhihuContent] = []
         is_end: bool = False
         offset: int = 0
         limit: int = 20
@@ -466,28 +483,28 @@ class ZhiHuClient(AbstractApiClient):
                 break
             paging_info = res.get("paging", {})
             is_end = paging_info.get("is_end")
-            contents = self._extractor.extract_content_list_from_creator(res.get("data"))
-            if callback:
-                await callback(contents)
-            all_contents.extend(contents)
+            content_list = self._extractor.extract_content_list_from_creator(res.get("data"))
+            if is_seen:
+                content_list, has_more = utils.drop_seen_items(content_list, is_seen, not is_end)
+                is_end = not has_more
+            if content_list:
+                yield content_list
             offset += limit
-            await asyncio.sleep(crawl_interval)
-        return all_contents
+            await wait_crawl_interval(crawl_interval)
 
 
-    async def get_all_videos_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0,
-                                        callback: Optional[Callable] = None) -> List[ZhihuContent]:
+    async def iter_videos_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0,
+                                     is_seen: Optional[Callable[[ZhihuContent], bool]] = None) -> AsyncIterator[List[ZhihuContent]]:
         """
-        获取创作者的所有视频
+        逐页获取创作者的所有视频，每取到一页产出一页
         Args:
-            creator:
-            crawl_interval:
-            callback:
+            creator: 创作者信息
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            is_seen: 判断内容是否已经爬取过，遇到已爬取过的内容时停止翻页，用于增量爬取
 
         Returns:
 
         """
-        all_contents: List[ZhihuContent] = []
         is_end: bool = False
         offset: int = 0
         limit: int = 20
@@ -497,13 +514,14 @@ class ZhiHuClient(AbstractApiClient):
                 break
             paging_info = res.get("paging", {})
             is_end = paging_info.get("is_end")
-            contents = self._extractor.extract_content_list_from_creator(res.get("data"))
-            if callback:
-                await callback(contents)
-            all_contents.extend(contents)
+            content_list = self._extractor.extract_content_list_from_creator(res.get("data"))
+            if is_seen:
+                content_list, has_more = utils.drop_seen_items(content_list, is_seen, not is_end)
+                is_end = not has_more
+            if content_list:
+                yield content_list
             offset += limit
-            await asyncio.sleep(crawl_interval)
-        return all_contents
+            await wait_crawl_interval(crawl_interval)
 
 
     async def get_answer_info(
@@ -520,7 +538,7 @@ class ZhiHuClient(AbstractApiClient):
         """
         uri = f"/question/{question_id}/answer/{answer_id}"
         response_html = await self.get(uri, return_response=True)
-        return self._extractor.extract_answer_content_from_html(response_html)
+        return await run_extraction(self._extractor.extract_answer_content_from_html, response_html)
 
     async def get_article_info(self, article_id: str) -> Optional[ZhihuContent]:
         """
@@ -533,7 +551,7 @@ class ZhiHuClient(AbstractApiClient):
         """
         uri = f"/p/{article_id}"
         response_html = await self.get(uri, return_response=True)
-        return self._extractor.extract_article_content_from_html(response_html)
+        return await run_extraction(self._extractor.extract_article_content_from_html, response_html)
 
     async def get_video_info(self, video_id: str) -> Optional[ZhihuContent]:
         """
@@ -546,4 +564,4 @@ class ZhiHuClient(AbstractApiClient):
         """
         uri = f"/zvideo/{video_id}"
         response_html = await self.get(uri, return_response=True)
-        return self._extractor.extract_zvideo_content_from_html(response_html)
+        return await run_extraction(self._extractor.extract_zvideo_content_from_html, response_html)
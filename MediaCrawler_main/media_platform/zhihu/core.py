@@ -29,10 +29,13 @@ from constant import zhihu as constant
 from base.base_crawler import AbstractCrawler
 from model.m_zhihu import ZhihuContent, ZhihuCreator
 from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator
 from store import zhihu as zhihu_store
-from tools import utils
+from store.crawl_index import crawl_index
+from tools import http_pool, signer_pool, utils
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter, get_concurrency_limiter
 from tools.cdp_browser import CDPBrowserManager
-from var import crawler_type_var, source_keyword_var
+from var import crawler_type_var
 
 from .client import ZhiHuClient
 from .exception import DataFetchError
@@ -59,12 +62,14 @@ class ZhihuCrawler(AbstractCrawler):
         Returns:
 
         """
-        playwright_proxy_format, httpx_proxy_format = None, None
+        playwright_proxy_format, httpx_proxy_format, proxy_rotator = None, None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
             )
-            ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
+            # IP 被封禁时由 proxy_rotator 为 API 客户端自动更换代理
+            proxy_rotator = ProxyRotator(ip_proxy_pool, max_rotations=config.IP_PROXY_MAX_ROTATIONS)
+            ip_proxy_info: IpInfoModel = await proxy_rotator.lease()
             playwright_proxy_format, httpx_proxy_format = self.format_proxy_info(
                 ip_proxy_info
             )
@@ -94,6 +99,7 @@ class ZhihuCrawler(AbstractCrawler):
 
             # Create a client to interact with the zhihu website.
             self.zhihu_client = await self.create_zhihu_client(httpx_proxy_format)
+            self.zhihu_client.proxy_rotator = proxy_rotator
             if not await self.zhihu_client.pong():
                 login_obj = ZhiHuLogin(
                     login_type=config.LOGIN_TYPE,
@@ -139,45 +145,52 @@ class ZhihuCrawler(AbstractCrawler):
         if config.CRAWLER_MAX_NOTES_COUNT < zhihu_limit_count:
             config.CRAWLER_MAX_NOTES_COUNT = zhihu_limit_count
         start_page = config.START_PAGE
-        for keyword in config.KEYWORDS.split(","):
-            source_keyword_var.set(keyword)
-            utils.logger.info(
-                f"[ZhihuCrawler.search] Current search keyword: {keyword}"
-            )
-            page = 1
-            while (
-                page - start_page + 1
-            ) * zhihu_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
-                if page < start_page:
-                    utils.logger.info(f"[ZhihuCrawler.search] Skip page {page}")
-                    page += 1
-                    continue
-
-                try:
-                    utils.logger.info(
-                        f"[ZhihuCrawler.search] search zhihu keyword: {keyword}, page: {page}"
-                    )
-                    content_list: List[ZhihuContent] = (
-                        await self.zhihu_client.get_note_by_keyword(
-                            keyword=keyword,
-                            page=page,
-                        )
-                    )
-                    utils.logger.info(
-                        f"[ZhihuCrawler.search] Search contents :{content_list}"
-                    )
-                    if not content_list:
-                        utils.logger.info("No more content!")
-                        break
+        await self.run_keyword_searches(self.search_by_keyword, zhihu_limit_count, start_page)
 
-                    page += 1
-                    for content in content_list:
-                        await zhihu_store.update_zhihu_content(content)
+    async def search_by_keyword(self, keyword: str, zhihu_limit_count: int, start_page: int) -> None:
+        """Search contents of one keyword and retrieve their comment information."""
+        utils.logger.info(
+            f"[ZhihuCrawler.search_by_keyword] Current search keyword: {keyword}"
+        )
+        page = 1
+        while (
+            page - start_page + 1
+        ) * zhihu_limit_count <= config.CRAWLER_MAX_NOTES_COUNT:
+            if page < start_page:
+                utils.logger.info(f"[ZhihuCrawler.search_by_keyword] Skip page {page}")
+                page += 1
+                continue
 
-                    await self.batch_get_content_comments(content_list)
-                except DataFetchError:
-                    utils.logger.error("[ZhihuCrawler.search] Search content error")
-                    return
+            try:
+                utils.logger.info(
+                    f"[ZhihuCrawler.search_by_keyword] search zhihu keyword: {keyword}, page: {page}"
+                )
+                content_list: List[ZhihuContent] = (
+                    await self.zhihu_client.get_note_by_keyword(
+                        keyword=keyword,
+                        page=page,
+                    )
+                )
+                utils.logger.info(
+                    f"[ZhihuCrawler.search_by_keyword] Search contents :{content_list}"
+                )
+                if not content_list:
+                    utils.logger.info("No more content!")
+                    break
+
+                page += 1
+                changed_content_list: List[ZhihuContent] = []
+                for content in content_list:
+                    await zhihu_store.update_zhihu_content(content)
+                    # 搜索结果自带赞同数和评论数，没有变化时跳过评论
+                    if not crawl_index.is_unchanged("zhihu", content.content_id, self.get_interact_counts(content)):
+                        changed_content_list.append(content)
+
+                await self.batch_get_content_comments(changed_content_list)
+                await self.mark_contents_seen(changed_content_list)
+            except DataFetchError:
+                utils.logger.error("[ZhihuCrawler.search_by_keyword] Search content error")
+                return
 
     async def batch_get_content_comments(self, content_list: List[ZhihuContent]):
         """
@@ -194,7 +207,7 @@ class ZhihuCrawler(AbstractCrawler):
             )
             return
 
-        semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY_NUM)
+        semaphore = get_concurrency_limiter("zhihu")
         task_list: List[Task] = []
         for content_item in content_list:
             task = asyncio.create_task(
@@ -204,7 +217,7 @@ class ZhihuCrawler(AbstractCrawler):
         await asyncio.gather(*task_list)
 
     async def get_comments(
-        self, content_item: ZhihuContent, semaphore: asyncio.Semaphore
+        self, content_item: ZhihuContent, semaphore: AdaptiveConcurrencyLimiter
     ):
         """
         Get note comments with keyword filtering and quantity limitation
@@ -219,11 +232,11 @@ class ZhihuCrawler(AbstractCrawler):
             utils.logger.info(
                 f"[ZhihuCrawler.get_comments] Begin get note id comments {content_item.content_id}"
             )
-            await self.zhihu_client.get_note_all_comments(
+            async for comments in self.zhihu_client.iter_note_comments(
                 content=content_item,
                 crawl_interval=random.random(),
-                callback=zhihu_store.batch_update_zhihu_note_comments,
-            )
+            ):
+                await zhihu_store.batch_update_zhihu_note_comments(comments)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -254,34 +267,19 @@ class ZhihuCrawler(AbstractCrawler):
             )
             await zhihu_store.save_creator(creator=createor_info)
 
-            # 默认只提取回答信息，如果需要文章和视频，把下面的注释打开即可
-
-            # Get all anwser information of the creator
-            all_content_list = await self.zhihu_client.get_all_anwser_by_creator(
+            # Get all anwser information of the creator, and the comments of each page
+            # 默认只提取回答信息，如果需要文章和视频，把 iter_answers_by_creator 换成 iter_articles_by_creator 或 iter_videos_by_creator 即可
+            async for content_list in self.zhihu_client.iter_answers_by_creator(
                 creator=createor_info,
                 crawl_interval=random.random(),
-                callback=zhihu_store.batch_update_zhihu_contents,
-            )
-
-            # Get all articles of the creator's contents
-            # all_content_list = await self.zhihu_client.get_all_articles_by_creator(
-            #     creator=createor_info,
-            #     crawl_interval=random.random(),
-            #     callback=zhihu_store.batch_update_zhihu_contents
-            # )
-
-            # Get all videos of the creator's contents
-            # all_content_list = await self.zhihu_client.get_all_videos_by_creator(
-            #     creator=createor_info,
-            #     crawl_interval=random.random(),
-            #     callback=zhihu_store.batch_update_zhihu_contents
-            # )
-
-            # Get all comments of the creator's contents
-            await self.batch_get_content_comments(all_content_list)
+                is_seen=lambda content: crawl_index.is_seen("zhihu", content.content_id),
+            ):
+                await zhihu_store.batch_update_zhihu_contents(content_list)
+                await self.batch_get_content_comments(content_list)
+                await self.mark_contents_seen(content_list)
 
     async def get_note_detail(
-        self, full_note_url: str, semaphore: asyncio.Semaphore
+        self, full_note_url: str, semaphore: AdaptiveConcurrencyLimiter
     ) -> Optional[ZhihuContent]:
         """
         Get note detail
@@ -332,7 +330,7 @@ class ZhihuCrawler(AbstractCrawler):
             full_note_url = full_note_url.split("?")[0]
             crawler_task = self.get_note_detail(
                 full_note_url=full_note_url,
-                semaphore=asyncio.Semaphore(config.MAX_CONCURRENCY_NUM),
+                semaphore=get_concurrency_limiter("zhihu"),
             )
             get_note_detail_task_list.append(crawler_task)
 
@@ -346,10 +344,34 @@ class ZhihuCrawler(AbstractCrawler):
                 continue
 
             note_detail = cast(ZhihuContent, note_detail)  # only for type check
-            need_get_comment_notes.append(note_detail)
             await zhihu_store.update_zhihu_content(note_detail)
+            if crawl_index.is_unchanged("zhihu", note_detail.content_id, self.get_interact_counts(note_detail)):
+                continue
+            need_get_comment_notes.append(note_detail)
 
         await self.batch_get_content_comments(need_get_comment_notes)
+        await self.mark_contents_seen(need_get_comment_notes)
+
+    @staticmethod
+    def get_interact_counts(content: ZhihuContent) -> Dict:
+        """
+        内容的互动数，用于增量爬取判断内容是否有变化
+        Args:
+            content: 知乎内容
+
+        Returns:
+
+        """
+        return {
+            "liked_count": content.voteup_count,
+            "comment_count": content.comment_count,
+        }
+
+    async def mark_contents_seen(self, content_list: List[ZhihuContent]) -> None:
+        """详情和评论都已保存后，把内容及其互动数记入增量爬取索引"""
+        for content in content_list:
+            crawl_index.mark_seen("zhihu", content.content_id, self.get_interact_counts(content))
+        await crawl_index.flush()
 
     @staticmethod
     def format_proxy_info(
@@ -461,6 +483,10 @@ class ZhihuCrawler(AbstractCrawler):
 
     async def close(self):
         """Close browser context"""
+        # 关闭共享的 HTTP 连接池
+        await http_pool.close_all()
+        # 关闭常驻的签名进程
+        await signer_pool.close_all()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
@@ -10,24 +10,107 @@
 
 
 # -*- coding: utf-8 -*-
+import hashlib
 import json
+import random
+import re
 from typing import Dict, List, Optional
 from urllib.parse import parse_qs, urlparse
 
-import execjs
 from parsel import Selector
 
+import config
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
 from tools import utils
 from tools.crawler_util import extract_text_from_html
+from tools.signer_pool import SignerPool
 
-ZHIHU_SGIN_JS = None
+_ZSE_INIT_STR = "6fpLRqJO8M/c3jnYxFkUVC4ZIG12SiH=5v0mXDazWBTsuw7QetbKdoPyAl+hN9rgE"
+_ZSE_ARRAY_OFFSET = [48, 53, 57, 48, 53, 51, 102, 55, 100, 49, 53, 101, 48, 49, 100, 55]
+_ZST_81 = "3_2.0aR_sn77yn6O92wOB8hPZnQr0EMYxc4f18wNBUgpTQ6nxERFZfTY0-4Lm-h3_tufIwJS8gcxTgJS_AuPZNcXCTwxI78YxEM20s4PGDwN8gGcYAupMWufIoLVqr4gxrRPOI0cY7HL8qun9g93mFukyigcmebS_FwOYPRP0E4rZUrN9DDom3hnynAUMnAVPF_PhaueTFH9fQL39OCCqYTxfb0rfi9wfPhSM6vxGDJo_rBHpQGNmBBLqPJHK2_w8C9eTVMO9Z9NOrMtfhGH_DgpM-BNM1DOxScLG3gg1Hre1FCXKQcXKkrSL1r9GWDXMk8wqBLNmbRH96BtOFqVZ7UYG3gC8D9cMS7Y9UrHLVCLZPJO8_CL_6GNCOg_zhJS8PbXmGTcBpgxfkieOPhNfthtf2gC_qD3YOce8nCwG2uwBOqeMoML9NBC1xb9yk6SuJhHLK7SM6LVfCve_3vLKlqcL6TxL_UosDvHLxrHmWgxBQ8Xs"
+_ZSE_ZK = [
+    1170614578, 1024848638, 1413669199, 3951632832, 3528873006, 2921909214, 4151847688, 3997739139, 1933479194,
+    3323781115, 3888513386, 460404854, 3747539722, 2403641034, 2615871395, 2119585428, 2265697227, 2035090028,
+    2773447226, 4289380121, 4217216195, 2200601443, 3051914490, 1579901135, 1321810770, 456816404, 2903323407,
+    4065664991, 330002838, 3506006750, 363569021, 2347096187
+]
 
+_ZSE_ZB = [
+    20, 223, 245, 7, 248, 2, 194, 209, 87, 6, 227, 253, 240, 128, 222, 91, 237, 9, 125, 157, 230, 93, 252, 205,
+    90, 79, 144, 199, 159, 197, 186, 167, 39, 37, 156, 198, 38, 42, 43, 168, 217, 153, 15, 103, 80, 189, 71, 191,
+    97, 84, 247, 95, 36, 69, 14, 35, 12, 171, 28, 114, 178, 148, 86, 182, 32, 83, 158, 109, 22, 255, 94, 238, 151,
+    85, 77, 124, 254, 18, 4, 26, 123, 176, 232, 193, 131, 172, 143, 142, 150, 30, 10, 146, 162, 62, 224, 218, 196,
+    229, 1, 192, 213, 27, 110, 56, 231, 180, 138, 107, 242, 187, 54, 120, 19, 44, 117, 228, 215, 203, 53, 239,
+    251, 127, 81, 11, 133, 96, 204, 132, 41, 115, 73, 55, 249, 147, 102, 48, 122, 145, 106, 118, 74, 190, 29, 16,
+    174, 5, 177, 129, 63, 113, 99, 31, 161, 76, 246, 34, 211, 13, 60, 68, 207, 160, 65, 111, 82, 165, 67, 169,
+    225, 57, 112, 244, 155, 51, 236, 200, 233, 58, 61, 47, 100, 137, 185, 64, 17, 70, 234, 163, 219, 108, 170,
+    166, 59, 149, 52, 105, 24, 212, 78, 173, 45, 0, 116, 226, 119, 136, 206, 135, 175, 195, 25, 92, 121, 208, 126,
+    139, 3, 75, 141, 21, 130, 98, 241, 40, 154, 66, 184, 49, 181, 46, 243, 88, 101, 183, 8, 23, 72, 188, 104, 179,
+    210, 134, 250, 201, 164, 89, 216, 202, 220, 50, 221, 152, 140, 33, 235, 214
+]
 
-def sign(url: str, cookies: str) -> Dict:
+
+def _zse_rotl(e: int, t: int) -> int:
+    return ((e << t) | (e >> (32 - t))) & 0xFFFFFFFF
+
+
+def _zse_bytes_to_int(e: List[int], t: int) -> int:
+    return ((e[t] & 255) << 24) | ((e[t + 1] & 255) << 16) | ((e[t + 2] & 255) << 8) | (e[t + 3] & 255)
+
+
+def _zse_int_to_bytes(e: int) -> List[int]:
+    return [(e >> 24) & 255, (e >> 16) & 255, (e >> 8) & 255, e & 255]
+
+
+def _zse_round(e: int) -> int:
+    r = _zse_bytes_to_int([_ZSE_ZB[b] for b in _zse_int_to_bytes(e)], 0)
+    return r ^ _zse_rotl(r, 2) ^ _zse_rotl(r, 10) ^ _zse_rotl(r, 18) ^ _zse_rotl(r, 24)
+
+
+def _zse_encrypt_block(block: List[int]) -> List[int]:
+    n = [_zse_bytes_to_int(block, 0), _zse_bytes_to_int(block, 4),
+         _zse_bytes_to_int(block, 8), _zse_bytes_to_int(block, 12)]
+    for r in range(32):
+        n.append(n[r] ^ _zse_round(n[r + 1] ^ n[r + 2] ^ n[r + 3] ^ _ZSE_ZK[r]))
+    return _zse_int_to_bytes(n[35]) + _zse_int_to_bytes(n[34]) + _zse_int_to_bytes(n[33]) + _zse_int_to_bytes(n[32])
+
+
+def get_zse_96(encode_md5: str, random_byte: Optional[int] = None) -> str:
     """
-    zhihu sign algorithm
+    x-zse-96 签名算法, libs/zhihu.js 中 get_zse_96 的 Python 实现
+    Args:
+        encode_md5: 签名参数的md5值
+        random_byte: 随机填充字节(0-126)，不传则随机生成，仅用于测试对齐
+
+    Returns:
+
+    """
+    if random_byte is None:
+        random_byte = random.randint(0, 126)
+    init_array = [random_byte, 0] + [ord(c) for c in encode_md5]
+    init_array += [14] * (48 - len(init_array))
+
+    cipher = _zse_encrypt_block([b ^ o ^ 42 for b, o in zip(init_array[:16], _ZSE_ARRAY_OFFSET)])
+    result_array = list(cipher)
+    for i in range(16, 48, 16):
+        cipher = _zse_encrypt_block([b ^ c for b, c in zip(init_array[i:i + 16], cipher)])
+        result_array += cipher
+
+    for i in range(47, -1, -4):
+        result_array[i] ^= 58
+    result_array.reverse()
+
+    result = []
+    for j in range(0, 48, 3):
+        e = result_array[j] | (result_array[j + 1] << 8) | (result_array[j + 2] << 16)
+        result.extend(_ZSE_INIT_STR[(e >> shift) & 63] for shift in (0, 6, 12, 18))
+    return "2.0_" + "".join(result)
+
+
+def get_sign(url: str, cookies: str) -> Dict:
+    """
+    zhihu sign algorithm, libs/zhihu.js 中 get_sign 的 Python 实现
     Args:
         url: request url with query string
         cookies: request cookies with d_c0 key
@@ -35,12 +118,30 @@ def sign(url: str, cookies: str) -> Dict:
     Returns:
 
     """
-    global ZHIHU_SGIN_JS
-    if not ZHIHU_SGIN_JS:
-        with open("libs/zhihu.js", mode="r", encoding="utf-8-sig") as f:
-            ZHIHU_SGIN_JS = execjs.compile(f.read())
+    match = re.search(r"d_c0=([^;]+)", cookies)
+    dc0 = match.group(1) if match else ""
+    params_join_str = "+".join(["101_3_3.0", url, dc0, _ZST_81])
+    params_md5_value = hashlib.md5(params_join_str.encode("utf-8")).hexdigest()
+    return {
+        "x-zst-81": _ZST_81,
+        "x-zse-96": get_zse_96(params_md5_value),
+    }
 
-    return ZHIHU_SGIN_JS.call("get_sign", url, cookies)
+
+zhihu_signer = SignerPool("libs/zhihu.js", pool_size=config.SIGN_WORKER_NUM, fast_paths={"get_sign": get_sign})
+
+
+async def sign(url: str, cookies: str) -> Dict:
+    """
+    zhihu sign algorithm
+    Args:
+        url: request url with query string
+        cookies: request cookies with d_c0 key
+
+    Returns:
+
+    """
+    return await zhihu_signer.call("get_sign", url, cookies)
 
 
 class ZhihuExtractor:
@@ -12,9 +12,11 @@
 # -*- coding: utf-8 -*-
 # @Author  : relakkes@gmail.com
 # @Time    : 2023/12/2 13:45
-# @Desc    : ip代理池实现
+# @Desc    : ip代理池实现，按延迟和失败率给 IP 打分加权选取，后台补充 IP
+import asyncio
 import random
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
 
 import httpx
 from tenacity import retry, stop_after_attempt, wait_fixed
@@ -27,28 +29,115 @@ from .base_proxy import ProxyProvider
 from .types import IpInfoModel, ProviderNameEnum
 
 
+class ProxyStat:
+    """
+    单个代理IP的健康状态，延迟取指数移动平均，分数越高被选中的概率越大
+    """
+
+    def __init__(self, proxy: IpInfoModel, expire_at: Optional[float], latency: float):
+        self.proxy = proxy
+        self.expire_at = expire_at
+        self.latency = latency
+        self.success_count = 0
+        self.fail_count = 0
+        self.continuous_fail_count = 0
+
+    @property
+    def score(self) -> float:
+        # 成功率做平滑，避免新 IP 一次失败就分数归零
+        success_rate = (self.success_count + 1) / (self.success_count + self.fail_count + 2)
+        return success_rate / max(self.latency, 0.05)
+
+    def report(self, success: bool, latency: Optional[float] = None) -> None:
+        if success:
+            self.success_count += 1
+            self.continuous_fail_count = 0
+        else:
+            self.fail_count += 1
+            self.continuous_fail_count += 1
+        if latency is not None:
+            self.latency = 0.7 * self.latency + 0.3 * latency
+
+
+def make_proxy_key(proxy: IpInfoModel) -> str:
+    return f"{proxy.ip}:{proxy.port}"
+
+
 class ProxyIpPool:
-    def __init__(self, ip_pool_count: int, enable_validate_ip: bool, ip_provider: ProxyProvider) -> None:
+    def __init__(self, ip_pool_count: int, enable_validate_ip: bool, ip_provider: ProxyProvider,
+                 min_ip_count: int = 1, expire_ahead_sec: int = 30, max_continuous_fails: int = 3) -> None:
         """
 
         Args:
-            ip_pool_count:
-            enable_validate_ip:
-            ip_provider:
+            ip_pool_count: 代理池中保持的 IP 数量
+            enable_validate_ip: 是否在放入代理池前验证 IP
+            ip_provider: IP 代理商
+            min_ip_count: 可用 IP 数低于该值时在后台从代理商补充
+            expire_ahead_sec: 距离过期时间不足该秒数的 IP 提前移出代理池
+            max_continuous_fails: 连续失败达到该次数的 IP 移出代理池
         """
         self.valid_ip_url = "https://echo.apifox.cn/"  # 验证 IP 是否有效的地址
         self.ip_pool_count = ip_pool_count
         self.enable_validate_ip = enable_validate_ip
-        self.proxy_list: List[IpInfoModel] = []
         self.ip_provider: ProxyProvider = ip_provider
+        self.min_ip_count = max(1, min(min_ip_count, ip_pool_count))
+        self.expire_ahead_sec = expire_ahead_sec
+        self.max_continuous_fails = max_continuous_fails
+        self._proxy_stats: Dict[str, ProxyStat] = {}
+        self._refill_task: Optional[asyncio.Task] = None
+
+    @property
+    def proxy_list(self) -> List[IpInfoModel]:
+        return [stat.proxy for stat in self._proxy_stats.values()]
 
     async def load_proxies(self) -> None:
         """
-        加载IP代理
+        从代理商获取 IP 补足代理池，开启验证时并发验证，只保留有效的 IP
         Returns:
 
         """
-        self.proxy_list = await self.ip_provider.get_proxies(self.ip_pool_count)
+        need_count = self.ip_pool_count - len(self._proxy_stats)
+        if need_count <= 0:
+            return
+        fetch_ts = time.time()
+        proxies = [
+            proxy for proxy in await self.ip_provider.get_proxies(need_count)
+            if make_proxy_key(proxy) not in self._proxy_stats
+        ]
+        if self.enable_validate_ip:
+            latencies = await asyncio.gather(*[self._check_proxy(proxy) for proxy in proxies])
+        else:
+            latencies = [1.0] * len(proxies)
+        for proxy, latency in zip(proxies, latencies):
+            if latency is None:
+                continue
+            stat = ProxyStat(proxy, self._get_expire_at(proxy, fetch_ts), latency)
+            if not self._is_expiring(stat, fetch_ts):
+                self._proxy_stats[make_proxy_key(proxy)] = stat
+        utils.logger.info(f"[ProxyIpPool.load_proxies] got {len(proxies)} ips, "
+                          f"pool size: {len(self._proxy_stats)}")
+
+    @staticmethod
+    def _get_expire_at(proxy: IpInfoModel, fetch_ts: float) -> Optional[float]:
+        """快代理返回的是剩余有效秒数，极速HTTP返回的是过期时间戳，统一转换成过期时间戳"""
+        if not proxy.expired_time_ts:
+            return None
+        if proxy.expired_time_ts < 10 ** 9:
+            return fetch_ts + proxy.expired_time_ts
+        return float(proxy.expired_time_ts)
+
+    def _is_expiring(self, stat: ProxyStat, now: float) -> bool:
+        return stat.expire_at is not None and stat.expire_at - now <= self.expire_ahead_sec
+
+    async def _check_proxy(self, proxy: IpInfoModel) -> Optional[float]:
+        """验证代理IP，有效时返回验证请求的耗时(秒)，无效时返回 None"""
+        start = time.monotonic()
+        try:
+            if await self._is_valid_proxy(proxy):
+                return time.monotonic() - start
+        except Exception:
+            pass
+        return None
 
     async def _is_valid_proxy(self, proxy: IpInfoModel) -> bool:
         """
@@ -61,7 +150,7 @@ class ProxyIpPool:
             httpx_proxy = {
                 f"{proxy.protocol}": f"http://{proxy.user}:{proxy.password}@{proxy.ip}:{proxy.port}"
             }
-            async with httpx.AsyncClient(proxies=httpx_proxy) as client:
+            async with httpx.AsyncClient(proxies=httpx_proxy, timeout=10) as client:
                 response = await client.get(self.valid_ip_url)
             if response.status_code == 200:
                 return True
@@ -71,28 +160,87 @@ class ProxyIpPool:
             utils.logger.info(f"[ProxyIpPool._is_valid_proxy] testing {proxy.ip} err: {e}")
             raise e
 
+    def _evict_expiring(self) -> None:
+        now = time.time()
+        for key, stat in list(self._proxy_stats.items()):
+            if self._is_expiring(stat, now):
+                utils.logger.info(f"[ProxyIpPool._evict_expiring] ip {key} is about to expire, evict it")
+                del self._proxy_stats[key]
+
+    def _ensure_refill(self) -> None:
+        """可用 IP 低于水位线时启动后台补充任务，不阻塞取 IP"""
+        if len(self._proxy_stats) >= self.min_ip_count:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        try:
+            await self.load_proxies()
+        except Exception as e:
+            utils.logger.error(f"[ProxyIpPool._refill] load proxies from provider err: {e}")
+
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def get_proxy(self) -> IpInfoModel:
+    async def get_proxy(self, exclude: Optional[IpInfoModel] = None) -> IpInfoModel:
         """
-        从代理池中随机提取一个代理IP
+        按健康分数加权随机提取一个代理IP，代理池不为空时不会发起任何网络请求
+        :param exclude: 更换代理时排除当前的 IP，代理池中只有这一个 IP 时仍然返回它
         :return:
         """
-        if len(self.proxy_list) == 0:
-            await self._reload_proxies()
+        self._evict_expiring()
+        self._ensure_refill()
+        if not self._proxy_stats:
+            # 代理池已经空了，只能等待补充完成
+            await self._refill_task
+        if not self._proxy_stats:
+            raise Exception("[ProxyIpPool.get_proxy] no valid ip in pool and again get it")
 
-        proxy = random.choice(self.proxy_list)
-        self.proxy_list.remove(proxy) # 取出来一个IP就应该移出掉
-        if self.enable_validate_ip:
-            if not await self._is_valid_proxy(proxy):
-                raise Exception("[ProxyIpPool.get_proxy] current ip invalid and again get it")
-        return proxy
+        stats = list(self._proxy_stats.values())
+        if exclude is not None and len(stats) > 1:
+            stats = [stat for stat in stats if make_proxy_key(stat.proxy) != make_proxy_key(exclude)]
+        stat = random.choices(stats, weights=[stat.score for stat in stats])[0]
+        return stat.proxy
+
+    def mark_success(self, proxy: IpInfoModel, latency: Optional[float] = None) -> None:
+        """
+        记录代理IP请求成功
+        Args:
+            proxy: 代理IP
+            latency: 请求耗时(秒)
+
+        Returns:
+
+        """
+        stat = self._proxy_stats.get(make_proxy_key(proxy))
+        if stat:
+            stat.report(True, latency)
+
+    def mark_failed(self, proxy: IpInfoModel, evict: bool = False) -> None:
+        """
+        记录代理IP请求失败，连续失败次数过多时移出代理池并在后台补充
+        Args:
+            proxy: 代理IP
+            evict: 是否直接移出代理池，IP 已被平台封禁时使用
+
+        Returns:
+
+        """
+        key = make_proxy_key(proxy)
+        stat = self._proxy_stats.get(key)
+        if not stat:
+            return
+        stat.report(False)
+        if evict or stat.continuous_fail_count >= self.max_continuous_fails:
+            utils.logger.info(f"[ProxyIpPool.mark_failed] ip {key} failed {stat.continuous_fail_count} times, evict it")
+            del self._proxy_stats[key]
+            self._ensure_refill()
 
     async def _reload_proxies(self):
         """
         # 重新加载代理池
         :return:
         """
-        self.proxy_list = []
+        self._proxy_stats.clear()
         await self.load_proxies()
 
 
@@ -111,7 +259,10 @@ async def create_ip_pool(ip_pool_count: int, enable_validate_ip: bool) -> ProxyI
     """
     pool = ProxyIpPool(ip_pool_count=ip_pool_count,
                        enable_validate_ip=enable_validate_ip,
-                       ip_provider=IpProxyProvider.get(config.IP_PROXY_PROVIDER_NAME)
+                       ip_provider=IpProxyProvider.get(config.IP_PROXY_PROVIDER_NAME),
+                       min_ip_count=config.IP_PROXY_POOL_MIN_COUNT,
+                       expire_ahead_sec=config.IP_PROXY_EXPIRE_AHEAD_SEC,
+                       max_continuous_fails=config.IP_PROXY_MAX_CONTINUOUS_FAILS,
                        )
     await pool.load_proxies()
     return pool
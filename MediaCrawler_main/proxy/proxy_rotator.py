@@ -0,0 +1,137 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 爬取过程中自动更换代理IP，API 客户端遇到 IP 被封或代理不可用时换一个 IP 重新请求
+import asyncio
+import functools
+import json
+from typing import Dict, Optional, Tuple, Type
+
+import httpx
+
+from tools import http_pool, utils
+
+from .proxy_ip_pool import ProxyIpPool
+from .types import IpInfoModel
+
+# 代理本身不可用的网络错误，与平台返回的 IP 封禁一样需要换 IP
+PROXY_TRANSPORT_ERRORS: Tuple[Type[Exception], ...] = (httpx.ProxyError, httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def _proxies_key(proxies: Optional[Dict]) -> str:
+    return json.dumps(proxies, sort_keys=True) if proxies else ""
+
+
+class ProxyRotator:
+    """
+    从代理池租用代理IP，并在 API 客户端检测到封禁时为客户端换绑新的代理
+    只替换客户端的 proxies(共享 httpx 连接池按代理取客户端)，浏览器和登录态保持不变
+    """
+
+    def __init__(self, ip_pool: ProxyIpPool, max_rotations: int = 3):
+        self.ip_pool = ip_pool
+        self.max_rotations = max_rotations
+        self.rotate_count = 0
+        self._leased: Dict[str, IpInfoModel] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def lease(self, exclude: Optional[IpInfoModel] = None) -> IpInfoModel:
+        """
+        从代理池租用一个代理IP
+        Args:
+            exclude: 需要排除的 IP
+
+        Returns:
+
+        """
+        ip_proxy_info = await self.ip_pool.get_proxy(exclude=exclude)
+        _, httpx_proxy = utils.format_proxy_info(ip_proxy_info)
+        self._leased[_proxies_key(httpx_proxy)] = ip_proxy_info
+        return ip_proxy_info
+
+    def mark_success(self, proxies: Optional[Dict], latency: float) -> None:
+        """
+        记录客户端通过该代理请求成功及耗时，用于代理池的健康分数
+        Args:
+            proxies: 请求使用的代理
+            latency: 请求耗时(秒)
+
+        Returns:
+
+        """
+        ip_info = self._leased.get(_proxies_key(proxies))
+        if ip_info:
+            self.ip_pool.mark_success(ip_info, latency)
+
+    async def rotate(self, api_client, failed_proxies: Optional[Dict], reason: str) -> None:
+        """
+        把客户端换绑到新的代理IP，并发请求同时检测到封禁时只换一次
+        Args:
+            api_client: 平台 API 客户端，需要有 proxies 属性
+            failed_proxies: 出错请求使用的代理
+            reason: 换 IP 的原因，用于日志
+
+        Returns:
+
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if _proxies_key(api_client.proxies) != _proxies_key(failed_proxies):
+                # 其他请求已经换过了
+                return
+            failed_ip_info = self._leased.get(_proxies_key(failed_proxies))
+            if failed_ip_info:
+                self.ip_pool.mark_failed(failed_ip_info, evict=True)
+            new_ip_info = await self.lease(exclude=failed_ip_info)
+            _, api_client.proxies = utils.format_proxy_info(new_ip_info)
+            self.rotate_count += 1
+            if failed_proxies:
+                # 之后的请求不再使用失效代理的客户端，其他协程在该客户端上进行中的请求继续完成，由 close_all 关闭
+                self._leased.pop(_proxies_key(failed_proxies), None)
+                http_pool.retire_client(failed_proxies)
+            utils.logger.warning(
+                f"[ProxyRotator.rotate] {type(api_client).__name__} switch proxy to {new_ip_info.ip}:{new_ip_info.port}, "
+                f"reason: {reason}"
+            )
+
+
+def rotate_proxy_on_block(*block_errors: Type[Exception]):
+    """
+    API 客户端 request 方法的装饰器，请求抛出 IP 封禁或代理不可用的异常时换 IP 重新请求
+    客户端的 proxy_rotator 为空(未开启 IP 代理)时直接抛出异常
+    Args:
+        *block_errors: 平台表示 IP 被封禁的异常类型
+
+    Returns:
+
+    """
+    retry_errors = tuple(block_errors) + PROXY_TRANSPORT_ERRORS
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            rotations = 0
+            while True:
+                proxies = self.proxies
+                try:
+                    return await func(self, *args, **kwargs)
+                except retry_errors as e:
+                    rotator: Optional[ProxyRotator] = getattr(self, "proxy_rotator", None)
+                    if rotator is None or rotations >= rotator.max_rotations:
+                        raise
+                    rotations += 1
+                    await rotator.rotate(self, proxies, f"{type(e).__name__}: {e}")
+
+        return wrapper
+
+    return decorator
@@ -30,7 +30,7 @@ CREATE TABLE bilibili_video (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_bilibili_vi_video_i_31c36e ON bilibili_video(video_id);
+CREATE UNIQUE INDEX idx_bilibili_vi_video_i_31c36e ON bilibili_video(video_id);
 CREATE INDEX idx_bilibili_vi_create__73e0ec ON bilibili_video(create_time);
 
 -- ----------------------------
@@ -55,7 +55,7 @@ CREATE TABLE bilibili_video_comment (
     like_count TEXT NOT NULL DEFAULT '0'
 );
 
-CREATE INDEX idx_bilibili_vi_comment_41c34e ON bilibili_video_comment(comment_id);
+CREATE UNIQUE INDEX idx_bilibili_vi_comment_41c34e ON bilibili_video_comment(comment_id);
 CREATE INDEX idx_bilibili_vi_video_i_f22873 ON bilibili_video_comment(video_id);
 
 -- ----------------------------
@@ -77,7 +77,7 @@ CREATE TABLE bilibili_up_info (
     is_official INTEGER DEFAULT NULL
 );
 
-CREATE INDEX idx_bilibili_vi_user_123456 ON bilibili_up_info(user_id);
+CREATE UNIQUE INDEX idx_bilibili_vi_user_123456 ON bilibili_up_info(user_id);
 
 -- ----------------------------
 -- Table structure for bilibili_contact_info
@@ -97,6 +97,7 @@ CREATE TABLE bilibili_contact_info (
     last_modify_ts INTEGER NOT NULL
 );
 
+CREATE UNIQUE INDEX idx_bilibili_contact_info_up_fan ON bilibili_contact_info(up_id, fan_id);
 CREATE INDEX idx_bilibili_contact_info_up_id ON bilibili_contact_info(up_id);
 CREATE INDEX idx_bilibili_contact_info_fan_id ON bilibili_contact_info(fan_id);
 
@@ -119,7 +120,7 @@ CREATE TABLE bilibili_up_dynamic (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_bilibili_up_dynamic_dynamic_id ON bilibili_up_dynamic(dynamic_id);
+CREATE UNIQUE INDEX idx_bilibili_up_dynamic_dynamic_id ON bilibili_up_dynamic(dynamic_id);
 
 -- ----------------------------
 -- Table structure for douyin_aweme
@@ -153,7 +154,7 @@ CREATE TABLE douyin_aweme (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_douyin_awem_aweme_i_6f7bc6 ON douyin_aweme(aweme_id);
+CREATE UNIQUE INDEX idx_douyin_awem_aweme_i_6f7bc6 ON douyin_aweme(aweme_id);
 CREATE INDEX idx_douyin_awem_create__299dfe ON douyin_aweme(create_time);
 
 -- ----------------------------
@@ -182,7 +183,7 @@ CREATE TABLE douyin_aweme_comment (
     pictures TEXT NOT NULL DEFAULT ''
 );
 
-CREATE INDEX idx_douyin_awem_comment_fcd7e4 ON douyin_aweme_comment(comment_id);
+CREATE UNIQUE INDEX idx_douyin_awem_comment_fcd7e4 ON douyin_aweme_comment(comment_id);
 CREATE INDEX idx_douyin_awem_aweme_i_c50049 ON douyin_aweme_comment(aweme_id);
 
 -- ----------------------------
@@ -205,6 +206,8 @@ CREATE TABLE dy_creator (
     videos_count TEXT DEFAULT NULL
 );
 
+CREATE UNIQUE INDEX idx_dy_creator_user_id ON dy_creator(user_id);
+
 -- ----------------------------
 -- Table structure for kuaishou_video
 -- ----------------------------
@@ -229,7 +232,7 @@ CREATE TABLE kuaishou_video (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_kuaishou_vi_video_i_c5c6a6 ON kuaishou_video(video_id);
+CREATE UNIQUE INDEX idx_kuaishou_vi_video_i_c5c6a6 ON kuaishou_video(video_id);
 CREATE INDEX idx_kuaishou_vi_create__a10dee ON kuaishou_video(create_time);
 
 -- ----------------------------
@@ -250,7 +253,7 @@ CREATE TABLE kuaishou_video_comment (
     sub_comment_count TEXT NOT NULL
 );
 
-CREATE INDEX idx_kuaishou_vi_comment_ed48fa ON kuaishou_video_comment(comment_id);
+CREATE UNIQUE INDEX idx_kuaishou_vi_comment_ed48fa ON kuaishou_video_comment(comment_id);
 CREATE INDEX idx_kuaishou_vi_video_i_e50914 ON kuaishou_video_comment(video_id);
 
 -- ----------------------------
@@ -278,7 +281,7 @@ CREATE TABLE weibo_note (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_weibo_note_note_id_f95b1a ON weibo_note(note_id);
+CREATE UNIQUE INDEX idx_weibo_note_note_id_f95b1a ON weibo_note(note_id);
 CREATE INDEX idx_weibo_note_create__692709 ON weibo_note(create_time);
 CREATE INDEX idx_weibo_note_create__d05ed2 ON weibo_note(create_date_time);
 
@@ -306,7 +309,7 @@ CREATE TABLE weibo_note_comment (
     parent_comment_id TEXT DEFAULT NULL
 );
 
-CREATE INDEX idx_weibo_note__comment_c7611c ON weibo_note_comment(comment_id);
+CREATE UNIQUE INDEX idx_weibo_note__comment_c7611c ON weibo_note_comment(comment_id);
 CREATE INDEX idx_weibo_note__note_id_24f108 ON weibo_note_comment(note_id);
 CREATE INDEX idx_weibo_note__create__667fe3 ON weibo_note_comment(create_date_time);
 
@@ -329,6 +332,8 @@ CREATE TABLE weibo_creator (
     tag_list TEXT
 );
 
+CREATE UNIQUE INDEX idx_weibo_creator_user_id ON weibo_creator(user_id);
+
 -- ----------------------------
 -- Table structure for xhs_creator
 -- ----------------------------
@@ -349,6 +354,8 @@ CREATE TABLE xhs_creator (
     tag_list TEXT
 );
 
+CREATE UNIQUE INDEX idx_xhs_creator_user_id ON xhs_creator(user_id);
+
 -- ----------------------------
 -- Table structure for xhs_note
 -- ----------------------------
@@ -379,7 +386,7 @@ CREATE TABLE xhs_note (
     xsec_token TEXT DEFAULT NULL
 );
 
-CREATE INDEX idx_xhs_note_note_id_209457 ON xhs_note(note_id);
+CREATE UNIQUE INDEX idx_xhs_note_note_id_209457 ON xhs_note(note_id);
 CREATE INDEX idx_xhs_note_time_eaa910 ON xhs_note(time);
 
 -- ----------------------------
@@ -404,7 +411,7 @@ CREATE TABLE xhs_note_comment (
     like_count TEXT DEFAULT NULL
 );
 
-CREATE INDEX idx_xhs_note_co_comment_8e8349 ON xhs_note_comment(comment_id);
+CREATE UNIQUE INDEX idx_xhs_note_co_comment_8e8349 ON xhs_note_comment(comment_id);
 CREATE INDEX idx_xhs_note_co_create__204f8d ON xhs_note_comment(create_time);
 
 -- ----------------------------
@@ -432,7 +439,7 @@ CREATE TABLE tieba_note (
     source_keyword TEXT DEFAULT ''
 );
 
-CREATE INDEX idx_tieba_note_note_id ON tieba_note(note_id);
+CREATE UNIQUE INDEX idx_tieba_note_note_id ON tieba_note(note_id);
 CREATE INDEX idx_tieba_note_publish_time ON tieba_note(publish_time);
 
 -- ----------------------------
@@ -459,7 +466,7 @@ CREATE TABLE tieba_comment (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_tieba_comment_comment_id ON tieba_comment(comment_id);
+CREATE UNIQUE INDEX idx_tieba_comment_comment_id ON tieba_comment(comment_id);
 CREATE INDEX idx_tieba_comment_note_id ON tieba_comment(note_id);
 CREATE INDEX idx_tieba_comment_publish_time ON tieba_comment(publish_time);
 
@@ -482,6 +489,8 @@ CREATE TABLE tieba_creator (
     registration_duration TEXT DEFAULT NULL
 );
 
+CREATE UNIQUE INDEX idx_tieba_creator_user_id ON tieba_creator(user_id);
+
 -- ----------------------------
 -- Table structure for zhihu_content
 -- ----------------------------
@@ -509,7 +518,7 @@ CREATE TABLE zhihu_content (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_zhihu_content_content_id ON zhihu_content(content_id);
+CREATE UNIQUE INDEX idx_zhihu_content_content_id ON zhihu_content(content_id);
 CREATE INDEX idx_zhihu_content_created_time ON zhihu_content(created_time);
 
 -- ----------------------------
@@ -536,7 +545,7 @@ CREATE TABLE zhihu_comment (
     last_modify_ts INTEGER NOT NULL
 );
 
-CREATE INDEX idx_zhihu_comment_comment_id ON zhihu_comment(comment_id);
+CREATE UNIQUE INDEX idx_zhihu_comment_comment_id ON zhihu_comment(comment_id);
 CREATE INDEX idx_zhihu_comment_content_id ON zhihu_comment(content_id);
 CREATE INDEX idx_zhihu_comment_publish_time ON zhihu_comment(publish_time);
 
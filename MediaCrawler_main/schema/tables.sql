@@ -26,7 +26,7 @@ CREATE TABLE `bilibili_video`
     `video_url`        varchar(512) DEFAULT NULL COMMENT '视频详情URL',
     `video_cover_url`  varchar(512) DEFAULT NULL COMMENT '视频封面图 URL',
     PRIMARY KEY (`id`),
-    KEY                `idx_bilibili_vi_video_i_31c36e` (`video_id`),
+    UNIQUE KEY         `idx_bilibili_vi_video_i_31c36e` (`video_id`),
     KEY                `idx_bilibili_vi_create__73e0ec` (`create_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='B站视频';
 
@@ -50,7 +50,7 @@ CREATE TABLE `bilibili_video_comment`
     `create_time`       bigint      NOT NULL COMMENT '评论时间戳',
     `sub_comment_count` varchar(16) NOT NULL COMMENT '评论回复数',
     PRIMARY KEY (`id`),
-    KEY                 `idx_bilibili_vi_comment_41c34e` (`comment_id`),
+    UNIQUE KEY          `idx_bilibili_vi_comment_41c34e` (`comment_id`),
     KEY                 `idx_bilibili_vi_video_i_f22873` (`video_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='B 站视频评论';
 
@@ -73,7 +73,7 @@ CREATE TABLE `bilibili_up_info`
     `user_rank`      int          DEFAULT NULL COMMENT '用户等级',
     `is_official`    int          DEFAULT NULL COMMENT '是否官号',
     PRIMARY KEY (`id`),
-    KEY              `idx_bilibili_vi_user_123456` (`user_id`)
+    UNIQUE KEY       `idx_bilibili_vi_user_123456` (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='B 站UP主信息';
 
 -- ----------------------------
@@ -94,6 +94,7 @@ CREATE TABLE `bilibili_contact_info`
     `add_ts`         bigint NOT NULL COMMENT '记录添加时间戳',
     `last_modify_ts` bigint NOT NULL COMMENT '记录最后修改时间戳',
     PRIMARY KEY (`id`),
+    UNIQUE KEY       `idx_bilibili_contact_info_up_fan` (`up_id`, `fan_id`),
     KEY              `idx_bilibili_contact_info_up_id` (`up_id`),
     KEY              `idx_bilibili_contact_info_fan_id` (`fan_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='B 站联系人信息';
@@ -117,7 +118,7 @@ CREATE TABLE `bilibili_up_dynamic`
     `add_ts`         bigint NOT NULL COMMENT '记录添加时间戳',
     `last_modify_ts` bigint NOT NULL COMMENT '记录最后修改时间戳',
     PRIMARY KEY (`id`),
-    KEY              `idx_bilibili_up_dynamic_dynamic_id` (`dynamic_id`)
+    UNIQUE KEY       `idx_bilibili_up_dynamic_dynamic_id` (`dynamic_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='B 站up主动态信息';
 
 -- ----------------------------
@@ -151,7 +152,7 @@ CREATE TABLE `douyin_aweme`
     `video_download_url`       varchar(1024) DEFAULT NULL COMMENT '视频下载地址',
     `music_download_url`       varchar(1024) DEFAULT NULL COMMENT '音乐下载地址',
     PRIMARY KEY (`id`),
-    KEY               `idx_douyin_awem_aweme_i_6f7bc6` (`aweme_id`),
+    UNIQUE KEY        `idx_douyin_awem_aweme_i_6f7bc6` (`aweme_id`),
     KEY               `idx_douyin_awem_create__299dfe` (`create_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='抖音视频';
 
@@ -178,7 +179,7 @@ CREATE TABLE `douyin_aweme_comment`
     `create_time`       bigint      NOT NULL COMMENT '评论时间戳',
     `sub_comment_count` varchar(16) NOT NULL COMMENT '评论回复数',
     PRIMARY KEY (`id`),
-    KEY                 `idx_douyin_awem_comment_fcd7e4` (`comment_id`),
+    UNIQUE KEY          `idx_douyin_awem_comment_fcd7e4` (`comment_id`),
     KEY                 `idx_douyin_awem_aweme_i_c50049` (`aweme_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='抖音视频评论';
 
@@ -201,7 +202,8 @@ CREATE TABLE `dy_creator`
     `fans`           varchar(16)  DEFAULT NULL COMMENT '粉丝数',
     `interaction`    varchar(16)  DEFAULT NULL COMMENT '获赞数',
     `videos_count`   varchar(16)  DEFAULT NULL COMMENT '作品数',
-    PRIMARY KEY (`id`)
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `idx_dy_creator_user_id` (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='抖音博主信息';
 
 -- ----------------------------
@@ -227,7 +229,7 @@ CREATE TABLE `kuaishou_video`
     `video_cover_url` varchar(512) DEFAULT NULL COMMENT '视频封面图 URL',
     `video_play_url`  varchar(512) DEFAULT NULL COMMENT '视频播放 URL',
     PRIMARY KEY (`id`),
-    KEY               `idx_kuaishou_vi_video_i_c5c6a6` (`video_id`),
+    UNIQUE KEY        `idx_kuaishou_vi_video_i_c5c6a6` (`video_id`),
     KEY               `idx_kuaishou_vi_create__a10dee` (`create_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='快手视频';
 
@@ -249,7 +251,7 @@ CREATE TABLE `kuaishou_video_comment`
     `create_time`       bigint      NOT NULL COMMENT '评论时间戳',
     `sub_comment_count` varchar(16) NOT NULL COMMENT '评论回复数',
     PRIMARY KEY (`id`),
-    KEY                 `idx_kuaishou_vi_comment_ed48fa` (`comment_id`),
+    UNIQUE KEY          `idx_kuaishou_vi_comment_ed48fa` (`comment_id`),
     KEY                 `idx_kuaishou_vi_video_i_e50914` (`video_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='快手视频评论';
 
@@ -278,7 +280,7 @@ CREATE TABLE `weibo_note`
     `shared_count`     varchar(16)  DEFAULT NULL COMMENT '帖子转发数量',
     `note_url`         varchar(512) DEFAULT NULL COMMENT '帖子详情URL',
     PRIMARY KEY (`id`),
-    KEY                `idx_weibo_note_note_id_f95b1a` (`note_id`),
+    UNIQUE KEY         `idx_weibo_note_note_id_f95b1a` (`note_id`),
     KEY                `idx_weibo_note_create__692709` (`create_time`),
     KEY                `idx_weibo_note_create__d05ed2` (`create_date_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='微博帖子';
@@ -306,7 +308,7 @@ CREATE TABLE `weibo_note_comment`
     `comment_like_count` varchar(16) NOT NULL COMMENT '评论点赞数量',
     `sub_comment_count`  varchar(16) NOT NULL COMMENT '评论回复数',
     PRIMARY KEY (`id`),
-    KEY                  `idx_weibo_note__comment_c7611c` (`comment_id`),
+    UNIQUE KEY           `idx_weibo_note__comment_c7611c` (`comment_id`),
     KEY                  `idx_weibo_note__note_id_24f108` (`note_id`),
     KEY                  `idx_weibo_note__create__667fe3` (`create_date_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='微博帖子评论';
@@ -330,7 +332,8 @@ CREATE TABLE `xhs_creator`
     `fans`           varchar(16)  DEFAULT NULL COMMENT '粉丝数',
     `interaction`    varchar(16)  DEFAULT NULL COMMENT '获赞和收藏数',
     `tag_list`       longtext COMMENT '标签列表',
-    PRIMARY KEY (`id`)
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `idx_xhs_creator_user_id` (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='小红书博主';
 
 -- ----------------------------
@@ -361,7 +364,7 @@ CREATE TABLE `xhs_note`
     `tag_list`         longtext COMMENT '标签列表',
     `note_url`         varchar(255) DEFAULT NULL COMMENT '笔记详情页的URL',
     PRIMARY KEY (`id`),
-    KEY                `idx_xhs_note_note_id_209457` (`note_id`),
+    UNIQUE KEY         `idx_xhs_note_note_id_209457` (`note_id`),
     KEY                `idx_xhs_note_time_eaa910` (`time`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='小红书笔记';
 
@@ -385,7 +388,7 @@ CREATE TABLE `xhs_note_comment`
     `sub_comment_count` int         NOT NULL COMMENT '子评论数量',
     `pictures`          varchar(512) DEFAULT NULL,
     PRIMARY KEY (`id`),
-    KEY                 `idx_xhs_note_co_comment_8e8349` (`comment_id`),
+    UNIQUE KEY          `idx_xhs_note_co_comment_8e8349` (`comment_id`),
     KEY                 `idx_xhs_note_co_create__204f8d` (`create_time`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='小红书笔记评论';
 
@@ -425,7 +428,7 @@ CREATE TABLE tieba_note
     ip_location       VARCHAR(255) DEFAULT '' COMMENT 'IP地理位置',
     add_ts            BIGINT       NOT NULL COMMENT '添加时间戳',
     last_modify_ts    BIGINT       NOT NULL COMMENT '最后修改时间戳',
-    KEY               `idx_tieba_note_note_id` (`note_id`),
+    UNIQUE KEY        `idx_tieba_note_note_id` (`note_id`),
     KEY               `idx_tieba_note_publish_time` (`publish_time`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='贴吧帖子表';
 
@@ -449,7 +452,7 @@ CREATE TABLE tieba_comment
     note_url          VARCHAR(255) NOT NULL COMMENT '帖子链接',
     add_ts            BIGINT       NOT NULL COMMENT '添加时间戳',
     last_modify_ts    BIGINT       NOT NULL COMMENT '最后修改时间戳',
-    KEY               `idx_tieba_comment_comment_id` (`note_id`),
+    UNIQUE KEY        `idx_tieba_comment_comment_id` (`comment_id`),
     KEY               `idx_tieba_comment_note_id` (`note_id`),
     KEY               `idx_tieba_comment_publish_time` (`publish_time`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='贴吧评论表';
@@ -484,7 +487,8 @@ CREATE TABLE `weibo_creator`
     `follows`        varchar(16)  DEFAULT NULL COMMENT '关注数',
     `fans`           varchar(16)  DEFAULT NULL COMMENT '粉丝数',
     `tag_list`       longtext COMMENT '标签列表',
-    PRIMARY KEY (`id`)
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `idx_weibo_creator_user_id` (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='微博博主';
 
 
@@ -507,7 +511,8 @@ CREATE TABLE `tieba_creator`
     `follows`               varchar(16)  DEFAULT NULL COMMENT '关注数',
     `fans`                  varchar(16)  DEFAULT NULL COMMENT '粉丝数',
     `registration_duration` varchar(16)  DEFAULT NULL COMMENT '吧龄',
-    PRIMARY KEY (`id`)
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `idx_tieba_creator_user_id` (`user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='贴吧创作者';
 
 DROP TABLE IF EXISTS `zhihu_content`;
@@ -533,7 +538,7 @@ CREATE TABLE `zhihu_content` (
     `add_ts` bigint NOT NULL COMMENT '记录添加时间戳',
     `last_modify_ts` bigint NOT NULL COMMENT '记录最后修改时间戳',
     PRIMARY KEY (`id`),
-    KEY `idx_zhihu_content_content_id` (`content_id`),
+    UNIQUE KEY `idx_zhihu_content_content_id` (`content_id`),
     KEY `idx_zhihu_content_created_time` (`created_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='知乎内容（回答、文章、视频）';
 
@@ -558,7 +563,7 @@ CREATE TABLE `zhihu_comment` (
     `add_ts` bigint NOT NULL COMMENT '记录添加时间戳',
     `last_modify_ts` bigint NOT NULL COMMENT '记录最后修改时间戳',
     PRIMARY KEY (`id`),
-    KEY `idx_zhihu_comment_comment_id` (`comment_id`),
+    UNIQUE KEY `idx_zhihu_comment_comment_id` (`comment_id`),
     KEY `idx_zhihu_comment_content_id` (`content_id`),
     KEY `idx_zhihu_comment_publish_time` (`publish_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='知乎评论';
@@ -593,4 +598,10 @@ alter table douyin_aweme_comment add column `like_count` varchar(255) NOT NULL D
 
 alter table xhs_note add column xsec_token varchar(50) default null comment '签名算法';
 alter table douyin_aweme_comment add column `pictures` varchar(500) NOT NULL DEFAULT '' COMMENT '评论图片列表';
-alter table bilibili_video_comment add column `like_count` varchar(255) NOT NULL DEFAULT '0' COMMENT '点赞数';
\ No newline at end of file
+alter table bilibili_video_comment add column `like_count` varchar(255) NOT NULL DEFAULT '0' COMMENT '点赞数';
+
+-- ----------------------------
+-- db / sqlite 存储按唯一键批量 upsert，老版本创建的表需要补充唯一索引(先清理重复数据)，例如：
+-- ALTER TABLE `xhs_note` DROP INDEX `idx_xhs_note_note_id_209457`, ADD UNIQUE KEY `idx_xhs_note_note_id_209457` (`note_id`);
+-- ALTER TABLE `xhs_creator` ADD UNIQUE KEY `idx_xhs_creator_user_id` (`user_id`);
+-- ----------------------------
@@ -14,7 +14,7 @@
 # @Time    : 2024/1/14 19:34
 # @Desc    :
 
-from typing import List
+from typing import Awaitable, Callable, List
 
 import config
 from var import source_keyword_var
@@ -28,6 +28,7 @@ class BiliStoreFactory:
         "csv": BiliCsvStoreImplement,
         "db": BiliDbStoreImplement,
         "json": BiliJsonStoreImplement,
+        "jsonl": BiliJsonlStoreImplement,
         "sqlite": BiliSqliteStoreImplement,
     }
 
@@ -36,7 +37,7 @@ class BiliStoreFactory:
         store_class = BiliStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ..."
+                "[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite ..."
             )
         return store_class()
 
@@ -146,6 +147,20 @@ async def store_video(aid, video_content, extension_file_name):
     )
 
 
+async def download_video(aid, extension_file_name, media_key: str, download: Callable[[str], Awaitable[bool]]) -> bool:
+    """
+    下载视频，相同 media_key 的视频只下载一次
+    Args:
+        aid:
+        extension_file_name:
+        media_key: 去掉参数的视频 url
+        download: client 的下载函数，参数为保存路径
+    """
+    video_store = BilibiliVideo()
+    save_file_name = video_store.make_save_file_name(str(aid), extension_file_name)
+    return await video_store.store_media(save_file_name, media_key, download)
+
+
 async def batch_update_bilibili_creator_fans(creator_info: Dict, fans_list: List[Dict]):
     if not fans_list:
         return
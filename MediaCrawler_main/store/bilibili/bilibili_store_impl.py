@@ -24,6 +24,7 @@ import aiofiles
 
 import config
 from base.base_crawler import AbstractStore
+from store.jsonl_store import JsonlStoreImplement
 from tools import utils, words
 from var import crawler_type_var
 
@@ -143,16 +144,9 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_content,
-                                         query_content_by_content_id,
-                                         update_content_by_content_id)
-        video_id = content_item.get("video_id")
-        video_detail: Dict = await query_content_by_content_id(content_id=video_id)
-        if not video_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(video_id, content_item=content_item)
+        from .bilibili_store_sql import upsert_content
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -164,16 +158,9 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_comment,
-                                         query_comment_by_comment_id,
-                                         update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .bilibili_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -185,16 +172,9 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_creator,
-                                         query_creator_by_creator_id,
-                                         update_creator_by_creator_id)
-        creator_id = creator.get("user_id")
-        creator_detail: Dict = await query_creator_by_creator_id(creator_id=creator_id)
-        if not creator_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_creator_id(creator_id,creator_item=creator)
+        from .bilibili_store_sql import upsert_creator
+        creator["add_ts"] = utils.get_current_timestamp()
+        await upsert_creator(creator)
 
     async def store_contact(self, contact_item: Dict):
         """
@@ -206,19 +186,9 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_contact,
-                                         query_contact_by_up_and_fan,
-                                         update_contact_by_id, )
-
-        up_id = contact_item.get("up_id")
-        fan_id = contact_item.get("fan_id")
-        contact_detail: Dict = await query_contact_by_up_and_fan(up_id=up_id, fan_id=fan_id)
-        if not contact_detail:
-            contact_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_contact(contact_item)
-        else:
-            key_id = contact_detail.get("id")
-            await update_contact_by_id(id=key_id, contact_item=contact_item)
+        from .bilibili_store_sql import upsert_contact
+        contact_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_contact(contact_item)
 
     async def store_dynamic(self, dynamic_item):
         """
@@ -230,17 +200,9 @@ class BiliDbStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_dynamic,
-                                         query_dynamic_by_dynamic_id,
-                                         update_dynamic_by_dynamic_id)
-
-        dynamic_id = dynamic_item.get("dynamic_id")
-        dynamic_detail = await query_dynamic_by_dynamic_id(dynamic_id=dynamic_id)
-        if not dynamic_detail:
-            dynamic_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_dynamic(dynamic_item)
-        else:
-            await update_dynamic_by_dynamic_id(dynamic_id, dynamic_item=dynamic_item)
+        from .bilibili_store_sql import upsert_dynamic
+        dynamic_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_dynamic(dynamic_item)
 
 
 class BiliJsonStoreImplement(AbstractStore):
@@ -354,6 +316,44 @@ class BiliJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(save_item=dynamic_item, store_type="dynamics")
 
 
+class BiliJsonlStoreImplement(JsonlStoreImplement):
+    jsonl_store_path: str = "data/bilibili/jsonl"
+    words_store_path: str = "data/bilibili/words"
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator JSONL storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(creator, "creators")
+
+    async def store_contact(self, contact_item: Dict):
+        """
+        creator contact JSONL storage implementation
+        Args:
+            contact_item: creator's contact item dict
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(save_item=contact_item, store_type="contacts")
+
+    async def store_dynamic(self, dynamic_item: Dict):
+        """
+        creator dynamic JSONL storage implementation
+        Args:
+            dynamic_item: creator's dynamic item dict
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(save_item=dynamic_item, store_type="dynamics")
+
+
 class BiliSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -365,16 +365,9 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_content,
-                                         query_content_by_content_id,
-                                         update_content_by_content_id)
-        video_id = content_item.get("video_id")
-        video_detail: Dict = await query_content_by_content_id(content_id=video_id)
-        if not video_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(video_id, content_item=content_item)
+        from .bilibili_store_sql import upsert_content
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -386,16 +379,9 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_comment,
-                                         query_comment_by_comment_id,
-                                         update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .bilibili_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -407,16 +393,9 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_creator,
-                                         query_creator_by_creator_id,
-                                         update_creator_by_creator_id)
-        creator_id = creator.get("user_id")
-        creator_detail: Dict = await query_creator_by_creator_id(creator_id=creator_id)
-        if not creator_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_creator_id(creator_id, creator_item=creator)
+        from .bilibili_store_sql import upsert_creator
+        creator["add_ts"] = utils.get_current_timestamp()
+        await upsert_creator(creator)
 
     async def store_contact(self, contact_item: Dict):
         """
@@ -428,19 +407,9 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_contact,
-                                         query_contact_by_up_and_fan,
-                                         update_contact_by_id, )
-
-        up_id = contact_item.get("up_id")
-        fan_id = contact_item.get("fan_id")
-        contact_detail: Dict = await query_contact_by_up_and_fan(up_id=up_id, fan_id=fan_id)
-        if not contact_detail:
-            contact_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_contact(contact_item)
-        else:
-            key_id = contact_detail.get("id")
-            await update_contact_by_id(id=key_id, contact_item=contact_item)
+        from .bilibili_store_sql import upsert_contact
+        contact_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_contact(contact_item)
 
     async def store_dynamic(self, dynamic_item):
         """
@@ -452,14 +421,6 @@ class BiliSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .bilibili_store_sql import (add_new_dynamic,
-                                         query_dynamic_by_dynamic_id,
-                                         update_dynamic_by_dynamic_id)
-
-        dynamic_id = dynamic_item.get("dynamic_id")
-        dynamic_detail = await query_dynamic_by_dynamic_id(dynamic_id=dynamic_id)
-        if not dynamic_detail:
-            dynamic_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_dynamic(dynamic_item)
-        else:
-            await update_dynamic_by_dynamic_id(dynamic_id, dynamic_item=dynamic_item)
+        from .bilibili_store_sql import upsert_dynamic
+        dynamic_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_dynamic(dynamic_item)
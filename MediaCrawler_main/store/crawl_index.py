@@ -0,0 +1,176 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 增量爬取索引，记录已爬取的帖子及其互动数，与数据保存方式(csv/db/json/jsonl/sqlite)无关
+import asyncio
+import json
+import pathlib
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import config
+from tools import utils
+
+# (平台, 帖子ID)
+IndexKey = Tuple[str, str]
+
+
+class CrawlIndex:
+    """
+    已爬取帖子的持久化索引(sqlite)，每个帖子记录最近一次爬取时的互动数(点赞/评论/收藏/分享等)
+    增量模式下：
+    1. 互动数没有变化的帖子跳过详情和评论的爬取
+    2. 创作者主页翻页遇到已爬取的帖子时停止翻页
+    索引启动时由 load 在线程中一次性读入内存，查询只访问内存；mark_seen 只更新内存并记入待写入列表，
+    由 flush 在线程中按批写入(每页一次事务)，事件循环上没有 sqlite 读写
+    """
+
+    def __init__(self, index_file_name: str = "data/crawl_index.db", enable: bool = False):
+        self.index_file_name = index_file_name
+        self.enable = enable
+        self._conn: Optional[sqlite3.Connection] = None
+        self._counts: Optional[Dict[IndexKey, Dict]] = None
+        self._pending: Dict[IndexKey, Dict] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            pathlib.Path(self.index_file_name).parent.mkdir(parents=True, exist_ok=True)
+            # 连接在 load/flush 的工作线程中使用，同一时刻只有一个线程访问(由 _flush_lock 保证)
+            self._conn = sqlite3.connect(self.index_file_name, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawl_index (platform TEXT NOT NULL, content_id TEXT NOT NULL, "
+                "counts TEXT NOT NULL, last_crawl_ts INTEGER NOT NULL, PRIMARY KEY (platform, content_id))"
+            )
+        return self._conn
+
+    def _load(self) -> None:
+        rows = self._get_conn().execute("SELECT platform, content_id, counts FROM crawl_index").fetchall()
+        self._counts = {(platform, content_id): json.loads(counts) for platform, content_id, counts in rows}
+
+    async def load(self) -> None:
+        """
+        在线程中把索引读入内存，开启增量模式后、开始爬取前调用
+        Returns:
+
+        """
+        if self.enable and self._counts is None:
+            await asyncio.get_running_loop().run_in_executor(None, self._load)
+
+    def get_counts(self, platform: str, content_id: str) -> Optional[Dict]:
+        """
+        获取帖子最近一次爬取时的互动数
+        Args:
+            platform: 平台
+            content_id: 帖子ID
+
+        Returns: 互动数，未爬取过时返回 None
+
+        """
+        if self._counts is None:
+            # 没有调用 load 时在当前线程读入
+            self._load()
+        return self._counts.get((platform, content_id))
+
+    def is_seen(self, platform: str, content_id: str) -> bool:
+        """增量模式下帖子是否已经爬取过，未开启增量模式时总是返回 False"""
+        if not self.enable or not content_id:
+            return False
+        return self.get_counts(platform, content_id) is not None
+
+    def is_unchanged(self, platform: str, content_id: str, counts: Dict) -> bool:
+        """
+        增量模式下帖子是否已经爬取过且互动数没有变化，未开启增量模式时总是返回 False
+        列表页和详情页返回的互动数字段不完全相同，只比较两边都有的字段，没有共同字段时视为有变化
+        Args:
+            platform: 平台
+            content_id: 帖子ID
+            counts: 当前的互动数
+
+        Returns:
+
+        """
+        if not self.enable or not content_id:
+            return False
+        seen_counts = self.get_counts(platform, content_id)
+        if seen_counts is None:
+            return False
+        common_keys = [key for key, value in counts.items() if value is not None and key in seen_counts]
+        if not common_keys:
+            return False
+        return all(str(counts[key]) == str(seen_counts[key]) for key in common_keys)
+
+    def mark_seen(self, platform: str, content_id: str, counts: Dict) -> None:
+        """
+        记录帖子已爬取(详情和评论都已保存)及其互动数，与已记录的互动数合并
+        只更新内存，调用 flush 后写入索引文件
+        Args:
+            platform: 平台
+            content_id: 帖子ID
+            counts: 当前的互动数
+
+        Returns:
+
+        """
+        if not self.enable or not content_id:
+            return
+        seen_counts = dict(self.get_counts(platform, content_id) or {})
+        seen_counts.update({key: value for key, value in counts.items() if value is not None})
+        self._counts[(platform, content_id)] = seen_counts
+        self._pending[(platform, content_id)] = seen_counts
+
+    def _write(self, pending: Dict[IndexKey, Dict]) -> None:
+        now = utils.get_current_timestamp()
+        rows: List[Tuple[str, str, str, int]] = [
+            (platform, content_id, json.dumps(counts, ensure_ascii=False), now)
+            for (platform, content_id), counts in pending.items()
+        ]
+        conn = self._get_conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO crawl_index (platform, content_id, counts, last_crawl_ts) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    async def flush(self) -> None:
+        """
+        在线程中把 mark_seen 记录的帖子一次性写入索引文件，一页帖子处理完后调用
+        Returns:
+
+        """
+        if not self._pending:
+            return
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, pending)
+            except Exception as e:
+                # 写入失败时放回待写入列表，下次 flush 或 close 时重试，期间新记录的互动数优先
+                utils.logger.error(f"[CrawlIndex.flush] write {len(pending)} rows into crawl index failed: {e}")
+                self._pending = {**pending, **self._pending}
+
+    def close(self) -> None:
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            self._write(pending)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._counts = None
+
+
+crawl_index = CrawlIndex(config.CRAWL_INDEX_PATH, config.ENABLE_INCREMENTAL_CRAWL)
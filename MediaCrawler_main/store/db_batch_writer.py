@@ -0,0 +1,157 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : db / sqlite 存储的批量写入队列，按表攒批后一次 upsert，替代逐条 查询 + 新增/更新
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import aiofiles
+
+import config
+from async_db import AsyncMysqlDB
+from async_sqlite_db import AsyncSqliteDB
+from tools import utils
+from var import media_crawler_db_var
+
+# (表名, 唯一键字段, 记录字段)，字段不同的记录不能放在同一条 executemany 语句里
+BatchKey = Tuple[str, Tuple[str, ...], Tuple[str, ...]]
+
+
+class DbBatchWriter:
+    """
+    写入先进入内存缓冲区，满足以下任一条件时批量落库：
+    1. 同一个表缓冲的记录数达到 batch_size
+    2. 距离上次落库超过 flush_interval 秒(后台定时任务)
+    3. 程序结束时调用 close
+    落库失败的一批记录放回缓冲区重试，连续失败超过 max_retries 次(例如表缺少唯一索引等永久错误)
+    或 close 时仍然失败，写入 dead_letter_dir 下的 <表名>.jsonl 后丢弃，缓冲区不会无限增长
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0,
+                 insert_only_fields: Tuple[str, ...] = ("add_ts",), max_retries: int = 3,
+                 dead_letter_dir: str = "data/db_dead_letter"):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.insert_only_fields = insert_only_fields
+        self.max_retries = max(0, max_retries)
+        self.dead_letter_dir = dead_letter_dir
+        self._buffers: Dict[BatchKey, List[Dict]] = {}
+        self._failures: Dict[BatchKey, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def upsert(self, table_name: str, item: Dict, conflict_fields: Tuple[str, ...]) -> None:
+        """
+        放入一条待写入的记录，唯一键已存在时更新，否则新增
+        Args:
+            table_name: 表名
+            item: 记录
+            conflict_fields: 唯一键字段
+
+        Returns:
+
+        """
+        key: BatchKey = (table_name, tuple(conflict_fields), tuple(item.keys()))
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append(dict(item))
+        self._ensure_flush_task()
+        if len(buffer) >= self.batch_size:
+            try:
+                await self._flush_key(key)
+            except Exception as e:
+                # 记录已放回缓冲区，由定时任务或 close 重试，不中断爬取
+                utils.logger.error(f"[DbBatchWriter.upsert] flush {table_name} failed, will retry: {e}")
+
+    def _ensure_flush_task(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                utils.logger.error(f"[DbBatchWriter._flush_periodically] flush failed: {e}")
+
+    async def _flush_key(self, key: BatchKey, final: bool = False) -> None:
+        # 先取走缓冲区再 await，落库期间新写入的记录进入新的缓冲区
+        items = self._buffers.pop(key, None)
+        if not items:
+            return
+        table_name, conflict_fields, _ = key
+        async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
+        try:
+            await async_db_conn.upsert_items(table_name, items, list(conflict_fields), list(self.insert_only_fields))
+        except Exception as e:
+            failures = self._failures.get(key, 0) + 1
+            if final or failures > self.max_retries:
+                self._failures.pop(key, None)
+                utils.logger.error(f"[DbBatchWriter._flush_key] upsert {len(items)} rows into {table_name} "
+                                   f"failed {failures} times, write them to dead letter file: {e}")
+                await self._write_dead_letter(table_name, items)
+                return
+            # 落库失败(锁超时、连接断开等)时把这一批放回缓冲区最前面，保持写入顺序，下次 flush 重试
+            self._failures[key] = failures
+            self._buffers[key] = items + self._buffers.get(key, [])
+            raise
+        except BaseException:
+            self._buffers[key] = items + self._buffers.get(key, [])
+            raise
+        self._failures.pop(key, None)
+        utils.logger.info(f"[DbBatchWriter._flush_key] upsert {len(items)} rows into {table_name}")
+
+    async def _write_dead_letter(self, table_name: str, items: List[Dict]) -> None:
+        file_name = os.path.join(self.dead_letter_dir, f"{table_name}.jsonl")
+        try:
+            os.makedirs(self.dead_letter_dir, exist_ok=True)
+            async with aiofiles.open(file_name, "a", encoding="utf-8") as f:
+                await f.write("".join(json.dumps(item, ensure_ascii=False, default=str) + "\n" for item in items))
+        except OSError as e:
+            utils.logger.error(f"[DbBatchWriter._write_dead_letter] drop {len(items)} rows of {table_name}, "
+                               f"write {file_name} failed: {e}")
+
+    async def flush(self, final: bool = False) -> None:
+        """
+        把所有缓冲区中的记录写入数据库
+        Args:
+            final: 是否是最后一次落库，失败的记录不再重试，直接写入 dead letter 文件
+
+        Returns:
+
+        """
+        for key in list(self._buffers.keys()):
+            await self._flush_key(key, final)
+
+    async def close(self) -> None:
+        """
+        停止定时任务并写入剩余记录，程序退出前调用
+        Returns:
+
+        """
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush(final=True)
+
+
+db_batch_writer = DbBatchWriter(
+    batch_size=config.DB_BATCH_SIZE,
+    flush_interval=config.DB_BATCH_FLUSH_INTERVAL_SEC,
+    max_retries=config.DB_BATCH_MAX_RETRIES,
+    dead_letter_dir=config.DB_BATCH_DEAD_LETTER_DIR,
+)
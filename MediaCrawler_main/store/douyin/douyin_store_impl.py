@@ -24,6 +24,7 @@ import aiofiles
 
 import config
 from base.base_crawler import AbstractStore
+from store.jsonl_store import JsonlStoreImplement
 from tools import utils, words
 from var import crawler_type_var
 
@@ -121,17 +122,11 @@ class DouyinDbStoreImplement(AbstractStore):
 
         """
 
-        from .douyin_store_sql import (add_new_content,
-                                       query_content_by_content_id,
-                                       update_content_by_content_id)
-        aweme_id = content_item.get("aweme_id")
-        aweme_detail: Dict = await query_content_by_content_id(content_id=aweme_id)
-        if not aweme_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            if content_item.get("title"):
-                await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(aweme_id, content_item=content_item)
+        from .douyin_store_sql import upsert_content
+        if not content_item.get("title"):
+            return
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -142,16 +137,9 @@ class DouyinDbStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .douyin_store_sql import (add_new_comment,
-                                       query_comment_by_comment_id,
-                                       update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .douyin_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -162,16 +150,9 @@ class DouyinDbStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .douyin_store_sql import (add_new_creator,
-                                       query_creator_by_user_id,
-                                       update_creator_by_user_id)
-        user_id = creator.get("user_id")
-        user_detail: Dict = await query_creator_by_user_id(user_id)
-        if not user_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_user_id(user_id, creator)
+        from .douyin_store_sql import upsert_creator
+        creator["add_ts"] = utils.get_current_timestamp()
+        await upsert_creator(creator)
 
 class DouyinJsonStoreImplement(AbstractStore):
     json_store_path: str = "data/douyin/json"
@@ -260,6 +241,11 @@ class DouyinJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(save_item=creator, store_type="creator")
 
 
+class DouyinJsonlStoreImplement(JsonlStoreImplement):
+    jsonl_store_path: str = "data/douyin/jsonl"
+    words_store_path: str = "data/douyin/words"
+
+
 class DouyinSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -271,17 +257,11 @@ class DouyinSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .douyin_store_sql import (add_new_content,
-                                       query_content_by_content_id,
-                                       update_content_by_content_id)
-        aweme_id = content_item.get("aweme_id")
-        aweme_detail: Dict = await query_content_by_content_id(content_id=aweme_id)
-        if not aweme_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            if content_item.get("title"):
-                await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(aweme_id, content_item=content_item)
+        from .douyin_store_sql import upsert_content
+        if not content_item.get("title"):
+            return
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -292,16 +272,9 @@ class DouyinSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .douyin_store_sql import (add_new_comment,
-                                       query_comment_by_comment_id,
-                                       update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .douyin_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -312,13 +285,6 @@ class DouyinSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .douyin_store_sql import (add_new_creator,
-                                       query_creator_by_user_id,
-                                       update_creator_by_user_id)
-        user_id = creator.get("user_id")
-        user_detail: Dict = await query_creator_by_user_id(user_id)
-        if not user_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_user_id(user_id, creator)
\ No newline at end of file
+        from .douyin_store_sql import upsert_creator
+        creator["add_ts"] = utils.get_current_timestamp()
+        await upsert_creator(creator)
\ No newline at end of file
@@ -0,0 +1,206 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : JSON Lines 追加写存储，每条数据只追加一行，不再整文件读改写
+import asyncio
+import json
+import os
+import pathlib
+import time
+from typing import Dict, List, Optional
+
+import config
+from base.base_crawler import AbstractStore
+from tools import utils
+from var import crawler_type_var
+
+
+class JsonlFileWriter:
+    """
+    单个 jsonl 文件的追加写入器，文件句柄常驻，写入走缓冲区，定期 flush + fsync
+    """
+
+    def __init__(self, file_path: str, words_file_name_prefix: Optional[str] = None):
+        self.file_path = file_path
+        self.words_file_name_prefix = words_file_name_prefix
+        pathlib.Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        if words_file_name_prefix:
+            pathlib.Path(words_file_name_prefix).parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(file_path, mode="a", encoding="utf-8", buffering=64 * 1024)
+        self._last_sync_time = time.monotonic()
+        self.write_count = 0
+
+    def write(self, save_item: Dict) -> None:
+        self._fh.write(json.dumps(save_item, ensure_ascii=False) + "\n")
+        self.write_count += 1
+
+    def need_sync(self, interval: float) -> bool:
+        return time.monotonic() - self._last_sync_time >= interval
+
+    async def sync(self) -> None:
+        """
+        把缓冲区写入文件，fsync 放到线程池执行，不阻塞事件循环
+        Returns:
+
+        """
+        self._last_sync_time = time.monotonic()
+        self._fh.flush()
+        await asyncio.get_event_loop().run_in_executor(None, os.fsync, self._fh.fileno())
+
+    async def close(self) -> None:
+        await self.sync()
+        self._fh.close()
+
+    def read_all(self) -> List[Dict]:
+        with open(self.file_path, mode="r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def compact_to_json(self) -> str:
+        """
+        把 jsonl 文件逐行转换成 JSON 数组文件，与 json 存储方式的输出格式一致
+        Returns: JSON 文件路径
+
+        """
+        json_file_path = os.path.splitext(self.file_path)[0] + ".json"
+        with open(self.file_path, mode="r", encoding="utf-8") as src, \
+                open(json_file_path, mode="w", encoding="utf-8") as dst:
+            dst.write("[")
+            first = True
+            for line in src:
+                if not line.strip():
+                    continue
+                dst.write("\n" if first else ",\n")
+                dst.write(json.dumps(json.loads(line), ensure_ascii=False, indent=4))
+                first = False
+            dst.write("\n]" if not first else "]")
+        return json_file_path
+
+
+class JsonlWriterManager:
+    """
+    按文件路径(crawler_type + store_type + 日期)管理写入器，所有平台共用
+    """
+
+    def __init__(self):
+        self._writers: Dict[str, JsonlFileWriter] = {}
+
+    async def save(self, file_path: str, save_item: Dict, words_file_name_prefix: Optional[str] = None) -> None:
+        writer = self._writers.get(file_path)
+        if writer is None:
+            writer = JsonlFileWriter(file_path, words_file_name_prefix)
+            self._writers[file_path] = writer
+        writer.write(save_item)
+        if writer.need_sync(config.JSONL_FLUSH_INTERVAL_SEC):
+            await writer.sync()
+
+    async def close(self) -> None:
+        """
+        flush 并关闭所有写入器，按配置生成 JSON 数组文件和词云
+        Returns:
+
+        """
+        writers = list(self._writers.values())
+        self._writers.clear()
+        loop = asyncio.get_event_loop()
+        for writer in writers:
+            await writer.close()
+            utils.logger.info(f"[JsonlWriterManager.close] saved {writer.write_count} items to {writer.file_path}")
+            if config.JSONL_COMPACT_TO_JSON:
+                json_file_path = await loop.run_in_executor(None, writer.compact_to_json)
+                utils.logger.info(f"[JsonlWriterManager.close] compacted {writer.file_path} to {json_file_path}")
+            if writer.words_file_name_prefix and config.ENABLE_GET_COMMENTS and config.ENABLE_GET_WORDCLOUD:
+                try:
+                    from tools import words
+                    save_data = await loop.run_in_executor(None, writer.read_all)
+                    await words.AsyncWordCloudGenerator().generate_word_frequency_and_cloud(
+                        save_data, writer.words_file_name_prefix
+                    )
+                except Exception as e:
+                    utils.logger.error(
+                        f"[JsonlWriterManager.close] generate word cloud for {writer.file_path} failed: {e}"
+                    )
+
+
+jsonl_writer_manager = JsonlWriterManager()
+
+
+async def close() -> None:
+    """关闭所有 jsonl 写入器，程序退出前调用"""
+    await jsonl_writer_manager.close()
+
+
+class JsonlStoreImplement(AbstractStore):
+    """
+    各平台 jsonl 存储实现的基类，子类只需要指定保存路径
+    """
+    jsonl_store_path: str = "data/jsonl"
+    words_store_path: str = "data/words"
+
+    def make_save_file_name(self, store_type: str) -> (str, str):
+        """
+        make save file name by store type
+        Args:
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        return (
+            f"{self.jsonl_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}.jsonl",
+            f"{self.words_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}"
+        )
+
+    async def save_data_to_jsonl(self, save_item: Dict, store_type: str):
+        """
+        Append one item to the jsonl file
+        Args:
+            save_item: save content dict info
+            store_type: Save type contains content and comments（contents | comments）
+
+        Returns:
+
+        """
+        save_file_name, words_file_name_prefix = self.make_save_file_name(store_type=store_type)
+        await jsonl_writer_manager.save(save_file_name, save_item, words_file_name_prefix)
+
+    async def store_content(self, content_item: Dict):
+        """
+        content JSONL storage implementation
+        Args:
+            content_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(content_item, "contents")
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        comment JSONL storage implementation
+        Args:
+            comment_item:
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(comment_item, "comments")
+
+    async def store_creator(self, creator: Dict):
+        """
+        creator JSONL storage implementation
+        Args:
+            creator: creator dict
+
+        Returns:
+
+        """
+        await self.save_data_to_jsonl(creator, "creator")
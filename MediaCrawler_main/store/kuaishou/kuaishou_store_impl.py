@@ -24,6 +24,7 @@ import aiofiles
 
 import config
 from base.base_crawler import AbstractStore
+from store.jsonl_store import JsonlStoreImplement
 from tools import utils, words
 from var import crawler_type_var
 
@@ -116,16 +117,9 @@ class KuaishouDbStoreImplement(AbstractStore):
 
         """
 
-        from .kuaishou_store_sql import (add_new_content,
-                                         query_content_by_content_id,
-                                         update_content_by_content_id)
-        video_id = content_item.get("video_id")
-        video_detail: Dict = await query_content_by_content_id(content_id=video_id)
-        if not video_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(video_id, content_item=content_item)
+        from .kuaishou_store_sql import upsert_content
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -136,16 +130,9 @@ class KuaishouDbStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .kuaishou_store_sql import (add_new_comment,
-                                         query_comment_by_comment_id,
-                                         update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .kuaishou_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
 
 class KuaishouJsonStoreImplement(AbstractStore):
@@ -236,6 +223,11 @@ class KuaishouJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(creator, "creator")
 
 
+class KuaishouJsonlStoreImplement(JsonlStoreImplement):
+    jsonl_store_path: str = "data/kuaishou/jsonl"
+    words_store_path: str = "data/kuaishou/words"
+
+
 class KuaishouSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -247,16 +239,9 @@ class KuaishouSqliteStoreImplement(AbstractStore):
 
         """
 
-        from .kuaishou_store_sql import (add_new_content,
-                                         query_content_by_content_id,
-                                         update_content_by_content_id)
-        video_id = content_item.get("video_id")
-        video_detail: Dict = await query_content_by_content_id(content_id=video_id)
-        if not video_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(video_id, content_item=content_item)
+        from .kuaishou_store_sql import upsert_content
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -267,16 +252,9 @@ class KuaishouSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .kuaishou_store_sql import (add_new_comment,
-                                         query_comment_by_comment_id,
-                                         update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .kuaishou_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -14,101 +14,30 @@
 # @Time    : 2024/4/6 15:30
 # @Desc    : sql接口集合
 
-from typing import Dict, List, Union
+from typing import Dict
 
-from async_db import AsyncMysqlDB
-from async_sqlite_db import AsyncSqliteDB
-from var import media_crawler_db_var
+from store.db_batch_writer import db_batch_writer
 
 
-async def query_content_by_content_id(content_id: str) -> Dict:
+async def upsert_content(content_item: Dict) -> None:
     """
-    查询一条内容记录（xhs的帖子 ｜ 抖音的视频 ｜ 微博 ｜ 快手视频 ...）
+    新增或更新一条内容记录（xhs的帖子 ｜ 抖音的视频 ｜ 微博 ｜ 快手视频 ...），放入批量写入队列，按批次 upsert 落库
     Args:
-        content_id:
-
-    Returns:
-
-    """
-    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
-    sql: str = f"select * from kuaishou_video where video_id = '{content_id}'"
-    rows: List[Dict] = await async_db_conn.query(sql)
-    if len(rows) > 0:
-        return rows[0]
-    return dict()
-
-
-async def add_new_content(content_item: Dict) -> int:
-    """
-    新增一条内容记录（xhs的帖子 ｜ 抖音的视频 ｜ 微博 ｜ 快手视频 ...）
-    Args:
-        content_item:
-
-    Returns:
-
-    """
-    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
-    last_row_id: int = await async_db_conn.item_to_table("kuaishou_video", content_item)
-    return last_row_id
-
-
-async def update_content_by_content_id(content_id: str, content_item: Dict) -> int:
-    """
-    更新一条记录（xhs的帖子 ｜ 抖音的视频 ｜ 微博 ｜ 快手视频 ...）
-    Args:
-        content_id:
         content_item:
 
     Returns:
 
     """
-    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
-    effect_row: int = await async_db_conn.update_table("kuaishou_video", content_item, "video_id", content_id)
-    return effect_row
-
-
-
-async def query_comment_by_comment_id(comment_id: str) -> Dict:
-    """
-    查询一条评论内容
-    Args:
-        comment_id:
-
-    Returns:
-
-    """
-    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
-    sql: str = f"select * from kuaishou_video_comment where comment_id = '{comment_id}'"
-    rows: List[Dict] = await async_db_conn.query(sql)
-    if len(rows) > 0:
-        return rows[0]
-    return dict()
-
-
-async def add_new_comment(comment_item: Dict) -> int:
-    """
-    新增一条评论记录
-    Args:
-        comment_item:
-
-    Returns:
-
-    """
-    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
-    last_row_id: int = await async_db_conn.item_to_table("kuaishou_video_comment", comment_item)
-    return last_row_id
+    await db_batch_writer.upsert("kuaishou_video", content_item, conflict_fields=("video_id",))
 
 
-async def update_comment_by_comment_id(comment_id: str, comment_item: Dict) -> int:
+async def upsert_comment(comment_item: Dict) -> None:
     """
-    更新增一条评论记录
+    新增或更新一条评论记录，放入批量写入队列，按批次 upsert 落库
     Args:
-        comment_id:
         comment_item:
 
     Returns:
 
     """
-    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
-    effect_row: int = await async_db_conn.update_table("kuaishou_video_comment", comment_item, "comment_id", comment_id)
-    return effect_row
+    await db_batch_writer.upsert("kuaishou_video_comment", comment_item, conflict_fields=("comment_id",))
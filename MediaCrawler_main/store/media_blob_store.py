@@ -0,0 +1,187 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 按内容寻址的媒体文件库，相同的图片/视频只下载、只占用一份磁盘空间
+import asyncio
+import hashlib
+import os
+import pathlib
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+import config
+from tools import utils
+
+# 下载函数，参数为保存路径，返回是否下载成功
+MediaDownloadFunc = Callable[[str], Awaitable[bool]]
+
+
+class MediaBlobStore:
+    """
+    媒体文件按 sha256 保存为 <blob_store_path>/<sha256前两位>/<sha256>，帖子目录下的文件是它的硬链接
+    索引(sqlite)记录两种映射：
+    1. media_key -> sha256，media_key 是媒体的稳定标识(去掉参数的 url，小红书图片用 trace id)，命中时不再下载
+    2. 保存路径 -> sha256，帖子目录被清理后可以直接从媒体库恢复
+    """
+
+    def __init__(self, blob_store_path: str = "data/blobs"):
+        self.blob_store_path = blob_store_path
+        self._conn: Optional[sqlite3.Connection] = None
+        # 索引和文件操作都在线程池中执行，sqlite 连接跨线程使用时需要加锁
+        self._conn_lock = threading.Lock()
+        # 同一份内容(sha256)同时只允许一个线程放入媒体库
+        self._blob_locks: Dict[str, threading.Lock] = {}
+        self._blob_locks_lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            pathlib.Path(self.blob_store_path).mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.blob_store_path, "index.db"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS media_blob (media_key TEXT PRIMARY KEY, sha256 TEXT NOT NULL, "
+                "size INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS file_blob (save_file_name TEXT PRIMARY KEY, sha256 TEXT NOT NULL);"
+            )
+        return self._conn
+
+    def make_blob_file_name(self, sha256: str) -> str:
+        return os.path.join(self.blob_store_path, sha256[:2], sha256)
+
+    def lookup(self, media_key: str = "", save_file_name: str = "") -> Optional[str]:
+        """
+        按 media_key 或保存路径查找已保存的媒体文件
+        Args:
+            media_key: 媒体标识
+            save_file_name: 保存路径
+
+        Returns: 媒体库中的文件路径，不存在时返回 None
+
+        """
+        with self._conn_lock:
+            conn = self._get_conn()
+            row = None
+            if media_key:
+                row = conn.execute("SELECT sha256 FROM media_blob WHERE media_key = ?", (media_key,)).fetchone()
+            if row is None and save_file_name:
+                row = conn.execute("SELECT sha256 FROM file_blob WHERE save_file_name = ?",
+                                   (save_file_name,)).fetchone()
+        if row is None:
+            return None
+        blob_file_name = self.make_blob_file_name(row[0])
+        return blob_file_name if os.path.exists(blob_file_name) else None
+
+    @staticmethod
+    def _link(src: str, dst: str) -> None:
+        """硬链接到目标路径，文件系统不支持硬链接时复制，临时文件名唯一，并发写同一路径时互不影响"""
+        pathlib.Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        tmp_file_name = f"{dst}.{os.getpid()}.{uuid.uuid4().hex}.linking"
+        try:
+            try:
+                os.link(src, tmp_file_name)
+            except OSError:
+                shutil.copyfile(src, tmp_file_name)
+            os.replace(tmp_file_name, dst)
+        except BaseException:
+            if os.path.exists(tmp_file_name):
+                os.remove(tmp_file_name)
+            raise
+
+    @staticmethod
+    def _sha256_file(file_name: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_name, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _move_to_store(self, save_file_name: str) -> str:
+        """
+        把新下载的文件放入媒体库，内容已存在时把保存路径替换成已有文件的硬链接，在线程池中执行
+        Returns: sha256
+
+        """
+        sha256 = self._sha256_file(save_file_name)
+        blob_file_name = self.make_blob_file_name(sha256)
+        with self._blob_lock(sha256):
+            if os.path.exists(blob_file_name):
+                self._link(blob_file_name, save_file_name)
+            else:
+                self._link(save_file_name, blob_file_name)
+        return sha256
+
+    def _blob_lock(self, sha256: str) -> threading.Lock:
+        with self._blob_locks_lock:
+            return self._blob_locks.setdefault(sha256, threading.Lock())
+
+    def _link_from_store(self, media_key: str, save_file_name: str) -> bool:
+        """在线程池中执行：媒体已在媒体库中时硬链接到保存路径"""
+        blob_file_name = self.lookup(media_key, save_file_name)
+        if not blob_file_name:
+            return False
+        self._link(blob_file_name, save_file_name)
+        return True
+
+    def _store_and_record(self, media_key: str, save_file_name: str) -> None:
+        """在线程池中执行：新下载的文件放入媒体库并写入索引"""
+        self._record(media_key, save_file_name, self._move_to_store(save_file_name))
+
+    def _record(self, media_key: str, save_file_name: str, sha256: str) -> None:
+        size = os.path.getsize(self.make_blob_file_name(sha256))
+        with self._conn_lock:
+            conn = self._get_conn()
+            with conn:
+                if media_key:
+                    conn.execute("INSERT OR REPLACE INTO media_blob (media_key, sha256, size) VALUES (?, ?, ?)",
+                                 (media_key, sha256, size))
+                conn.execute("INSERT OR REPLACE INTO file_blob (save_file_name, sha256) VALUES (?, ?)",
+                             (save_file_name, sha256))
+
+    async def fetch(self, media_key: str, save_file_name: str, download: MediaDownloadFunc) -> bool:
+        """
+        保存一个媒体文件，media_key 或保存路径已在媒体库中时直接硬链接，否则下载后放入媒体库
+        Args:
+            media_key: 媒体标识
+            save_file_name: 保存路径
+            download: 下载函数
+
+        Returns: 是否保存成功
+
+        """
+        if os.path.exists(save_file_name):
+            return True
+        # 索引查询、写入和文件链接都放到线程池，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self._link_from_store, media_key, save_file_name):
+            utils.logger.info(f"[MediaBlobStore.fetch] media {media_key} already downloaded, link to {save_file_name}")
+            return True
+        if not await download(save_file_name):
+            return False
+        await loop.run_in_executor(None, self._store_and_record, media_key, save_file_name)
+        return True
+
+    def close(self) -> None:
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+media_blob_store = MediaBlobStore(config.MEDIA_BLOB_STORE_PATH)
+
+
+def make_media_key(url: str) -> str:
+    """默认的媒体标识：去掉协议和查询参数的 url"""
+    return url.split("?")[0].split("://")[-1]
@@ -21,6 +21,7 @@ import aiofiles
 
 import config
 from base.base_crawler import AbstractStore
+from store.jsonl_store import JsonlStoreImplement
 from tools import utils, words
 from var import crawler_type_var
 
@@ -118,16 +119,9 @@ class TieBaDbStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .tieba_store_sql import (add_new_content,
-                                      query_content_by_content_id,
-                                      update_content_by_content_id)
-        note_id = content_item.get("note_id")
-        note_detail: Dict = await query_content_by_content_id(content_id=note_id)
-        if not note_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(note_id, content_item=content_item)
+        from .tieba_store_sql import upsert_content
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -138,16 +132,9 @@ class TieBaDbStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .tieba_store_sql import (add_new_comment,
-                                      query_comment_by_comment_id,
-                                      update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .tieba_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -158,16 +145,9 @@ class TieBaDbStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .tieba_store_sql import (add_new_creator,
-                                      query_creator_by_user_id,
-                                      update_creator_by_user_id)
-        user_id = creator.get("user_id")
-        user_detail: Dict = await query_creator_by_user_id(user_id)
-        if not user_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_user_id(user_id, creator)
+        from .tieba_store_sql import upsert_creator
+        creator["add_ts"] = utils.get_current_timestamp()
+        await upsert_creator(creator)
 
 
 class TieBaJsonStoreImplement(AbstractStore):
@@ -256,6 +236,11 @@ class TieBaJsonStoreImplement(AbstractStore):
         await self.save_data_to_json(creator, "creator")
 
 
+class TieBaJsonlStoreImplement(JsonlStoreImplement):
+    jsonl_store_path: str = "data/tieba/jsonl"
+    words_store_path: str = "data/tieba/words"
+
+
 class TieBaSqliteStoreImplement(AbstractStore):
     async def store_content(self, content_item: Dict):
         """
@@ -266,16 +251,9 @@ class TieBaSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .tieba_store_sql import (add_new_content,
-                                      query_content_by_content_id,
-                                      update_content_by_content_id)
-        note_id = content_item.get("note_id")
-        note_detail: Dict = await query_content_by_content_id(content_id=note_id)
-        if not note_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(note_id, content_item=content_item)
+        from .tieba_store_sql import upsert_content
+        content_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_content(content_item)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -286,16 +264,9 @@ class TieBaSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .tieba_store_sql import (add_new_comment,
-                                      query_comment_by_comment_id,
-                                      update_comment_by_comment_id)
-        comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        from .tieba_store_sql import upsert_comment
+        comment_item["add_ts"] = utils.get_current_timestamp()
+        await upsert_comment(comment_item)
 
     async def store_creator(self, creator: Dict):
         """
@@ -306,13 +277,6 @@ class TieBaSqliteStoreImplement(AbstractStore):
         Returns:
 
         """
-        from .tieba_store_sql import (add_new_creator,
-                                      query_creator_by_user_id,
-                                      update_creator_by_user_id)
-        user_id = creator.get("user_id")
-        user_detail: Dict = await query_creator_by_user_id(user_id)
-        if not user_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_user_id(user_id, creator)
+        from .tieba_store_sql import upsert_creator
+        creator["add_ts"] = utils.get_current_timestamp()
+        await upsert_creator(creator)
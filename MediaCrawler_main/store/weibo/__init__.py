@@ -15,7 +15,7 @@
 # @Desc    :
 
 import re
-from typing import List
+from typing import Awaitable, Callable, List
 
 from var import source_keyword_var
 
@@ -28,6 +28,7 @@ class WeibostoreFactory:
         "csv": WeiboCsvStoreImplement,
         "db": WeiboDbStoreImplement,
         "json": WeiboJsonStoreImplement,
+        "jsonl": WeiboJsonlStoreImplement,
         "sqlite": WeiboSqliteStoreImplement,
     }
 
@@ -36,7 +37,7 @@ class WeibostoreFactory:
         store_class = WeibostoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+                "[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite ...")
         return store_class()
 
 
@@ -170,6 +171,24 @@ async def update_weibo_note_image(picid: str, pic_content, extension_file_name):
         {"pic_id": picid, "pic_content": pic_content, "extension_file_name": extension_file_name})
 
 
+async def download_weibo_note_image(picid: str, extension_file_name: str, media_key: str,
+                                    download: Callable[[str], Awaitable[bool]]) -> bool:
+    """
+    下载微博图片，转发等场景下相同的图片只下载一次
+    Args:
+        picid:
+        extension_file_name:
+        media_key: 去掉参数的图片 url
+        download: client 的下载函数，参数为保存路径
+
+    Returns:
+
+    """
+    image_store = WeiboStoreImage()
+    save_file_name = image_store.make_save_file_name(picid, extension_file_name)
+    return await image_store.store_media(save_file_name, media_key, download)
+
+
 async def save_creator(user_id: str, user_info: Dict):
     """
     Save creator information to local
@@ -13,7 +13,7 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/1/14 17:34
 # @Desc    :
-from typing import List
+from typing import Awaitable, Callable, List
 
 import config
 from var import source_keyword_var
@@ -28,6 +28,7 @@ class XhsStoreFactory:
         "csv": XhsCsvStoreImplement,
         "db": XhsDbStoreImplement,
         "json": XhsJsonStoreImplement,
+        "jsonl": XhsJsonlStoreImplement,
         "sqlite": XhsSqliteStoreImplement
     }
 
@@ -35,7 +36,7 @@ class XhsStoreFactory:
     def create_store() -> AbstractStore:
         store_class = XhsStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
+            raise ValueError("[XhsStoreFactory.create_store] Invalid save option only supported csv or db or json or jsonl or sqlite ...")
         return store_class()
 
 
@@ -226,3 +227,21 @@ async def update_xhs_note_image(note_id, pic_content, extension_file_name):
 
     await XiaoHongShuImage().store_image(
         {"notice_id": note_id, "pic_content": pic_content, "extension_file_name": extension_file_name})
+
+
+async def download_xhs_note_media(note_id: str, extension_file_name: str, media_key: str,
+                                  download: Callable[[str], Awaitable[bool]]) -> bool:
+    """
+    下载小红书笔记图片/视频，相同 media_key 的媒体只下载一次
+    Args:
+        note_id:
+        extension_file_name:
+        media_key: 图片为 trace id，视频为去掉参数的 url
+        download: client 的下载函数，参数为保存路径
+
+    Returns:
+
+    """
+    image_store = XiaoHongShuImage()
+    save_file_name = image_store.make_save_file_name(note_id, extension_file_name)
+    return await image_store.store_media(save_file_name, media_key, download)
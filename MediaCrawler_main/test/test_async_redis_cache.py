@@ -0,0 +1,101 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import fnmatch
+from unittest import IsolatedAsyncioTestCase
+
+from cache.async_redis_cache import AsyncRedisCache
+from proxy.base_proxy import IpCache
+from proxy.types import IpInfoModel
+
+
+class FakePipeline:
+    def __init__(self, redis_client: "FakeRedis"):
+        self.redis_client = redis_client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis_client.round_trips += 1
+        for key, value in self.commands:
+            self.redis_client.data[key] = value
+
+
+class FakeRedis:
+    """只实现 AsyncRedisCache 用到的命令，并统计网络往返次数"""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    async def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self.data[key] = value
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    async def scan_iter(self, match=None, count=None):
+        keys = [key for key in self.data if fnmatch.fnmatchcase(key, match)]
+        for index in range(0, len(keys), count):
+            self.round_trips += 1
+            for key in keys[index:index + count]:
+                yield key.encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def close(self):
+        pass
+
+
+class TestAsyncRedisCache(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis_client = FakeRedis()
+        self.cache = AsyncRedisCache(redis_client=self.redis_client, scan_count=2)
+
+    async def test_set_and_get(self):
+        await self.cache.set("key", {"a": [1, 2]}, 10)
+        self.assertEqual(await self.cache.get("key"), {"a": [1, 2]})
+        self.assertIsNone(await self.cache.get("missing"))
+
+    async def test_bulk(self):
+        await self.cache.set_many([(f"kuaidaili_{i}", f"ip{i}", 10) for i in range(5)])
+        await self.cache.set("jishuhttp_0", "ip", 10)
+        self.assertEqual(self.redis_client.round_trips, 2)
+        keys = sorted(await self.cache.keys("kuaidaili_*"))
+        self.assertEqual(keys, [f"kuaidaili_{i}" for i in range(5)])
+        self.assertEqual(await self.cache.get_many(keys + ["missing"]), [f"ip{i}" for i in range(5)] + [None])
+
+    async def test_ip_cache_load_all_ip(self):
+        ip_cache = IpCache()
+        ip_cache.cache_client = self.cache
+        ip_info = IpInfoModel(ip="1.1.1.1", port=80, user="u", password="p", expired_time_ts=60)
+        await ip_cache.set_ips([("kuaidaili_1.1.1.1_80", ip_info.model_dump_json(), 60)])
+        self.redis_client.round_trips = 0
+        self.assertEqual(await ip_cache.load_all_ip("kuaidaili"), [ip_info])
+        # 一次 SCAN + 一次 MGET
+        self.assertEqual(self.redis_client.round_trips, 2)
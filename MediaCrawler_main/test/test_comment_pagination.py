@@ -0,0 +1,199 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+import config
+from media_platform.tieba.client import BaiduTieBaClient
+from media_platform.xhs.client import XiaoHongShuClient
+from model.m_baidu_tieba import TiebaComment, TiebaNote
+from tools import concurrency_limiter
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+
+class FakeXhsClient(XiaoHongShuClient):
+
+    def __init__(self, page_count: int, sub_page_count: int = 0):
+        super().__init__(headers={}, playwright_page=None, cookie_dict={})
+        self.page_count = page_count
+        self.sub_page_count = sub_page_count
+        self.requested_pages = 0
+        self.running_sub_requests = 0
+        self.max_running_sub_requests = 0
+
+    async def get_note_comments(self, note_id: str, xsec_token: str, cursor: str = ""):
+        page = int(cursor or 0)
+        self.requested_pages += 1
+        return {
+            "has_more": page + 1 < self.page_count,
+            "cursor": str(page + 1),
+            "comments": [
+                {
+                    "id": f"{page}-{i}", "note_id": note_id, "sub_comments": [{"id": f"{page}-{i}-sub"}],
+                    "sub_comment_has_more": self.sub_page_count > 0, "sub_comment_cursor": "0",
+                }
+                for i in range(10)
+            ],
+        }
+
+    async def get_note_sub_comments(self, note_id: str, root_comment_id: str, xsec_token: str, num: int = 10,
+                                    cursor: str = ""):
+        page = int(cursor or 0)
+        self.running_sub_requests += 1
+        self.max_running_sub_requests = max(self.max_running_sub_requests, self.running_sub_requests)
+        await asyncio.sleep(0.01)
+        self.running_sub_requests -= 1
+        return {
+            "has_more": page + 1 < self.sub_page_count,
+            "cursor": str(page + 1),
+            "comments": [{"id": f"{root_comment_id}-sub-{page}-{i}"} for i in range(num)],
+        }
+
+
+class FakeTiebaClient(BaiduTieBaClient):
+
+    def __init__(self, total_pages: list):
+        super().__init__()
+        # 第 N 次请求时页面上显示的总页数，用于模拟爬取过程中帖子页数变化
+        self.total_pages = total_pages
+        self.requested_pages = []
+        self.running = 0
+        self.max_running = 0
+
+    async def get_note_comment_page(self, note_id: str, page: int):
+        total_page = self.total_pages[min(len(self.requested_pages), len(self.total_pages) - 1)]
+        self.requested_pages.append(page)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        # 后面的页先返回，验证产出顺序仍按页码
+        await asyncio.sleep(0.05 / page)
+        self.running -= 1
+        if total_page and page > total_page:
+            return [], total_page
+        comments = [
+            TiebaComment(comment_id=f"{page}-{i}", content="", note_id=note_id, note_url="", tieba_id="",
+                         tieba_name="", tieba_link="")
+            for i in range(30)
+        ]
+        return comments, total_page
+
+
+class ShiftedTiebaClient(FakeTiebaClient):
+    """第 2 页的楼层全部是第 1 页已经产出过的(爬取过程中有新回复，楼层后移)"""
+
+    async def get_note_comment_page(self, note_id: str, page: int):
+        comments, total_page = await super().get_note_comment_page(note_id, page)
+        if page == 2:
+            comments, _ = await super().get_note_comment_page(note_id, 1)
+        return comments, total_page
+
+
+class TestCommentPagination(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.enable_sub_comments = config.ENABLE_GET_SUB_COMMENTS
+        self.max_sub_comments_count = config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES
+
+    async def asyncTearDown(self):
+        config.ENABLE_GET_SUB_COMMENTS = self.enable_sub_comments
+        concurrency_limiter._concurrency_limiters.pop("xhs", None)
+        config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES = self.max_sub_comments_count
+
+    async def test_pages_are_streamed(self):
+        config.ENABLE_GET_SUB_COMMENTS = False
+        client = FakeXhsClient(page_count=100)
+        pages = client.iter_note_comments("note", "token", crawl_interval=0, max_count=25)
+        first_page = await pages.__anext__()
+        # 取到第一页时不会预先把后面的页都请求完
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual(client.requested_pages, 1)
+        rest = [page async for page in pages]
+        self.assertEqual([len(page) for page in rest], [10, 5])
+        self.assertEqual(client.requested_pages, 3)
+
+    async def test_sub_comments_follow_their_page(self):
+        config.ENABLE_GET_SUB_COMMENTS = True
+        client = FakeXhsClient(page_count=1)
+        pages = [page async for page in client.iter_note_comments("note", "token", crawl_interval=0, max_count=100)]
+        self.assertEqual(pages[0][0]["id"], "0-0")
+        self.assertCountEqual([page[0]["id"] for page in pages[1:]], [f"0-{i}-sub" for i in range(10)])
+
+    async def test_sub_comment_threads_run_concurrently_and_are_capped(self):
+        config.ENABLE_GET_SUB_COMMENTS = True
+        config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES = 95
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=4, adaptive=False)
+        concurrency_limiter._concurrency_limiters["xhs"] = limiter
+        client = FakeXhsClient(page_count=1, sub_page_count=3)
+        # 与评论任务一样先持有一个名额，子评论翻页用这个名额加上平台控制器的 3 个空闲名额
+        async with limiter:
+            pages = [page async for page in client.iter_note_comments("note", "token", crawl_interval=0, max_count=10)]
+        sub_comments = [comment for page in pages[1:] for comment in page]
+        self.assertEqual(len(pages[0]), 10)
+        self.assertEqual(len(sub_comments), 95)
+        self.assertEqual(client.max_running_sub_requests, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_sub_comments_share_platform_limiter(self):
+        config.ENABLE_GET_SUB_COMMENTS = True
+        config.CRAWLER_MAX_SUB_COMMENTS_COUNT_SINGLENOTES = 1000
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1, adaptive=False)
+        concurrency_limiter._concurrency_limiters["xhs"] = limiter
+        client = FakeXhsClient(page_count=1, sub_page_count=2)
+        # 平台并发为 1 时，评论任务持有唯一的名额，子评论逐页翻页，不会因为等待名额卡住
+        async with limiter:
+            pages = [page async for page in client.iter_note_comments("note", "token", crawl_interval=0, max_count=10)]
+        self.assertEqual(len(pages), 1 + 10 * 3)
+        self.assertEqual(client.max_running_sub_requests, 1)
+
+    async def test_tieba_pages_fetched_in_windows_and_ordered(self):
+        config.ENABLE_GET_SUB_COMMENTS = False
+        client = FakeTiebaClient(total_pages=[10])
+        note = TiebaNote(note_id="1", title="", note_url="", tieba_name="", tieba_link="", total_replay_page=10)
+        pages = [page async for page in client.iter_note_comments(note, crawl_interval=0, max_count=1000)]
+        self.assertEqual([page[0].comment_id for page in pages], [f"{i}-0" for i in range(1, 11)])
+        self.assertEqual(client.max_running, config.TIEBA_COMMENT_PAGE_CONCURRENCY)
+
+    async def test_tieba_only_needed_pages_are_fetched(self):
+        config.ENABLE_GET_SUB_COMMENTS = False
+        client = FakeTiebaClient(total_pages=[10])
+        note = TiebaNote(note_id="1", title="", note_url="", tieba_name="", tieba_link="", total_replay_page=10)
+        pages = [page async for page in client.iter_note_comments(note, crawl_interval=0, max_count=45)]
+        self.assertEqual([len(page) for page in pages], [30, 15])
+        self.assertEqual(client.requested_pages, [1, 2])
+
+    async def test_tieba_total_page_changes_mid_crawl(self):
+        config.ENABLE_GET_SUB_COMMENTS = False
+        # 详情页显示 3 页，爬取过程中新增回复变为 6 页
+        client = FakeTiebaClient(total_pages=[3, 6])
+        note = TiebaNote(note_id="1", title="", note_url="", tieba_name="", tieba_link="", total_replay_page=3)
+        pages = [page async for page in client.iter_note_comments(note, crawl_interval=0, max_count=1000)]
+        self.assertEqual(len(pages), 6)
+
+        # 页数未知时逐页拉取直到没有评论
+        client = FakeTiebaClient(total_pages=[0])
+        note = TiebaNote(note_id="1", title="", note_url="", tieba_name="", tieba_link="", total_replay_page=0)
+        pages = [page async for page in client.iter_note_comments(note, crawl_interval=0, max_count=90)]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(client.max_running, 1)
+
+    async def test_tieba_duplicated_page_does_not_end(self):
+        config.ENABLE_GET_SUB_COMMENTS = False
+        client = ShiftedTiebaClient(total_pages=[4])
+        note = TiebaNote(note_id="1", title="", note_url="", tieba_name="", tieba_link="", total_replay_page=4)
+        pages = [page async for page in client.iter_note_comments(note, crawl_interval=0, max_count=1000)]
+        # 第 2 页整页重复时跳过，继续拉取到总页数为止
+        self.assertEqual([page[0].comment_id for page in pages], ["1-0", "3-0", "4-0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def test_limit_in_flight(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, adaptive=False)
+        running, max_running = 0, 0
+
+        async def worker():
+            nonlocal running, max_running
+            async with limiter:
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*[worker() for _ in range(10)])
+        self.assertEqual(max_running, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_cancelled_waiter_releases_slot(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, adaptive=False)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        limiter.release()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        # 被取消的等待者不能占用名额
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+        self.assertEqual(limiter.in_flight, 1)
+
+    async def test_ramp_up_and_back_off(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=8)
+        await limiter.acquire()
+        for _ in range(20):
+            limiter.in_flight = limiter.limit
+            limiter.on_sample(0.1)
+        self.assertGreater(limiter.limit, 4)
+
+        # 延迟升高说明请求在平台侧排队，降低并发
+        limit = limiter.limit
+        for _ in range(20):
+            limiter.on_sample(1.0)
+        self.assertLess(limiter.limit, limit)
+
+        limit = limiter.limit
+        limiter.on_dropped()
+        self.assertLess(limiter.limit, limit)
+
+    async def test_no_ramp_up_when_idle(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8)
+        for _ in range(20):
+            limiter.on_sample(0.1)
+        self.assertEqual(limiter.limit, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+import unittest
+
+from media_platform.xhs.client import XiaoHongShuClient
+from store.crawl_index import CrawlIndex
+from tools import utils
+
+
+class TestCrawlIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = CrawlIndex(os.path.join(self.tmp_dir.name, "crawl_index.db"), enable=True)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def test_unchanged(self):
+        self.assertFalse(self.index.is_unchanged("xhs", "n1", {"liked_count": "10"}))
+        self.index.mark_seen("xhs", "n1", {"liked_count": "10", "comment_count": "2"})
+        self.assertTrue(self.index.is_seen("xhs", "n1"))
+        # 只比较两边都有的字段
+        self.assertTrue(self.index.is_unchanged("xhs", "n1", {"liked_count": "10", "share_count": "1"}))
+        self.assertFalse(self.index.is_unchanged("xhs", "n1", {"comment_count": "3"}))
+        self.assertFalse(self.index.is_unchanged("xhs", "n1", {"share_count": "1"}))
+
+    def test_disabled(self):
+        self.index.enable = False
+        self.index.mark_seen("xhs", "n1", {"liked_count": "10"})
+        self.index.enable = True
+        self.assertFalse(self.index.is_seen("xhs", "n1"))
+
+    def test_flush_persists(self):
+        async def mark_and_flush():
+            await self.index.load()
+            self.index.mark_seen("xhs", "n1", {"liked_count": "10"})
+            self.index.mark_seen("xhs", "n2", {"liked_count": "20"})
+            await self.index.flush()
+
+        asyncio.run(mark_and_flush())
+        self.assertEqual(self.index._pending, {})
+        # 新打开的索引能读到 flush 写入的记录
+        reopened = CrawlIndex(self.index.index_file_name, enable=True)
+        try:
+            asyncio.run(reopened.load())
+            self.assertTrue(reopened.is_unchanged("xhs", "n2", {"liked_count": "20"}))
+            self.assertFalse(reopened.is_seen("xhs", "n3"))
+        finally:
+            reopened.close()
+
+    def test_creator_notes_stop_at_seen(self):
+        seen_note_ids = {"n2", "n3"}
+        notes = [
+            {"note_id": "n2", "interact_info": {"sticky": True}},
+            {"note_id": "n1", "interact_info": {}},
+            {"note_id": "n3", "interact_info": {}},
+            {"note_id": "n0", "interact_info": {}},
+        ]
+        new_notes, has_more = XiaoHongShuClient._drop_seen_notes(
+            notes, lambda note: note["note_id"] in seen_note_ids, True
+        )
+        self.assertEqual([note["note_id"] for note in new_notes], ["n1"])
+        self.assertFalse(has_more)
+
+    def test_drop_seen_items_without_pinned(self):
+        # 没有置顶标记的平台(快手/知乎/贴吧等)遇到第一个已爬取过的条目就停止翻页
+        seen_ids = {"3"}
+        new_ids, has_more = utils.drop_seen_items(["1", "2", "3", "4"], lambda item: item in seen_ids, True)
+        self.assertEqual(new_ids, ["1", "2"])
+        self.assertFalse(has_more)
+        new_ids, has_more = utils.drop_seen_items(["5", "6"], lambda item: item in seen_ids, True)
+        self.assertEqual(new_ids, ["5", "6"])
+        self.assertTrue(has_more)
+
+
+if __name__ == "__main__":
+    unittest.main()
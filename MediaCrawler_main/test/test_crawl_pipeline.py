@@ -0,0 +1,114 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import unittest
+
+from tools.crawl_pipeline import merge_page_iterators, run_pipeline
+
+
+class TestCrawlPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stages_overlap_and_keep_order(self):
+        results = []
+
+        async def pages():
+            for page in range(5):
+                await asyncio.sleep(0.05)
+                yield page
+
+        async def detail(page):
+            await asyncio.sleep(0.05)
+            return page * 10
+
+        async def comments(item):
+            await asyncio.sleep(0.05)
+            results.append(item)
+
+        start = time.monotonic()
+        await run_pipeline(pages(), [detail, comments])
+        # 串行需要 5 * 3 * 0.05 = 0.75 秒，流水线约为 (5 + 2) * 0.05 秒
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(results, [0, 10, 20, 30, 40])
+
+    async def test_none_result_skips_later_stages(self):
+        results = []
+
+        async def pages():
+            for page in range(4):
+                yield page
+
+        async def keep_even(page):
+            return page if page % 2 == 0 else None
+
+        async def collect(page):
+            results.append(page)
+
+        await run_pipeline(pages(), [keep_even, collect])
+        self.assertEqual(results, [0, 2])
+
+    async def test_stage_error_cancels_pipeline(self):
+        closed = []
+
+        async def pages():
+            try:
+                page = 0
+                while True:
+                    yield page
+                    page += 1
+            finally:
+                closed.append(True)
+
+        async def fail(page):
+            if page == 2:
+                raise ValueError(page)
+            return page
+
+        async def slow(page):
+            await asyncio.sleep(10)
+
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(run_pipeline(pages(), [fail, slow]), timeout=2)
+        self.assertEqual(closed, [True])
+
+    async def test_merge_page_iterators_keeps_each_cursor(self):
+        async def thread(name: str, page_count: int):
+            for page in range(page_count):
+                await asyncio.sleep(0.01)
+                yield [f"{name}-{page}"]
+
+        start = time.monotonic()
+        pages = [page async for page in merge_page_iterators([thread(name, 5) for name in "abcd"], concurrency=4)]
+        # 串行需要 4 * 5 * 0.01 秒，并发约为 5 * 0.01 秒
+        self.assertLess(time.monotonic() - start, 0.15)
+        for name in "abcd":
+            # 同一迭代器内的分页保持顺序
+            self.assertEqual([page[0] for page in pages if page[0][0] == name], [f"{name}-{i}" for i in range(5)])
+
+    async def test_merge_page_iterators_stops_at_max_count(self):
+        closed = []
+
+        async def thread(name: str):
+            try:
+                while True:
+                    yield [name] * 3
+            finally:
+                closed.append(name)
+
+        pages = [page async for page in merge_page_iterators([thread("a"), thread("b")], concurrency=2, max_count=7)]
+        self.assertEqual(sum(len(page) for page in pages), 7)
+        self.assertCountEqual(closed, ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from async_sqlite_db import AsyncSqliteDB
+from store.db_batch_writer import DbBatchWriter
+from var import media_crawler_db_var
+
+
+class TestDbBatchWriter(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = AsyncSqliteDB(os.path.join(self.tmp_dir.name, "test.db"))
+        await self.db.executescript(
+            "CREATE TABLE note_comment (id INTEGER PRIMARY KEY AUTOINCREMENT, comment_id TEXT, "
+            "content TEXT, add_ts INTEGER, last_modify_ts INTEGER);"
+            "CREATE UNIQUE INDEX idx_note_comment_comment_id ON note_comment(comment_id);"
+        )
+        media_crawler_db_var.set(self.db)
+        self.dead_letter_dir = os.path.join(self.tmp_dir.name, "dead_letter")
+        self.writer = DbBatchWriter(batch_size=10, flush_interval=60, max_retries=2,
+                                    dead_letter_dir=self.dead_letter_dir)
+
+    async def test_batch_upsert(self):
+        for i in range(25):
+            await self.writer.upsert("note_comment", {"comment_id": str(i), "content": "v1", "add_ts": 1,
+                                                      "last_modify_ts": 1}, conflict_fields=("comment_id",))
+        # 攒够 batch_size 的两批已经落库，剩余 5 条还在缓冲区
+        self.assertEqual(len(await self.db.query("select * from note_comment")), 20)
+        await self.writer.upsert("note_comment", {"comment_id": "0", "content": "v2", "add_ts": 2,
+                                                  "last_modify_ts": 2}, conflict_fields=("comment_id",))
+        await self.writer.close()
+
+        rows = await self.db.query("select * from note_comment order by id")
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0]["content"], "v2")
+        self.assertEqual(rows[0]["last_modify_ts"], 2)
+        self.assertEqual(rows[0]["add_ts"], 1)
+
+    async def test_failed_flush_is_retried(self):
+        upsert_items = self.db.upsert_items
+        calls = []
+
+        async def fail_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            return await upsert_items(*args, **kwargs)
+
+        self.db.upsert_items = fail_once
+        for i in range(10):
+            await self.writer.upsert("note_comment", {"comment_id": str(i), "content": "v1", "add_ts": 1,
+                                                      "last_modify_ts": 1}, conflict_fields=("comment_id",))
+        # 第一次落库失败，记录仍在缓冲区
+        self.assertEqual(len(await self.db.query("select * from note_comment")), 0)
+        await self.writer.upsert("note_comment", {"comment_id": "10", "content": "v1", "add_ts": 1,
+                                                  "last_modify_ts": 1}, conflict_fields=("comment_id",))
+        await self.writer.flush()
+        self.assertEqual(len(await self.db.query("select * from note_comment")), 11)
+
+    async def test_permanent_error_goes_to_dead_letter(self):
+        async def always_fail(*args, **kwargs):
+            raise RuntimeError("ON CONFLICT clause does not match any PRIMARY KEY or UNIQUE constraint")
+
+        self.db.upsert_items = always_fail
+        for i in range(12):
+            await self.writer.upsert("note_comment", {"comment_id": str(i), "content": "v1", "add_ts": 1,
+                                                      "last_modify_ts": 1}, conflict_fields=("comment_id",))
+        # 第 10、11、12 条记录各触发一次落库，第 3 次失败后超过重试次数，这一批写入 dead letter 文件，缓冲区清空
+        self.assertEqual(self.writer._buffers, {})
+        await self.writer.upsert("note_comment", {"comment_id": "12", "content": "v1", "add_ts": 1,
+                                                  "last_modify_ts": 1}, conflict_fields=("comment_id",))
+        # close 时仍然失败的记录直接写入 dead letter 文件
+        await self.writer.close()
+        with open(os.path.join(self.dead_letter_dir, "note_comment.jsonl"), encoding="utf-8") as f:
+            comment_ids = [json.loads(line)["comment_id"] for line in f]
+        self.assertEqual(comment_ids, [str(i) for i in range(13)])
+
+    async def asyncTearDown(self):
+        await self.writer.close()
+        await self.db.close()
+        self.tmp_dir.cleanup()
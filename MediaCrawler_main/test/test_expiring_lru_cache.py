@@ -0,0 +1,63 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import mock
+
+from cache.expiring_lru_cache import ExpiringLruCache
+
+
+class TestExpiringLruCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("cache.expiring_lru_cache.time.time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = ExpiringLruCache(max_entries=3)
+
+    def test_expired_key(self):
+        self.cache.set("key", "value", 10)
+        self.cache.set("key2", "value", 20)
+        self.assertEqual(self.cache.get("key"), "value")
+        self.now += 11
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.keys("*"), ["key2"])
+        # 覆盖后以新的过期时间为准
+        self.cache.set("key2", "value2", 100)
+        self.now += 50
+        self.assertEqual(self.cache.get("key2"), "value2")
+
+    def test_lru_eviction(self):
+        self.cache.set("a", 1, 60)
+        self.cache.set("b", 2, 60)
+        self.cache.set("c", 3, 60)
+        self.cache.get("a")
+        self.cache.set("d", 4, 60)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(len(self.cache), 3)
+
+    def test_keys_pattern(self):
+        cache = ExpiringLruCache()
+        for key in ["kuaidaili_1.1.1.1_80", "kuaidaili_2.2.2.2_81", "JISUHTTP_3.3.3.3_80", "kuaidai"]:
+            cache.set(key, key, 60)
+        self.assertEqual(cache.keys("kuaidaili_*"), ["kuaidaili_1.1.1.1_80", "kuaidaili_2.2.2.2_81"])
+        self.assertEqual(cache.keys("*_80"), ["JISUHTTP_3.3.3.3_80", "kuaidaili_1.1.1.1_80"])
+        self.assertEqual(cache.keys("kuaidaili_?.*_8[1]"), ["kuaidaili_2.2.2.2_81"])
+        self.assertEqual(cache.keys("kuaidai"), ["kuaidai"])
+        cache.delete("kuaidaili_1.1.1.1_80")
+        cache.set("kuaidaili_1.1.1.1_80", "new", 60)
+        self.assertEqual(cache.keys("kuaidaili_*"), ["kuaidaili_1.1.1.1_80", "kuaidaili_2.2.2.2_81"])
+
+
+if __name__ == "__main__":
+    unittest.main()
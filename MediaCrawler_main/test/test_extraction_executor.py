@@ -0,0 +1,50 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from media_platform.tieba.help import TieBaExtractor
+from media_platform.xhs.help import transform_json_keys
+from tools.extraction_executor import ExtractionExecutor
+
+TIEBA_TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "media_platform", "tieba", "test_data")
+
+
+class TestExtractionExecutor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_small_page_is_parsed_inline(self):
+        executor = ExtractionExecutor(max_workers=2, inline_max_size=1024)
+        result = await executor.run(transform_json_keys, {"noteId": {"imageList": [{"urlDefault": "a"}]}})
+        self.assertEqual(result, {"note_id": {"image_list": [{"url_default": "a"}]}})
+        self.assertTrue(executor.should_inline("<html></html>"))
+        # 小页面不会启动进程池
+        self.assertIsNone(executor._pool)
+
+    async def test_large_page_is_parsed_in_process_pool(self):
+        with open(os.path.join(TIEBA_TEST_DATA_DIR, "note_comments.html"), "r", encoding="utf-8") as f:
+            page_content = f.read()
+        extractor = TieBaExtractor()
+        expected = extractor.extract_tieba_note_parment_comments(page_content, note_id="1")
+
+        executor = ExtractionExecutor(max_workers=1, inline_max_size=1024)
+        try:
+            result = await executor.run(extractor.extract_tieba_note_parment_comments, page_content, note_id="1")
+            self.assertIsNotNone(executor._pool)
+        finally:
+            executor.close()
+        self.assertEqual(result, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
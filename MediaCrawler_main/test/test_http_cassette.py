@@ -0,0 +1,67 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import functools
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+
+from tools.http_cassette import Cassette, CassetteMissError, make_match_key, record_response_hook
+from tools.http_pool import HttpClientPool
+
+
+class TestHttpCassette(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "xhs_search.jsonl.gz")
+        self.page = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.page += 1
+        return httpx.Response(200, json={"success": True, "page": self.page})
+
+    def test_match_key_ignore_volatile_params(self):
+        self.assertEqual(
+            make_match_key("GET", "https://a.com/api?b=2&a=1&a_bogus=x&ts=1"),
+            make_match_key("get", "https://a.com/api?a=1&b=2&a_bogus=y&ts=2"),
+        )
+        self.assertEqual(
+            make_match_key("POST", "https://a.com/api", b'{"keyword": "k", "search_id": "1"}'),
+            make_match_key("POST", "https://a.com/api", b'{"search_id": "2", "keyword": "k"}'),
+        )
+        self.assertNotEqual(make_match_key("GET", "https://a.com/api?a=1"), make_match_key("GET", "https://a.com/api?a=2"))
+
+    async def test_record_and_replay(self):
+        cassette = Cassette(self.file_path)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(self.handler),
+                                     event_hooks={"response": [functools.partial(record_response_hook, cassette)]}) as client:
+            for ts in range(2):
+                await client.get("https://edith.xiaohongshu.com/api/search", params={"page": 1, "ts": ts})
+        cassette.save()
+
+        pool = HttpClientPool(cassette_mode="replay", cassette=Cassette(self.file_path).load())
+        client = pool.get_client({"https://": "http://u:p@1.1.1.1:80"})
+        pages = [
+            (await client.get("https://edith.xiaohongshu.com/api/search", params={"page": 1, "ts": 99})).json()["page"]
+            for _ in range(3)
+        ]
+        # 同一个请求按录制顺序返回，最后一条重复返回
+        self.assertEqual(pages, [1, 2, 2])
+        with self.assertRaises(CassetteMissError):
+            await client.get("https://edith.xiaohongshu.com/api/search", params={"page": 2})
+        await pool.close_all()
@@ -0,0 +1,42 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from store.jsonl_store import JsonlWriterManager
+
+
+class TestJsonlWriterManager(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "jsonl", "search_contents_2024-01-01.jsonl")
+        self.manager = JsonlWriterManager()
+
+    async def test_append_and_compact(self):
+        items = [{"note_id": str(i), "title": f"标题{i}"} for i in range(100)]
+        for item in items:
+            await self.manager.save(self.file_path, item)
+        writer = self.manager._writers[self.file_path]
+        await self.manager.close()
+
+        with open(self.file_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 100)
+        with open(writer.compact_to_json(), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), items)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        self.tmp_dir.cleanup()
@@ -0,0 +1,85 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+import config
+from base.base_crawler import AbstractCrawler
+from var import source_keyword_var
+
+
+class FakeCrawler(AbstractCrawler):
+
+    def __init__(self):
+        self.saved = []
+        self.running = 0
+        self.max_running = 0
+
+    async def start(self):
+        pass
+
+    async def search(self):
+        pass
+
+    async def launch_browser(self, chromium, playwright_proxy, user_agent, headless=True):
+        pass
+
+    async def search_by_keyword(self, keyword: str, page_count: int):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        for _ in range(page_count):
+            await asyncio.sleep(0.01)
+            # 模拟 store 在保存时读取上下文中的关键词
+            self.saved.append((keyword, source_keyword_var.get()))
+        self.running -= 1
+
+
+class TestKeywordSearch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.keywords = config.KEYWORDS
+        self.concurrency = config.KEYWORD_SEARCH_CONCURRENCY
+
+    async def asyncTearDown(self):
+        config.KEYWORDS = self.keywords
+        config.KEYWORD_SEARCH_CONCURRENCY = self.concurrency
+
+    async def test_keyword_attribution(self):
+        config.KEYWORDS = "a,b,c,d,e"
+        config.KEYWORD_SEARCH_CONCURRENCY = 2
+        crawler = FakeCrawler()
+        await crawler.run_keyword_searches(crawler.search_by_keyword, 3)
+        self.assertEqual(len(crawler.saved), 15)
+        self.assertTrue(all(keyword == source_keyword for keyword, source_keyword in crawler.saved))
+        self.assertEqual(crawler.max_running, 2)
+        # 关键词只在各自的 task 内生效
+        self.assertEqual(source_keyword_var.get(), "")
+
+    async def test_error_cancels_other_keywords(self):
+        config.KEYWORDS = "a,b"
+        config.KEYWORD_SEARCH_CONCURRENCY = 2
+        finished = []
+
+        async def search_keyword(keyword: str):
+            if keyword == "a":
+                raise ValueError(keyword)
+            await asyncio.sleep(1)
+            finished.append(keyword)
+
+        with self.assertRaises(ValueError):
+            await FakeCrawler().run_keyword_searches(search_keyword)
+        self.assertEqual(finished, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+import unittest
+
+from store.media_blob_store import MediaBlobStore, make_media_key
+
+
+class TestMediaBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = MediaBlobStore(os.path.join(self.tmp_dir.name, "blobs"))
+        self.download_count = 0
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def make_download(self, content: bytes):
+        async def download(save_file_name: str) -> bool:
+            self.download_count += 1
+            os.makedirs(os.path.dirname(save_file_name), exist_ok=True)
+            with open(save_file_name, "wb") as f:
+                f.write(content)
+            return True
+        return download
+
+    def test_same_media_key_download_once(self):
+        first = os.path.join(self.tmp_dir.name, "note1", "0.jpg")
+        second = os.path.join(self.tmp_dir.name, "note2", "0.jpg")
+        download = self.make_download(b"image")
+        asyncio.run(self.store.fetch("img-key", first, download))
+        asyncio.run(self.store.fetch("img-key", second, download))
+        self.assertEqual(self.download_count, 1)
+        self.assertTrue(os.path.samefile(first, second))
+
+    def test_same_content_share_blob(self):
+        first = os.path.join(self.tmp_dir.name, "note1", "0.jpg")
+        second = os.path.join(self.tmp_dir.name, "note2", "0.jpg")
+        asyncio.run(self.store.fetch("key-a", first, self.make_download(b"image")))
+        asyncio.run(self.store.fetch("key-b", second, self.make_download(b"image")))
+        self.assertEqual(self.download_count, 2)
+        self.assertTrue(os.path.samefile(first, second))
+
+    def test_concurrent_same_content(self):
+        async def fetch_all():
+            download = self.make_download(b"same image")
+            return await asyncio.gather(*[
+                self.store.fetch(f"key-{i}", os.path.join(self.tmp_dir.name, f"note{i}", "0.jpg"), download)
+                for i in range(20)
+            ])
+
+        self.assertTrue(all(asyncio.run(fetch_all())))
+        file_names = [os.path.join(self.tmp_dir.name, f"note{i}", "0.jpg") for i in range(20)]
+        self.assertTrue(all(os.path.samefile(file_names[0], file_name) for file_name in file_names))
+        # 没有残留的临时文件
+        self.assertEqual([name for _, _, names in os.walk(self.tmp_dir.name) for name in names
+                          if name.endswith(".linking")], [])
+
+    def test_make_media_key(self):
+        self.assertEqual(make_media_key("https://a.com/x.jpg?t=1"), make_media_key("http://a.com/x.jpg?t=2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import functools
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import IsolatedAsyncioTestCase
+
+from tools import http_pool
+from tools.media_downloader import PART_SUFFIX, MediaDownloader, MediaDownloadQueue
+
+MEDIA_CONTENT = os.urandom(256 * 1024 + 7)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    range_requests = []
+    full_requests = 0
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if not match:
+            RangeHandler.full_requests += 1
+            self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(len(MEDIA_CONTENT)))
+            self.end_headers()
+            self.wfile.write(MEDIA_CONTENT)
+            return
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(MEDIA_CONTENT) - 1
+        RangeHandler.range_requests.append((start, end))
+        body = MEDIA_CONTENT[start:end + 1]
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(MEDIA_CONTENT)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMediaDownloader(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/video.mp4"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_file_name = os.path.join(self.tmp_dir.name, "1", "video.mp4")
+        RangeHandler.range_requests.clear()
+        RangeHandler.full_requests = 0
+
+    async def test_stream_download(self):
+        downloader = MediaDownloader(chunk_size=4096, segment_num=1)
+        self.assertTrue(await downloader.download(self.url, self.save_file_name))
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), MEDIA_CONTENT)
+        self.assertFalse(os.path.exists(self.save_file_name + PART_SUFFIX))
+
+    async def test_resume_from_part_file(self):
+        os.makedirs(os.path.dirname(self.save_file_name))
+        with open(self.save_file_name + PART_SUFFIX, "wb") as f:
+            f.write(MEDIA_CONTENT[:1000])
+        downloader = MediaDownloader(segment_num=4, segment_threshold=1024)
+        self.assertTrue(await downloader.download(self.url, self.save_file_name))
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), MEDIA_CONTENT)
+        self.assertEqual(RangeHandler.range_requests, [(1000, len(MEDIA_CONTENT) - 1)])
+
+    async def test_parallel_segments(self):
+        downloader = MediaDownloader(segment_num=4, segment_threshold=1024)
+        self.assertTrue(await downloader.download(self.url, self.save_file_name))
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), MEDIA_CONTENT)
+        # 1 次整个文件的请求(根据 Content-Length 决定分段后放弃) + 4 个分段
+        self.assertEqual(RangeHandler.full_requests, 1)
+        self.assertEqual(len(RangeHandler.range_requests), 4)
+        self.assertEqual(os.listdir(os.path.dirname(self.save_file_name)), ["video.mp4"])
+
+    async def test_small_file_single_request(self):
+        downloader = MediaDownloader(segment_num=4, segment_threshold=len(MEDIA_CONTENT) + 1)
+        self.assertTrue(await downloader.download(self.url, self.save_file_name))
+        with open(self.save_file_name, "rb") as f:
+            self.assertEqual(f.read(), MEDIA_CONTENT)
+        # 小于分段阈值的文件不额外探测大小
+        self.assertEqual((RangeHandler.full_requests, RangeHandler.range_requests), (1, []))
+
+    async def test_download_queue_retry_and_join(self):
+        downloader = MediaDownloader(segment_num=1)
+        queue = MediaDownloadQueue(downloader, worker_num=2, max_queue_size=2, max_retries=1)
+        attempts = []
+
+        async def flaky_job(save_file_name):
+            attempts.append(save_file_name)
+            if attempts.count(save_file_name) == 1 and save_file_name.endswith("0.mp4"):
+                return False
+            return await downloader.download(self.url, save_file_name)
+
+        save_file_names = [os.path.join(self.tmp_dir.name, f"{i}.mp4") for i in range(5)]
+        for save_file_name in save_file_names:
+            await queue.put(functools.partial(flaky_job, save_file_name), save_file_name)
+        await queue.join()
+
+        stats = queue.stats()
+        self.assertEqual((stats["pending"], stats["done"], stats["failed"]), (0, 5, 0))
+        self.assertEqual(stats["downloaded_bytes"], 5 * len(MEDIA_CONTENT))
+        self.assertEqual(len(attempts), 6)
+
+    async def asyncTearDown(self):
+        await http_pool.close_all()
+        self.tmp_dir.cleanup()
@@ -13,10 +13,17 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2023/12/2 14:42
 # @Desc    :
+from typing import List
 from unittest import IsolatedAsyncioTestCase
 
-from proxy.proxy_ip_pool import create_ip_pool
+from proxy.base_proxy import ProxyProvider
+from media_platform.xhs.exception import IPBlockError
+from proxy.proxy_ip_pool import ProxyIpPool, create_ip_pool
+from proxy.proxy_rotator import ProxyRotator, rotate_proxy_on_block
+from proxy.proxy_ip_pool import make_proxy_key
 from proxy.types import IpInfoModel
+from tools import http_pool, utils
+from tools.rate_limiter import rate_limited
 
 
 class TestIpPool(IsolatedAsyncioTestCase):
@@ -28,3 +35,110 @@ class TestIpPool(IsolatedAsyncioTestCase):
             print(ip_proxy_info)
             self.assertIsNotNone(ip_proxy_info.ip, msg="验证 ip 是否获取成功")
 
+
+
+class FakeProxyProvider(ProxyProvider):
+    def __init__(self):
+        self.fetch_count = 0
+
+    async def get_proxies(self, num: int) -> List[IpInfoModel]:
+        self.fetch_count += 1
+        return [
+            IpInfoModel(ip=f"10.0.{self.fetch_count}.{i}", port=8000, user="u", password="p",
+                        expired_time_ts=600 if i else 10)
+            for i in range(num)
+        ]
+
+
+class TestProxyIpPoolScore(IsolatedAsyncioTestCase):
+    async def test_evict_expiring_and_refill(self):
+        provider = FakeProxyProvider()
+        pool = ProxyIpPool(ip_pool_count=3, enable_validate_ip=False, ip_provider=provider,
+                           min_ip_count=2, expire_ahead_sec=30, max_continuous_fails=2)
+        await pool.load_proxies()
+        # 剩余 10 秒过期的 IP 不会放入代理池
+        self.assertEqual(len(pool.proxy_list), 2)
+
+        proxy = await pool.get_proxy()
+        pool.mark_failed(proxy)
+        pool.mark_failed(proxy)
+        self.assertNotIn(proxy, pool.proxy_list)
+        # 低于水位线后在后台补充
+        await pool._refill_task
+        self.assertEqual(provider.fetch_count, 2)
+        self.assertGreaterEqual(len(pool.proxy_list), 2)
+
+    async def test_exclude_and_weight(self):
+        pool = ProxyIpPool(ip_pool_count=3, enable_validate_ip=False, ip_provider=FakeProxyProvider())
+        await pool.load_proxies()
+        fast, slow = pool.proxy_list
+        pool.mark_success(fast, 0.05)
+        for _ in range(10):
+            pool.mark_success(slow, 10)
+        self.assertNotEqual(await pool.get_proxy(exclude=fast), fast)
+        picks = [await pool.get_proxy() for _ in range(200)]
+        self.assertGreater(picks.count(fast), picks.count(slow))
+
+
+class FakeApiClient:
+    def __init__(self, proxies, blocked_ips):
+        self.proxies = proxies
+        self.proxy_rotator = None
+        self.blocked_ips = blocked_ips
+        self.request_count = 0
+
+    @rotate_proxy_on_block(IPBlockError)
+    async def request(self) -> str:
+        self.request_count += 1
+        proxy_url = list(self.proxies.values())[0]
+        if any(ip in proxy_url for ip in self.blocked_ips):
+            raise IPBlockError("blocked")
+        return proxy_url
+
+
+class FakeRateLimitedClient:
+    def __init__(self, proxies, proxy_rotator):
+        self.proxies = proxies
+        self.proxy_rotator = proxy_rotator
+
+    @rate_limited("fake", IPBlockError)
+    async def request(self, method, url, **kwargs) -> str:
+        return url
+
+
+class TestProxyRotator(IsolatedAsyncioTestCase):
+    async def test_rotate_on_block(self):
+        pool = ProxyIpPool(ip_pool_count=3, enable_validate_ip=False, ip_provider=FakeProxyProvider())
+        await pool.load_proxies()
+        rotator = ProxyRotator(pool, max_rotations=3)
+        first = await rotator.lease()
+        _, httpx_proxy = utils.format_proxy_info(first)
+        api_client = FakeApiClient(httpx_proxy, blocked_ips=[first.ip])
+        failed_http_client = http_pool.get_client(httpx_proxy)
+        with self.assertRaises(IPBlockError):
+            await api_client.request()
+
+        api_client.proxy_rotator = rotator
+        proxy_url = await api_client.request()
+        self.assertNotIn(first.ip, proxy_url)
+        self.assertNotIn(first, pool.proxy_list)
+        self.assertEqual(rotator.rotate_count, 1)
+        # 失效代理对应的共享 httpx 客户端不再分配，但不关闭，其他进行中的请求可以继续完成，close_all 时关闭
+        self.assertFalse(failed_http_client.is_closed)
+        self.assertIsNot(http_pool.get_client(httpx_proxy), failed_http_client)
+        await http_pool.close_all()
+        self.assertTrue(failed_http_client.is_closed)
+
+    async def test_report_success_from_request(self):
+        pool = ProxyIpPool(ip_pool_count=2, enable_validate_ip=False, ip_provider=FakeProxyProvider())
+        await pool.load_proxies()
+        rotator = ProxyRotator(pool)
+        ip_info = await rotator.lease()
+        _, httpx_proxy = utils.format_proxy_info(ip_info)
+        api_client = FakeRateLimitedClient(httpx_proxy, rotator)
+        await api_client.request("GET", "https://example.com/api")
+        await api_client.request("GET", "https://example.com/api")
+        # 平台客户端的请求路径把成功次数和延迟反馈给代理池
+        stat = pool._proxy_stats[make_proxy_key(ip_info)]
+        self.assertEqual(stat.success_count, 2)
+        self.assertLess(stat.latency, 1)
@@ -0,0 +1,96 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+import config
+from tools.rate_limiter import AdaptiveRateLimiter, get_endpoint_class, rate_limited, rate_limiter_registry
+
+
+class ThrottleError(Exception):
+    pass
+
+
+class FakeClient:
+    proxies = None
+
+    def __init__(self, throttle: bool = False):
+        self.throttle = throttle
+
+    @rate_limited("fake", ThrottleError)
+    async def request(self, method, url, **kwargs):
+        if self.throttle:
+            raise ThrottleError("429")
+        return {"ok": True}
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def test_endpoint_class(self):
+        self.assertEqual(
+            get_endpoint_class("https://www.zhihu.com/api/v4/answers/1234567/root_comments?offset=0"),
+            "www.zhihu.com/api/v4/answers/*/root_comments",
+        )
+        self.assertEqual(get_endpoint_class("https://edith.xiaohongshu.com/api/sns/web/v2/comment/page?note_id=1"),
+                         "edith.xiaohongshu.com/api/sns/web/v2/comment/page")
+
+    async def test_acquire_paces_requests(self):
+        limiter = AdaptiveRateLimiter(initial_rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        # 第一个令牌已在桶中，后面 4 个按 20 次/秒生成
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_aimd(self):
+        limiter = AdaptiveRateLimiter(initial_rate=2, min_rate=0.5, max_rate=3, increase_step=1, decrease_factor=0.5)
+        limiter.on_success(0.1)
+        self.assertAlmostEqual(limiter.rate, 2.5)
+        for _ in range(10):
+            limiter.on_success(0.1)
+        self.assertEqual(limiter.rate, 3)
+        limiter.on_throttled()
+        self.assertEqual(limiter.rate, 1.5)
+        for _ in range(5):
+            limiter.on_throttled()
+        self.assertEqual(limiter.rate, 0.5)
+
+    def test_high_latency_holds_rate(self):
+        limiter = AdaptiveRateLimiter(initial_rate=2, increase_step=1, latency_factor=2)
+        for _ in range(5):
+            limiter.on_success(0.1)
+        rate = limiter.rate
+        for _ in range(3):
+            limiter.on_success(2.0)
+        self.assertEqual(limiter.rate, rate)
+
+    async def test_decorator_adjusts_rate(self):
+        enable = config.ENABLE_ADAPTIVE_RATE_LIMIT
+        config.ENABLE_ADAPTIVE_RATE_LIMIT = True
+        try:
+            url = "https://fake.com/api/comments/9876543"
+            limiter = rate_limiter_registry.get_limiter("fake", url)
+            rate = limiter.rate
+            self.assertEqual(await FakeClient().request("GET", url), {"ok": True})
+            self.assertGreater(limiter.rate, rate)
+
+            rate = limiter.rate
+            with self.assertRaises(ThrottleError):
+                await FakeClient(throttle=True).request("GET", "https://fake.com/api/comments/1234567")
+            self.assertLess(limiter.rate, rate)
+        finally:
+            config.ENABLE_ADAPTIVE_RATE_LIMIT = enable
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import shutil
+import subprocess
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+from media_platform.zhihu.help import get_sign, get_zse_96
+from tools.signer_pool import SignerPool
+
+
+# 在 node 中执行 libs/zhihu.js，固定 Math.random 使随机填充字节等于给定值，输出 get_zse_96 的签名
+ZSE_96_JS_RUNNER = """
+const fs = require("fs");
+const [encodeMd5, randomBytes] = JSON.parse(process.argv[1]);
+eval(fs.readFileSync("libs/zhihu.js", "utf-8"));
+console.log(JSON.stringify(randomBytes.map(randomByte => {
+    Math.random = () => (randomByte + 0.5) / 127;
+    return get_zse_96(encodeMd5);
+})));
+"""
+
+
+@unittest.skipIf(shutil.which("node") is None, "node is not installed")
+class TestZse96(unittest.TestCase):
+
+    def test_same_as_js(self):
+        encode_md5 = "3b7f4a2e9c1d8e6f0a5b4c3d2e1f0a9b"
+        random_bytes = [0, 5, 63, 126]
+        output = subprocess.run(
+            ["node", "-e", ZSE_96_JS_RUNNER, json.dumps([encode_md5, random_bytes])],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(json.loads(output), [get_zse_96(encode_md5, random_byte) for random_byte in random_bytes])
+
+
+@unittest.skipIf(shutil.which("node") is None, "node is not installed")
+class TestSignerPool(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.pool = SignerPool("libs/zhihu.js", pool_size=2)
+
+    async def test_reuse_worker(self):
+        cookies = "d_c0=AbCdEf123; z_c0=xyz"
+        for _ in range(3):
+            res = await self.pool.call("get_sign", "/api/v4/me", cookies)
+            self.assertEqual(res["x-zst-81"], get_sign("/api/v4/me", cookies)["x-zst-81"])
+            self.assertTrue(res["x-zse-96"].startswith("2.0_"))
+        self.assertEqual(len(self.pool._workers), 1)
+
+    async def test_douyin_sign(self):
+        douyin_pool = SignerPool("libs/douyin.js")
+        try:
+            a_bogus = await douyin_pool.call("sign_datail", "aweme_id=1&device_platform=webapp", "Mozilla/5.0")
+            self.assertTrue(a_bogus)
+        finally:
+            await douyin_pool.close()
+
+    async def test_close_while_calling(self):
+        cookies = "d_c0=AbCdEf123"
+        call_task = asyncio.create_task(self.pool.call("get_sign", "/api/v4/me", cookies))
+        # 等待签名进程启动并开始处理请求后关闭进程池
+        while not self.pool._workers:
+            await asyncio.sleep(0.01)
+        await self.pool.close()
+        try:
+            await call_task
+        except Exception as e:
+            self.assertNotIsInstance(e, AttributeError)
+        self.assertIsNone(self.pool._idle)
+        self.assertIn(self.pool, list(SignerPool._instances))
+
+    async def asyncTearDown(self):
+        await self.pool.close()
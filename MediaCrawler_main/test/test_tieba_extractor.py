@@ -0,0 +1,42 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+import pickle
+import unittest
+
+from benchmark.bench_tieba_extractor import build_cases
+from media_platform.tieba.help import TieBaExtractor, TieBaLxmlExtractor
+
+
+class TestTieBaLxmlExtractor(unittest.TestCase):
+
+    def test_output_same_as_parsel_extractor(self):
+        old_extractor, new_extractor = TieBaExtractor(), TieBaLxmlExtractor()
+        for name, method, method_args in build_cases():
+            with self.subTest(name):
+                expected = getattr(old_extractor, method)(*method_args)
+                self.assertTrue(expected)
+                self.assertEqual(getattr(new_extractor, method)(*method_args), expected)
+
+    def test_comment_page_total_page(self):
+        _, _, method_args = [case for case in build_cases() if case[0] == "comment_page"][0]
+        comments, total_page = TieBaLxmlExtractor().extract_tieba_note_comment_page(*method_args)
+        self.assertEqual(len(comments), 30)
+        self.assertEqual(total_page, TieBaExtractor.extract_total_replay_page(method_args[0]))
+
+    def test_picklable_for_process_pool(self):
+        extractor = pickle.loads(pickle.dumps(TieBaLxmlExtractor()))
+        self.assertIsInstance(extractor, TieBaLxmlExtractor)
+
+
+if __name__ == "__main__":
+    unittest.main()
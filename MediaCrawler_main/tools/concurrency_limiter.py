@@ -0,0 +1,168 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 自适应并发控制，同一平台的详情、评论等并发任务共享一个并发上限，按请求延迟(Vegas)和限流信号调整
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import config
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    可动态调整上限的信号量，用法与 asyncio.Semaphore 相同: async with limiter: ...
+    上限按 Vegas 算法调整:
+    1. 记录最低请求延迟作为无排队时的延迟，估算排队比例 = 1 - 最低延迟 / 当前延迟(排队数 = 上限 * 排队比例)
+    2. 排队比例小于 alpha 且并发已用满一半以上时提高上限，大于 beta 时降低上限，每个并发窗口约调整 1
+       (并发上限只有个位数，排队阈值按上限的比例计算，固定的排队数阈值在小上限下永远达不到)
+    3. 遇到限流、超时时上限乘以 0.75
+    最低延迟每 probe_interval 个样本重新取一次，适应网络和代理的变化
+    并发名额的单位是逐个发请求的任务(一条帖子的详情任务、评论翻页任务等)：持有名额的任务同一时刻只有一个请求在进行，
+    占用的名额数就是进行中的请求数，与 rate_limited 按单个请求采集的延迟样本(on_sample)单位一致；
+    任务内需要并发的请求(如多条一级评论的子评论翻页)要为每个额外并发的请求单独获取名额(见 crawl_pipeline.merge_page_iterators)
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = 1,
+            min_limit: int = 1,
+            max_limit: int = 8,
+            adaptive: bool = True,
+            alpha: float = 0.3,
+            beta: float = 0.6,
+            probe_interval: int = 200,
+    ):
+        """
+        Args:
+            initial_limit: 初始并发上限
+            min_limit: 最低并发上限
+            max_limit: 最高并发上限
+            adaptive: 是否自适应调整，关闭时为固定上限的共享信号量
+            alpha: 估算排队比例低于该值时提高上限
+            beta: 估算排队比例高于该值时降低上限
+            probe_interval: 重新取最低延迟的样本间隔
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.adaptive = adaptive
+        self.alpha = alpha
+        self.beta = beta
+        self.probe_interval = probe_interval
+        self.in_flight = 0
+        self._limit = float(initial_limit)
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._min_latency: Optional[float] = None
+        self._sample_count = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, min(self.max_limit, int(self._limit)))
+
+    async def acquire(self) -> None:
+        """
+        获取一个并发名额，名额用完时按先来先得排队等待
+        Returns:
+
+        """
+        if self.try_acquire():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已经分到名额时任务被取消，把名额交还给下一个等待者
+                self.release()
+            raise
+
+    def try_acquire(self) -> bool:
+        """
+        不等待地获取一个并发名额
+        Returns: 是否获取到名额，有空闲名额且没有排队的任务时返回 True
+
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake_up_waiters()
+
+    def _wake_up_waiters(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self) -> "AdaptiveConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+    def on_sample(self, latency: float) -> None:
+        """
+        记录一次成功请求的延迟并调整并发上限
+        Args:
+            latency: 请求耗时(秒)
+
+        Returns:
+
+        """
+        if not self.adaptive or latency <= 0:
+            return
+        self._sample_count += 1
+        if self._min_latency is None or latency < self._min_latency or self._sample_count % self.probe_interval == 0:
+            self._min_latency = latency
+        queue_ratio = 1 - self._min_latency / latency
+        if queue_ratio < self.alpha:
+            # 并发没用满时延迟低不代表还能承受更高的并发
+            if self.in_flight * 2 >= self.limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._wake_up_waiters()
+        elif queue_ratio > self.beta:
+            self._limit = max(self.min_limit, self._limit - 1 / self._limit)
+
+    def on_dropped(self) -> None:
+        """请求被限流或超时，降低并发上限"""
+        if self.adaptive:
+            self._limit = max(self.min_limit, self._limit * 0.75)
+
+
+_concurrency_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+
+
+def get_concurrency_limiter(platform: str) -> AdaptiveConcurrencyLimiter:
+    """
+    获取平台共享的并发控制器，首次调用时按配置创建(保证命令行参数已经生效)
+    Args:
+        platform: 平台
+
+    Returns:
+
+    """
+    limiter = _concurrency_limiters.get(platform)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=config.MAX_CONCURRENCY_NUM,
+            min_limit=1,
+            max_limit=max(config.MAX_CONCURRENCY_NUM, config.ADAPTIVE_CONCURRENCY_MAX_NUM),
+            adaptive=config.ENABLE_ADAPTIVE_CONCURRENCY,
+        )
+        _concurrency_limiters[platform] = limiter
+    return limiter
@@ -0,0 +1,162 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 分阶段的爬取流水线，搜索翻页、详情、保存、评论等阶段通过有界队列连接，各阶段同时处理不同的页；
+#            以及并发消费多个分页迭代器(如多条一级评论下的子评论)
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+
+from tools.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+# 队列结束标记
+_END = object()
+
+
+async def run_pipeline(
+        source: AsyncIterator[Any],
+        stages: Sequence[Callable[[Any], Awaitable[Any]]],
+        queue_size: int = 1,
+) -> None:
+    """
+    按流水线执行爬取：source 产出的每一项依次经过各个阶段，上一阶段的返回值是下一阶段的输入
+    每个阶段由一个 task 按顺序处理，阶段之间的队列最多缓存 queue_size 项，
+    例如第 N 页在获取评论时第 N+1 页已在获取详情，总耗时接近最慢的阶段而不是各阶段之和
+    阶段返回 None 时该项不再传给后续阶段；任一阶段抛出异常时取消整个流水线并向上抛出
+    Args:
+        source: 产出待处理项的异步迭代器，例如逐页搜索的异步生成器
+        stages: 各阶段的处理函数
+        queue_size: 阶段之间的队列长度
+
+    Returns:
+
+    """
+    queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=max(1, queue_size)) for _ in stages]
+
+    async def produce():
+        async for item in source:
+            await queues[0].put(item)
+        await queues[0].put(_END)
+
+    async def consume(index: int, stage: Callable[[Any], Awaitable[Any]]):
+        next_queue = queues[index + 1] if index + 1 < len(queues) else None
+        while True:
+            item = await queues[index].get()
+            if item is _END:
+                if next_queue is not None:
+                    await next_queue.put(_END)
+                return
+            result = await stage(item)
+            if next_queue is not None and result is not None:
+                await next_queue.put(result)
+
+    task_list = [asyncio.create_task(produce())]
+    task_list.extend(asyncio.create_task(consume(index, stage)) for index, stage in enumerate(stages))
+    try:
+        await asyncio.gather(*task_list)
+    except BaseException:
+        for task in task_list:
+            task.cancel()
+        await asyncio.gather(*task_list, return_exceptions=True)
+        raise
+    finally:
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def merge_page_iterators(
+        iterators: Sequence[AsyncIterator[List[Any]]],
+        concurrency: int = 4,
+        max_count: Optional[int] = None,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+) -> AsyncIterator[List[Any]]:
+    """
+    并发消费多个分页迭代器，每个迭代器独立翻页(各自维护游标)，按到达顺序产出各迭代器的分页
+    最多同时消费 concurrency 个迭代器，产出的总条数达到 max_count 时停止并取消其余迭代器
+    传入平台共享的并发控制器 limiter 时按页获取并发名额，不再使用 concurrency：
+    调用方(评论任务)已经持有一个名额，消费期间它自己不发请求，这个名额同一时刻给一个迭代器翻页，
+    其余迭代器只在控制器有空闲名额时并发翻页，不会等待控制器(调用方持有名额时等待会和其他评论任务互相等待)
+    Args:
+        iterators: 分页迭代器，每次产出一页数据(列表)
+        concurrency: 同时消费的迭代器数量
+        max_count: 产出的最大总条数，None 表示不限制
+        limiter: 平台共享的并发控制器
+
+    Returns:
+
+    """
+    if not iterators or (max_count is not None and max_count <= 0):
+        return
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    # 调用方持有的并发名额
+    owner_slot = asyncio.Lock()
+    # 队列有界，消费方处理慢时各迭代器暂停翻页，内存只保留少量分页
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, concurrency))
+
+    async def next_page(iterator: AsyncIterator[List[Any]]) -> List[Any]:
+        if owner_slot.locked() and limiter.try_acquire():
+            try:
+                return await iterator.__anext__()
+            finally:
+                limiter.release()
+        async with owner_slot:
+            return await iterator.__anext__()
+
+    async def consume(iterator: AsyncIterator[List[Any]]):
+        if limiter is None:
+            async with semaphore:
+                async for page in iterator:
+                    await queue.put((page, None))
+            return
+        while True:
+            try:
+                page = await next_page(iterator)
+            except StopAsyncIteration:
+                return
+            await queue.put((page, None))
+
+    async def drain(iterator: AsyncIterator[List[Any]]):
+        try:
+            await consume(iterator)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put((_END, e))
+            return
+        finally:
+            # 被取消时迭代器可能停在 yield 处，需要显式关闭以执行其清理逻辑
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        await queue.put((_END, None))
+
+    task_list = [asyncio.create_task(drain(iterator)) for iterator in iterators]
+    count = 0
+    try:
+        running = len(task_list)
+        while running:
+            page, error = await queue.get()
+            if page is _END:
+                if error is not None:
+                    raise error
+                running -= 1
+                continue
+            if max_count is not None:
+                page = page[:max_count - count]
+            count += len(page)
+            yield page
+            if max_count is not None and count >= max_count:
+                return
+    finally:
+        for task in task_list:
+            task.cancel()
+        await asyncio.gather(*task_list, return_exceptions=True)
@@ -21,7 +21,7 @@ import re
 import urllib
 import urllib.parse
 from io import BytesIO
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import httpx
 from PIL import Image, ImageDraw
@@ -203,3 +203,26 @@ def extract_url_params_to_dict(url: str) -> Dict:
     parsed_url = urllib.parse.urlparse(url)
     url_params_dict = dict(urllib.parse.parse_qsl(parsed_url.query))
     return url_params_dict
+
+
+def drop_seen_items(items: List[Any], is_seen: Callable[[Any], bool], has_more: bool,
+                    is_pinned: Optional[Callable[[Any], bool]] = None) -> Tuple[List[Any], bool]:
+    """
+    去掉创作者主页一页内容中已爬取过的条目，用于增量爬取
+    主页按发布时间倒序，遇到已爬取过的非置顶条目说明之后的条目都已爬取过，停止翻页
+    Args:
+        items: 一页内容
+        is_seen: 判断条目是否已经爬取过
+        has_more: 是否还有下一页
+        is_pinned: 判断条目是否为置顶，置顶条目不按发布时间排序
+
+    Returns: 未爬取过的条目, 是否继续翻页
+
+    """
+    new_items = []
+    for item in items:
+        if not is_seen(item):
+            new_items.append(item)
+        elif not (is_pinned and is_pinned(item)):
+            return new_items, False
+    return new_items, has_more
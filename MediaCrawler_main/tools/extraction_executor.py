@@ -0,0 +1,113 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : HTML 解析进程池，大页面的 XPath/正则/JSON 解析放到子进程执行，避免阻塞事件循环
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+import config
+from tools import utils
+
+
+class ExtractionExecutor:
+    """
+    解析执行器：
+    1. 参数中的文本总长度小于 inline_max_size 时直接在当前线程解析，小页面不值得跨进程传输
+    2. 否则提交到进程池解析，解析函数和返回值需要可以被 pickle(模块级函数、提取器的方法，pydantic 模型或 dict)
+    3. 进程池异常退出时退回当前线程解析，下次调用重建进程池
+    """
+
+    def __init__(self, max_workers: int = 2, inline_max_size: int = 64 * 1024):
+        """
+        Args:
+            max_workers: 解析进程数量，小于等于 0 时全部在当前线程解析
+            inline_max_size: 直接在当前线程解析的最大文本长度(字符数)
+        """
+        self.max_workers = max_workers
+        self.inline_max_size = inline_max_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # 主进程中有事件循环、浏览器等线程，使用 spawn 启动干净的子进程，不 fork 这些状态
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def should_inline(self, *args: Any) -> bool:
+        if self.max_workers <= 0:
+            return True
+        size = sum(len(arg) for arg in args if isinstance(arg, (str, bytes)))
+        return size < self.inline_max_size
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        执行解析函数
+        Args:
+            func: 解析函数
+            *args: 解析函数的参数，其中的文本(页面内容)用于判断是否在当前线程解析
+            **kwargs: 解析函数的关键字参数
+
+        Returns:
+            解析函数的返回值
+
+        """
+        if self.should_inline(*args):
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_pool(), functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool as e:
+            utils.logger.error(f"[ExtractionExecutor.run] process pool is broken, fallback to inline: {e}")
+            self.close()
+            return func(*args, **kwargs)
+
+    def close(self) -> None:
+        """
+        关闭进程池
+        Returns:
+
+        """
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+_extraction_executor: Optional[ExtractionExecutor] = None
+
+
+def get_extraction_executor() -> ExtractionExecutor:
+    """获取全局解析执行器，首次调用时按配置创建"""
+    global _extraction_executor
+    if _extraction_executor is None:
+        _extraction_executor = ExtractionExecutor(
+            max_workers=config.EXTRACTION_PROCESS_NUM,
+            inline_max_size=config.EXTRACTION_INLINE_MAX_SIZE,
+        )
+    return _extraction_executor
+
+
+async def run_extraction(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """使用全局解析执行器执行解析函数"""
+    return await get_extraction_executor().run(func, *args, **kwargs)
+
+
+def close() -> None:
+    """关闭全局解析执行器的进程池"""
+    if _extraction_executor is not None:
+        _extraction_executor.close()
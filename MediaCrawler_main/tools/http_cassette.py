@@ -0,0 +1,167 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : HTTP 录制/回放，录制各平台 API 的请求和响应保存为压缩的 cassette 文件，回放时不访问网络
+import base64
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from tools import utils
+
+# 签名、时间戳、随机数等每次请求都会变化的参数，匹配录制记录时忽略
+VOLATILE_PARAMS = {
+    "a_bogus", "X-Bogus", "msToken", "verifyFp", "fp", "_signature", "w_rid", "wts", "x-s", "x-t", "x-s-common",
+    "search_id", "session_id", "t", "ts", "timestamp", "_", "callback", "rnd", "__NS_sig3",
+}
+
+# 图片、视频等大文件不录制
+SKIP_CONTENT_TYPE_PREFIXES = ("image/", "video/", "audio/", "application/octet-stream")
+
+# 响应体以解码后的内容保存，回放时不能再带这些头
+DROP_RESPONSE_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+class CassetteMissError(httpx.TransportError):
+    """回放时 cassette 中没有匹配的录制记录"""
+
+
+def _normalize_body(content: bytes) -> str:
+    if not content:
+        return ""
+    try:
+        body = json.loads(content)
+    except (ValueError, UnicodeDecodeError):
+        body = None
+    if isinstance(body, dict):
+        body = {key: value for key, value in body.items() if key not in VOLATILE_PARAMS}
+        return json.dumps(body, sort_keys=True, ensure_ascii=False)
+    try:
+        form = parse_qsl(content.decode("utf-8"), keep_blank_values=True, strict_parsing=True)
+        return urlencode(sorted((key, value) for key, value in form if key not in VOLATILE_PARAMS))
+    except (ValueError, UnicodeDecodeError):
+        return hashlib.sha1(content).hexdigest()
+
+
+def make_match_key(method: str, url: str, content: bytes = b"") -> str:
+    """
+    生成录制记录的匹配 key：请求方法 + 去掉易变参数并排序的 url + 规整后的请求体，请求头不参与匹配
+    Args:
+        method: 请求方法
+        url: 请求 url
+        content: 请求体
+
+    Returns:
+
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if key not in VOLATILE_PARAMS))
+    normalized_url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+    return f"{method.upper()} {normalized_url} {_normalize_body(content)}"
+
+
+class Cassette:
+    """
+    一个 cassette 文件保存一次爬取的所有请求/响应，格式为 gzip 压缩的 jsonl，每行一条记录
+    同一个 key 的多条记录按录制顺序回放，回放到最后一条时重复返回最后一条
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._records: List[Dict] = []
+        self._replay_records: Dict[str, Deque[Dict]] = {}
+
+    def load(self) -> "Cassette":
+        if os.path.exists(self.file_path):
+            with gzip.open(self.file_path, mode="rt", encoding="utf-8") as f:
+                self._records = [json.loads(line) for line in f if line.strip()]
+        self._replay_records = {}
+        for record in self._records:
+            self._replay_records.setdefault(record["match_key"], deque()).append(record)
+        utils.logger.info(f"[Cassette.load] loaded {len(self._records)} records from {self.file_path}")
+        return self
+
+    def save(self) -> None:
+        pathlib.Path(self.file_path).parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.file_path, mode="wt", encoding="utf-8") as f:
+            for record in self._records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        utils.logger.info(f"[Cassette.save] saved {len(self._records)} records to {self.file_path}")
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, request: httpx.Request, response: httpx.Response) -> None:
+        """
+        录制一对请求/响应，响应体必须已经读取
+        Args:
+            request:
+            response:
+
+        Returns:
+
+        """
+        content = response.content
+        record = {
+            "match_key": make_match_key(request.method, str(request.url), request.content),
+            "method": request.method,
+            "url": str(request.url),
+            "status_code": response.status_code,
+            "headers": [[key, value] for key, value in response.headers.items()
+                        if key.lower() not in DROP_RESPONSE_HEADERS],
+        }
+        try:
+            record["text"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            record["content_b64"] = base64.b64encode(content).decode("ascii")
+        self._records.append(record)
+
+    def find(self, request: httpx.Request) -> Optional[Dict]:
+        records = self._replay_records.get(make_match_key(request.method, str(request.url), request.content))
+        if not records:
+            return None
+        return records.popleft() if len(records) > 1 else records[0]
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """从 cassette 返回录制的响应，不访问网络"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        record = self.cassette.find(request)
+        if record is None:
+            raise CassetteMissError(f"no recorded response for {request.method} {request.url}", request=request)
+        if "text" in record:
+            content = record["text"].encode("utf-8")
+        else:
+            content = base64.b64decode(record["content_b64"])
+        return httpx.Response(record["status_code"], headers=record["headers"], content=content, request=request)
+
+
+async def record_response_hook(cassette: Cassette, response: httpx.Response) -> None:
+    """httpx 响应钩子，读取响应体后写入 cassette，图片/视频不录制"""
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith(SKIP_CONTENT_TYPE_PREFIXES):
+        return
+    await response.aread()
+    cassette.add(response.request, response)
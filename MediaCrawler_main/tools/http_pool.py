@@ -0,0 +1,210 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 按代理复用的 httpx 长连接池，供所有平台的 API 客户端共享
+import functools
+import json
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, List, Optional, Union
+
+import httpx
+
+import config
+from tools import utils
+from tools.http_cassette import Cassette, ReplayTransport, record_response_hook
+
+ProxiesType = Optional[Union[str, Dict[str, str]]]
+
+
+class HttpClientPool:
+    """
+    每个代理(包括无代理)对应一个长期存活的 httpx.AsyncClient，
+    复用 TCP/TLS 连接，开启 keep-alive，可选 HTTP/2 多路复用
+    """
+
+    def __init__(
+            self,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 30,
+            http2: bool = False,
+            cassette_mode: str = "",
+            cassette: Optional[Cassette] = None,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            max_connections: 最大连接数
+            max_keepalive_connections: 最大空闲长连接数
+            keepalive_expiry: 空闲长连接保持时间(秒)
+            http2: 是否开启 HTTP/2
+            cassette_mode: 空字符串为正常请求，record 录制请求和响应，replay 从 cassette 回放不访问网络
+            cassette: 录制/回放使用的 cassette
+            transport: 非回放模式下使用的自定义 transport，为空时使用 httpx 默认的网络 transport
+        """
+        self._cassette_mode = cassette_mode if cassette is not None else ""
+        self._cassette = cassette
+        self._transport = transport
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2 = http2 and self._http2_available()
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # 已从 _clients 移除但可能还有进行中请求的客户端，close_all 时关闭
+        self._retired_clients: List[httpx.AsyncClient] = []
+
+    @staticmethod
+    def _http2_available() -> bool:
+        """
+        HTTP/2 依赖 h2 包(pip install httpx[http2])，未安装时退回 HTTP/1.1
+        Returns:
+
+        """
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            utils.logger.warning("[HttpClientPool] h2 is not installed, fallback to HTTP/1.1")
+            return False
+
+    @staticmethod
+    def _proxy_key(proxies: ProxiesType) -> str:
+        if not proxies:
+            return ""
+        if isinstance(proxies, dict):
+            return json.dumps(proxies, sort_keys=True)
+        return str(proxies)
+
+    def get_client(self, proxies: ProxiesType = None) -> httpx.AsyncClient:
+        """
+        获取指定代理对应的共享客户端，不存在或已关闭时创建
+        Args:
+            proxies: httpx 格式的代理
+
+        Returns:
+
+        """
+        key = self._proxy_key(proxies)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            # 共享连接不共享 cookie，每次请求的 cookie 仍以请求头为准
+            cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+            if self._cassette_mode == "replay":
+                client = httpx.AsyncClient(transport=ReplayTransport(self._cassette), cookies=cookies)
+            else:
+                event_hooks = None
+                if self._cassette_mode == "record":
+                    event_hooks = {"response": [functools.partial(record_response_hook, self._cassette)]}
+                client = httpx.AsyncClient(
+                    proxies=proxies or None,
+                    limits=self._limits,
+                    http2=self._http2,
+                    cookies=cookies,
+                    event_hooks=event_hooks,
+                    transport=self._transport,
+                )
+            self._clients[key] = client
+        return client
+
+    async def close_client(self, proxies: ProxiesType = None) -> None:
+        """
+        关闭指定代理对应的客户端，一般在代理失效或被替换时调用
+        Args:
+            proxies: httpx 格式的代理
+
+        Returns:
+
+        """
+        client = self._clients.pop(self._proxy_key(proxies), None)
+        if client is not None:
+            await client.aclose()
+
+    def retire_client(self, proxies: ProxiesType = None) -> None:
+        """
+        代理失效或被替换时调用，之后的请求不再使用该代理对应的客户端
+        同一个客户端上可能还有其他进行中的请求，不立即关闭，由 close_all 统一关闭
+        Args:
+            proxies: httpx 格式的代理
+
+        Returns:
+
+        """
+        client = self._clients.pop(self._proxy_key(proxies), None)
+        if client is not None:
+            self._retired_clients.append(client)
+
+    async def close_all(self) -> None:
+        """
+        关闭所有客户端，释放连接
+        Returns:
+
+        """
+        clients = list(self._clients.values()) + self._retired_clients
+        self._clients.clear()
+        self._retired_clients = []
+        for client in clients:
+            await client.aclose()
+        if clients:
+            utils.logger.info(f"[HttpClientPool.close_all] closed {len(clients)} http clients")
+        if self._cassette_mode == "record":
+            self._cassette.save()
+
+
+_http_client_pool: Optional[HttpClientPool] = None
+
+
+def get_http_client_pool() -> HttpClientPool:
+    """
+    获取全局连接池，首次调用时按配置创建(保证命令行参数已经生效)
+    Returns:
+
+    """
+    global _http_client_pool
+    if _http_client_pool is None:
+        cassette = None
+        if config.HTTP_CASSETTE_MODE in ("record", "replay"):
+            cassette = Cassette(get_cassette_file_path())
+            if config.HTTP_CASSETTE_MODE == "replay":
+                cassette.load()
+        _http_client_pool = HttpClientPool(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            http2=config.ENABLE_HTTP2,
+            cassette_mode=config.HTTP_CASSETTE_MODE,
+            cassette=cassette,
+        )
+    return _http_client_pool
+
+
+def get_cassette_file_path() -> str:
+    """cassette 文件按平台和爬取类型区分，例如 data/cassettes/xhs_search.jsonl.gz"""
+    return f"{config.HTTP_CASSETTE_DIR}/{config.PLATFORM}_{config.CRAWLER_TYPE}.jsonl.gz"
+
+
+def get_client(proxies: ProxiesType = None) -> httpx.AsyncClient:
+    """获取指定代理对应的共享 httpx 客户端"""
+    return get_http_client_pool().get_client(proxies)
+
+
+async def close_all() -> None:
+    """关闭全局连接池中的所有客户端"""
+    if _http_client_pool is not None:
+        await _http_client_pool.close_all()
+
+
+def retire_client(proxies: ProxiesType = None) -> None:
+    """停止使用全局连接池中指定代理对应的客户端，进行中的请求不受影响，程序结束时关闭"""
+    if _http_client_pool is not None:
+        _http_client_pool.retire_client(proxies)
@@ -0,0 +1,386 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 流式媒体下载，分块写入临时文件后原子重命名，支持 Range 断点续传、大文件分段并行下载、全局限速和并发限制
+#            以及独立于爬取流程的下载队列和 worker 池
+import asyncio
+import os
+import pathlib
+import shutil
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+import httpx
+
+import config
+from tools import http_pool, utils
+from tools.http_pool import ProxiesType
+
+PART_SUFFIX = ".part"
+
+
+class MediaDownloadError(Exception):
+    """媒体下载失败"""
+
+
+class BandwidthLimiter:
+    """
+    全局带宽限制，所有下载共享，按 已分配字节数 / 速率 推算下一块数据最早可以写入的时间
+    """
+
+    def __init__(self, max_bytes_per_sec: int = 0):
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self._next_time = 0.0
+
+    async def consume(self, size: int) -> None:
+        if self.max_bytes_per_sec <= 0:
+            return
+        now = time.monotonic()
+        start = max(self._next_time, now)
+        self._next_time = start + size / self.max_bytes_per_sec
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class MediaDownloader:
+    """
+    媒体文件下载器
+    1. 响应按 chunk_size 分块直接写入 <文件名>.part，下载完成后重命名为目标文件，内存占用与文件大小无关
+    2. .part 文件已存在时通过 Range 请求从断点继续下载
+    3. 文件大于 segment_threshold 且服务端支持 Range 时，分成 segment_num 段并行下载后合并
+    4. 所有下载共享并发数(max_concurrency 个同时进行的 HTTP 流)和带宽(max_bytes_per_sec)预算
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 4,
+            max_bytes_per_sec: int = 0,
+            chunk_size: int = 64 * 1024,
+            segment_threshold: int = 32 * 1024 * 1024,
+            segment_num: int = 4,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.chunk_size = chunk_size
+        self.segment_threshold = segment_threshold
+        self.segment_num = max(1, segment_num)
+        self._limiter = BandwidthLimiter(max_bytes_per_sec)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 实际从网络读取的字节数，用于统计下载速度
+        self.downloaded_bytes = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def download(self, url: str, save_file_name: str, headers: Optional[Dict] = None,
+                       proxies: ProxiesType = None, timeout: float = 60) -> bool:
+        """
+        下载媒体文件到本地，目标文件已存在时直接跳过
+        Args:
+            url: 媒体地址
+            save_file_name: 保存路径
+            headers: 请求头
+            proxies: httpx 格式的代理
+            timeout: 单次网络读写超时时间
+
+        Returns: 是否下载成功
+
+        """
+        if os.path.exists(save_file_name):
+            return True
+        pathlib.Path(save_file_name).parent.mkdir(parents=True, exist_ok=True)
+        part_file_name = save_file_name + PART_SUFFIX
+        headers = dict(headers or {})
+        try:
+            if self.segment_num > 1 and not os.path.exists(part_file_name):
+                await self._download_first_time(url, part_file_name, headers, proxies, timeout)
+            else:
+                await self._download_range(url, part_file_name, headers, proxies, timeout)
+            os.replace(part_file_name, save_file_name)
+        except (httpx.HTTPError, MediaDownloadError, OSError) as e:
+            # 保留 .part 文件，下次下载同一个文件时断点续传
+            utils.logger.error(f"[MediaDownloader.download] download {url} to {save_file_name} failed, err: {e}")
+            return False
+        utils.logger.info(f"[MediaDownloader.download] save media {save_file_name} success ...")
+        return True
+
+    async def _download_first_time(self, url: str, part_file_name: str, headers: Dict, proxies: ProxiesType,
+                                   timeout: float) -> None:
+        """
+        首次下载直接请求整个文件，不单独探测大小：
+        响应的文件大小超过 segment_threshold 且服务端支持 Range 时放弃这个响应，改为分段并行下载，
+        否则直接写入这个响应，图片等小文件只需要一次请求
+        """
+        total_size = None
+        client = http_pool.get_client(proxies)
+        async with self._get_semaphore():
+            async with client.stream("GET", url, headers=headers, timeout=timeout) as response:
+                if response.status_code != 200:
+                    raise MediaDownloadError(f"unexpected status code {response.status_code}")
+                content_length = response.headers.get("Content-Length", "")
+                if (content_length.isdigit() and int(content_length) >= self.segment_threshold
+                        and response.headers.get("Accept-Ranges", "").lower() == "bytes"):
+                    total_size = int(content_length)
+                else:
+                    await self._write_response(response, part_file_name, "wb")
+        # 分段下载的每个分段各自占用下载并发，需要在释放当前的并发之后进行
+        if total_size is not None:
+            await self._download_segments(url, part_file_name, total_size, headers, proxies, timeout)
+
+    async def _download_segments(self, url: str, part_file_name: str, total_size: int, headers: Dict,
+                                 proxies: ProxiesType, timeout: float) -> None:
+        segment_size = -(-total_size // self.segment_num)
+        segments: List[Tuple[str, int, int]] = []
+        for index in range(self.segment_num):
+            start = index * segment_size
+            end = min(total_size, start + segment_size) - 1
+            if start > end:
+                break
+            segments.append((f"{part_file_name}.{index}", start, end))
+
+        await asyncio.gather(*[
+            self._download_range(url, segment_file_name, headers, proxies, timeout, start, end)
+            for segment_file_name, start, end in segments
+        ])
+        for segment_file_name, start, end in segments:
+            if os.path.getsize(segment_file_name) != end - start + 1:
+                raise MediaDownloadError(f"segment {segment_file_name} is incomplete")
+        # 合并分段文件，合并期间使用临时文件名，不与单流下载的 .part 文件混淆
+        await asyncio.get_event_loop().run_in_executor(
+            None, self._merge_segments, [name for name, _, _ in segments], part_file_name
+        )
+
+    @staticmethod
+    def _merge_segments(segment_file_names: List[str], part_file_name: str) -> None:
+        merging_file_name = part_file_name + ".merging"
+        with open(merging_file_name, "wb") as dst:
+            for segment_file_name in segment_file_names:
+                with open(segment_file_name, "rb") as src:
+                    shutil.copyfileobj(src, dst)
+        os.replace(merging_file_name, part_file_name)
+        for segment_file_name in segment_file_names:
+            os.remove(segment_file_name)
+
+    async def _download_range(self, url: str, file_name: str, headers: Dict, proxies: ProxiesType,
+                              timeout: float, start: int = 0, end: Optional[int] = None) -> None:
+        """
+        把 [start, end] 区间的数据流式追加到 file_name，file_name 已有的内容视为已下载的部分
+        """
+        downloaded = os.path.getsize(file_name) if os.path.exists(file_name) else 0
+        if end is not None and downloaded >= end - start + 1:
+            return
+        request_headers = dict(headers)
+        if start + downloaded > 0 or end is not None:
+            request_headers["Range"] = f"bytes={start + downloaded}-{'' if end is None else end}"
+
+        client = http_pool.get_client(proxies)
+        async with self._get_semaphore():
+            async with client.stream("GET", url, headers=request_headers, timeout=timeout) as response:
+                if response.status_code == 206:
+                    mode = "ab"
+                elif response.status_code == 200 and start == 0 and end is None:
+                    # 服务端不支持 Range，从头开始下载
+                    mode = "wb"
+                elif response.status_code == 416 and downloaded > 0 and end is None:
+                    # 上次已经下载完整，只是没来得及重命名
+                    return
+                else:
+                    raise MediaDownloadError(f"unexpected status code {response.status_code}")
+                await self._write_response(response, file_name, mode)
+
+    async def _write_response(self, response: httpx.Response, file_name: str, mode: str) -> None:
+        async with aiofiles.open(file_name, mode) as f:
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                await self._limiter.consume(len(chunk))
+                await f.write(chunk)
+                self.downloaded_bytes += len(chunk)
+
+
+DownloadJob = Callable[[], Awaitable[bool]]
+
+
+class MediaDownloadQueue:
+    """
+    媒体下载 worker 池，爬虫只负责把下载任务放入队列，元数据爬取不再等待媒体下载
+    1. worker_num 个 worker 并行消费队列，失败的任务按 1s、2s、4s... 间隔重试 max_retries 次，.part 文件保留用于断点续传
+    2. 队列长度达到 max_queue_size 时 put 会等待，避免下载跟不上时任务无限堆积
+    3. 定期输出队列长度和下载速度，程序结束前调用 join 等待队列清空
+    """
+
+    def __init__(self, downloader: MediaDownloader, worker_num: int = 4, max_queue_size: int = 1000,
+                 max_retries: int = 3, report_interval: float = 10):
+        self.downloader = downloader
+        self.worker_num = max(1, worker_num)
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.report_interval = report_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reporter: Optional[asyncio.Task] = None
+        self._start_time = 0.0
+        self.done_count = 0
+        self.failed_count = 0
+        self._start_bytes = 0
+
+    @property
+    def pending_count(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if not self._workers:
+            self._start_time = time.monotonic()
+            self._start_bytes = self.downloader.downloaded_bytes
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_num)]
+            self._reporter = asyncio.create_task(self._report_periodically())
+
+    async def put(self, job: DownloadJob, save_file_name: str) -> None:
+        """
+        放入一个下载任务，队列已满时等待
+        Args:
+            job: 执行一次下载的协程函数，返回是否成功，通常是 functools.partial(client.download_xxx, url, save_file_name)
+            save_file_name: 保存的文件名，用于日志
+
+        Returns:
+
+        """
+        self._ensure_workers()
+        await self._queue.put((job, save_file_name))
+
+    async def _worker(self) -> None:
+        while True:
+            job, save_file_name = await self._queue.get()
+            try:
+                await self._run_job(job, save_file_name)
+            except Exception as e:
+                self.failed_count += 1
+                utils.logger.error(f"[MediaDownloadQueue._worker] download {save_file_name} error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: DownloadJob, save_file_name: str) -> None:
+        for attempt in range(self.max_retries + 1):
+            if await job():
+                self.done_count += 1
+                return
+            if attempt < self.max_retries:
+                await asyncio.sleep(2 ** attempt)
+        self.failed_count += 1
+        utils.logger.error(f"[MediaDownloadQueue._run_job] download {save_file_name} failed after "
+                           f"{self.max_retries} retries")
+
+    def stats(self) -> Dict:
+        """
+        下载队列统计信息
+        Returns:
+
+        """
+        elapsed = max(time.monotonic() - self._start_time, 1e-6) if self._start_time else 0
+        downloaded_bytes = self.downloader.downloaded_bytes - self._start_bytes
+        return {
+            "pending": self.pending_count,
+            "done": self.done_count,
+            "failed": self.failed_count,
+            "downloaded_bytes": downloaded_bytes,
+            "bytes_per_sec": downloaded_bytes / elapsed if elapsed else 0,
+        }
+
+    def _log_stats(self, prefix: str) -> None:
+        stats = self.stats()
+        utils.logger.info(
+            f"[{prefix}] media download pending: {stats['pending']}, done: {stats['done']}, "
+            f"failed: {stats['failed']}, speed: {stats['bytes_per_sec'] / 1024:.1f} KB/s"
+        )
+
+    async def _report_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self._log_stats("MediaDownloadQueue._report_periodically")
+
+    async def join(self) -> None:
+        """
+        等待队列中的任务全部完成并停止 worker
+        Returns:
+
+        """
+        if self._queue is None or not self._workers:
+            return
+        if self.pending_count:
+            utils.logger.info(f"[MediaDownloadQueue.join] waiting for {self.pending_count} media downloads ...")
+        await self._queue.join()
+        tasks = self._workers + [self._reporter]
+        self._workers, self._reporter = [], None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._log_stats("MediaDownloadQueue.join")
+
+
+_media_downloader: Optional[MediaDownloader] = None
+
+
+def get_media_downloader() -> MediaDownloader:
+    """
+    获取全局共享的媒体下载器，所有平台共用同一份并发和带宽预算
+    Returns:
+
+    """
+    global _media_downloader
+    if _media_downloader is None:
+        _media_downloader = MediaDownloader(
+            max_concurrency=config.MEDIA_DOWNLOAD_CONCURRENCY,
+            max_bytes_per_sec=config.MEDIA_DOWNLOAD_MAX_BYTES_PER_SEC,
+            chunk_size=config.MEDIA_DOWNLOAD_CHUNK_SIZE,
+            segment_threshold=config.MEDIA_DOWNLOAD_SEGMENT_THRESHOLD,
+            segment_num=config.MEDIA_DOWNLOAD_SEGMENT_NUM,
+        )
+    return _media_downloader
+
+
+async def download(url: str, save_file_name: str, headers: Optional[Dict] = None,
+                   proxies: ProxiesType = None, timeout: float = 60) -> bool:
+    """使用全局下载器下载媒体文件"""
+    return await get_media_downloader().download(url, save_file_name, headers, proxies, timeout)
+
+
+_media_download_queue: Optional[MediaDownloadQueue] = None
+
+
+def get_media_download_queue() -> MediaDownloadQueue:
+    """
+    获取全局共享的媒体下载队列
+    Returns:
+
+    """
+    global _media_download_queue
+    if _media_download_queue is None:
+        _media_download_queue = MediaDownloadQueue(
+            get_media_downloader(),
+            worker_num=config.MEDIA_DOWNLOAD_WORKER_NUM,
+            max_queue_size=config.MEDIA_DOWNLOAD_QUEUE_SIZE,
+            max_retries=config.MEDIA_DOWNLOAD_MAX_RETRIES,
+        )
+    return _media_download_queue
+
+
+async def enqueue(job: DownloadJob, save_file_name: str) -> None:
+    """把下载任务放入全局下载队列，不等待下载完成"""
+    await get_media_download_queue().put(job, save_file_name)
+
+
+async def close() -> None:
+    """等待全局下载队列清空，程序退出前调用"""
+    if _media_download_queue is not None:
+        await _media_download_queue.join()
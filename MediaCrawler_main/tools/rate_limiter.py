@@ -0,0 +1,228 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 自适应限速，按 (平台, 接口, 代理) 划分令牌桶，速率按 AIMD 随限流信号和响应延迟调整
+import asyncio
+import functools
+import json
+import re
+import time
+from typing import Dict, Optional, Type
+from urllib.parse import urlsplit
+
+import httpx
+
+import config
+from tools import utils
+from tools.concurrency_limiter import get_concurrency_limiter
+
+# 路径中包含 4 位以上数字的片段视为帖子/用户 ID，同一类接口共用一个令牌桶
+ID_SEGMENT_PATTERN = re.compile(r"/[^/]*\d{4,}[^/]*")
+
+
+def get_endpoint_class(url: str) -> str:
+    """
+    接口分类：域名 + 去掉 ID 片段的路径，例如 api.zhihu.com/api/v4/answers/*/root_comments
+    Args:
+        url: 请求 url
+
+    Returns:
+
+    """
+    parts = urlsplit(url)
+    return f"{parts.netloc}{ID_SEGMENT_PATTERN.sub('/*', parts.path)}"
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶 + AIMD
+    1. 令牌按当前速率生成，最多累积 burst 个；令牌不足时预支令牌并等待，等待时间按排队顺序递增
+    2. 请求成功且延迟正常时加性增加速率，每秒约增加 increase_step
+    3. 遇到限流(429、验证码、IP 封禁)时速率乘以 decrease_factor，并清空累积的令牌
+    4. 近期延迟(快速 EWMA)超过长期延迟(慢速 EWMA)的 latency_factor 倍时认为接近平台承受上限，保持速率不再增加
+    """
+
+    def __init__(
+            self,
+            initial_rate: float = 2.0,
+            min_rate: float = 0.2,
+            max_rate: float = 5.0,
+            burst: float = 2.0,
+            increase_step: float = 0.5,
+            decrease_factor: float = 0.5,
+            latency_factor: float = 2.0,
+    ):
+        """
+        Args:
+            initial_rate: 初始速率(请求/秒)
+            min_rate: 最低速率
+            max_rate: 最高速率
+            burst: 令牌桶容量，允许的突发请求数
+            increase_step: 每秒加性增加的速率
+            decrease_factor: 限流时速率的乘性减小系数
+            latency_factor: 近期延迟超过长期延迟的倍数时停止增加速率
+        """
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.latency_ewma: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """
+        获取一个令牌，令牌不足时等待
+        Returns:
+
+        """
+        self._refill()
+        self._tokens -= 1
+        if self._tokens < 0:
+            # 预支的令牌由后续生成的令牌偿还，后来的请求等待更久，保证先来先得
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def on_success(self, latency: float) -> None:
+        """
+        请求成功，延迟正常时加性增加速率
+        Args:
+            latency: 请求耗时(秒)
+
+        Returns:
+
+        """
+        if self.latency_ewma is None:
+            self.latency_ewma = self.baseline_latency = latency
+        else:
+            self.latency_ewma = 0.7 * self.latency_ewma + 0.3 * latency
+            self.baseline_latency = 0.98 * self.baseline_latency + 0.02 * latency
+        if self.latency_ewma > self.baseline_latency * self.latency_factor:
+            return
+        self._refill()
+        self.rate = min(self.max_rate, self.rate + self.increase_step / self.rate)
+
+    def on_throttled(self) -> None:
+        """请求被限流，乘性减小速率"""
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._tokens = min(self._tokens, 0.0)
+
+
+class RateLimiterRegistry:
+    """按 (平台, 接口分类, 代理) 管理令牌桶，同一账号同一出口 IP 的同类接口共用一个速率"""
+
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveRateLimiter] = {}
+
+    def get_limiter(self, platform: str, url: str, proxies=None) -> AdaptiveRateLimiter:
+        """
+        获取请求对应的令牌桶，不存在时按配置创建
+        Args:
+            platform: 平台
+            url: 请求 url
+            proxies: 请求使用的代理
+
+        Returns:
+
+        """
+        proxies_key = json.dumps(proxies, sort_keys=True) if proxies else ""
+        key = f"{platform}|{get_endpoint_class(url)}|{proxies_key}"
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(
+                initial_rate=config.RATE_LIMIT_INITIAL_RPS,
+                min_rate=config.RATE_LIMIT_MIN_RPS,
+                max_rate=config.RATE_LIMIT_MAX_RPS,
+                burst=config.RATE_LIMIT_BURST,
+                increase_step=config.RATE_LIMIT_INCREASE_STEP,
+                decrease_factor=config.RATE_LIMIT_DECREASE_FACTOR,
+                latency_factor=config.RATE_LIMIT_LATENCY_FACTOR,
+            )
+            self._limiters[key] = limiter
+        return limiter
+
+
+rate_limiter_registry = RateLimiterRegistry()
+
+
+def rate_limited(platform: str, *throttle_errors: Type[Exception]):
+    """
+    API 客户端 request 方法的装饰器，请求前从令牌桶获取令牌，按请求结果调整速率
+    请求延迟和限流、超时信号同时反馈给平台共享的并发控制器，开启 IP 代理时请求成功和延迟反馈给代理池
+    未开启自适应限速(ENABLE_ADAPTIVE_RATE_LIMIT)时不等待令牌
+    Args:
+        platform: 平台
+        *throttle_errors: 平台表示限流、验证码、IP 封禁的异常类型
+
+    Returns:
+
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, method, url, **kwargs):
+            concurrency_limiter = get_concurrency_limiter(platform)
+            proxies = kwargs.get("proxies") or self.proxies
+            limiter = None
+            if config.ENABLE_ADAPTIVE_RATE_LIMIT:
+                limiter = rate_limiter_registry.get_limiter(platform, url, proxies)
+                await limiter.acquire()
+            start = time.monotonic()
+            try:
+                result = await func(self, method, url, **kwargs)
+            except throttle_errors as e:
+                concurrency_limiter.on_dropped()
+                if limiter is not None:
+                    limiter.on_throttled()
+                    utils.logger.warning(
+                        f"[rate_limited] {platform} {get_endpoint_class(url)} throttled, "
+                        f"rate down to {limiter.rate:.2f}/s, err: {e}"
+                    )
+                raise
+            except httpx.TimeoutException:
+                concurrency_limiter.on_dropped()
+                raise
+            latency = time.monotonic() - start
+            concurrency_limiter.on_sample(latency)
+            if limiter is not None:
+                limiter.on_success(latency)
+            proxy_rotator = getattr(self, "proxy_rotator", None)
+            if proxy_rotator is not None:
+                # 开启 IP 代理时把成功和延迟反馈给代理池，用于按健康分数选择代理
+                proxy_rotator.mark_success(proxies, latency)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+async def wait_crawl_interval(crawl_interval: float) -> None:
+    """
+    翻页之间的爬取间隔，开启自适应限速时请求速率由令牌桶控制，不再固定 sleep
+    Args:
+        crawl_interval: 未开启自适应限速时的 sleep 时间(秒)
+
+    Returns:
+
+    """
+    if not config.ENABLE_ADAPTIVE_RATE_LIMIT:
+        await asyncio.sleep(crawl_interval)
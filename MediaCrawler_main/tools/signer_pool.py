@@ -0,0 +1,186 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+
+# -*- coding: utf-8 -*-
+# @Desc    : 常驻 JS 签名进程池，替代每次签名都重新拉起 node 进程的 execjs 调用
+import asyncio
+import json
+import os
+import shutil
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from tools import utils
+
+SIGN_WORKER_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "libs", "sign_worker.js")
+
+
+class SignerError(Exception):
+    """签名进程调用失败"""
+
+
+class _NodeSignWorker:
+    """
+    一个常驻的 node 签名进程，通过 stdin/stdout 以行分隔的 JSON 通信
+    同一时刻只处理一个请求，由 SignerPool 负责调度
+    """
+
+    def __init__(self, node_path: str, js_path: str):
+        self._node_path = node_path
+        self._js_path = js_path
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._req_id = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self) -> None:
+        self._proc = await asyncio.create_subprocess_exec(
+            self._node_path, SIGN_WORKER_JS, self._js_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        ready = await self._read_line()
+        if not ready.get("ready"):
+            await self.close()
+            raise SignerError(f"load {self._js_path} failed: {ready.get('error')}")
+        utils.logger.info(f"[_NodeSignWorker.start] sign worker pid:{self._proc.pid} ready for {self._js_path}")
+
+    async def _read_line(self) -> Dict:
+        line = await self._proc.stdout.readline()
+        if not line:
+            raise SignerError(f"sign worker for {self._js_path} exited unexpectedly")
+        return json.loads(line)
+
+    async def call(self, fn_name: str, args: List[Any]) -> Any:
+        if not self.alive:
+            await self.start()
+        self._req_id += 1
+        payload = json.dumps({"id": self._req_id, "fn": fn_name, "args": args}, ensure_ascii=False)
+        try:
+            self._proc.stdin.write(payload.encode("utf-8") + b"\n")
+            await self._proc.stdin.drain()
+            resp = await self._read_line()
+        except (BrokenPipeError, ConnectionResetError, SignerError) as e:
+            # 进程已退出，下次调用时自动重启
+            await self.close()
+            raise SignerError(f"call {fn_name} failed: {e}")
+        if resp.get("id") != self._req_id:
+            await self.close()
+            raise SignerError(f"call {fn_name} got mismatched response: {resp}")
+        if "error" in resp:
+            raise SignerError(f"call {fn_name} error: {resp['error']}")
+        return resp.get("result")
+
+    async def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None or proc.returncode is not None:
+            return
+        try:
+            proc.stdin.close()
+            await asyncio.wait_for(proc.wait(), timeout=3)
+        except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+            proc.kill()
+            await proc.wait()
+
+
+class SignerPool:
+    """
+    签名服务，抖音 a_bogus 和知乎 x-zse-96 等签名统一通过 call 调用
+    1. 注册了纯 Python 实现(fast_paths)的函数直接在进程内计算
+    2. 否则交给常驻的 node 进程池，签名脚本只加载一次，进程复用
+    3. 本机没有 node 时退回 execjs，在线程池中执行，避免阻塞事件循环
+    """
+
+    # 只弱引用已创建的进程池，不再使用的进程池可以被回收
+    _instances: "weakref.WeakSet[SignerPool]" = weakref.WeakSet()
+
+    def __init__(self, js_path: str, pool_size: int = 1, fast_paths: Optional[Dict[str, Callable]] = None):
+        """
+
+        Args:
+            js_path: 签名脚本路径
+            pool_size: 常驻 node 进程数量
+            fast_paths: 函数名 -> 纯 Python 实现
+        """
+        self.js_path = js_path
+        self.pool_size = max(1, pool_size)
+        self._fast_paths: Dict[str, Callable] = fast_paths or {}
+        self._node_path: Optional[str] = shutil.which("node")
+        self._workers: List[_NodeSignWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._execjs_ctx = None
+        SignerPool._instances.add(self)
+
+    async def call(self, fn_name: str, *args) -> Any:
+        """
+        调用签名函数
+        Args:
+            fn_name: 签名脚本中的函数名
+            *args: 函数参数，需要能被 JSON 序列化
+
+        Returns:
+
+        """
+        fast_path = self._fast_paths.get(fn_name)
+        if fast_path is not None:
+            return fast_path(*args)
+        if self._node_path is None:
+            return await self._call_execjs(fn_name, *args)
+
+        worker = await self._acquire()
+        try:
+            return await worker.call(fn_name, list(args))
+        finally:
+            # 调用期间进程池被 close 时 _idle 为 None，进程已被关闭，不再放回
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+    async def _acquire(self) -> _NodeSignWorker:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._idle.empty() and len(self._workers) < self.pool_size:
+            worker = _NodeSignWorker(self._node_path, self.js_path)
+            self._workers.append(worker)
+            try:
+                await worker.start()
+            except Exception:
+                self._workers.remove(worker)
+                raise
+            return worker
+        return await self._idle.get()
+
+    async def _call_execjs(self, fn_name: str, *args) -> Any:
+        if self._execjs_ctx is None:
+            import execjs
+            with open(self.js_path, mode="r", encoding="utf-8-sig") as f:
+                self._execjs_ctx = execjs.compile(f.read())
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: self._execjs_ctx.call(fn_name, *args))
+
+    async def close(self) -> None:
+        """
+        关闭所有常驻签名进程
+        Returns:
+
+        """
+        workers, self._workers = self._workers, []
+        self._idle = None
+        for worker in workers:
+            await worker.close()
+
+
+async def close_all() -> None:
+    """关闭所有签名进程池"""
+    for pool in list(SignerPool._instances):
+        await pool.close()
@@ -102,13 +102,10 @@ async def crawl_video(platform, params):
                 if note_info and 'video' in note_info:
                     video_url = note_info['video']['media']['url_list'][0]
                     
-                    # 下载视频
-                    video_content = await client.get_note_media(video_url)
-                    if video_content:
-                        filename = secure_filename(f'xhs_{note_id}.mp4')
-                        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                        with open(filepath, 'wb') as f:
-                            f.write(video_content)
+                    # 下载视频，直接流式写入上传目录
+                    filename = secure_filename(f'xhs_{note_id}.mp4')
+                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                    if await client.download_note_media(video_url, filepath):
                         return {'success': True, 'filepath': filepath, 'note_info': note_info}
                     else:
                         return {'success': False, 'error': '无法下载视频'}
@@ -244,13 +241,10 @@ async def crawl_video(platform, params):
                         video_url = best_video.get('main_url', '')
                         
                         if video_url:
-                            # 下载视频
-                            video_content = await client.get_note_media(video_url)
-                            if video_content:
-                                filename = secure_filename(f'tt_{note_id}.mp4')
-                                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                                with open(filepath, 'wb') as f:
-                                    f.write(video_content)
+                            # 下载视频，直接流式写入上传目录
+                            filename = secure_filename(f'tt_{note_id}.mp4')
+                            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                            if await client.download_note_media(video_url, filepath):
                                 return {'success': True, 'filepath': filepath, 'note_info': video_info}
                             else:
                                 return {'success': False, 'error': '无法下载视频'}